@@ -1,5 +1,10 @@
 from flask import Flask, jsonify, request, g
 from flask_cors import CORS
+# Medição de uso por empresa: os hooks do boto3 precisam ser registrados antes
+# de qualquer client existir — os blueprints criam clients no import.
+from services import usage_metering
+usage_metering.install()
+from services import request_metrics
 from routes import (
     routes,
     routes_v2,
@@ -9,19 +14,18 @@ from routes import (
     admin_routes,
     routes_facial,
     feriados_routes,
-    chatbot_rh_routes,
-    admin_aws_routes,
     payroll_routes,
     users_routes,
-    audit_routes,
     kiosk_telemetry_routes,
+    lazy as lazy_routes,
 )
 import os
 import json
 import time
 import uuid
-from collections import defaultdict
 from dotenv import load_dotenv
+from utils.rate_limiter import RateLimiter
+from utils.auth import current_payload
 import logging
 
 load_dotenv()
@@ -71,8 +75,9 @@ CORS(
     supports_credentials=True,
 )
 
-# ─── Rate limiting (token bucket in-memory) ───────────────────────────────────
-_rate_store: dict[str, list[float]] = defaultdict(list)
+# ─── Rate limiting (GCRA, estado compartilhado entre workers do host) ────────
+# Ver utils/rate_limiter.py — RATE_LIMIT_BACKEND escolhe sqlite/memory/remoto.
+_rate_limiter = RateLimiter()
 _RATE_CONFIG: dict[str, tuple[int, int]] = {
     '/api/login':                       (5, 60),
     '/api/funcionario/login':           (5, 60),
@@ -87,23 +92,14 @@ _COMPANY_SCOPED_ENDPOINTS = {'/api/reconhecer_rosto', '/api/registrar_ponto_faci
 
 
 def _facial_rate_key(path: str, ip: str) -> str:
-    """Para endpoints faciais, extrai company_id do JWT sem verificar assinatura
-    (a verificação completa acontece no decorator @token_required da rota).
-    Se não houver token ou company_id, cai back para IP."""
-    try:
-        import jwt as pyjwt
-        auth = request.headers.get('Authorization', '')
-        if auth.startswith('Bearer '):
-            payload = pyjwt.decode(
-                auth[7:],
-                options={"verify_signature": False},
-                algorithms=["HS256"],
-            )
-            cid = payload.get('company_id') or ''
-            if cid:
-                return f"company:{cid}:{path}"
-    except Exception:
-        pass
+    """Para endpoints faciais, conta por company_id do JWT. O token é verificado
+    aqui (current_payload guarda as claims em `g`, então o @token_required da
+    rota não decodifica de novo) — um company_id forjado não consome o bucket
+    de outra empresa. Sem token válido, cai back para IP."""
+    payload = current_payload(allow_cookie=False)
+    cid = (payload or {}).get('company_id') or ''
+    if cid:
+        return f"company:{cid}:{path}"
     return f"{ip}:{path}"
 
 # ─── Blueprints ───────────────────────────────────────────────────────────────
@@ -115,12 +111,48 @@ app.register_blueprint(auth_admin_routes)
 app.register_blueprint(admin_routes)
 app.register_blueprint(routes_facial)
 app.register_blueprint(feriados_routes)
-app.register_blueprint(chatbot_rh_routes)
-app.register_blueprint(admin_aws_routes)
 app.register_blueprint(payroll_routes)
 app.register_blueprint(users_routes)
-app.register_blueprint(audit_routes)
 app.register_blueprint(kiosk_telemetry_routes)
+# Rotas raras (chatbot, AWS admin, auditoria): importadas na primeira chamada.
+lazy_routes.register(app)
+
+# ─── Workers em background ────────────────────────────────────────────────────
+def start_background_workers() -> None:
+    """Threads de fundo do processo que atende requisições."""
+    # Verificação facial de pontos aceitos com Rekognition indisponível. Também
+    # retoma jobs deixados no spool por um worker anterior (crash/reload).
+    from services.facial_verification import start_worker as start_verification_worker
+    start_verification_worker()
+    # Upload de fotos de ponto/cadastro para o S3 — reenvia o que ficou no spool.
+    from utils.s3_uploader import start_uploader
+    start_uploader()
+    # Métricas/custos AWS do portal admin — as rotas só leem o snapshot local.
+    from services.aws_metrics import start_collector as start_aws_metrics_collector
+    start_aws_metrics_collector()
+    # Uso por empresa/rota (services/usage_metering.py) — grava em lote na Usage.
+    usage_metering.start()
+    # Snapshot das métricas por rota deste worker para o /metrics dos outros.
+    request_metrics.start()
+
+
+def warm_up() -> None:
+    """Estruturas só de leitura montadas antes do fork (preload do Gunicorn):
+    os workers as herdam prontas, compartilhadas copy-on-write, e a primeira
+    requisição de cada worker não paga por elas."""
+    from datetime import datetime
+    from utils import aws_clients
+    lazy_routes.warm()                    # blueprints sob demanda (chatbot, requests...)
+    app.url_map.update()                  # matcher de rotas do werkzeug
+    aws_clients.warm()                    # modelos de serviço do botocore
+    datetime.strptime('2025-01-01 08:00:00', '%Y-%m-%d %H:%M:%S')  # _strptime + regex
+
+
+# Com preload (config/gunicorn.py) o master importa o app e não pode ter
+# threads — um lock tomado por elas no fork ficaria preso no worker. Nesse
+# caso cada worker chama start_background_workers() no post_fork.
+if os.getenv('PRELOAD_APP') != '1':
+    start_background_workers()
 
 
 @app.before_request
@@ -128,6 +160,28 @@ def attach_request_id():
     """Gera ou herda X-Request-ID para rastreamento de cada request."""
     g.request_id = request.headers.get('X-Request-ID') or str(uuid.uuid4())
     g.request_start = time.monotonic()
+    if request.method != 'OPTIONS':
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        usage_metering.begin_request(f"{request.method} {rule}")
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Tempo total + AWS/externos da requisição: Server-Timing e /metrics."""
+    if request.method == 'OPTIONS' or request.path == '/metrics' or not hasattr(g, 'request_start'):
+        return response
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    timing = request_metrics.record(request.method, rule, response.status_code,
+                                    time.monotonic() - g.request_start, usage_metering.current())
+    if request_metrics.SERVER_TIMING:
+        response.headers['Server-Timing'] = timing
+    return response
+
+
+@app.teardown_request
+def finish_usage_metering(exc):
+    usage_metering.end_request()
+    usage_metering.flush_inline()   # só em Lambda (sem thread de flush)
 
 
 @app.before_request
@@ -143,12 +197,12 @@ def enforce_rate_limit():
         key = _facial_rate_key(request.path, ip)
     else:
         key = f"{ip}:{request.path}"
-    now = time.monotonic()
-    _rate_store[key] = [t for t in _rate_store[key] if now - t < window]
-    if len(_rate_store[key]) >= max_req:
+    retry_after = _rate_limiter.hit(key, max_req, window)
+    if retry_after > 0:
         logger.warning(f"Rate limit atingido: {request.path} ip={ip}")
-        return jsonify({'error': 'Muitas tentativas. Aguarde alguns minutos.'}), 429
-    _rate_store[key].append(now)
+        response = jsonify({'error': 'Muitas tentativas. Aguarde alguns minutos.'})
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response, 429
     return None
 
 
@@ -214,6 +268,14 @@ def health_check():
     }), status_code
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Séries por rota no formato do Prometheus (services/request_metrics.py)."""
+    if not request_metrics.scrape_allowed(request.remote_addr, request.headers):
+        return jsonify({'error': 'Não encontrado'}), 404
+    return request_metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @app.route('/api/version', methods=['GET'])
 def api_version():
     version = os.getenv('BACKEND_VERSION') or os.getenv('APP_VERSION') or 'unknown'
@@ -1,4 +1,5 @@
 """Gunicorn configuration file for production"""
+import gc
 import multiprocessing
 import os
 
@@ -10,9 +11,33 @@ backlog = 2048
 
 # Worker processes — cpu_count*2+1 é o padrão recomendado pelo Gunicorn
 # Em t3.micro (1 vCPU) = 3 workers; t3.small (2 vCPU) = 5 workers
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# gthread: cada worker atende `threads` requisições ao mesmo tempo. Quase todo
+# o tempo de uma batida é espera de I/O (Rekognition, S3, DynamoDB, SES, Groq),
+# que libera o GIL — com sync um worker ficava parado durante cada chamada e
+# um t3.small atendia só 5 requisições simultâneas; com 5 workers × 8 threads
+# são 40. Não usamos gevent/eventlet: exigiriam monkeypatch de boto3, bcrypt
+# e sqlite3. Estado global compartilhado entre as threads: ver a seção
+# "Concurrency" do README. GUNICORN_WORKER_CLASS=sync volta ao modo antigo.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
 worker_connections = 1000
+
+# Preload: o master importa o app uma vez, monta as estruturas só de leitura
+# (app.warm_up: blueprints sob demanda, modelos do botocore, matcher de rotas)
+# e os workers nascem por fork já com tudo pronto, compartilhando as páginas
+# copy-on-write — menos RSS por worker e primeira requisição sem cold start.
+# O master não tem threads nem conexões: post_fork recria clients e sobe as
+# threads de fundo em cada worker. Com preload, SIGHUP só recria os workers a
+# partir do código já carregado — deploy de código novo reinicia o master.
+# GUNICORN_PRELOAD=0 volta ao import por worker.
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+if preload_app:
+    os.environ['PRELOAD_APP'] = '1'
+    # Coletas do GC no master espalham escritas (gc_refs) pelas páginas que os
+    # workers deveriam compartilhar; desligado até o fork, congelado em when_ready.
+    gc.disable()
 timeout = 120
 keepalive = 5
 
@@ -36,3 +61,51 @@ tmp_upload_dir = None
 # SSL (se necessário)
 # keyfile = "/path/to/key.pem"
 # certfile = "/path/to/cert.pem"
+
+
+def worker_exit(server, worker):
+    """Encerramento gracioso do worker (SIGTERM, ou troca de workers quando o
+    master recebe SIGHUP): grava o que ainda está nos buffers em memória
+    (auditoria, telemetria do kiosk) e o snapshot de métricas antes do
+    processo sair."""
+    try:
+        from services.batch_buffer import flush_all
+        flush_all()
+    except Exception as e:
+        server.log.warning(f"worker_exit: flush dos buffers falhou: {e}")
+    try:
+        from services.request_metrics import dump
+        dump()
+    except Exception as e:
+        server.log.warning(f"worker_exit: snapshot de métricas falhou: {e}")
+
+
+def on_starting(server):
+    """Master subindo: zera os snapshots de métricas dos workers anteriores."""
+    from services.request_metrics import clear_snapshots
+    clear_snapshots()
+
+
+def when_ready(server):
+    """Master pronto, antes do primeiro fork: aquece e congela o heap."""
+    if not preload_app:
+        return
+    try:
+        from app import warm_up
+        warm_up()
+    except Exception as e:
+        server.log.warning(f"when_ready: warm_up falhou (workers aquecem sozinhos): {e}")
+    # objetos atuais vão para a geração permanente: o GC dos workers não toca
+    # nessas páginas e elas continuam compartilhadas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Worker recém-criado: nada de socket/thread herdado do master."""
+    if not preload_app:
+        return
+    gc.enable()
+    from utils import aws_clients
+    aws_clients.reset()
+    from app import start_background_workers
+    start_background_workers()
@@ -1,5 +1,8 @@
 """
 Rotas da API - Blueprints organizados por funcionalidade
+
+chatbot_rh, admin_aws e audit não são importados aqui: o app os registra sob
+demanda (ver routes/lazy.py).
 """
 from .api import routes
 from .v2 import routes_v2
@@ -9,11 +12,8 @@ from .facial import routes_facial
 from .admin import admin_routes
 from .admin_auth import auth_admin_routes
 from .feriados import feriados_routes
-from .chatbot_rh import chatbot_rh_routes
-from .admin_aws import admin_aws_routes
 from .payroll import payroll_routes
 from .users import users_routes
-from .audit import audit_routes
 from .kiosk_telemetry import kiosk_telemetry_routes
 
 __all__ = [
@@ -25,11 +25,8 @@ __all__ = [
     'admin_routes',
     'auth_admin_routes',
     'feriados_routes',
-    'chatbot_rh_routes',
-    'admin_aws_routes',
     'payroll_routes',
     'users_routes',
-    'audit_routes',
     'kiosk_telemetry_routes',
 ]
 
@@ -9,11 +9,9 @@ Routes:
   GET /api/admin/companies/{companyId}/records - Get company time records
 """
 from flask import Blueprint, request, jsonify
-import boto3
 import os
 import jwt
 from botocore.exceptions import ClientError
-from collections import defaultdict
 from decimal import Decimal
 from datetime import datetime
 from boto3.dynamodb.conditions import Attr, Key
@@ -21,10 +19,13 @@ from functools import wraps
 import uuid
 import bcrypt
 
+from services import company_stats
+from utils import aws_clients
+
 admin_routes = Blueprint('admin_routes', __name__)
 
 # AWS
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+dynamodb = aws_clients.lazy_resource('dynamodb')
 table_user_company = dynamodb.Table(os.getenv('DYNAMODB_TABLE_USERS', 'UserCompany'))
 table_employees = dynamodb.Table(os.getenv('DYNAMODB_TABLE_EMPLOYEES', 'Employees'))
 table_time_records = dynamodb.Table(os.getenv('DYNAMODB_TABLE_RECORDS', 'TimeRecords'))
@@ -70,13 +71,14 @@ def _convert_decimal(obj):
 @admin_routes.route('/api/admin/dashboard/stats', methods=['GET'])
 @admin_required
 def get_dashboard_stats():
-    """Get dashboard statistics from DynamoDB.
+    """Get dashboard statistics from the per-company counters (CompanyStats).
     
     Returns:
     {
         "totalCompanies": int,
         "totalEmployees": int (apenas ativos),
         "totalTimeEntries": int,
+        "totalPhotos": int,
         "activeCompanies": int,
         "inactiveCompanies": int,
         "paidCompanies": int,
@@ -85,87 +87,8 @@ def get_dashboard_stats():
     }
     """
     try:
-        # Get total companies
-        try:
-            company_response = table_user_company.scan()
-            total_companies = company_response.get('Count', 0)
-            companies_list = company_response.get('Items', [])
-            
-            # Handle pagination
-            while 'LastEvaluatedKey' in company_response:
-                company_response = table_user_company.scan(
-                    ExclusiveStartKey=company_response['LastEvaluatedKey']
-                )
-                total_companies += company_response.get('Count', 0)
-                companies_list.extend(company_response.get('Items', []))
-        except ClientError as e:
-            print(f"Error scanning UserCompany: {e}")
-            total_companies = 0
-            companies_list = []
-
-        # Get total employees — describe_table retorna contagem aproximada sem custo de leitura
-        try:
-            emp_info = table_employees.meta.client.describe_table(TableName=table_employees.table_name)
-            total_employees = emp_info['Table'].get('ItemCount', 0)
-        except ClientError as e:
-            print(f"Error describing Employees table: {e}")
-            total_employees = 0
-
-        # Get total time records — idem
-        try:
-            rec_info = table_time_records.meta.client.describe_table(TableName=table_time_records.table_name)
-            total_time_entries = rec_info['Table'].get('ItemCount', 0)
-        except ClientError as e:
-            print(f"Error describing TimeRecords table: {e}")
-            total_time_entries = 0
-
-        # Count active/inactive companies
-        active_companies = 0
-        inactive_companies = 0
-        paid_companies = 0
-        unpaid_companies = 0
-        
-        for company in companies_list:
-            status = company.get('status', 'active').lower()
-            if status == 'active':
-                active_companies += 1
-            else:
-                inactive_companies += 1
-            
-            # Check payment status if available
-            payment_status = company.get('paymentStatus', 'unpaid').lower()
-            if payment_status == 'paid':
-                paid_companies += 1
-            else:
-                unpaid_companies += 1
-
-        # Get last created companies (sort by creation date, get last 5)
-        last_companies = sorted(
-            companies_list,
-            key=lambda x: x.get('data_criacao', ''),
-            reverse=True
-        )[:5]
-
-        last_created_companies = [
-            {
-                'companyId': company.get('company_id', ''),
-                'companyName': company.get('empresa_nome', ''),
-                'dateCreated': company.get('data_criacao', ''),
-                'status': company.get('status', 'active')
-            }
-            for company in last_companies
-        ]
-
-        return jsonify({
-            'totalCompanies': total_companies,
-            'totalEmployees': total_employees,
-            'totalTimeEntries': total_time_entries,
-            'activeCompanies': active_companies,
-            'inactiveCompanies': inactive_companies,
-            'paidCompanies': paid_companies,
-            'unpaidCompanies': unpaid_companies,
-            'lastCreatedCompanies': last_created_companies
-        }), 200
+        # Só os itens de CompanyStats (um por empresa, ver services/company_stats.py)
+        return jsonify(company_stats.dashboard_totals(company_stats.load_all())), 200
 
     except Exception as e:
         print(f"Error in get_dashboard_stats: {e}")
@@ -177,88 +100,14 @@ def get_dashboard_stats():
 def get_companies():
     """Get all companies with payment and employee count data.
     
-    Returns a list of all companies from UserCompany table.
+    Reads only the CompanyStats items (directory fields + counters kept up to
+    date on the write paths). Companies created before CompanyStats existed
+    show up after scripts/rebuild_company_counters.py --execute.
     """
     try:
-        response = table_user_company.scan()
-        companies = response.get('Items', [])
-        
-        # Handle pagination
-        while 'LastEvaluatedKey' in response:
-            response = table_user_company.scan(
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            companies.extend(response.get('Items', []))
-
-        # Single scan of TimeRecords to aggregate records count per company
-        try:
-            rec_response = table_time_records.scan(ProjectionExpression='company_id')
-            rec_items = rec_response.get('Items', [])
-            while 'LastEvaluatedKey' in rec_response:
-                rec_response = table_time_records.scan(
-                    ProjectionExpression='company_id',
-                    ExclusiveStartKey=rec_response['LastEvaluatedKey']
-                )
-                rec_items.extend(rec_response.get('Items', []))
-            records_per_company: dict = defaultdict(int)
-            for item in rec_items:
-                records_per_company[item.get('company_id', '')] += 1
-        except Exception:
-            records_per_company = defaultdict(int)
-
-        # Deduplicate: UserCompany tem uma linha por usuário; manter apenas o primeiro por company_id
-        seen_ids: set = set()
-        unique_companies = []
-        for c in companies:
-            cid = c.get('company_id', '')
-            if cid and cid not in seen_ids:
-                seen_ids.add(cid)
-                unique_companies.append(c)
-        companies = unique_companies
-
-        # Enrich companies with employee and record counts
-        enriched_companies = []
-        for company in companies:
-            company_id = company.get('company_id', '')
-            
-            # Count active employees — query por hash key, muito mais eficiente que scan
-            try:
-                emp_response = table_employees.query(
-                    KeyConditionExpression=Key('company_id').eq(company_id),
-                    FilterExpression=Attr('ativo').eq(True),
-                    Select='COUNT',
-                )
-                active_employees = emp_response.get('Count', 0)
-                while 'LastEvaluatedKey' in emp_response:
-                    emp_response = table_employees.query(
-                        KeyConditionExpression=Key('company_id').eq(company_id),
-                        FilterExpression=Attr('ativo').eq(True),
-                        Select='COUNT',
-                        ExclusiveStartKey=emp_response['LastEvaluatedKey'],
-                    )
-                    active_employees += emp_response.get('Count', 0)
-            except Exception as emp_error:
-                print(f"Error counting employees for {company_id}: {emp_error}")
-                active_employees = 0
-            
-            # Get payment status
-            payments = company.get('payments', {})
-            
-            enriched_companies.append({
-                'companyId': company_id,
-                'companyName': company.get('empresa_nome', ''),
-                'email': company.get('email', ''),
-                'status': company.get('status', 'active'),
-                'dateCreated': company.get('data_criacao', ''),
-                'activeEmployees': active_employees,
-                'expectedEmployees': company.get('numero_funcionarios', 0),
-                'payments': payments,
-                'userId': company.get('user_id', ''),
-                'recordsCount': int(records_per_company.get(company_id, 0)),
-            })
-
+        companies = [company_stats.company_summary(item) for item in company_stats.load_all()]
         return jsonify({
-            'companies': enriched_companies
+            'companies': companies
         }), 200
 
     except ClientError as e:
@@ -331,6 +180,9 @@ def create_company():
         
         # Insert into UserCompany table
         table_user_company.put_item(Item=company_item)
+        company_stats.sync_company(company_id, **{
+            k: v for k, v in company_item.items() if k in company_stats.DIRECTORY_FIELDS
+        })
         
         print(f"[DEBUG] Company created successfully - company_id: {company_id}")
         
@@ -493,6 +345,7 @@ def create_company_employee(company_id: str):
         }
 
         table_employees.put_item(Item=item)
+        company_stats.employee_activated(company_id)
 
         return jsonify({
             'employee': {
@@ -666,6 +519,8 @@ def update_company_payment_status(company_id: str):
             print(f"[DEBUG] Using put_item fallback")
             table_user_company.put_item(Item=current_item)
 
+        company_stats.sync_payment(company_id, month_year, is_paid)
+
         print(f"[DEBUG] Update successful")
 
         return jsonify({
@@ -716,6 +571,7 @@ def suspend_company(company_id: str):
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={':status': 'suspended'}
         )
+        company_stats.sync_company(company_id, status='suspended')
 
         return jsonify({
             'message': 'Empresa suspensa com sucesso',
@@ -760,6 +616,7 @@ def resume_company(company_id: str):
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={':status': 'active'}
         )
+        company_stats.sync_company(company_id, status='active')
 
         return jsonify({
             'message': 'Empresa reativada com sucesso',
@@ -809,6 +666,9 @@ def update_company(company_id: str):
             if uc_names:
                 kw['ExpressionAttributeNames'] = uc_names
             table_user_company.update_item(**kw)
+            company_stats.sync_company(company_id, **{
+                uc_names[name]: uc_vals[':' + name[1:]] for name in uc_names
+            })
 
         cfg_parts, cfg_vals, cfg_names = [], {}, {}
         if 'rh_enabled' in data:
@@ -863,6 +723,7 @@ def delete_company(company_id: str):
                 ':now': datetime.utcnow().isoformat()
             }
         )
+        company_stats.sync_company(company_id, status='deleted')
 
         return jsonify({
             'message': 'Empresa deletada com sucesso',
@@ -6,8 +6,8 @@ Routes:
   POST /api/auth/admin-verify - Verify admin token
 """
 from flask import Blueprint, request, jsonify
-import boto3
 from botocore.exceptions import ClientError
+from utils import aws_clients
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
@@ -16,7 +16,7 @@ import os
 auth_admin_routes = Blueprint('auth_admin_routes', __name__)
 
 # AWS
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+dynamodb = aws_clients.lazy_resource('dynamodb')
 table_admin_users = dynamodb.Table('AdminUsers')
 
 # JWT Configuration — sem fallback hardcoded; falha explicitamente se ausente
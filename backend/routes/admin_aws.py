@@ -6,26 +6,13 @@ Routes:
   GET /api/admin/aws/company/<id>/usage - Per-company AWS usage
 """
 from flask import Blueprint, jsonify, request
-import boto3
 import os
 import jwt
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Attr, Key
-from datetime import datetime, timedelta
 from functools import wraps
-from decimal import Decimal
 
-admin_aws_routes = Blueprint('admin_aws_routes', __name__)
+from services import aws_metrics, company_stats, usage_metering
 
-REGION   = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-S3_BUCKET         = os.getenv('S3_BUCKET',                  'registraponto-prod-fotos')
-REKOGNITION_COLL  = os.getenv('REKOGNITION_COLLECTION',      'registraponto-faces')
-TABLE_EMPLOYEES   = os.getenv('DYNAMODB_TABLE_EMPLOYEES',    'Employees')
-TABLE_RECORDS     = os.getenv('DYNAMODB_TABLE_RECORDS',      'TimeRecords')
-TABLE_USERS       = os.getenv('DYNAMODB_TABLE_USERS',        'UserCompany')
-TABLE_CONFIG      = os.getenv('DYNAMODB_TABLE_CONFIG',       'ConfigCompany')
-TABLE_DAILY       = os.getenv('DYNAMODB_TABLE_DAILY_SUMMARY','DailySummary')
-TABLE_MONTHLY     = os.getenv('DYNAMODB_TABLE_MONTHLY_SUMMARY','MonthlySummary')
+admin_aws_routes = Blueprint('admin_aws_routes', __name__)
 
 
 # ── auth ──────────────────────────────────────────────────────────────────────
@@ -56,121 +43,26 @@ def admin_required(f):
 def _bytes_to_mb(b: int) -> float:
     return round(b / (1024 * 1024), 2)
 
-def _bytes_to_gb(b: int) -> float:
-    return round(b / (1024 * 1024 * 1024), 4)
-
 
 # ── /api/admin/aws/metrics ────────────────────────────────────────────────────
+# Servidas do snapshot local mantido por services/aws_metrics.py — abrir o
+# portal não chama a AWS. `_cache` traz idade/staleness do snapshot;
+# ?refresh=1 pede uma coleta em background (single-flight).
+
+# Primeira leitura depois do deploy (sem snapshot ainda): quanto esperar a coleta
+_FIRST_LOAD_WAIT_S = 15
+
 
 @admin_aws_routes.route('/api/admin/aws/metrics', methods=['GET', 'OPTIONS'])
 @admin_required
 def get_aws_metrics():
     """Returns DynamoDB table stats, S3 bucket stats, and Rekognition collection info."""
-    result = {}
-
-    # ── DynamoDB ─────────────────────────────────────────────────────────────
-    ddb_client = boto3.client('dynamodb', region_name=REGION)
-    tables_cfg = {
-        'Employees':      TABLE_EMPLOYEES,
-        'TimeRecords':    TABLE_RECORDS,
-        'UserCompany':    TABLE_USERS,
-        'ConfigCompany':  TABLE_CONFIG,
-        'DailySummary':   TABLE_DAILY,
-        'MonthlySummary': TABLE_MONTHLY,
-    }
-    dynamo_tables = []
-    total_items = 0
-    total_size  = 0
-    for label, tname in tables_cfg.items():
-        try:
-            resp = ddb_client.describe_table(TableName=tname)
-            t = resp['Table']
-            item_count  = int(t.get('ItemCount', 0))
-            size_bytes  = int(t.get('TableSizeBytes', 0))
-            total_items += item_count
-            total_size  += size_bytes
-            dynamo_tables.append({
-                'label':        label,
-                'table_name':   tname,
-                'item_count':   item_count,
-                'size_bytes':   size_bytes,
-                'size_mb':      _bytes_to_mb(size_bytes),
-                'status':       t.get('TableStatus', 'UNKNOWN'),
-                'billing_mode': t.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED'),
-            })
-        except ClientError as e:
-            dynamo_tables.append({
-                'label': label,
-                'table_name': tname,
-                'error': e.response['Error']['Code'],
-            })
-        except Exception as e:
-            dynamo_tables.append({'label': label, 'table_name': tname, 'error': str(e)})
-
-    result['dynamodb'] = {
-        'tables':           dynamo_tables,
-        'total_items':      total_items,
-        'total_size_bytes': total_size,
-        'total_size_mb':    _bytes_to_mb(total_size),
-    }
-
-    # ── S3 via CloudWatch ────────────────────────────────────────────────────
-    try:
-        cw  = boto3.client('cloudwatch', region_name=REGION)
-        now = datetime.utcnow()
-        start = now - timedelta(days=3)
-
-        def _cw_metric(metric_name, storage_type):
-            r = cw.get_metric_statistics(
-                Namespace='AWS/S3',
-                MetricName=metric_name,
-                Dimensions=[
-                    {'Name': 'BucketName',   'Value': S3_BUCKET},
-                    {'Name': 'StorageType',  'Value': storage_type},
-                ],
-                StartTime=start,
-                EndTime=now,
-                Period=86400,
-                Statistics=['Average'],
-            )
-            pts = sorted(r.get('Datapoints', []), key=lambda x: x['Timestamp'])
-            return int(pts[-1]['Average']) if pts else 0
-
-        size_bytes   = _cw_metric('BucketSizeBytes',  'StandardStorage')
-        object_count = _cw_metric('NumberOfObjects',   'AllStorageTypes')
-
-        result['s3'] = {
-            'bucket':        S3_BUCKET,
-            'size_bytes':    size_bytes,
-            'size_gb':       _bytes_to_gb(size_bytes),
-            'size_mb':       _bytes_to_mb(size_bytes),
-            'object_count':  object_count,
-        }
-    except Exception as e:
-        result['s3'] = {'bucket': S3_BUCKET, 'error': str(e), 'size_bytes': 0, 'object_count': 0}
-
-    # ── Rekognition ──────────────────────────────────────────────────────────
-    try:
-        rek  = boto3.client('rekognition', region_name=REGION)
-        resp = rek.describe_collection(CollectionId=REKOGNITION_COLL)
-        result['rekognition'] = {
-            'collection':         REKOGNITION_COLL,
-            'face_count':         resp.get('FaceCount', 0),
-            'face_model_version': resp.get('FaceModelVersion', 'unknown'),
-            'creation_timestamp': str(resp.get('CreationTimestamp', '')),
-        }
-    except Exception as e:
-        result['rekognition'] = {
-            'collection': REKOGNITION_COLL,
-            'face_count': 0,
-            'error': str(e),
-        }
-
-    # ── Region ──────────────────────────────────────────────────────────────
-    result['region'] = REGION
-    result['timestamp'] = datetime.utcnow().isoformat() + 'Z'
-
-    return jsonify(result), 200
+    if request.args.get('refresh') == '1':
+        aws_metrics.metrics_cache.refresh_async(force=True)
+    data, meta = aws_metrics.metrics_cache.get(wait_s=_FIRST_LOAD_WAIT_S)
+    if data is None:
+        return jsonify({'error': meta.get('error') or 'Métricas ainda não coletadas', '_cache': meta}), 503
+    return jsonify({**data, '_cache': meta}), 200
 
 
 # ── /api/admin/aws/costs ──────────────────────────────────────────────────────
@@ -182,94 +74,28 @@ def get_aws_costs():
     Falls back gracefully if Cost Explorer is not available / no permission.
     """
     months_back = int(request.args.get('months', 6))
-    try:
-        # Cost Explorer is always in us-east-1
-        ce  = boto3.client('ce', region_name='us-east-1')
-        now = datetime.utcnow()
-
-        # End = first of current month → only complete months
-        end_date   = now.replace(day=1).strftime('%Y-%m-%d')
-        start_date = (now.replace(day=1) - timedelta(days=months_back * 31)).replace(day=1).strftime('%Y-%m-%d')
-
-        response = ce.get_cost_and_usage(
-            TimePeriod={'Start': start_date, 'End': end_date},
-            Granularity='MONTHLY',
-            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
-            Metrics=['BlendedCost', 'UsageQuantity'],
-        )
-
-        monthly = []
-        for period in response.get('ResultsByTime', []):
-            month_str = period['TimePeriod']['Start'][:7]
-            services  = []
-            total     = 0.0
-            for group in period.get('Groups', []):
-                cost = float(group['Metrics']['BlendedCost']['Amount'])
-                if cost < 0.00001:
-                    continue
-                service = group['Keys'][0]
-                # Shorten long AWS service names
-                short = (service
-                    .replace('Amazon ', '')
-                    .replace('AWS ', '')
-                    .replace(' (AWS GovCloud)', '')
-                    .strip())
-                services.append({'service': short, 'full_name': service, 'cost': round(cost, 6)})
-                total += cost
-
-            monthly.append({
-                'month':    month_str,
-                'services': sorted(services, key=lambda x: x['cost'], reverse=True),
-                'total':    round(total, 6),
-            })
-
-        # Also get current month-to-date
-        today = now.strftime('%Y-%m-%d')
-        mtd_resp = ce.get_cost_and_usage(
-            TimePeriod={'Start': end_date, 'End': today},
-            Granularity='MONTHLY',
-            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
-            Metrics=['BlendedCost'],
-        )
-        mtd_total = 0.0
-        mtd_services = []
-        for period in mtd_resp.get('ResultsByTime', []):
-            for group in period.get('Groups', []):
-                cost = float(group['Metrics']['BlendedCost']['Amount'])
-                if cost < 0.00001:
-                    continue
-                short = group['Keys'][0].replace('Amazon ', '').replace('AWS ', '').strip()
-                mtd_services.append({'service': short, 'cost': round(cost, 6)})
-                mtd_total += cost
-
-        return jsonify({
-            'monthly_costs':  monthly,
-            'current_month':  {
-                'month':    now.strftime('%Y-%m'),
-                'total':    round(mtd_total, 6),
-                'services': sorted(mtd_services, key=lambda x: x['cost'], reverse=True),
-            },
-            'currency': 'USD',
-            'error':    None,
-        }), 200
-
-    except ClientError as e:
-        code = e.response['Error']['Code']
-        msg  = e.response['Error']['Message']
-        return jsonify({
+    if request.args.get('refresh') == '1':
+        aws_metrics.costs_cache.refresh_async(force=True)
+    data, meta = aws_metrics.costs_cache.get(wait_s=_FIRST_LOAD_WAIT_S)
+    if data is None:
+        error = meta.get('error') or 'Custos ainda não coletados'
+        body = {
             'monthly_costs': [],
             'current_month': None,
             'currency': 'USD',
-            'error': f'{code}: {msg}',
-            'error_hint': 'Adicione permissão ce:GetCostAndUsage na IAM policy do usuário AWS.',
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'monthly_costs': [],
-            'current_month': None,
-            'currency': 'USD',
-            'error': str(e),
-        }), 200
+            'error': error,
+            '_cache': meta,
+        }
+        if 'AccessDenied' in error:
+            body['error_hint'] = 'Adicione permissão ce:GetCostAndUsage na IAM policy do usuário AWS.'
+        return jsonify(body), 200
+
+    monthly = data.get('monthly_costs', [])
+    return jsonify({
+        **data,
+        'monthly_costs': monthly[-months_back:] if months_back > 0 else [],
+        '_cache': meta,
+    }), 200
 
 
 # ── /api/admin/aws/company/<id>/usage ─────────────────────────────────────────
@@ -277,66 +103,45 @@ def get_aws_costs():
 @admin_aws_routes.route('/api/admin/aws/company/<company_id>/usage', methods=['GET', 'OPTIONS'])
 @admin_required
 def get_company_aws_usage(company_id):
-    """Per-company AWS resource usage: employees, records, S3 photos, Rekognition faces."""
-    result = {'company_id': company_id}
+    """Per-company AWS usage from pre-aggregated rows only.
 
-    ddb = boto3.resource('dynamodb', region_name=REGION)
+    - employee_count / record_count: CompanyStats counters (services/company_stats.py)
+    - usage: requests, DynamoDB items/capacity, Rekognition calls and S3
+      uploads per route and per day, metered in-process
+      (services/usage_metering.py) — window set by ?days= (default 30)
+    - s3_objects / s3_size_bytes: objects/bytes uploaded in the window
 
-    # Employee count — query por hash key (company_id) é muito mais eficiente que scan
+    Nothing here lists the bucket or the Rekognition collection anymore;
+    rekognition_faces is kept for compatibility and is always null.
+    """
     try:
-        emp_table = ddb.Table(TABLE_EMPLOYEES)
-        resp = emp_table.query(
-            KeyConditionExpression=Key('company_id').eq(company_id),
-            Select='COUNT',
-        )
-        result['employee_count'] = resp.get('Count', 0)
-    except Exception as e:
-        result['employee_count'] = None
-        result['employee_count_error'] = str(e)
+        days = min(max(int(request.args.get('days', 30)), 1), 400)
+    except ValueError:
+        return jsonify({'error': 'days inválido'}), 400
+
+    result = {'company_id': company_id, 'days': days}
 
-    # Records count — query por hash key
     try:
-        rec_table = ddb.Table(TABLE_RECORDS)
-        resp = rec_table.query(
-            KeyConditionExpression=Key('company_id').eq(company_id),
-            Select='COUNT',
-        )
-        result['record_count'] = resp.get('Count', 0)
+        stats = company_stats.get_company(company_id) or {}
+        result['employee_count'] = int(stats.get('active_employees', 0) or 0)
+        result['record_count'] = int(stats.get('records', 0) or 0)
     except Exception as e:
+        result['employee_count'] = None
         result['record_count'] = None
-        result['record_count_error'] = str(e)
+        result['stats_error'] = str(e)
 
-    # S3: count objects and total size for this company
     try:
-        s3_client  = boto3.client('s3', region_name=REGION)
-        paginator  = s3_client.get_paginator('list_objects_v2')
-        s3_count   = 0
-        s3_bytes   = 0
-        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=f'{company_id}/'):
-            for obj in page.get('Contents', []):
-                s3_count += 1
-                s3_bytes += obj.get('Size', 0)
-        result['s3_objects']    = s3_count
-        result['s3_size_bytes'] = s3_bytes
-        result['s3_size_mb']    = _bytes_to_mb(s3_bytes)
+        usage = usage_metering.summarize_usage(usage_metering.query_usage(company_id, days=days))
+        result['usage'] = usage
+        result['s3_objects'] = usage['totals']['s3_puts']
+        result['s3_size_bytes'] = usage['totals']['s3_bytes']
+        result['s3_size_mb'] = _bytes_to_mb(usage['totals']['s3_bytes'])
     except Exception as e:
-        result['s3_objects']    = None
+        result['usage'] = None
+        result['s3_objects'] = None
         result['s3_size_bytes'] = None
-        result['s3_error']      = str(e)
-
-    # Rekognition: count faces belonging to this company
-    try:
-        rek  = boto3.client('rekognition', region_name=REGION)
-        faces = []
-        paginator_rek = rek.get_paginator('list_faces')
-        for page in paginator_rek.paginate(CollectionId=REKOGNITION_COLL):
-            for face in page.get('Faces', []):
-                ext_id = face.get('ExternalImageId', '')
-                if ext_id.startswith(company_id):
-                    faces.append(face['FaceId'])
-        result['rekognition_faces'] = len(faces)
-    except Exception as e:
-        result['rekognition_faces'] = None
-        result['rekognition_error'] = str(e)
+        result['s3_size_mb'] = None
+        result['usage_error'] = str(e)
 
+    result['rekognition_faces'] = None
     return jsonify(result), 200
@@ -5,14 +5,12 @@ from decimal import Decimal
 import uuid
 import tempfile
 import os
-import boto3
 from utils.aws import (
     tabela_funcionarios, tabela_registros, enviar_s3, reconhecer_funcionario,
     rekognition, BUCKET, COLLECTION, REGIAO, tabela_usuarioempresa, tabela_configuracoes,
-    _resize_for_rekognition, generate_presigned_url,
+    _resize_for_rekognition, generate_presigned_url, generate_presigned_urls,
 )
-from functools import wraps
-from utils.auth import verify_token
+from utils.auth import verify_token, bearer_token_required as token_required
 from werkzeug.security import check_password_hash
 import jwt
 from flask import current_app
@@ -24,7 +22,11 @@ import unicodedata
 import re
 from utils.logger import setup_logger
 from utils.response_utils import sanitize_employee, sanitize_employees
+from utils.photo_derivatives import item_fields as _foto_derivados, photo_key_for
 from services.audit_service import log_event as _log_audit
+from services.face_embeddings import mark_deleted as _invalidar_embeddings
+from services import company_stats
+from utils import aws_clients
 from utils.registro_normalizer import (
     extrair_employee_id as _norm_emp,
     extrair_data_hora as _norm_dh,
@@ -41,7 +43,7 @@ from utils.schedule import (
     pt_schedule_to_weekly,
 )
 
-s3 = boto3.client('s3', region_name=REGIAO)
+s3 = aws_clients.lazy_client('s3', REGIAO)
 
 routes = Blueprint('routes', __name__)
 
@@ -117,28 +119,6 @@ def _apply_preset_to_employee(employee_item: dict, preset: dict):
 
 # CORS configurado globalmente no app.py
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        # OPTIONS requests pass through without token validation (CORS preflight)
-        if request.method == 'OPTIONS':
-            # Call function with None payload for OPTIONS
-            return ('', 200)
-        
-        token = None
-        # O token pode vir no header Authorization: Bearer <token>
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        if not token:
-            return jsonify({'error': 'Token ausente'}), 401
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido'}), 401
-        return f(payload, *args, **kwargs)
-    return decorated
-
 @routes.route('/', methods=['GET', 'OPTIONS'])
 def health():
     return 'OK', 200
@@ -469,10 +449,11 @@ def atualizar_funcionario(payload, funcionario_id):
                     print(f"Aviso: falha ao deletar face anterior: {e}")
 
             # Upload into company folder
-            foto_s3_key = enviar_s3(temp_path, f"funcionarios/{funcionario_id}.jpg", empresa_id)
+            foto_s3_key = enviar_s3(temp_path, f"funcionarios/{funcionario_id}.jpg", empresa_id, derivatives=True)
             foto_url = generate_presigned_url(foto_s3_key, expiration_seconds=300)
-            os.remove(temp_path)
             funcionario['foto_s3_key'] = foto_s3_key
+            funcionario.update(_foto_derivados(foto_s3_key, temp_path))
+            os.remove(temp_path)
             funcionario.pop('foto_url', None)
             if face_id:
                 funcionario['face_id'] = face_id
@@ -706,21 +687,34 @@ def atualizar_foto_funcionario(payload, funcionario_id):
                 print(f"[PUT FOTO] Aviso: falha ao deletar face anterior: {e}")
 
         foto_nome = f"funcionarios/{funcionario_id}.jpg"
-        foto_s3_key = enviar_s3(temp_path, foto_nome, empresa_id)
+        foto_s3_key = enviar_s3(temp_path, foto_nome, empresa_id, derivatives=True)
         foto_url = generate_presigned_url(foto_s3_key, expiration_seconds=300)
+        derivados = _foto_derivados(foto_s3_key, temp_path)
 
         if face_id:
             tabela_funcionarios.update_item(
                 Key={'company_id': empresa_id, 'id': funcionario_id},
-                UpdateExpression='SET foto_s3_key = :key, face_id = :fid REMOVE foto_url',
-                ExpressionAttributeValues={':key': foto_s3_key, ':fid': face_id}
+                UpdateExpression='SET foto_s3_key = :key, foto_s3_key_sm = :sm, foto_s3_key_md = :md, face_id = :fid REMOVE foto_url',
+                ExpressionAttributeValues={
+                    ':key': foto_s3_key, ':fid': face_id,
+                    ':sm': derivados['foto_s3_key_sm'], ':md': derivados['foto_s3_key_md'],
+                }
             )
         else:
             tabela_funcionarios.update_item(
                 Key={'company_id': empresa_id, 'id': funcionario_id},
-                UpdateExpression='SET foto_s3_key = :key REMOVE foto_url',
-                ExpressionAttributeValues={':key': foto_s3_key}
+                UpdateExpression='SET foto_s3_key = :key, foto_s3_key_sm = :sm, foto_s3_key_md = :md REMOVE foto_url',
+                ExpressionAttributeValues={
+                    ':key': foto_s3_key,
+                    ':sm': derivados['foto_s3_key_sm'], ':md': derivados['foto_s3_key_md'],
+                }
             )
+        # Embeddings on-device foram calculados sobre a foto antiga — tombstone
+        # para os tablets descartarem no próximo pull incremental.
+        try:
+            _invalidar_embeddings(empresa_id, funcionario_id)
+        except Exception as e:
+            print(f"[PUT FOTO] Aviso: falha ao invalidar embeddings: {e}")
         return jsonify({"success": True, "foto_url": foto_url})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -786,6 +780,11 @@ def excluir_funcionario(funcionario_id):
         except Exception as e:
             print(f"[DELETE] Erro ao excluir face no Rekognition: {str(e)}")
 
+        try:
+            _invalidar_embeddings(empresa_id, funcionario_id)
+        except Exception as e:
+            print(f"[DELETE] Erro ao invalidar embeddings faciais: {str(e)}")
+
         # Atualizar funcionário com exclusão lógica
         try:
             # Timestamp atual
@@ -799,7 +798,8 @@ def excluir_funcionario(funcionario_id):
                 'senha_hash': None,  # Remover senha
                 'login': None,  # Remover login
                 'foto_url': None,  # Remover URL da foto
-                'foto_s3_key': None  # Remover chave S3
+                'foto_s3_key': None,  # Remover chave S3
+                **_foto_derivados(None),  # e das miniaturas
             }
             
             # Construir UpdateExpression
@@ -828,6 +828,8 @@ def excluir_funcionario(funcionario_id):
                 ExpressionAttributeNames=expr_attr_names,
                 ExpressionAttributeValues=expr_attr_values
             )
+            if funcionario.get('ativo') is True:
+                company_stats.employee_deactivated(empresa_id)
             
             print(f"[DELETE] Funcionário marcado como inativo (exclusão lógica): {funcionario_id}")
             print(f"[DELETE] Data da exclusão: {deleted_timestamp}")
@@ -951,7 +953,7 @@ def cadastrar_funcionario(payload):
             foto_nome = f"funcionarios/{funcionario_id}.jpg"
             temp_path = os.path.join(tempfile.gettempdir(), foto_nome.split('/')[-1])
             foto.save(temp_path)
-            foto_s3_key = enviar_s3(temp_path, foto_nome, empresa_id)
+            foto_s3_key = enviar_s3(temp_path, foto_nome, empresa_id, derivatives=True)
 
             # Indexar no Rekognition
             with open(temp_path, 'rb') as image:
@@ -998,6 +1000,7 @@ def cadastrar_funcionario(payload):
         # Adicionar campos opcionais
         if foto_s3_key:
             funcionario_item['foto_s3_key'] = foto_s3_key
+            funcionario_item.update(_foto_derivados(foto_s3_key, _raw_bytes))
         if face_id:
             funcionario_item['face_id'] = face_id
         if cpf:
@@ -1119,6 +1122,7 @@ def cadastrar_funcionario(payload):
 
         # Salvar no DynamoDB (Employees table uses company_id as partition key)
         tabela_funcionarios.put_item(Item=funcionario_item)
+        company_stats.employee_activated(empresa_id)
         
         # Salvar horário pré-definido se fornecido
         if nome_horario and horario_entrada and horario_saida:
@@ -2008,13 +2012,18 @@ def listar_funcionarios(payload):
         funcionarios = response_func.get('Items', [])
         # Padronizar para id/nome
         # Retornar todos os campos relevantes de cada funcionário
+        # foto_url nunca é persistido no item (é presigned, expira) — sempre
+        # regenerado aqui a partir de foto_s3_key. Sem isso, a foto some da
+        # listagem assim que o campo antigo expira ou é sobrescrito num PUT.
+        # Assinatura em lote + cache: a mesma foto mantém a mesma URL entre
+        # listagens, então o navegador reaproveita a imagem já baixada.
+        # A listagem mostra avatar — miniatura 'sm' quando existir.
+        foto_urls = generate_presigned_urls(
+            [photo_key_for(f, 'sm') for f in funcionarios], expiration_seconds=300
+        )
         funcionarios_list = []
         for f in funcionarios:
-            # foto_url nunca é persistido no item (é presigned, expira) — sempre
-            # regenerado aqui a partir de foto_s3_key. Sem isso, a foto some da
-            # listagem assim que o campo antigo expira ou é sobrescrito num PUT.
-            foto_s3_key = f.get('foto_s3_key')
-            foto_url = generate_presigned_url(foto_s3_key, expiration_seconds=300) if foto_s3_key else None
+            foto_url = foto_urls.get(photo_key_for(f, 'sm'))
             funcionario_dict = {
                 'id': f.get('id'),
                 'nome': f.get('nome', ''),
@@ -2127,7 +2136,7 @@ def enviar_email_espelho():
         </div>
         """
 
-        ses_client = boto3.client('ses', region_name='us-east-1')
+        ses_client = aws_clients.client('ses', os.environ.get('SES_REGION', 'us-east-1'))
         ses_from = os.environ.get('SES_FROM_EMAIL', '')
         if not ses_from:
             return jsonify({'error': 'Remetente de email não configurado. Defina SES_FROM_EMAIL no .env do servidor.'}), 500
@@ -2274,6 +2283,7 @@ def ajustar_registro(payload, registro_id):
         }
         
         tabela_registros.put_item(Item=novo_registro)
+        company_stats.record_written(company_id, novo_registro)
 
         _log_audit(
             company_id=company_id,
@@ -2496,6 +2506,7 @@ def registrar_ponto_manual(payload):
     
     # Salva no DynamoDB
     tabela_registros.put_item(Item=registro)
+    company_stats.record_written(empresa_id, registro)
 
     _log_audit(
         company_id=empresa_id,
@@ -2584,6 +2595,7 @@ def registrar_ferias(payload):
         current += timedelta(days=1)
 
     if criados:
+        company_stats.records_written(empresa_id, len(criados))
         _log_audit(
             company_id=empresa_id,
             user_id=payload.get('usuario_id', payload.get('email', '')),
@@ -2663,7 +2675,7 @@ def registrar_atestado(payload):
         with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
             tmp = tmp_file.name
             arquivo.save(tmp)
-        atestado_s3_key = enviar_s3(tmp, s3_key, empresa_id)
+        atestado_s3_key = enviar_s3(tmp, s3_key, empresa_id, background=False)
         # Gera URL para resposta imediata (1h); a key persiste no DynamoDB para renovação futura
         atestado_url = generate_presigned_url(atestado_s3_key, expiration_seconds=3600) or ''
     except Exception as e:
@@ -2699,6 +2711,7 @@ def registrar_atestado(payload):
         criados.append(date_str)
 
     if criados:
+        company_stats.records_written(empresa_id, len(criados))
         _log_audit(
             company_id=empresa_id,
             user_id=payload.get('usuario_id', payload.get('email', '')),
@@ -2846,7 +2859,7 @@ def substituir_atestado(payload):
         with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
             tmp = tmp_file.name
             arquivo.save(tmp)
-        new_s3_key = enviar_s3(tmp, new_s3_key, empresa_id)
+        new_s3_key = enviar_s3(tmp, new_s3_key, empresa_id, background=False)
         new_url    = generate_presigned_url(new_s3_key, expiration_seconds=3600) or ''
     except Exception as e:
         return jsonify({'mensagem': f'Erro ao fazer upload: {str(e)}'}), 500
@@ -2914,13 +2927,22 @@ def listar_registros_protegido(payload):
     registros = response.get('Items', [])
     return jsonify(registros)
 
+def _login_indisponivel(motivo: str):
+    """503 dos logins: índice de login fora do ar ou fila do bcrypt cheia."""
+    logger.error(f"[LOGIN] {motivo}")
+    resp = jsonify({'error': 'Login temporariamente indisponível. Tente novamente em instantes.'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
+
+
 @routes.route('/login', methods=['POST', 'OPTIONS'])
 def login():
     """Login exclusivo para empresas usando credenciais da tabela UserCompany."""
     if request.method == 'OPTIONS':
         return jsonify({}), 200
 
-    from utils.auth import verify_password, get_secret_key
+    from utils.auth import get_secret_key
+    from utils.password_pool import PasswordPoolBusy, verify_many
     from services.permissions import calculate_permissions
     from services.audit_service import log_event as _log_event
     import datetime
@@ -2937,47 +2959,44 @@ def login():
         if not usuario_id or not senha:
             return jsonify({'error': 'usuario_id e senha são obrigatórios'}), 400
 
-        # Buscar usuário via GSI user_id-index (O(1)) com fallback para scan
-        usuario = None
+        # Busca só pelo GSI user_id-index (scripts/create_login_indexes.py).
+        # Sem fallback para scan: no pico de login um scan por tentativa
+        # consumiria a capacidade da tabela inteira — melhor um 503 curto.
         try:
-            gsi_resp = tabela_usuarioempresa.query(
+            candidatos = tabela_usuarioempresa.query(
                 IndexName='user_id-index',
                 KeyConditionExpression=Key('user_id').eq(usuario_id),
-            )
-            items = gsi_resp.get('Items', [])
-            if items:
-                usuario = items[0]
-        except Exception:
-            pass  # GSI ainda não criado — fallback para scan
+            ).get('Items', [])
+        except Exception as e:
+            return _login_indisponivel(f"GSI user_id-index indisponível: {type(e).__name__}")
 
-        if usuario is None:
-            scan_resp = tabela_usuarioempresa.scan(
-                FilterExpression=Attr('user_id').eq(usuario_id)
-            )
-            items = scan_resp.get('Items', [])
-            if items:
-                usuario = items[0]
+        if not candidatos:
+            return jsonify({'error': 'Login ou senha incorretos'}), 401
 
-        if not usuario:
+        # Verificar senha (prioriza hash bcrypt, no pool fora da thread). O
+        # user_id não é garantidamente único entre empresas: vale o candidato
+        # cuja senha confere.
+        try:
+            confere = verify_many(senha, [c.get('senha_hash') or '' for c in candidatos])
+        except PasswordPoolBusy:
+            return _login_indisponivel("fila do bcrypt cheia")
+        usuario = next((c for c, ok in zip(candidatos, confere) if ok), None)
+        _plaintext_migration = False
+        if usuario is None:
+            import hmac as _hmac
+            for c in candidatos:
+                if not c.get('senha_hash') and c.get('senha') and _hmac.compare_digest(
+                        senha.encode('utf-8'), c['senha'].encode('utf-8')):
+                    usuario = c
+                    _plaintext_migration = True
+                    break
+        if usuario is None:
             return jsonify({'error': 'Login ou senha incorretos'}), 401
 
         # Verificar conta ativa (campo adicionado pela migration)
         if usuario.get('active') is False:
             return jsonify({'error': 'Conta desativada. Entre em contato com o administrador.'}), 403
 
-        # Verificar senha (prioriza hash bcrypt)
-        _plaintext_migration = False
-        if usuario.get('senha_hash'):
-            if not verify_password(senha, usuario['senha_hash']):
-                return jsonify({'error': 'Login ou senha incorretos'}), 401
-        elif usuario.get('senha'):
-            import hmac as _hmac
-            if not _hmac.compare_digest(senha.encode('utf-8'), usuario['senha'].encode('utf-8')):
-                return jsonify({'error': 'Login ou senha incorretos'}), 401
-            _plaintext_migration = True
-        else:
-            return jsonify({'error': 'Login ou senha incorretos'}), 401
-
         company_id   = usuario.get('company_id', '')
         user_id      = usuario['user_id']
         role         = usuario.get('role') or 'OWNER'
@@ -3054,23 +3073,14 @@ def login():
 @routes.route('/me', methods=['GET', 'OPTIONS'])
 def me():
     """Retorna payload do usuário autenticado (cookie ou Bearer). Usado na inicialização do SPA."""
-    from utils.auth import token_required as _tr
     if request.method == 'OPTIONS':
         return '', 200
-    token = request.cookies.get('session_token')
-    if not token:
-        auth_h = request.headers.get('Authorization', '')
-        if auth_h.startswith('Bearer '):
-            token = auth_h.split(' ', 1)[1]
-    if not token:
+    from utils.auth import request_token, current_payload
+    if not request_token():
         return jsonify({'error': 'Token ausente'}), 401
-    from utils.auth import verify_token, is_token_blacklisted
-    payload = verify_token(token)
+    payload = current_payload()  # já recusa token revogado
     if not payload:
         return jsonify({'error': 'Token inválido'}), 401
-    jti = payload.get('jti')
-    if jti and is_token_blacklisted(jti):
-        return jsonify({'error': 'Token revogado'}), 401
     tipo = payload.get('tipo', 'empresa')
     if tipo == 'funcionario':
         return jsonify({
@@ -3095,19 +3105,13 @@ def logout():
     """Invalida o token atual (blacklist) e limpa o cookie de sessão."""
     if request.method == 'OPTIONS':
         return '', 200
-    from utils.auth import cookie_kwargs, verify_token, blacklist_token, is_token_blacklisted
-    token = request.cookies.get('session_token')
-    if not token:
-        auth_h = request.headers.get('Authorization', '')
-        if auth_h.startswith('Bearer '):
-            token = auth_h.split(' ', 1)[1]
-    if token:
-        payload = verify_token(token)
-        if payload:
-            jti = payload.get('jti')
-            exp = payload.get('exp', 0)
-            if jti:
-                blacklist_token(jti, float(exp))
+    from utils.auth import cookie_kwargs, current_payload, blacklist_token
+    payload = current_payload()
+    if payload:
+        jti = payload.get('jti')
+        exp = payload.get('exp', 0)
+        if jti:
+            blacklist_token(jti, float(exp))
     resp = jsonify({'message': 'Logout realizado com sucesso'})
     kw = cookie_kwargs(max_age=0)
     resp.set_cookie('session_token', value='', **kw)
@@ -3301,6 +3305,8 @@ def cadastrar_usuario_empresa():
             'senha_hash': senha_hash,
             'data_criacao': datetime.now().isoformat()
         })
+        company_stats.sync_company(empresa_id, user_id=usuario_id, email=email, empresa_nome=empresa_nome,
+                                   data_criacao=datetime.now().isoformat())
         
         return jsonify({'success': True, 'usuario_id': usuario_id, 'empresa_id': empresa_id}), 201
         
@@ -3318,7 +3324,8 @@ def login_funcionario():
     if request.method == 'OPTIONS':
         return '', 200
     
-    from utils.auth import verify_password, get_secret_key
+    from utils.auth import get_secret_key
+    from utils.password_pool import PasswordPoolBusy, verify_many
     import datetime
     import jwt
     
@@ -3333,32 +3340,33 @@ def login_funcionario():
         if not funcionario_id or not senha:
             return jsonify({'error': 'ID do funcionário e senha são obrigatórios'}), 400
 
-        # Busca via GSI id-index (O(1), sem precisar que o app saiba a empresa —
-        # o formulário de login do funcionário só pede ID+senha). O 'id' é único
-        # DENTRO de cada empresa (dedup na criação), mas duas empresas diferentes
-        # podem ter funcionários com o mesmo id (ex: "joao.silva" nas duas) — por
-        # isso a GSI pode retornar mais de um candidato, e desambiguamos pela senha.
-        candidatos = []
+        # Com a empresa no corpo (app que já logou antes), get_item direto na
+        # chave. Sem ela, GSI id-index (o formulário só pede ID+senha). O 'id'
+        # é único DENTRO de cada empresa (dedup na criação), mas duas empresas
+        # podem ter o mesmo id (ex: "joao.silva" nas duas) — a GSI pode trazer
+        # mais de um candidato, e desambiguamos pela senha. Sem fallback para
+        # scan (ver login()).
+        company_id = (data.get('company_id') or data.get('empresa_id') or '').strip()
         try:
-            gsi_resp = tabela_funcionarios.query(
-                IndexName='id-index',
-                KeyConditionExpression=Key('id').eq(funcionario_id),
-            )
-            candidatos = gsi_resp.get('Items', [])
+            if company_id:
+                item = tabela_funcionarios.get_item(
+                    Key={'company_id': company_id, 'id': funcionario_id}
+                ).get('Item')
+                candidatos = [item] if item else []
+            else:
+                candidatos = tabela_funcionarios.query(
+                    IndexName='id-index',
+                    KeyConditionExpression=Key('id').eq(funcionario_id),
+                ).get('Items', [])
         except Exception as e:
-            logger.error(f"[LOGIN FUNC] GSI id-index indisponível, usando scan: {type(e).__name__}")
-            try:
-                scan_resp = tabela_funcionarios.scan(FilterExpression=Attr('id').eq(funcionario_id))
-                candidatos = scan_resp.get('Items', [])
-            except Exception as e2:
-                logger.error(f"[LOGIN FUNC] Erro ao buscar funcionário: {type(e2).__name__}")
-                candidatos = []
-
-        funcionario = None
-        for candidato in candidatos:
-            if verify_password(senha, candidato.get('senha_hash', '')):
-                funcionario = candidato
-                break
+            return _login_indisponivel(f"busca do funcionário falhou: {type(e).__name__}")
+
+        # Todos os candidatos são verificados de uma vez, em paralelo no pool
+        try:
+            confere = verify_many(senha, [c.get('senha_hash') or '' for c in candidatos])
+        except PasswordPoolBusy:
+            return _login_indisponivel("fila do bcrypt cheia")
+        funcionario = next((c for c, ok in zip(candidatos, confere) if ok), None)
 
         if not funcionario:
             return jsonify({'error': 'ID ou senha inválidos'}), 401
@@ -4439,6 +4447,7 @@ def registrar_ponto_localizacao(payload):
         
         # Salvar registro
         tabela_registros.put_item(Item=registro_item)
+        company_stats.record_written(company_id, registro_item)
         
         print(f"[REGISTRO LOCATION] Ponto registrado com sucesso: {funcionario_id}#{data_hora_atual}")
         
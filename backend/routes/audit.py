@@ -1,20 +1,19 @@
 # backend/routes/audit.py
 """
 GET /api/audit — lista logs de auditoria da empresa.
-Params: user_id, action, entity, date_from, date_to, limit (max 500)
+Params: user_id, action, entity, employee_id, date_from, date_to, limit (max 500),
+        cursor (next_cursor da página anterior)
+
+A página vem cheia (até `limit` eventos que passam nos filtros) dentro do
+orçamento de leitura — ver services/audit_service.query_logs.
 """
 from __future__ import annotations
 from flask import Blueprint, request, jsonify
-import boto3
-import os
-from boto3.dynamodb.conditions import Key, Attr
 from utils.auth import token_required, require_permission
+from services.audit_service import expand_item, query_logs
 
 audit_routes = Blueprint('audit_routes', __name__)
 
-_dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
-_table_audit = _dynamodb.Table(os.environ.get('DYNAMODB_TABLE_AUDIT', 'AuditLogs'))
-
 
 @audit_routes.route('/api/audit', methods=['GET', 'OPTIONS'])
 @token_required
@@ -33,43 +32,30 @@ def get_audit_logs(payload):
     filter_action     = (request.args.get('action') or '').strip()
     filter_entity     = (request.args.get('entity') or '').strip()
     filter_employee   = (request.args.get('employee_id') or '').strip()
-    limit             = min(int(request.args.get('limit', 100)), 500)
-
-    key_cond = Key('company_id').eq(company_id)
-    if date_from and date_to:
-        key_cond = key_cond & Key('created_at_log_id').between(date_from, date_to + '\xff')
-    elif date_from:
-        key_cond = key_cond & Key('created_at_log_id').gte(date_from)
-
-    filter_expr = None
-    if filter_user:
-        filter_expr = Attr('user_id').eq(filter_user)
-    if filter_action:
-        cond = Attr('action').eq(filter_action)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-    if filter_entity:
-        cond = Attr('entity').eq(filter_entity)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-    if filter_employee:
-        cond = Attr('employee_id').eq(filter_employee)
-        filter_expr = cond if filter_expr is None else (filter_expr & cond)
-
-    kwargs: dict = {
-        'KeyConditionExpression': key_cond,
-        'Limit': limit,
-        'ScanIndexForward': False,
-    }
-    if filter_expr is not None:
-        kwargs['FilterExpression'] = filter_expr
+    cursor            = (request.args.get('cursor') or '').strip() or None
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+    except ValueError:
+        return jsonify({'error': 'limit inválido'}), 400
 
     try:
-        resp = _table_audit.query(**kwargs)
-        logs = resp.get('Items', [])
+        page = query_logs(
+            company_id,
+            date_from=date_from, date_to=date_to,
+            user_id=filter_user, action=filter_action,
+            entity=filter_entity, employee_id=filter_employee,
+            limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         err = str(e)
         if 'ResourceNotFoundException' in err or 'Cannot do operations' in err:
             # Tabela AuditLogs ainda não criada no AWS Console
             return jsonify({'logs': [], 'count': 0, 'warning': 'Tabela AuditLogs não encontrada. Crie-a no AWS Console.'}), 200
+        if cursor and 'ValidationException' in err:
+            return jsonify({'error': 'cursor não corresponde aos filtros'}), 400
         raise
 
-    return jsonify({'logs': logs, 'count': len(logs)}), 200
+    logs = [expand_item(item) for item in page['logs']]
+    return jsonify({'logs': logs, 'count': len(logs), 'next_cursor': page['next_cursor']}), 200
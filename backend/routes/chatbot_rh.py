@@ -8,17 +8,19 @@ Segurança:
 - Todas as queries são executadas por funções internas controladas
 - Apenas leitura (sem escrita, aprovação ou exclusão)
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, has_app_context
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from typing import Optional
+from collections import OrderedDict
+from threading import Lock
 import os
 import json
-import requests
-from functools import wraps
+import time
 from boto3.dynamodb.conditions import Key, Attr
-from utils.auth import verify_token
+from utils.auth import bearer_token_required as token_required
 from utils.aws import dynamodb
+from services import analytics_cube, company_stats, usage_metering
 import unicodedata
 import re
 
@@ -31,32 +33,6 @@ table_employees = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_EMPLOYEES',      'Em
 table_records   = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_RECORDS',        'TimeRecords'))
 table_config    = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_CONFIG',         'ConfigCompany'))
 
-# ---------------------------------------------------------------------------
-# Decorator de autenticação
-# ---------------------------------------------------------------------------
-
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return ('', 200)
-
-        token = None
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-
-        if not token:
-            return jsonify({'error': 'Token ausente'}), 401
-
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido ou expirado'}), 401
-
-        return f(payload, *args, **kwargs)
-    return decorated
-
-
 # ---------------------------------------------------------------------------
 # Utilitários
 # ---------------------------------------------------------------------------
@@ -130,84 +106,6 @@ def _buscar_funcionarios_empresa(company_id: str):
         return []
 
 
-def _buscar_daily_summary_mes(company_id: str, year: int, month: int):
-    """
-    Escaneia DailySummary para o mês inteiro da empresa.
-    Retorna lista de itens.
-    """
-    start = f"{year:04d}-{month:02d}-01"
-    if month == 12:
-        end = f"{year:04d}-{month:02d}-31"
-    else:
-        last_day = (date(year, month + 1, 1) - timedelta(days=1)).day
-        end = f"{year:04d}-{month:02d}-{last_day:02d}"
-
-    try:
-        # DailySummary: PK=company_id, SK=employee_id#date
-        resp = table_daily.query(
-            KeyConditionExpression=Key('company_id').eq(company_id)
-        )
-        items = resp.get('Items', [])
-        while 'LastEvaluatedKey' in resp:
-            resp = table_daily.query(
-                KeyConditionExpression=Key('company_id').eq(company_id),
-                ExclusiveStartKey=resp['LastEvaluatedKey']
-            )
-            items.extend(resp.get('Items', []))
-    except Exception as e:
-        print(f"[CHATBOT] Erro ao buscar DailySummary: {e}")
-        return []
-
-    # Filtrar pelo mês
-    filtered = []
-    for item in items:
-        d = item.get('date', '')
-        if start <= d <= end:
-            filtered.append(item)
-    return filtered
-
-
-def _buscar_daily_summary_data(company_id: str, target_date: str):
-    """Busca resumos diários para uma data específica."""
-    try:
-        resp = table_daily.query(
-            KeyConditionExpression=Key('company_id').eq(company_id)
-        )
-        items = resp.get('Items', [])
-        while 'LastEvaluatedKey' in resp:
-            resp = table_daily.query(
-                KeyConditionExpression=Key('company_id').eq(company_id),
-                ExclusiveStartKey=resp['LastEvaluatedKey']
-            )
-            items.extend(resp.get('Items', []))
-    except Exception as e:
-        print(f"[CHATBOT] Erro ao buscar DailySummary por data: {e}")
-        return []
-
-    return [item for item in items if item.get('date', '') == target_date]
-
-
-def _buscar_monthly_summary(company_id: str, year: int, month: int):
-    """Busca MonthlySummary para o mês da empresa."""
-    month_str = f"{year:04d}-{month:02d}"
-    try:
-        resp = table_monthly.query(
-            KeyConditionExpression=Key('company_id').eq(company_id)
-        )
-        items = resp.get('Items', [])
-        while 'LastEvaluatedKey' in resp:
-            resp = table_monthly.query(
-                KeyConditionExpression=Key('company_id').eq(company_id),
-                ExclusiveStartKey=resp['LastEvaluatedKey']
-            )
-            items.extend(resp.get('Items', []))
-    except Exception as e:
-        print(f"[CHATBOT] Erro ao buscar MonthlySummary: {e}")
-        return []
-
-    return [item for item in items if item.get('month', '') == month_str]
-
-
 def _get_employee_name(item):
     """Extrai nome do funcionário de um item de DailySummary ou do dict de employees."""
     return (
@@ -218,10 +116,16 @@ def _get_employee_name(item):
     )
 
 
-def _build_employee_map(company_id: str):
-    """Retorna dict {employee_id: nome} para a empresa."""
-    employees = _buscar_funcionarios_empresa(company_id)
-    return {e.get('id', e.get('employee_id', '')): e.get('nome', 'Funcionário') for e in employees}
+def _cubo(company_id: str, year: int, month: int) -> analytics_cube.MonthCube:
+    """Cubo do mês da empresa, reaproveitando a versão de dados lida em chat_rh."""
+    version = g.get('chatbot_data_version') if has_app_context() else None
+    return analytics_cube.get_cube(company_id, year, month, version=version)
+
+
+def _posicoes(cube, employee_name: Optional[str], apenas_ativos: bool = False) -> list:
+    """Posições do cubo cujo nome contém employee_name (todas se None)."""
+    total = cube.ativos if apenas_ativos else len(cube.ids)
+    return [p for p in range(total) if not employee_name or _nome_contem(cube.nomes[p], employee_name)]
 
 
 # ---------------------------------------------------------------------------
@@ -230,7 +134,7 @@ def _build_employee_map(company_id: str):
 
 def faltas_do_mes(company_id: str, employee_name: Optional[str], month: int, year: int) -> dict:
     """
-    Retorna os dias de falta no mês calculados diretamente de TimeRecords.
+    Retorna os dias de falta no mês calculados a partir dos TimeRecords do cubo.
     Para cada dia útil passado do mês, verifica quem não tem nenhum registro.
     Não depende de DailySummary para funcionar, assim funciona mesmo quando
     nenhum registro foi feito no mês.
@@ -256,82 +160,21 @@ def faltas_do_mes(company_id: str, employee_name: Optional[str], month: int, yea
             'resultados': [],
         }
 
-    employees = _buscar_funcionarios_empresa(company_id)
-    if employee_name:
-        employees = [e for e in employees if _nome_contem(e.get('nome', ''), employee_name)]
-
-    if not employees:
-        return {
-            'intent': 'faltas_do_mes',
-            'month': month,
-            'year': year,
-            'employee_name_filter': employee_name,
-            'resultados': [],
-        }
-
-    start_str = primeiro_dia.isoformat()
-    end_str = fim.isoformat()
-
-    # Buscar todos os TimeRecords do mês para a empresa
-    try:
-        resp = table_records.query(
-            KeyConditionExpression=Key('company_id').eq(company_id),
-            ProjectionExpression='employee_id, data_hora',
-        )
-        todos_registros = resp.get('Items', [])
-        while 'LastEvaluatedKey' in resp:
-            resp = table_records.query(
-                KeyConditionExpression=Key('company_id').eq(company_id),
-                ExclusiveStartKey=resp['LastEvaluatedKey'],
-                ProjectionExpression='employee_id, data_hora',
-            )
-            todos_registros.extend(resp.get('Items', []))
-    except Exception as e:
-        print(f'[CHATBOT] Erro ao buscar TimeRecords para faltas do mês: {e}')
-        todos_registros = []
-
-    # Conjunto de (employee_id, date) que TÊM registro no período
-    pares_com_registro: set = set()
-    for r in todos_registros:
-        dh = r.get('data_hora', '')
-        if dh:
-            d = dh[:10]
-            if start_str <= d <= end_str:
-                emp_id = r.get('employee_id', '')
-                if emp_id:
-                    pares_com_registro.add((emp_id, d))
-
-    # Gerar lista de dias úteis (seg-sex) no período
-    dias_uteis = []
-    current = primeiro_dia
-    while current <= fim:
-        if current.weekday() < 5:  # 0=seg, 4=sex
-            dias_uteis.append(current.isoformat())
-        current += timedelta(days=1)
-
-    # Para cada funcionário, coletar dias úteis sem registro
-    emp_faltas: dict = {
-        e.get('id', e.get('employee_id', '')): {
-            'emp': e,
-            'dias': [],
-        }
-        for e in employees
-    }
+    cube = _cubo(company_id, year, month)
 
-    for emp_id in emp_faltas:
-        for dia_str in dias_uteis:
-            if (emp_id, dia_str) not in pares_com_registro:
-                emp_faltas[emp_id]['dias'].append(dia_str)
+    # Dias úteis (seg-sex) do período
+    dias_uteis = [d for d in range(1, fim.day + 1) if date(year, month, d).weekday() < 5]
 
+    # Para cada funcionário ativo, dias úteis sem nenhum registro
     resultados = []
-    for emp_id, dado in emp_faltas.items():
-        if dado['dias']:
-            nome = dado['emp'].get('nome', 'Desconhecido')
+    for p in _posicoes(cube, employee_name, apenas_ativos=True):
+        dias = [cube.iso(d) for d in dias_uteis if not cube.flags[cube.idx(p, d)] & analytics_cube.REGISTRO]
+        if dias:
             resultados.append({
-                'funcionario': nome,
-                'employee_id': emp_id,
-                'dias_falta': sorted(dado['dias']),
-                'total': len(dado['dias']),
+                'funcionario': cube.nomes[p],
+                'employee_id': cube.ids[p],
+                'dias_falta': dias,
+                'total': len(dias),
             })
 
     resultados.sort(key=lambda x: x['funcionario'])
@@ -446,63 +289,24 @@ def horas_extras_periodo(
     end_date: str,
 ) -> dict:
     """Retorna horas extras no período. Se employee_name fornecido, filtra."""
-    # Buscar todos os itens do intervalo de datas (pode cruzar meses)
     start_dt = datetime.strptime(start_date[:10], '%Y-%m-%d').date()
     end_dt = datetime.strptime(end_date[:10], '%Y-%m-%d').date()
 
-    all_items = []
-    current = date(start_dt.year, start_dt.month, 1)
-    while current <= end_dt:
-        month_items = _buscar_daily_summary_mes(company_id, current.year, current.month)
-        for item in month_items:
-            d = item.get('date', '')
-            if start_date <= d <= end_date:
-                all_items.append(item)
-        # Avançar para próximo mês
-        if current.month == 12:
-            current = date(current.year + 1, 1, 1)
-        else:
-            current = date(current.year, current.month + 1, 1)
-
-    # Remover duplicatas
-    seen = set()
-    unique_items = []
-    for item in all_items:
-        key = (item.get('employee_id', ''), item.get('date', ''))
-        if key not in seen:
-            seen.add(key)
-            unique_items.append(item)
-
-    employee_map = _build_employee_map(company_id)
-
-    com_extras = [
-        i for i in unique_items
-        if int(_decimal_to_float(i.get('extra_hours', 0) or i.get('overtime_minutes', 0)) or 0) > 0
-    ]
-
-    if employee_name:
-        com_extras = [
-            i for i in com_extras
-            if _nome_contem(
-                employee_map.get(i.get('employee_id', ''), _get_employee_name(i)),
-                employee_name
-            )
-        ]
-
-    # Agrupar por funcionário, somando horas extras
+    # Um cubo por mês do intervalo (pode cruzar meses); soma em minutos
     agrupado = {}
-    for item in com_extras:
-        emp_id = item.get('employee_id', '')
-        nome = employee_map.get(emp_id, _get_employee_name(item))
-        # extra_hours pode estar em horas (Decimal) ou em minutos
-        extra_h = _decimal_to_float(item.get('extra_hours', 0) or 0)
-        extra_m = int(_decimal_to_float(item.get('overtime_minutes', 0) or 0))
-        # Normalizar para minutos
-        total_min = extra_m if extra_m > 0 else int(extra_h * 60)
-        if emp_id not in agrupado:
-            agrupado[emp_id] = {'nome': nome, 'employee_id': emp_id, 'total_minutos': 0, 'dias': []}
-        agrupado[emp_id]['total_minutos'] += total_min
-        agrupado[emp_id]['dias'].append(item.get('date', ''))
+    for y, m in analytics_cube.months_between(start_dt, end_dt):
+        cube = _cubo(company_id, y, m)
+        first = start_dt.day if (y, m) == (start_dt.year, start_dt.month) else 1
+        last = end_dt.day if (y, m) == (end_dt.year, end_dt.month) else cube.days
+        for p in _posicoes(cube, employee_name):
+            dias = [d for d in range(first, last + 1) if cube.extra[cube.idx(p, d)] > 0]
+            if not dias:
+                continue
+            emp_id = cube.ids[p]
+            if emp_id not in agrupado:
+                agrupado[emp_id] = {'nome': cube.nomes[p], 'employee_id': emp_id, 'total_minutos': 0, 'dias': []}
+            agrupado[emp_id]['total_minutos'] += sum(cube.extra[cube.idx(p, d)] for d in dias)
+            agrupado[emp_id]['dias'].extend(cube.iso(d) for d in dias)
 
     resultados = [
         {
@@ -531,26 +335,16 @@ def dias_trabalhados_funcionario(
     year: int,
 ) -> dict:
     """Retorna dias trabalhados no mês por funcionário."""
-    items = _buscar_daily_summary_mes(company_id, year, month)
-    employee_map = _build_employee_map(company_id)
-
-    trabalhados = [i for i in items if i.get('status') != 'absent']
-
-    if employee_name:
-        trabalhados = [
-            i for i in trabalhados
-            if _nome_contem(
-                employee_map.get(i.get('employee_id', ''), _get_employee_name(i)),
-                employee_name
-            )
-        ]
+    cube = _cubo(company_id, year, month)
 
+    # Dias com DailySummary que não é falta
     agrupado = {}
-    for item in trabalhados:
-        emp_id = item.get('employee_id', '')
-        nome = employee_map.get(emp_id, _get_employee_name(item))
-        agrupado.setdefault(emp_id, {'nome': nome, 'employee_id': emp_id, 'dias': []})
-        agrupado[emp_id]['dias'].append(item.get('date', ''))
+    for p in _posicoes(cube, employee_name):
+        dias = [d for d in cube.dias_com(p, analytics_cube.RESUMO)
+                if not cube.flags[cube.idx(p, d)] & analytics_cube.AUSENTE]
+        if dias:
+            agrupado[cube.ids[p]] = {'nome': cube.nomes[p], 'employee_id': cube.ids[p],
+                                     'dias': [cube.iso(d) for d in dias]}
 
     resultados = [
         {
@@ -579,22 +373,19 @@ def resumo_mensal_funcionario(
     year: int,
 ) -> dict:
     """Retorna o resumo mensal do(s) funcionário(s)."""
-    month_summaries = _buscar_monthly_summary(company_id, year, month)
-    employee_map = _build_employee_map(company_id)
+    cube = _cubo(company_id, year, month)
+    month_summaries = list(cube.monthly.values())
 
     if employee_name:
         month_summaries = [
             i for i in month_summaries
-            if _nome_contem(
-                employee_map.get(i.get('employee_id', ''), _get_employee_name(i)),
-                employee_name
-            )
+            if _nome_contem(cube.nome(i.get('employee_id', ''), _get_employee_name(i)), employee_name)
         ]
 
     resultados = []
     for item in month_summaries:
         emp_id = item.get('employee_id', '')
-        nome = employee_map.get(emp_id, _get_employee_name(item))
+        nome = cube.nome(emp_id, _get_employee_name(item))
         resultados.append({
             'funcionario': nome,
             'employee_id': emp_id,
@@ -626,11 +417,10 @@ def resumo_mensal_funcionario(
 
 def saldo_negativo(company_id: str, month: int, year: int) -> dict:
     """Retorna funcionários com saldo negativo no mês."""
-    month_summaries = _buscar_monthly_summary(company_id, year, month)
-    employee_map = _build_employee_map(company_id)
+    cube = _cubo(company_id, year, month)
 
     negativos = [
-        i for i in month_summaries
+        i for i in cube.monthly.values()
         if i.get('status') == 'negative'
         or _decimal_to_float(i.get('final_balance', 0) or 0) < 0
     ]
@@ -638,7 +428,7 @@ def saldo_negativo(company_id: str, month: int, year: int) -> dict:
     resultados = []
     for item in negativos:
         emp_id = item.get('employee_id', '')
-        nome = employee_map.get(emp_id, _get_employee_name(item))
+        nome = cube.nome(emp_id, _get_employee_name(item))
         saldo_min = int(_decimal_to_float(item.get('final_balance', 0) or 0) * 60)
         resultados.append({
             'funcionario': nome,
@@ -678,71 +468,33 @@ def listar_funcionarios(company_id: str) -> dict:
 def ausentes_hoje(company_id: str, employee_name: Optional[str]) -> dict:
     """
     Retorna funcionários que NÃO registraram ponto hoje.
-    Compara lista de funcionários ativos com quem de fato registrou hoje em TimeRecords.
+    Compara os funcionários ativos do cubo do mês com a flag REGISTRO de hoje.
     """
-    hoje = _get_data_hoje()
-
-    employees = _buscar_funcionarios_empresa(company_id)
-    if not employees:
-        return {
-            'intent': 'ausentes_hoje',
-            'data': hoje,
-            'total_empresa': 0,
-            'com_registro': 0,
-            'employee_name_filter': employee_name,
-            'resultados': [],
-        }
-
-    # Buscar todos os registros de hoje na tabela TimeRecords
-    try:
-        resp = table_records.query(
-            KeyConditionExpression=Key('company_id').eq(company_id),
-            ProjectionExpression='employee_id, data_hora',
-        )
-        todos_registros = resp.get('Items', [])
-        while 'LastEvaluatedKey' in resp:
-            resp = table_records.query(
-                KeyConditionExpression=Key('company_id').eq(company_id),
-                ExclusiveStartKey=resp['LastEvaluatedKey'],
-                ProjectionExpression='employee_id, data_hora',
-            )
-            todos_registros.extend(resp.get('Items', []))
-    except Exception as e:
-        print(f'[CHATBOT] Erro ao buscar TimeRecords: {e}')
-        todos_registros = []
+    hoje = date.today()
+    cube = _cubo(company_id, hoje.year, hoje.month)
 
-    # IDs que já registraram hoje
-    ids_com_registro = set()
-    for r in todos_registros:
-        dh = r.get('data_hora', '')
-        if dh and dh[:10] == hoje:
-            emp_id = r.get('employee_id', '')
-            if emp_id:
-                ids_com_registro.add(emp_id)
-
-    # Funcionários sem registro hoje
-    ausentes = [
-        e for e in employees
-        if e.get('id', e.get('employee_id', '')) not in ids_com_registro
+    # Funcionários ativos com e sem registro hoje
+    ids_com_registro = [
+        p for p in range(cube.ativos)
+        if cube.flags[cube.idx(p, hoje.day)] & analytics_cube.REGISTRO
     ]
-
-    if employee_name:
-        ausentes = [e for e in ausentes if _nome_contem(e.get('nome', ''), employee_name)]
+    ausentes = [p for p in _posicoes(cube, employee_name, apenas_ativos=True)
+                if not cube.flags[cube.idx(p, hoje.day)] & analytics_cube.REGISTRO]
 
     resultados = [
         {
-            'funcionario': e.get('nome', 'Desconhecido'),
-            'employee_id': e.get('id', e.get('employee_id', '')),
-            'cargo': e.get('cargo', ''),
+            'funcionario': cube.nomes[p],
+            'employee_id': cube.ids[p],
+            'cargo': cube.cargos[p],
         }
-        for e in ausentes
+        for p in ausentes
     ]
     resultados.sort(key=lambda x: x['funcionario'])
 
     return {
         'intent': 'ausentes_hoje',
-        'data': hoje,
-        'total_empresa': len(employees),
+        'data': hoje.isoformat(),
+        'total_empresa': cube.ativos,
         'com_registro': len(ids_com_registro),
         'employee_name_filter': employee_name,
         'resultados': resultados,
@@ -870,7 +622,9 @@ FORMATO DE RESPOSTA (JSON puro, sem markdown):
         'max_tokens': 512,
     }
 
-    resp = requests.post(GROQ_API_URL, headers=headers, json=body, timeout=20)
+    import requests  # só quem chama o Groq paga o import (~30 ms)
+    with usage_metering.time_external('groq'):
+        resp = requests.post(GROQ_API_URL, headers=headers, json=body, timeout=20)
 
     if not resp.ok:
         print(f'[CHATBOT] Groq HTTP {resp.status_code}: {resp.text[:300]}')
@@ -888,8 +642,10 @@ FORMATO DE RESPOSTA (JSON puro, sem markdown):
 
 
 # ---------------------------------------------------------------------------
-# Fallback: parser local por palavras-chave (sem IA)
-# Usado quando o Groq está indisponível
+# Parser local por palavras-chave (sem IA)
+# Tentado antes do Groq: quando reconhece exatamente uma família de intenção,
+# a resposta sai sem chamada externa. Também é o fallback quando o Groq está
+# indisponível.
 # ---------------------------------------------------------------------------
 
 _MESES_PT = {
@@ -899,11 +655,34 @@ _MESES_PT = {
     'outubro': 10, 'novembro': 11, 'dezembro': 12,
 }
 
+# Palavras-chave por família de intenção (comparadas com o texto normalizado)
+_PALAVRAS_INTENCAO = {
+    'listar': ['listar', 'lista', 'citar', 'cite', 'nomes', 'colaborador'],
+    'falta': ['falt', 'ausent', 'nao veio', 'nao compareceu'],
+    'atraso': ['atras', 'chegou tarde', 'chegou atrasado', 'atraso'],
+    'extra': ['hora extra', 'horas extras', 'banco de horas', 'hora a mais', 'overtime'],
+    'trabalhados': ['dias trabalhado', 'quantos dias trabalh', 'presenca', 'presença'],
+    'saldo': ['saldo negativo', 'banco negativo', 'debito', 'devendo hora', 'horas negativ'],
+    'resumo': ['resumo', 'relatorio', 'relatório', 'sumario', 'sumário', 'como foi o mes'],
+}
+
+
+# Expressões de tempo que o parser local não sabe resolver: com qualquer uma
+# delas a pergunta vai ao Groq (senão "ontem"/"mês passado" virariam o mês atual).
+_TEMPO_NAO_TRATADO = re.compile(r'\b(?:ante)?ontem\b|passad|\bsemana|\bdia\s+\d|\bultim[oa]s?\b')
+
+
+def _tem(q: str, familia: str) -> bool:
+    return any(w in q for w in _PALAVRAS_INTENCAO[familia])
+
 
 def _parse_intent_local(question: str) -> dict:
     """
     Parser simples baseado em palavras-chave.
-    Fallback para quando o Groq estiver indisponível.
+
+    `confident` é True quando a pergunta casa com uma única família de
+    intenção, não precisa de esclarecimento e toda expressão de tempo dela foi
+    entendida — só nesse caso o Groq não é chamado.
     """
     q = _normalizar(question)
     today = date.today()
@@ -911,15 +690,18 @@ def _parse_intent_local(question: str) -> dict:
     # Detectar mês e ano
     month = today.month
     year = today.year
+    periodo_explicito = False
     for nome, num in _MESES_PT.items():
         if nome in q:
             month = num
+            periodo_explicito = True
             break
 
     # Detectar ano explícito (ex: 2026)
     ano_match = re.search(r'\b(202\d)\b', q)
     if ano_match:
         year = int(ano_match.group(1))
+        periodo_explicito = True
 
     # Detectar nome de funcionário (heurística simples: palavra após "o|a|do|da|de" + maiúscula no original)
     employee_name = None
@@ -939,31 +721,31 @@ def _parse_intent_local(question: str) -> dict:
         current_date = None
 
     # Determinar intent — verificar "hoje" ANTES das versões mensais
-    if any(w in q for w in ['listar', 'lista', 'citar', 'cite', 'nomes', 'colaborador']):
+    if _tem(q, 'listar'):
         intent = 'listar_funcionarios'
 
-    elif any(w in q for w in ['falt', 'ausent', 'nao veio', 'nao compareceu']) and 'hoje' in q:
+    elif _tem(q, 'falta') and 'hoje' in q:
         intent = 'faltas_hoje'
 
-    elif any(w in q for w in ['falt', 'ausent', 'nao veio', 'nao compareceu']) and employee_name:
+    elif _tem(q, 'falta') and employee_name:
         intent = 'dias_falta_funcionario_mes'
 
-    elif any(w in q for w in ['falt', 'ausent', 'nao veio', 'nao compareceu']):
+    elif _tem(q, 'falta'):
         intent = 'faltas_mes'
 
-    elif any(w in q for w in ['atras', 'chegou tarde', 'chegou atrasado', 'atraso']):
+    elif _tem(q, 'atraso'):
         intent = 'atrasos_hoje'
 
-    elif any(w in q for w in ['hora extra', 'horas extras', 'banco de horas', 'hora a mais', 'overtime']):
+    elif _tem(q, 'extra'):
         intent = 'horas_extras_funcionario_mes'
 
-    elif any(w in q for w in ['dias trabalhado', 'quantos dias trabalh', 'presenca', 'presença']):
+    elif _tem(q, 'trabalhados'):
         intent = 'dias_trabalhados_funcionario_mes'
 
-    elif any(w in q for w in ['saldo negativo', 'banco negativo', 'debito', 'devendo hora', 'horas negativ']):
+    elif _tem(q, 'saldo'):
         intent = 'saldo_negativo'
 
-    elif any(w in q for w in ['resumo', 'relatorio', 'relatório', 'sumario', 'sumário', 'como foi o mes']):
+    elif _tem(q, 'resumo'):
         intent = 'resumo_funcionario_mes'
 
     else:
@@ -976,6 +758,7 @@ def _parse_intent_local(question: str) -> dict:
             'date': None,
             'needs_clarification': True,
             'clarification_question': 'Você quer consultar faltas, atrasos, horas extras, saldo negativo ou resumo de um funcionário?',
+            'confident': False,
         }
 
     needs_clarification = False
@@ -985,6 +768,12 @@ def _parse_intent_local(question: str) -> dict:
         needs_clarification = True
         clarification_question = 'Qual funcionário você deseja consultar?'
 
+    familias = sum(1 for familia in _PALAVRAS_INTENCAO if _tem(q, familia))
+    # Intents "de hoje" ignoram mês/ano citados ("atrasados em março")
+    tempo_entendido = not _TEMPO_NAO_TRATADO.search(q) and not (
+        intent in ('faltas_hoje', 'atrasos_hoje') and periodo_explicito
+    )
+
     return {
         'intent': intent,
         'employee_name': employee_name,
@@ -994,6 +783,7 @@ def _parse_intent_local(question: str) -> dict:
         'date': current_date,
         'needs_clarification': needs_clarification,
         'clarification_question': clarification_question,
+        'confident': familias == 1 and not needs_clarification and tempo_entendido,
     }
 
 
@@ -1210,6 +1000,126 @@ def _dispatch(intent_data: dict, company_id: str) -> dict:
         }
 
 
+# ---------------------------------------------------------------------------
+# Caches em memória (por worker)
+#
+# Intenção: chave = (data de hoje, pergunta normalizada). Perguntas repetidas
+# ou que só diferem em acento/caixa/pontuação não voltam ao Groq. A data entra
+# na chave porque "hoje" e "este mês" são resolvidos para datas concretas.
+#
+# Resposta: chave = (empresa, intent, parâmetros) e o item guarda a versão dos
+# dados da empresa (company_stats.data_version — muda a cada registro gravado
+# ou funcionário ativado/desativado). Versão diferente = miss. Edições que não
+# passam pelos contadores (ajustes, recálculo de resumos) ficam cobertas pelo
+# TTL CHATBOT_ANSWER_TTL_S.
+# ---------------------------------------------------------------------------
+
+_INTENT_CACHE_MAX = int(os.getenv('CHATBOT_INTENT_CACHE_MAX', '2000'))
+_ANSWER_CACHE_MAX = int(os.getenv('CHATBOT_ANSWER_CACHE_MAX', '500'))
+_ANSWER_TTL_S = float(os.getenv('CHATBOT_ANSWER_TTL_S', '120'))
+
+_intent_cache: 'OrderedDict[tuple, dict]' = OrderedDict()
+_answer_cache: 'OrderedDict[tuple, tuple[float, str, dict, str]]' = OrderedDict()
+_cache_lock = Lock()
+
+
+def _chave_pergunta(question: str) -> str:
+    """Pergunta normalizada: sem acento, minúscula, sem pontuação, espaços únicos."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', _normalizar(question)).split())
+
+
+def _lru_get(cache: OrderedDict, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _lru_set(cache: OrderedDict, key, value, max_size: int) -> None:
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+def _resolver_intencao(question: str) -> tuple[dict, str]:
+    """
+    Intenção da pergunta e sua origem: 'cache', 'local', 'groq' ou 'fallback'.
+
+    Ordem: cache → parser local (se confiante) → Groq → parser local como
+    fallback. Só resultados do local confiante e do Groq entram no cache; o
+    fallback não, para que a pergunta volte ao Groq quando ele se recuperar.
+    """
+    key = (_get_data_hoje(), _chave_pergunta(question))
+    cached = _lru_get(_intent_cache, key)
+    if cached is not None:
+        return dict(cached), 'cache'
+
+    local = _parse_intent_local(question)
+    if local.get('confident'):
+        _lru_set(_intent_cache, key, local, _INTENT_CACHE_MAX)
+        return dict(local), 'local'
+
+    import requests
+    try:
+        intent_data = _parse_intent_groq(question)
+    except ValueError as e:
+        print(f'[CHATBOT] Erro de configuração Groq: {e}')
+        return local, 'fallback'
+    except requests.exceptions.HTTPError as e:
+        print(f'[CHATBOT] Groq HTTP Error: {e} — response: {getattr(e.response, "text", "")[:300]}')
+        return local, 'fallback'
+    except requests.exceptions.RequestException as e:
+        print(f'[CHATBOT] Groq RequestException: {type(e).__name__}: {e}')
+        return local, 'fallback'
+    except json.JSONDecodeError as e:
+        print(f'[CHATBOT] Groq JSON parse error: {e}')
+        return local, 'fallback'
+    except Exception as e:
+        print(f'[CHATBOT] Erro inesperado ao chamar Groq: {type(e).__name__}: {e}')
+        return local, 'fallback'
+
+    if isinstance(intent_data, dict):
+        _lru_set(_intent_cache, key, intent_data, _INTENT_CACHE_MAX)
+    return intent_data, 'groq'
+
+
+def _chave_resposta(company_id: str, intent_data: dict) -> tuple:
+    """Parâmetros que determinam o resultado de _dispatch."""
+    return (
+        company_id,
+        intent_data.get('intent'),
+        _normalizar(intent_data.get('employee_name') or ''),
+        str(intent_data.get('month') or ''),
+        str(intent_data.get('year') or ''),
+        intent_data.get('start_date') or '',
+        intent_data.get('end_date') or '',
+        _get_data_hoje(),
+    )
+
+
+def _resposta_cacheada(key: tuple, version: Optional[str]):
+    """(result, message) se houver resposta válida para a versão atual."""
+    if version is None:
+        return None
+    entry = _lru_get(_answer_cache, key)
+    if entry is None:
+        return None
+    expires_at, cached_version, result, message = entry
+    if cached_version != version or expires_at < time.monotonic():
+        return None
+    return result, message
+
+
+def _guardar_resposta(key: tuple, version: Optional[str], result: dict, message: str) -> None:
+    if version is None:
+        return
+    _lru_set(_answer_cache, key, (time.monotonic() + _ANSWER_TTL_S, version, result, message),
+             _ANSWER_CACHE_MAX)
+
+
 # ---------------------------------------------------------------------------
 # Endpoint principal
 # ---------------------------------------------------------------------------
@@ -1224,8 +1134,9 @@ def chat_rh(payload):
 
     Fluxo:
     1. Extrai company_id do JWT (nunca do body)
-    2. Envia a pergunta ao Groq para parsear a intenção
-    3. Dispara a função de consulta interna correspondente
+    2. Resolve a intenção (cache → parser local confiante → Groq)
+    3. Dispara a função de consulta interna correspondente, ou reaproveita a
+       resposta em cache se os dados da empresa não mudaram
     4. Retorna resposta em linguagem natural + dados estruturados
     """
     # company_id SEMPRE do JWT — nunca do frontend
@@ -1242,30 +1153,8 @@ def chat_rh(payload):
     if len(question) > 500:
         return jsonify({'error': 'Pergunta muito longa (máximo 500 caracteres)'}), 400
 
-    try:
-        # 1. Parsear intenção com IA
-        intent_data = _parse_intent_groq(question)
-        used_fallback = False
-    except ValueError as e:
-        print(f'[CHATBOT] Erro de configuração Groq: {e}')
-        intent_data = _parse_intent_local(question)
-        used_fallback = True
-    except requests.exceptions.HTTPError as e:
-        print(f'[CHATBOT] Groq HTTP Error: {e} — response: {getattr(e.response, "text", "")[:300]}')
-        intent_data = _parse_intent_local(question)
-        used_fallback = True
-    except requests.exceptions.RequestException as e:
-        print(f'[CHATBOT] Groq RequestException: {type(e).__name__}: {e}')
-        intent_data = _parse_intent_local(question)
-        used_fallback = True
-    except json.JSONDecodeError as e:
-        print(f'[CHATBOT] Groq JSON parse error: {e}')
-        intent_data = _parse_intent_local(question)
-        used_fallback = True
-    except Exception as e:
-        print(f'[CHATBOT] Erro inesperado ao chamar Groq: {type(e).__name__}: {e}')
-        intent_data = _parse_intent_local(question)
-        used_fallback = True
+    # 1. Parsear intenção: cache → parser local → Groq
+    intent_data, intent_source = _resolver_intencao(question)
 
     # 2. Se precisar de complemento, retornar imediatamente
     if intent_data.get('needs_clarification'):
@@ -1276,27 +1165,35 @@ def chat_rh(payload):
             'data': None,
         }), 200
 
-    try:
-        # 3. Executar consulta interna com company_id do token
-        result = _dispatch(intent_data, company_id)
-    except Exception as e:
-        print(f'[CHATBOT] Erro ao executar consulta: {e}')
-        return jsonify({'error': 'Erro ao buscar os dados. Tente novamente.'}), 500
-
-    # 4. Formatar resposta em linguagem natural
-    if result.get('intent') in ('desconhecido', 'desconhecida'):
-        message = result.get('mensagem', 'Não entendi sua pergunta.')
+    answer_key = _chave_resposta(company_id, intent_data)
+    version = company_stats.data_version(company_id)
+    g.chatbot_data_version = version  # reaproveitada pelo cubo mensal (_cubo)
+    cached = _resposta_cacheada(answer_key, version)
+    if cached is not None:
+        result, message = cached
     else:
         try:
-            # Mesclar start_date/end_date do intent no result para formatação
-            if intent_data.get('start_date') and 'start_date' not in result:
-                result['start_date'] = intent_data['start_date']
-            if intent_data.get('end_date') and 'end_date' not in result:
-                result['end_date'] = intent_data['end_date']
-            message = _formatar_resposta(result)
+            # 3. Executar consulta interna com company_id do token
+            result = _dispatch(intent_data, company_id)
         except Exception as e:
-            print(f'[CHATBOT] Erro ao formatar resposta: {e}')
-            message = 'Dados encontrados, mas houve um erro ao formatar a resposta.'
+            print(f'[CHATBOT] Erro ao executar consulta: {e}')
+            return jsonify({'error': 'Erro ao buscar os dados. Tente novamente.'}), 500
+
+        # 4. Formatar resposta em linguagem natural
+        if result.get('intent') in ('desconhecido', 'desconhecida'):
+            message = result.get('mensagem', 'Não entendi sua pergunta.')
+        else:
+            try:
+                # Mesclar start_date/end_date do intent no result para formatação
+                if intent_data.get('start_date') and 'start_date' not in result:
+                    result['start_date'] = intent_data['start_date']
+                if intent_data.get('end_date') and 'end_date' not in result:
+                    result['end_date'] = intent_data['end_date']
+                message = _formatar_resposta(result)
+            except Exception as e:
+                print(f'[CHATBOT] Erro ao formatar resposta: {e}')
+                message = 'Dados encontrados, mas houve um erro ao formatar a resposta.'
+        _guardar_resposta(answer_key, version, result, message)
 
     # 5. Identificar employee_id para link opcional de espelho
     employee_id_link = None
@@ -1312,7 +1209,9 @@ def chat_rh(payload):
         'message': message,
         'intent': result.get('intent'),
         'data': result,
-        'used_fallback': used_fallback,
+        'used_fallback': intent_source == 'fallback',
+        'intent_source': intent_source,
+        'cached': cached is not None,
         'employee_link': {
             'employee_id': employee_id_link,
             'employee_name': employee_name_link,
@@ -3,7 +3,7 @@ from datetime import datetime, timedelta, date
 from decimal import Decimal
 from zoneinfo import ZoneInfo
 from boto3.dynamodb.conditions import Key, Attr
-from utils.auth import verify_token
+from utils.auth import bearer_token_required
 from functools import wraps
 from utils.aws import dynamodb, generate_presigned_url, extract_s3_key_from_url
 from utils.schedule import get_schedule_for_date
@@ -64,30 +64,12 @@ daily_routes = Blueprint('daily_routes', __name__)
 
 # Decorator para autenticação
 def token_required(f):
+    """Autenticação comum (utils.auth); as rotas daqui leem o payload de request.user_data."""
     @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
-        
-        if auth_header:
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'error': 'Token inválido'}), 401
-        
-        if not token:
-            return jsonify({'error': 'Token não fornecido'}), 401
-        
-        try:
-            data = verify_token(token)
-            if not data:
-                return jsonify({'error': 'Token inválido ou expirado'}), 401
-            request.user_data = data
-        except Exception as e:
-            return jsonify({'error': 'Token inválido ou expirado'}), 401
-        
+    @bearer_token_required
+    def decorated(payload, *args, **kwargs):
+        request.user_data = payload
         return f(*args, **kwargs)
-    
     return decorated
 
 
@@ -5,7 +5,6 @@ Endpoints automáticos sem filtros manuais
 from flask import Blueprint, jsonify, request
 from datetime import datetime, date, timedelta
 from boto3.dynamodb.conditions import Key, Attr
-import boto3
 from utils.auth import verify_token
 from decimal import Decimal, InvalidOperation
 import calendar
@@ -14,14 +13,17 @@ from typing import Any, Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from utils.aws import tabela_configuracoes as table_config
+from utils.aws import generate_presigned_url, generate_presigned_urls
+from utils.photo_derivatives import photo_key_for
 from services.overtime import calculate_overtime
 from utils.schedule_settings import resolve_early_entry_overtime, resolve_interval_automatico
+from utils import aws_clients
 
 dashboard_routes = Blueprint('dashboard_routes', __name__)
 
 # Configuração AWS
 import os as _os
-dynamodb = boto3.resource('dynamodb', region_name=_os.getenv('AWS_REGION', 'us-east-1'))
+dynamodb = aws_clients.lazy_resource('dynamodb')
 table_employees       = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_EMPLOYEES',      'Employees'))
 table_records         = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_RECORDS',        'TimeRecords'))
 table_daily_summary   = dynamodb.Table(_os.getenv('DYNAMODB_TABLE_DAILY_SUMMARY',  'DailySummary'))
@@ -401,7 +403,13 @@ def _build_attendance_summary(
     summary: Dict[str, Any] = {
         'employee_id': employee_identifier,
         'name': employee.get('nome', 'Funcionário'),
-        'photo_url': employee.get('foto_url', ''),
+        # foto_s3_key é a fonte atual (foto_url não é mais persistido); a URL
+        # sai do cache de assinaturas, pré-aquecido em lote por quem chama.
+        # Miniatura 'sm' quando existir (avatar do dashboard).
+        'photo_url': (
+            generate_presigned_url(photo_key_for(employee, 'sm'), expiration_seconds=300)
+            if employee.get('foto_s3_key') else None
+        ) or employee.get('foto_url', ''),
         'present': False,
         'late': False,
         'arrival_dt': None,
@@ -558,6 +566,7 @@ def _compute_attendance(company_id: str, today: date) -> Tuple[List[Dict[str, An
     today_str = today.isoformat()
     company_settings = _get_company_settings(company_id)
     employees = _get_active_employees(company_id)
+    generate_presigned_urls([photo_key_for(e, 'sm') for e in employees], expiration_seconds=300)
 
     summaries: List[Dict[str, Any]] = []
     for employee in employees:
@@ -1158,6 +1167,7 @@ def get_dashboard_snapshot():
             month_futures  = list(pool.map(fetch_month,  employees))
 
         # Processar resultados de hoje
+        generate_presigned_urls([photo_key_for(e, 'sm') for e in employees], expiration_seconds=300)
         attendance_summaries = []
         for employee, resolved_id, records in today_futures:
             summary = _build_attendance_summary(
@@ -21,12 +21,12 @@ import pytz
 import os
 import uuid
 import tempfile
-from functools import wraps
 from werkzeug.utils import secure_filename
 from boto3.dynamodb.conditions import Key
 
-from utils.auth import verify_token
+from utils.auth import bearer_token_required as token_required
 from utils.aws import (
+    MATCH_STATUSES,
     reconhecer_funcionario,
     tabela_funcionarios,
     tabela_registros,
@@ -38,33 +38,16 @@ from utils.aws import (
     _resize_for_rekognition,
 )
 from utils.geolocation import validar_localizacao, formatar_distancia
+from utils.s3 import upload_photo_to_s3
+from utils.photo_derivatives import item_fields as foto_derivados, photo_key_for
+from services.facial_verification import enqueue_verification
+from services import company_stats
 
 routes_facial = Blueprint('routes_facial', __name__)
 
 TZ_SP = pytz.timezone('America/Sao_Paulo')
 
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return '', 200
-
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token não fornecido'}), 401
-
-        if token.startswith('Bearer '):
-            token = token[7:]
-
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido ou expirado'}), 401
-
-        return f(payload, *args, **kwargs)
-    return decorated
-
-
 def _log_tenant_mismatch(*, endpoint, expected, matched, extra=None):
     """Log estruturado para auditoria. NUNCA suprima estes logs."""
     print(
@@ -192,7 +175,16 @@ def reconhecer_rosto(payload):
                 'error': 'Funcionário não pertence a esta empresa'
             }), 403
 
-        if status not in ('OK', 'LOW_CONFIDENCE'):
+        if status == 'UNAVAILABLE':
+            # Rekognition com throttling/timeout ou circuito aberto: responde na
+            # hora para o kiosk cair no fluxo offline em vez de esperar.
+            return jsonify({
+                'reconhecido': False,
+                'indisponivel': True,
+                'error': 'Reconhecimento facial temporariamente indisponível'
+            }), 503
+
+        if status not in MATCH_STATUSES:
             return jsonify({
                 'reconhecido': False,
                 'error': f"Erro no reconhecimento: {match.get('reason', status)}"
@@ -252,7 +244,8 @@ def reconhecer_rosto(payload):
         cargo = funcionario.get('cargo') or funcionario.get('position') or ''
         # Foto CADASTRADA do funcionário (não a captura feita agora pro reconhecimento).
         # foto_s3_key é a fonte atual; foto_url/photo_url ficam como fallback legado.
-        foto_s3_key = funcionario.get('foto_s3_key')
+        # Tela de confirmação do kiosk: miniatura 'md' basta.
+        foto_s3_key = photo_key_for(funcionario, 'md')
         if foto_s3_key:
             foto_url = generate_presigned_url(foto_s3_key, expiration_seconds=300) or ''
         else:
@@ -485,6 +478,7 @@ def registrar_ponto_facial(payload):
             registro['synced_at'] = agora_servidor.isoformat()
 
         tabela_registros.put_item(Item=registro)
+        company_stats.record_written(token_company_id, registro)
         print(
             f"[FACIAL] Ponto gravado: company_id={token_company_id} key={composite_key} "
             f"tipo={tipo} source={'OFFLINE_SYNC' if is_offline else 'ONLINE'}"
@@ -593,13 +587,17 @@ def cadastrar_foto_funcionario(payload):
             }), 400
 
         foto_nome = f"funcionarios/{funcionario_id}.jpg"
-        foto_s3_key = enviar_s3(temp_path, foto_nome, token_company_id)
+        foto_s3_key = enviar_s3(temp_path, foto_nome, token_company_id, derivatives=True)
         foto_url = generate_presigned_url(foto_s3_key, expiration_seconds=300)
+        derivados = foto_derivados(foto_s3_key, temp_path)
 
         tabela_funcionarios.update_item(
             Key={'company_id': token_company_id, 'id': funcionario_id},
-            UpdateExpression='SET face_id = :fid, foto_s3_key = :fkey',
-            ExpressionAttributeValues={':fid': face_id, ':fkey': foto_s3_key},
+            UpdateExpression='SET face_id = :fid, foto_s3_key = :fkey, foto_s3_key_sm = :sm, foto_s3_key_md = :md',
+            ExpressionAttributeValues={
+                ':fid': face_id, ':fkey': foto_s3_key,
+                ':sm': derivados['foto_s3_key_sm'], ':md': derivados['foto_s3_key_md'],
+            },
         )
 
         print(f"[FACIAL] Foto auto-cadastrada: company_id={token_company_id} funcionario_id={funcionario_id}")
@@ -677,36 +675,43 @@ def registrar_ponto_funcionario(payload):
             )
             return jsonify({'success': False, 'error': 'Rosto não reconhecido. Tente novamente ou procure o RH.', 'motivo': 'rosto_nao_confere'}), 403
 
-        if status not in ('OK', 'LOW_CONFIDENCE'):
-            return jsonify({'success': False, 'error': f"Erro no reconhecimento: {match.get('reason', status)}"}), 500
-
-        matched_employee_id = match['employee_id']
-        matched_company_id = match['company_id']
+        # Modo degradado: Rekognition indisponível (throttling, timeout, circuito
+        # aberto). O ponto é aceito com a foto guardada e fica PENDING_VERIFICATION;
+        # services/facial_verification.py confirma a identidade depois e sinaliza
+        # divergências ao RH. Portaria 671/2021: não podemos impedir o registro.
+        pendente_verificacao = status == 'UNAVAILABLE'
 
-        # 2) Defesa #2: re-checar tenant.
-        if matched_company_id != token_company_id:
-            _log_tenant_mismatch(
-                endpoint='registrar_ponto_funcionario',
-                expected=token_company_id,
-                matched=matched_company_id,
-                extra={'where': 'post-helper-recheck'},
-            )
-            return jsonify({'success': False, 'error': 'Rosto não reconhecido. Tente novamente ou procure o RH.', 'motivo': 'rosto_nao_confere'}), 403
+        if not pendente_verificacao and status not in MATCH_STATUSES:
+            return jsonify({'success': False, 'error': f"Erro no reconhecimento: {match.get('reason', status)}"}), 500
 
-        # 3) Trava de identidade: o rosto reconhecido TEM que ser o do funcionário logado.
-        #    Não é uma restrição de local — é prova de identidade, equivalente à senha.
-        if matched_employee_id != funcionario_id:
-            _log_tenant_mismatch(
-                endpoint='registrar_ponto_funcionario',
-                expected=funcionario_id,
-                matched=matched_employee_id,
-                extra={'where': 'identity-lock', 'company_id': token_company_id},
-            )
-            return jsonify({
-                'success': False,
-                'error': 'O rosto não confere com o seu cadastro.',
-                'motivo': 'rosto_nao_confere',
-            }), 403
+        if not pendente_verificacao:
+            matched_employee_id = match['employee_id']
+            matched_company_id = match['company_id']
+
+            # 2) Defesa #2: re-checar tenant.
+            if matched_company_id != token_company_id:
+                _log_tenant_mismatch(
+                    endpoint='registrar_ponto_funcionario',
+                    expected=token_company_id,
+                    matched=matched_company_id,
+                    extra={'where': 'post-helper-recheck'},
+                )
+                return jsonify({'success': False, 'error': 'Rosto não reconhecido. Tente novamente ou procure o RH.', 'motivo': 'rosto_nao_confere'}), 403
+
+            # 3) Trava de identidade: o rosto reconhecido TEM que ser o do funcionário logado.
+            #    Não é uma restrição de local — é prova de identidade, equivalente à senha.
+            if matched_employee_id != funcionario_id:
+                _log_tenant_mismatch(
+                    endpoint='registrar_ponto_funcionario',
+                    expected=funcionario_id,
+                    matched=matched_employee_id,
+                    extra={'where': 'identity-lock', 'company_id': token_company_id},
+                )
+                return jsonify({
+                    'success': False,
+                    'error': 'O rosto não confere com o seu cadastro.',
+                    'motivo': 'rosto_nao_confere',
+                }), 403
 
         funcionario = _buscar_funcionario_tenant_safe(token_company_id, funcionario_id)
         if not funcionario:
@@ -823,13 +828,37 @@ def registrar_ponto_funcionario(payload):
             registro['fora_do_raio'] = fora_do_raio
         if distance_from_company is not None:
             registro['distance_from_company'] = distance_from_company
+        if pendente_verificacao:
+            registro['verification_status'] = 'PENDING_VERIFICATION'
+            try:
+                with open(temp_path, 'rb') as _f:
+                    _foto_bytes = _f.read()
+                registro['foto_s3_key'], _ = upload_photo_to_s3(
+                    _foto_bytes, token_company_id, funcionario_id, agora_registro,
+                )
+                registro.update(foto_derivados(registro['foto_s3_key'], _foto_bytes))
+            except Exception as e_s3:
+                # Registro vai sem foto_s3_key: o job de verificação envia a cópia
+                # do spool e grava a key antes de apagá-la.
+                print(f"[FACIAL] Aviso: foto do ponto pendente não enviada ao S3: {e_s3}")
 
         tabela_registros.put_item(Item=registro)
+        company_stats.record_written(token_company_id, registro)
         print(
             f"[FACIAL] Ponto (facial+gps) gravado: company_id={token_company_id} key={composite_key} "
             f"tipo={tipo} fora_do_raio={fora_do_raio} gps_status={gps_status}"
+            f"{' verificacao=PENDENTE' if pendente_verificacao else ''}"
         )
 
+        if pendente_verificacao:
+            try:
+                enqueue_verification(
+                    token_company_id, composite_key, funcionario_id, temp_path,
+                    foto_s3_key=registro.get('foto_s3_key'),
+                )
+            except Exception as e_q:
+                print(f"[FACIAL] ERRO ao enfileirar verificação de {composite_key}: {e_q}")
+
         # Resposta ao funcionário: NUNCA inclui status de raio (definição de produto —
         # ver painel administrativo para isso).
         return jsonify({
@@ -838,6 +867,7 @@ def registrar_ponto_funcionario(payload):
             'tipo_label': tipo_label,
             'timestamp': timestamp_iso,
             'mensagem': f'Ponto de {tipo_label} registrado com sucesso!',
+            'pendente_verificacao': pendente_verificacao,
         }), 200
 
     except Exception as e:
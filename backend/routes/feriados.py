@@ -4,30 +4,11 @@ Chave: company_id  |  campo: feriados_<ano>_<uf>
 """
 from flask import Blueprint, request, jsonify
 from utils.aws import tabela_configuracoes
-from utils.auth import verify_token
-from functools import wraps
+from utils.auth import current_payload
 import json
 
 feriados_routes = Blueprint('feriados_routes', __name__)
 
-# ── Auth decorator (igual ao padrão dos outros routes) ────────────────────────
-
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            parts = request.headers['Authorization'].split()
-            if len(parts) == 2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-        if not token:
-            return jsonify({'error': 'Token ausente'}), 401
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido'}), 401
-        return f(payload, *args, **kwargs)
-    return decorated
-
 # ── Helper ────────────────────────────────────────────────────────────────────
 
 def _feriados_key(ano: str, uf: str) -> str:
@@ -41,11 +22,6 @@ def get_feriados():
         return jsonify({}), 200
 
     try:
-        token = None
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-
         ano = request.args.get('ano', '')
         uf  = request.args.get('uf', '')
 
@@ -54,10 +30,9 @@ def get_feriados():
 
         # Tenta obter company_id do token; se não tiver, usa chave genérica
         company_id = 'global'
-        if token:
-            payload = verify_token(token)
-            if payload:
-                company_id = payload.get('company_id') or payload.get('sub') or 'global'
+        payload = current_payload(allow_cookie=False)
+        if payload:
+            company_id = payload.get('company_id') or payload.get('sub') or 'global'
 
         try:
             resp = tabela_configuracoes.get_item(Key={'company_id': company_id})
@@ -107,12 +82,9 @@ def salvar_localizacao():
         cidade = data.get('cidade', '')
 
         company_id = 'global'
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            payload = verify_token(token)
-            if payload:
-                company_id = payload.get('company_id') or 'global'
+        payload = current_payload(allow_cookie=False)
+        if payload:
+            company_id = payload.get('company_id') or 'global'
 
         if not uf:
             return jsonify({'error': 'uf obrigatório'}), 400
@@ -153,12 +125,9 @@ def salvar_feriados():
 
         # Obtém company_id do token
         company_id = 'global'
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            payload = verify_token(token)
-            if payload:
-                company_id = payload.get('company_id') or payload.get('sub') or 'global'
+        payload = current_payload(allow_cookie=False)
+        if payload:
+            company_id = payload.get('company_id') or payload.get('sub') or 'global'
 
         campo = _feriados_key(ano, uf)
 
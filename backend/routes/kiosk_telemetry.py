@@ -1,34 +1,50 @@
 """
 Telemetria do kiosk: logs remotos e heartbeat de tablets.
 
-POST /api/kiosk/logs                    — recebe batch de eventos do kioskLogger
+POST /api/kiosk/logs                    — recebe batch de eventos do kioskLogger (202, gravação em lote)
 POST /api/kiosk/heartbeat               — estado do tablet (versão, uptime, bateria, fila)
 GET  /api/kiosk/heartbeats              — lista heartbeats da empresa autenticada
 
 GET  /api/admin/kiosk/logs              — admin: todos os logs (filtrável por empresa/evento/data)
 GET  /api/admin/kiosk/heartbeats        — admin: todos os heartbeats de todas as empresas
+GET  /api/admin/kiosk/fleet-summary     — admin: tablets online/offline, global e por empresa
+GET  /api/admin/kiosk/rollups           — admin: contadores de saúde por empresa/tablet (5m, 1d)
 """
 from flask import Blueprint, request, jsonify
-import boto3
 import os
 import time
 import jwt as pyjwt
 from datetime import datetime, timezone
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from functools import wraps
 
-from utils.auth import verify_token
+from utils import aws_clients
+from utils.auth import bearer_token_required as _token_required
+from services.batch_buffer import BatchWriteBuffer
+from services.kiosk_telemetry import (
+    HeartbeatCoalescer,
+    RollupAggregator,
+    fleet_devices,
+    fleet_summary,
+    load_fleet,
+    log_index_fields,
+    query_logs,
+    query_rollups,
+    update_fleet,
+)
 
 _JWT_SECRET = os.getenv('JWT_SECRET_KEY', '')
 _JWT_ALGORITHM = 'HS256'
 
-# Cache em memória do flag force_update (evita GetItem no DynamoDB em cada heartbeat)
-_force_update_cache: dict = {'value': False, 'expires': 0}
+# Cache em memória do flag force_update (evita GetItem no DynamoDB em cada heartbeat).
+# Tupla (valor, expira_em) trocada inteira: threads concorrentes leem sempre um
+# par consistente, sem lock.
+_force_update_cache: tuple[bool, float] = (False, 0.0)
 
 kiosk_telemetry_routes = Blueprint('kiosk_telemetry_routes', __name__)
 
-dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+dynamodb = aws_clients.lazy_resource('dynamodb')
 _table_name = os.getenv('DYNAMODB_TABLE_KIOSK_TELEMETRY', 'KioskTelemetry')
 
 
@@ -36,18 +52,35 @@ def _get_table():
     return dynamodb.Table(_table_name)
 
 
+# Logs do kiosk são gravados em lote por uma thread por worker (ver
+# services/batch_buffer.py) — a requisição não espera o DynamoDB.
+_log_buffer = BatchWriteBuffer(
+    'kiosk-logs', _get_table, key_attrs=['pk', 'sk'],
+    max_items=int(os.getenv('KIOSK_LOG_BUFFER_MAX', '20000')),
+)
+
+# Último heartbeat gravado por tablet, por worker — evita um put_item por
+# heartbeat quando nada relevante mudou.
+_heartbeats = HeartbeatCoalescer()
+
+# Contadores de saúde (eventos por tipo, erros, fila, bateria) em buckets de
+# 5 min e diários — somados em memória e gravados com ADD a cada minuto.
+_rollups = RollupAggregator()
+
+
 def _check_force_update() -> bool:
     """Lê o flag force_update do DynamoDB com cache de 60s por worker."""
     global _force_update_cache
-    if time.time() < _force_update_cache['expires']:
-        return _force_update_cache['value']
+    value, expires = _force_update_cache
+    if time.time() < expires:
+        return value
     try:
         resp = _get_table().get_item(Key={'pk': 'CONTROL#update', 'sk': 'flag'})
         item = resp.get('Item', {})
         active = bool(item.get('active', False))
     except Exception:
         active = False
-    _force_update_cache = {'value': active, 'expires': time.time() + 60}
+    _force_update_cache = (active, time.time() + 60)
     return active
 
 
@@ -76,74 +109,71 @@ def _admin_required(f):
     return decorated
 
 
-def _token_required(f):
-    from functools import wraps
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return ('', 200)
-        auth = request.headers.get('Authorization', '')
-        if not auth.startswith('Bearer '):
-            return jsonify({'error': 'Token ausente'}), 401
-        payload = verify_token(auth[7:])
-        if not payload:
-            return jsonify({'error': 'Token inválido ou expirado'}), 401
-        return f(payload, *args, **kwargs)
-    return decorated
-
-
 # ─── POST /api/kiosk/logs ────────────────────────────────────────────────────
 
 @kiosk_telemetry_routes.route('/api/kiosk/logs', methods=['POST'])
 @_token_required
 def receive_logs(payload):
+    """Valida o batch e devolve 202 na hora — a gravação é feita em lote pelo
+    _log_buffer (25 itens por BatchWriteItem, juntando todos os tablets)."""
     company_id = payload.get('company_id') or ''
     if not company_id:
         return jsonify({'error': 'company_id ausente no token'}), 403
 
     data = request.get_json(silent=True) or {}
     entries = data.get('entries', [])
-    device_id = data.get('device_id', 'unknown')
-    version = data.get('version', 'unknown')
+    device_id = str(data.get('device_id', 'unknown'))[:64]
+    version = str(data.get('version', 'unknown'))[:32]
 
     if not isinstance(entries, list) or len(entries) == 0:
-        return jsonify({'ok': True, 'stored': 0}), 200
+        return jsonify({'ok': True, 'accepted': 0}), 200
 
     # Limitar a 500 entradas por batch para evitar abuso
     entries = entries[:500]
 
-    table = _get_table()
     now_iso = datetime.now(timezone.utc).isoformat()
-    stored = 0
+    ttl = int(time.time()) + 30 * 24 * 3600  # 30 dias
+    items = []
 
     for entry in entries:
         if not isinstance(entry, dict):
             continue
         event = str(entry.get('event', ''))[:64]
         detail = str(entry.get('detail', ''))[:512] if entry.get('detail') else None
-        ts = int(entry.get('ts', 0))
+        try:
+            ts = int(entry.get('ts', 0))
+        except (TypeError, ValueError):
+            continue
         if not event:
             continue
-        try:
-            item = {
-                'pk': f"LOG#{company_id}#{device_id}",
-                'sk': f"{ts}#{event}",
-                'company_id': company_id,
-                'device_id': device_id,
-                'version': version,
-                'event': event,
-                'ts': ts,
-                'received_at': now_iso,
-                'ttl': int(time.time()) + 30 * 24 * 3600,  # 30 dias
-            }
-            if detail:
-                item['detail'] = detail
-            table.put_item(Item=item)
-            stored += 1
-        except Exception:
-            pass
-
-    return jsonify({'ok': True, 'stored': stored}), 200
+        item = {
+            'pk': f"LOG#{company_id}#{device_id}",
+            'sk': f"{ts}#{event}",
+            'company_id': company_id,
+            'device_id': device_id,
+            'version': version,
+            'event': event,
+            'ts': ts,
+            'received_at': now_iso,
+            'ttl': ttl,
+            **log_index_fields(company_id, event, ts),
+        }
+        if detail:
+            item['detail'] = detail
+        items.append(item)
+
+    if not _log_buffer.offer(items):
+        # Buffer cheio (DynamoDB lento/fora): o tablet só avança o cursor de
+        # envio com resposta 2xx, então reenvia este batch no próximo ciclo.
+        resp = jsonify({'ok': False, 'error': 'ingestão sobrecarregada, tente novamente'})
+        resp.headers['Retry-After'] = '60'
+        return resp, 503
+
+    _rollups.start(_get_table)
+    for item in items:
+        _rollups.add_log(company_id, device_id, item['event'], item['ts'])
+
+    return jsonify({'ok': True, 'accepted': len(items)}), 202
 
 
 # ─── POST /api/kiosk/heartbeat ───────────────────────────────────────────────
@@ -165,33 +195,45 @@ def receive_heartbeat(payload):
     last_sync = data.get('last_sync')      # ISO string ou None
 
     now_iso = datetime.now(timezone.utc).isoformat()
-
-    try:
-        item = {
-            'pk': f"HEARTBEAT#{company_id}",
-            'sk': device_id,
-            'company_id': company_id,
-            'device_id': device_id,
-            'version': version,
-            'uptime': uptime,
-            'wifi': wifi,
-            'queue_size': queue_size,
-            'last_seen': now_iso,
-            'ttl': int(time.time()) + 7 * 24 * 3600,  # 7 dias
-        }
-        if battery is not None:
-            item['battery'] = int(battery)
-        if last_sync:
-            item['last_sync'] = str(last_sync)[:64]
-
-        _get_table().put_item(Item=item)
-    except ClientError as e:
-        if _table_missing(e):
-            return jsonify({'ok': True, 'warn': 'tabela não criada ainda'}), 200
-        return jsonify({'ok': False, 'error': str(e)}), 200
-    except Exception as e:
-        # Falha silenciosa — telemetria não deve derrubar o kiosk
-        return jsonify({'ok': False, 'error': str(e)}), 200
+    state = {
+        'version': version,
+        'uptime': uptime,
+        'wifi': wifi,
+        'queue_size': queue_size,
+        'last_seen': now_iso,
+    }
+    if battery is not None:
+        state['battery'] = int(battery)
+    if last_sync:
+        state['last_sync'] = str(last_sync)[:64]
+
+    _rollups.start(_get_table)
+    _rollups.add_heartbeat(company_id, device_id, state)
+
+    # Heartbeat igual ao anterior e recente → não grava (ver
+    # services/kiosk_telemetry.py::HeartbeatCoalescer). O force_update
+    # continua sendo devolvido normalmente.
+    if _heartbeats.should_write(company_id, device_id, state):
+        try:
+            table = _get_table()
+            table.put_item(Item={
+                'pk': f"HEARTBEAT#{company_id}",
+                'sk': device_id,
+                'company_id': company_id,
+                'device_id': device_id,
+                **state,
+                'ttl': int(time.time()) + 7 * 24 * 3600,  # 7 dias
+            })
+            update_fleet(table, company_id, device_id, state)
+        except ClientError as e:
+            _heartbeats.forget(company_id, device_id)
+            if _table_missing(e):
+                return jsonify({'ok': True, 'warn': 'tabela não criada ainda'}), 200
+            return jsonify({'ok': False, 'error': str(e)}), 200
+        except Exception as e:
+            _heartbeats.forget(company_id, device_id)
+            # Falha silenciosa — telemetria não deve derrubar o kiosk
+            return jsonify({'ok': False, 'error': str(e)}), 200
 
     force_update = _check_force_update()
     return jsonify({'ok': True, 'force_update': force_update}), 200
@@ -244,47 +286,18 @@ def admin_list_logs():
     end_ts   = int(request.args.get('end_ts', now_ms))
 
     try:
-        # Scan com FilterExpression, paginado.
-        # IMPORTANTE: `Limit` no scan() do DynamoDB limita quantos itens são LIDOS
-        # antes do FilterExpression ser aplicado, não quantos resultados filtrados
-        # voltam. Com a tabela misturando LOG#/HEARTBEAT#/CONTROL# de todas as
-        # empresas (~30k itens e crescendo), um scan de página única com Limit=2000
-        # praticamente nunca inclui itens recentes — por isso a visão padrão (24h)
-        # sempre vinha vazia. Aqui paginamos de fato via ExclusiveStartKey até achar
-        # itens suficientes ou esgotar um teto de páginas (custo previsível).
-        filter_parts = [
-            Attr('ts').between(start_ts, end_ts),
-        ]
-        if company_filter:
-            filter_parts.append(Attr('company_id').eq(company_filter))
-        if event_filter:
-            filter_parts.append(Attr('event').eq(event_filter))
-
-        # Combina todos os filtros com AND
-        fe = filter_parts[0]
-        for part in filter_parts[1:]:
-            fe = fe & part
-
-        MAX_SCAN_PAGES = 40  # teto de custo: ~40 páginas de até 1MB cada
-        table = _get_table()
-        items: list = []
-        scan_kwargs = {'FilterExpression': fe}
-        for _ in range(MAX_SCAN_PAGES):
-            resp = table.scan(**scan_kwargs)
-            items.extend(resp.get('Items', []))
-            last_key = resp.get('LastEvaluatedKey')
-            if not last_key or len(items) >= limit:
-                break
-            scan_kwargs['ExclusiveStartKey'] = last_key
-
-        # Ordenar por ts desc e limitar
-        items.sort(key=lambda x: x.get('ts', 0), reverse=True)
-        items = items[:limit]
+        # Query nos índices por hora (services/kiosk_telemetry.py) — lê só os
+        # buckets da janela pedida, do mais recente para o mais antigo. Antes
+        # era um scan de até 40 páginas da tabela inteira com filtro em ts,
+        # que deixava a visão padrão (24h) vazia quando a tabela cresceu.
+        items = query_logs(
+            _get_table(), start_ts, end_ts,
+            company_id=company_filter, event=event_filter, limit=limit,
+        )
 
         for item in items:
-            item.pop('pk', None)
-            item.pop('sk', None)
-            item.pop('ttl', None)
+            for attr in ('pk', 'sk', 'ttl', 'log_bucket', 'company_event'):
+                item.pop(attr, None)
             # DynamoDB devolve números como Decimal, e o jsonify do Flask
             # serializa Decimal como STRING (não como number) — o front
             # (new Date(ts)) precisa de um number de verdade.
@@ -310,35 +323,9 @@ def admin_list_heartbeats():
     company_filter = request.args.get('company_id', '').strip()
 
     try:
-        table = _get_table()
-        if company_filter:
-            resp = table.query(
-                KeyConditionExpression=Key('pk').eq(f"HEARTBEAT#{company_filter}"),
-            )
-            items = resp.get('Items', [])
-        else:
-            # Paginado: uma única página de scan() pode não cobrir os ~1MB da
-            # tabela inteira, e os itens HEARTBEAT# somem no meio de milhares
-            # de itens LOG# se pararmos na primeira página.
-            MAX_SCAN_PAGES = 40
-            items = []
-            scan_kwargs = {'FilterExpression': Attr('pk').begins_with('HEARTBEAT#')}
-            for _ in range(MAX_SCAN_PAGES):
-                resp = table.scan(**scan_kwargs)
-                items.extend(resp.get('Items', []))
-                last_key = resp.get('LastEvaluatedKey')
-                if not last_key:
-                    break
-                scan_kwargs['ExclusiveStartKey'] = last_key
-
-        # Ordenar por last_seen desc
-        items.sort(key=lambda x: x.get('last_seen', ''), reverse=True)
-
-        for item in items:
-            item.pop('pk', None)
-            item.pop('sk', None)
-            item.pop('ttl', None)
-
+        # Visão da frota materializada (pk=FLEET): uma query para todas as
+        # empresas, um get_item para uma — sem scan na tabela de logs.
+        items = fleet_devices(load_fleet(_get_table(), company_filter))
         return jsonify({'heartbeats': items, 'total': len(items)}), 200
     except ClientError as e:
         if _table_missing(e):
@@ -348,6 +335,56 @@ def admin_list_heartbeats():
         return jsonify({'error': str(e)}), 500
 
 
+# ─── ADMIN: GET /api/admin/kiosk/fleet-summary ───────────────────────────────
+# Tablets online/offline no total e por empresa (empresas com mais tablets
+# offline primeiro). `online` = heartbeat nos últimos online_window_s segundos.
+
+@kiosk_telemetry_routes.route('/api/admin/kiosk/fleet-summary', methods=['GET'])
+@_admin_required
+def admin_fleet_summary():
+    try:
+        return jsonify(fleet_summary(fleet_devices(load_fleet(_get_table())))), 200
+    except ClientError as e:
+        if _table_missing(e):
+            return jsonify({'total': 0, 'online': 0, 'offline': 0, 'companies': []}), 200
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ─── ADMIN: GET /api/admin/kiosk/rollups ─────────────────────────────────────
+# Query params:
+#   granularity — 5m (padrão) ou 1d
+#   company_id  — sem ele: uma linha por empresa; com ele: totais da empresa
+#   device_id   — com company_id: um tablet, ou '*' para todos os tablets
+#   start_ts / end_ts — Unix ms (padrão: últimas 24h para 5m, 30 dias para 1d)
+
+@kiosk_telemetry_routes.route('/api/admin/kiosk/rollups', methods=['GET'])
+@_admin_required
+def admin_list_rollups():
+    granularity = request.args.get('granularity', '5m').strip()
+    company_filter = request.args.get('company_id', '').strip()
+    device_filter = request.args.get('device_id', '').strip()
+    default_window_ms = (30 * 24 if granularity == '1d' else 24) * 3600 * 1000
+    try:
+        now_ms = int(time.time() * 1000)
+        end_ts = int(request.args.get('end_ts', now_ms))
+        start_ts = int(request.args.get('start_ts', end_ts - default_window_ms))
+        rollups = query_rollups(
+            _get_table(), granularity, start_ts / 1000, end_ts / 1000,
+            company_id=company_filter, device_id=device_filter,
+        )
+        return jsonify({'rollups': rollups, 'total': len(rollups), 'granularity': granularity}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        if _table_missing(e):
+            return jsonify({'rollups': [], 'total': 0}), 200
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ─── ADMIN: POST /api/admin/kiosk/force-update ───────────────────────────────
 # Ativa o flag force_update que será retornado no próximo heartbeat de cada tablet.
 # O tablet receberá o flag e chamará registration.update() no SW — sem recarregar
@@ -370,7 +407,7 @@ def admin_force_update():
                 'set_at': datetime.now(timezone.utc).isoformat(),
                 'ttl': int(time.time()) + 2 * 3600,
             })
-            _force_update_cache = {'value': True, 'expires': time.time() + 60}
+            _force_update_cache = (True, time.time() + 60)
         except ClientError as e:
             return jsonify({'error': str(e)}), 500
         return jsonify({'ok': True, 'message': 'Flag ativado — tablets atualizam no próximo heartbeat (≤5 min)'}), 200
@@ -378,7 +415,7 @@ def admin_force_update():
     # DELETE
     try:
         _get_table().delete_item(Key={'pk': 'CONTROL#update', 'sk': 'flag'})
-        _force_update_cache = {'value': False, 'expires': time.time() + 60}
+        _force_update_cache = (False, time.time() + 60)
     except ClientError:
         pass
     return jsonify({'ok': True}), 200
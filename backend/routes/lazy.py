@@ -0,0 +1,99 @@
+"""
+Blueprints carregados sob demanda.
+
+Rotas raras (chatbot de RH, métricas AWS do portal admin, auditoria) ficam
+fora do import do app: no Lambda o import de todos os blueprints é pago a cada
+cold start e no Gunicorn a cada reload — o chatbot sozinho puxava `requests`.
+
+Para cada módulo de LAZY_ROUTES o app registra um Blueprint "casca" com o
+mesmo nome, as mesmas URLs/métodos e os mesmos endpoints (url_for continua
+igual). A view de cada regra é um LazyView: na primeira chamada importa o
+módulo real, registra o blueprint num Flask auxiliar e passa a delegar para a
+view registrada ali (com todos os decorators).
+
+Limites:
+    - hooks de blueprint (before_request, errorhandler...) não rodam — um
+      blueprint que use hooks fica no registro normal do app.py
+    - LAZY_ROUTES precisa repetir as regras do blueprint real;
+      tests/test_lazy_routes.py compara as duas listas
+
+LAZY_BLUEPRINTS=0 importa e registra os blueprints reais na subida.
+"""
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+
+from flask import Blueprint, Flask
+
+# módulo → (blueprint, [(regra, view, métodos)])
+LAZY_ROUTES: dict[str, tuple[str, list[tuple[str, str, list[str]]]]] = {
+    'routes.chatbot_rh': ('chatbot_rh_routes', [
+        ('/api/chat/rh', 'chat_rh', ['POST', 'OPTIONS']),
+    ]),
+    'routes.admin_aws': ('admin_aws_routes', [
+        ('/api/admin/aws/metrics', 'get_aws_metrics', ['GET', 'OPTIONS']),
+        ('/api/admin/aws/costs', 'get_aws_costs', ['GET', 'OPTIONS']),
+        ('/api/admin/aws/company/<company_id>/usage', 'get_company_aws_usage', ['GET', 'OPTIONS']),
+    ]),
+    'routes.audit': ('audit_routes', [
+        ('/api/audit', 'get_audit_logs', ['GET', 'OPTIONS']),
+    ]),
+}
+
+_lock = threading.Lock()
+_views: dict[str, dict] = {}
+
+
+def real_views(module: str) -> dict:
+    """view_functions do blueprint real (importa o módulo na primeira vez)."""
+    views = _views.get(module)
+    if views is None:
+        with _lock:
+            views = _views.get(module)
+            if views is None:
+                blueprint = getattr(importlib.import_module(module), LAZY_ROUTES[module][0])
+                scratch = Flask(module)
+                scratch.register_blueprint(blueprint)
+                views = _views[module] = dict(scratch.view_functions)
+                print(f"[LAZY] {module} carregado")
+    return views
+
+
+class LazyView:
+    def __init__(self, module: str, endpoint: str):
+        self.module = module
+        self.endpoint = endpoint
+        self.__name__ = endpoint.rsplit('.', 1)[-1]
+        self._view = None
+
+    def __call__(self, **kwargs):
+        view = self._view
+        if view is None:
+            view = self._view = real_views(self.module)[self.endpoint]
+        return view(**kwargs)
+
+
+def placeholder(module: str) -> Blueprint:
+    name, rules = LAZY_ROUTES[module]
+    blueprint = Blueprint(name, module)
+    for rule, view, methods in rules:
+        blueprint.add_url_rule(rule, view, LazyView(module, f'{name}.{view}'), methods=methods)
+    return blueprint
+
+
+def warm() -> None:
+    """Importa todos os módulos sob demanda (preload do Gunicorn, antes do fork)."""
+    for module in LAZY_ROUTES:
+        real_views(module)
+
+
+def register(app: Flask) -> None:
+    """Registra os blueprints de LAZY_ROUTES (casca ou reais, conforme LAZY_BLUEPRINTS)."""
+    eager = os.getenv('LAZY_BLUEPRINTS', '1') == '0'
+    for module, (name, _) in LAZY_ROUTES.items():
+        if eager:
+            app.register_blueprint(getattr(importlib.import_module(module), name))
+        else:
+            app.register_blueprint(placeholder(module))
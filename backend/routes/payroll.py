@@ -9,17 +9,17 @@ from decimal import Decimal, ROUND_HALF_UP
 from typing import Any, Dict, List, Optional
 from boto3.dynamodb.conditions import Key, Attr
 from concurrent.futures import ThreadPoolExecutor
-import boto3
 import calendar
 import os
 
 from utils.auth import verify_token
 from services.payroll_engine import compute_worked_data
 from services.payroll_rules import calcular_prefolha
+from utils import aws_clients
 
 payroll_routes = Blueprint('payroll_routes', __name__)
 
-dynamodb             = boto3.resource('dynamodb', region_name='us-east-1')
+dynamodb             = aws_clients.lazy_resource('dynamodb')
 table_employees      = dynamodb.Table('Employees')
 table_payroll_config = dynamodb.Table('PayrollConfig')
 table_competencia    = dynamodb.Table('PayrollCompetencia')
@@ -10,7 +10,6 @@ POST   /api/users/<user_id>/toggle-active   — ativar/desativar (editar_usuario
 """
 from __future__ import annotations
 from flask import Blueprint, request, jsonify
-import boto3
 import os
 import bcrypt
 import decimal
@@ -22,6 +21,7 @@ from boto3.dynamodb.conditions import Key
 from utils.auth import token_required, require_permission
 from services.permissions import ALLOWED_ROLES_FOR_NEW, ALL_PERMISSIONS, calculate_permissions
 from services.audit_service import log_event
+from utils import aws_clients
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +40,7 @@ def _to_json_safe(obj):
 
 users_routes = Blueprint('users_routes', __name__)
 
-_dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+_dynamodb = aws_clients.lazy_resource('dynamodb')
 _table_users = _dynamodb.Table(os.environ.get('DYNAMODB_TABLE_USERS', 'UserCompany'))
 
 
@@ -2,13 +2,12 @@
 ROTAS V2 - Nova Arquitetura com DailySummary e MonthlySummary
 Endpoints modernos para registro de ponto e dashboards
 """
-from flask import Blueprint, request, jsonify
-from datetime import datetime, date, timedelta
+from flask import Blueprint, request, jsonify, make_response
+from datetime import datetime, date, timedelta, timezone
 from decimal import Decimal
 import boto3
 from boto3.dynamodb.conditions import Key
-from utils.auth import verify_token
-from functools import wraps
+from utils.auth import bearer_token_required as token_required_v2
 from models import DailySummary, MonthlySummary, TimeRecord
 from services.summary import (
     calculate_daily_summary,
@@ -19,11 +18,14 @@ from services.summary import (
     rebuild_monthly_summary
 )
 from utils.s3 import upload_photo_to_s3, generate_s3_key, get_photo_url
+from utils.photo_derivatives import item_fields as foto_derivados
 from utils.aws import (
     tabela_funcionarios as table_employees,
     tabela_registros as table_records,
     dynamodb
 )
+from services import company_stats, face_embeddings
+import gzip
 import uuid
 import json
 
@@ -35,28 +37,6 @@ routes_v2 = Blueprint('routes_v2', __name__, url_prefix='/api/v2')
 table_daily = dynamodb.Table('DailySummary')
 table_monthly = dynamodb.Table('MonthlySummary')
 
-def token_required_v2(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return ('', 200)
-        
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'error': 'Token ausente'}), 401
-        
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido'}), 401
-        
-        return f(payload, *args, **kwargs)
-    return decorated
-
 @routes_v2.route('/health', methods=['GET'])
 def health():
     """Health check"""
@@ -143,12 +123,14 @@ def registrar_ponto_v2(payload):
             'longitude': longitude,
             'work_mode_at_time': work_mode,
             'foto_s3_key': foto_s3_key,
+            **(foto_derivados(foto_s3_key, foto_bytes) if foto_s3_key else {}),
             'foto_url': foto_url,
             'valid_location': True,  # TODO: validar localização
             'created_at': agora.isoformat()
         }
         
         table_records.put_item(Item=registro)
+        company_stats.record_written(company_id, registro)
         
         # Atualizar DailySummary
         target_date = agora.date()
@@ -581,3 +563,124 @@ def get_records_by_date(payload, employee_id, date_str):
     except Exception as e:
         print(f"[ERRO] Get records: {e}")
         return jsonify({'error': str(e)}), 500
+
+
+# ─── Embeddings faciais (reconhecimento on-device) ────────────────────────────
+# Consumido por mobile/src/features/facial/embeddingPullService.ts.
+# `since` é o `server_now` da resposta anterior. Ele fica alguns segundos atrás
+# do relógio real porque o GSI por updated_at é eventualmente consistente: um
+# item gravado no último instante pode ainda não estar visível. Reenviar um
+# item no pull seguinte é inofensivo, porque o cliente faz upsert.
+_EMBEDDINGS_CURSOR_MARGIN = timedelta(seconds=5)
+_EMBEDDINGS_GZIP_MIN_BYTES = 1024
+
+
+@routes_v2.route('/face_embeddings', methods=['GET', 'OPTIONS'])
+@token_required_v2
+def list_face_embeddings(payload):
+    """
+    Pull (completo ou incremental) de embeddings da empresa do token.
+    Query params:
+        - since / updated_since: ISO do último pull (opcional; ausente = snapshot completo)
+        - model_version: versão do modelo (padrão: FACE_EMBEDDING_MODEL_VERSION)
+        - format: json (padrão) | f16 | f32 — f16/f32 devolvem o payload binário RPFE
+    """
+    try:
+        company_id = payload.get('company_id')
+        if not company_id:
+            return jsonify({'error': 'company_id ausente no token'}), 403
+
+        since = (request.args.get('since') or request.args.get('updated_since') or '').strip()
+        model_version = (request.args.get('model_version') or face_embeddings.DEFAULT_MODEL_VERSION).strip()
+        fmt = (request.args.get('format') or '').strip().lower()
+        if not fmt and 'application/octet-stream' in (request.headers.get('Accept') or ''):
+            fmt = 'f16'
+        fmt = fmt or 'json'
+        if fmt != 'json':
+            try:
+                dtype = face_embeddings.parse_dtype(fmt)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        server_now = (datetime.now(timezone.utc) - _EMBEDDINGS_CURSOR_MARGIN).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        items = face_embeddings.list_embeddings(company_id, model_version, since or None)
+
+        etag = face_embeddings.compute_etag(company_id, model_version, since, fmt, items)
+        if etag in (request.headers.get('If-None-Match') or ''):
+            resp = make_response('', 304)
+            resp.headers['ETag'] = etag
+            return resp
+
+        if fmt == 'json':
+            resp = jsonify({
+                'items': [
+                    {
+                        'employee_id': it['employee_id'],
+                        'embedding': it.get('embedding', []),
+                        'model_version': it['model_version'] or model_version,
+                        'updated_at': it['updated_at'],
+                        **({'deleted': True} if it['deleted'] else {}),
+                    }
+                    for it in items
+                ],
+                'server_now': server_now,
+                'model_version': model_version,
+            })
+        else:
+            body = face_embeddings.pack_embeddings(items, dtype)
+            resp = make_response(body, 200)
+            resp.headers['Content-Type'] = 'application/octet-stream'
+            if len(body) >= _EMBEDDINGS_GZIP_MIN_BYTES and 'gzip' in (request.headers.get('Accept-Encoding') or ''):
+                resp.set_data(gzip.compress(body, compresslevel=6))
+                resp.headers['Content-Encoding'] = 'gzip'
+            resp.headers['X-Server-Now'] = server_now
+            resp.headers['X-Model-Version'] = model_version
+
+        resp.headers['ETag'] = etag
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        resp.headers['Vary'] = 'Authorization, Accept, Accept-Encoding'
+        return resp
+
+    except Exception as e:
+        print(f"[ERRO] List face embeddings: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@routes_v2.route('/face_embeddings/<employee_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
+@token_required_v2
+def upsert_face_embedding(payload, employee_id):
+    """
+    Grava (PUT) ou invalida (DELETE) o embedding de um funcionário.
+    PUT body: { "embedding": [float, ...], "model_version": "..." }
+    DELETE query param opcional: model_version (ausente = todas as versões)
+    """
+    try:
+        company_id = payload.get('company_id')
+        if not company_id:
+            return jsonify({'error': 'company_id ausente no token'}), 403
+        if payload.get('tipo') == 'funcionario':
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        emp = table_employees.get_item(Key={'company_id': company_id, 'id': employee_id}).get('Item')
+        if not emp:
+            return jsonify({'error': 'Funcionário não encontrado nesta empresa'}), 404
+
+        if request.method == 'DELETE':
+            removed = face_embeddings.mark_deleted(company_id, employee_id, request.args.get('model_version') or None)
+            return jsonify({'ok': True, 'removed': removed}), 200
+
+        data = request.get_json(silent=True) or {}
+        embedding = data.get('embedding')
+        model_version = (data.get('model_version') or face_embeddings.DEFAULT_MODEL_VERSION).strip()
+        if not isinstance(embedding, list) or not all(isinstance(v, (int, float)) for v in embedding):
+            return jsonify({'error': 'embedding deve ser uma lista de números'}), 400
+        try:
+            updated_at = face_embeddings.put_embedding(company_id, employee_id, embedding, model_version)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({'ok': True, 'employee_id': employee_id, 'model_version': model_version, 'updated_at': updated_at}), 200
+
+    except Exception as e:
+        print(f"[ERRO] Upsert face embedding: {e}")
+        return jsonify({'error': str(e)}), 500
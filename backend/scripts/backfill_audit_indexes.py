@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Backfill dos atributos de índice da tabela AuditLogs.
+
+Eventos gravados antes de company_entity/company_employee existirem não
+aparecem nos GSIs de filtro — e portanto somem de GET /api/audit quando se
+filtra por funcionário ou entidade. Este script varre os itens sem
+company_entity e os preenche a partir de company_id/entity/employee_id.
+
+Uso:
+    # Dry-run (conta itens afetados, não altera)
+    python backend/scripts/backfill_audit_indexes.py
+
+    # Executar o backfill
+    python backend/scripts/backfill_audit_indexes.py --execute
+
+Pode ser rodado mais de uma vez — itens já preenchidos são ignorados.
+"""
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from services.audit_service import index_fields  # noqa: E402
+
+load_dotenv()
+
+DRY_RUN = '--execute' not in sys.argv
+
+REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_AUDIT', 'AuditLogs')
+table = boto3.resource('dynamodb', region_name=REGION).Table(TABLE_NAME)
+
+
+def iter_pending():
+    scan_kwargs = {
+        'FilterExpression': Attr('company_entity').not_exists(),
+        'ProjectionExpression': 'company_id, created_at_log_id, entity, employee_id',
+    }
+    while True:
+        resp = table.scan(**scan_kwargs)
+        yield from resp.get('Items', [])
+        last_key = resp.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def main():
+    print(f"{'[DRY-RUN] ' if DRY_RUN else ''}Backfill de company_entity/company_employee — tabela: {TABLE_NAME}")
+
+    updated = skipped = errors = 0
+    for item in iter_pending():
+        company_id = item.get('company_id')
+        entity = item.get('entity')
+        if not company_id or not entity:
+            skipped += 1
+            continue
+        if DRY_RUN:
+            updated += 1
+            continue
+        fields = index_fields(company_id, entity, item.get('employee_id', ''))
+        names = {f'#f{i}': name for i, name in enumerate(fields)}
+        values = {f':f{i}': value for i, value in enumerate(fields.values())}
+        try:
+            table.update_item(
+                Key={'company_id': company_id, 'created_at_log_id': item['created_at_log_id']},
+                UpdateExpression='SET ' + ', '.join(f'#f{i} = :f{i}' for i in range(len(fields))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+            updated += 1
+        except Exception as e:
+            errors += 1
+            print(f"  [ERRO] {company_id} / {item['created_at_log_id']}: {e}")
+        if updated and updated % 1000 == 0:
+            print(f"  ... {updated} itens atualizados")
+
+    verb = 'seriam atualizados' if DRY_RUN else 'atualizados'
+    print(f"\nItens {verb}: {updated} | ignorados: {skipped} | erros: {errors}")
+    if DRY_RUN and updated:
+        print("Execute com --execute para aplicar.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Backfill dos índices de tempo dos logs do kiosk (tabela KioskTelemetry).
+
+Logs gravados antes de log_bucket/company_event existirem não aparecem nos
+GSIs bucket-ts-index e company_event-ts-index — e portanto não aparecem em
+GET /api/admin/kiosk/logs. Este script varre os itens LOG# sem esses
+atributos e os preenche a partir de company_id/event/ts.
+
+Uso:
+    # Dry-run (conta itens afetados, não altera)
+    python backend/scripts/backfill_kiosk_log_buckets.py
+
+    # Executar o backfill
+    python backend/scripts/backfill_kiosk_log_buckets.py --execute
+
+Pode ser rodado mais de uma vez — itens já preenchidos são ignorados.
+"""
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from services.kiosk_telemetry import log_index_fields  # noqa: E402
+
+load_dotenv()
+
+DRY_RUN = '--execute' not in sys.argv
+
+REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_KIOSK_TELEMETRY', 'KioskTelemetry')
+table = boto3.resource('dynamodb', region_name=REGION).Table(TABLE_NAME)
+
+
+def iter_pending():
+    scan_kwargs = {
+        'FilterExpression': Attr('pk').begins_with('LOG#') & Attr('log_bucket').not_exists(),
+        'ProjectionExpression': 'pk, sk, company_id, event, ts',
+    }
+    while True:
+        resp = table.scan(**scan_kwargs)
+        yield from resp.get('Items', [])
+        last_key = resp.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def main():
+    print(f"{'[DRY-RUN] ' if DRY_RUN else ''}Backfill de log_bucket/company_event — tabela: {TABLE_NAME}")
+
+    updated = skipped = errors = 0
+    for item in iter_pending():
+        company_id = item.get('company_id')
+        event = item.get('event')
+        ts = item.get('ts')
+        if not company_id or not event or ts is None:
+            skipped += 1
+            continue
+        if DRY_RUN:
+            updated += 1
+            continue
+        fields = log_index_fields(company_id, event, int(ts))
+        try:
+            table.update_item(
+                Key={'pk': item['pk'], 'sk': item['sk']},
+                UpdateExpression='SET log_bucket = :b, company_event = :ce',
+                ConditionExpression=Attr('pk').exists(),  # não recriar item expirado pelo TTL
+                ExpressionAttributeValues={':b': fields['log_bucket'], ':ce': fields['company_event']},
+            )
+            updated += 1
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            skipped += 1
+        except Exception as e:
+            errors += 1
+            print(f"  [ERRO] {item['pk']} / {item['sk']}: {e}")
+        if updated and updated % 1000 == 0:
+            print(f"  ... {updated} itens atualizados")
+
+    verb = 'seriam atualizados' if DRY_RUN else 'atualizados'
+    print(f"\nItens {verb}: {updated} | ignorados: {skipped} | erros: {errors}")
+    if DRY_RUN and updated:
+        print("Execute com --execute para aplicar.")
+
+
+if __name__ == '__main__':
+    main()
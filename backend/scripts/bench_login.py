@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark local do bcrypt do login: na thread da requisição x pool de processos
+(utils/password_pool.py). Não acessa AWS.
+
+Simula um pico de login (THREADS threads verificando senha sem parar) e, ao
+mesmo tempo, uma thread de "batida" fazendo trabalho curto de CPU (JSON + hash,
+~ o que uma batida de ponto faz fora do I/O). Mede logins/s e a latência
+p50/p95 da batida em cada modo — com o pool o bcrypt fica limitado a
+BCRYPT_POOL_WORKERS processos e a batida não disputa CPU com o pico.
+
+Uso:
+    python backend/scripts/bench_login.py [--threads 8] [--seconds 5] [--rounds 12]
+
+Use --rounds igual ao custo de produção (bcrypt.gensalt() padrão = 12).
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import bcrypt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils import password_pool  # noqa: E402
+
+
+def _arg(name: str, default: int) -> int:
+    if name in sys.argv:
+        return int(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+THREADS = _arg('--threads', 8)
+SECONDS = _arg('--seconds', 5)
+ROUNDS = _arg('--rounds', 12)
+
+
+def _batida() -> None:
+    payload = {'employee_id': 'joao_a1b2', 'company_id': 'c1', 'data_hora': '2025-03-03 08:00:00',
+               'coords': [-23.55, -46.63], 'itens': list(range(200))}
+    for _ in range(20):
+        hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+def rodar(modo: str, senha: str, senha_hash: str) -> None:
+    stop = threading.Event()
+    logins = [0] * THREADS
+    latencias: list[float] = []
+
+    def login(i: int):
+        while not stop.is_set():
+            if modo == 'pool':
+                password_pool.verify(senha, senha_hash)
+            else:
+                bcrypt.checkpw(senha.encode(), senha_hash.encode())
+            logins[i] += 1
+
+    def batidas():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            _batida()
+            latencias.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(THREADS)]
+    threads.append(threading.Thread(target=batidas))
+    for t in threads:
+        t.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for t in threads:
+        t.join()
+    print(f'  {modo:6s}  logins/s={sum(logins) / SECONDS:7.1f}  '
+          f'batida p50={_percentil(latencias, 0.5):6.2f} ms  p95={_percentil(latencias, 0.95):6.2f} ms  '
+          f'(n={len(latencias)})')
+
+
+if __name__ == '__main__':
+    senha = 'senha-de-teste'
+    senha_hash = bcrypt.hashpw(senha.encode(), bcrypt.gensalt(rounds=ROUNDS)).decode()
+    print(f'bcrypt rounds={ROUNDS} threads={THREADS} duração={SECONDS}s '
+          f'pool={password_pool.WORKERS} processo(s), fila={password_pool.MAX_PENDING}')
+    password_pool.verify(senha, senha_hash)  # sobe o pool antes de medir
+    for modo in ('inline', 'pool'):
+        rodar(modo, senha, senha_hash)
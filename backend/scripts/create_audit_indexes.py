@@ -0,0 +1,78 @@
+"""
+Cria os GSIs de filtro da tabela AuditLogs (ver services/audit_service.py).
+
+    company_employee-created-index — company_employee (<company_id>#<employee_id>)
+                                     + created_at_log_id; só eventos com funcionário
+    company_entity-created-index   — company_entity (<company_id>#<ENTITY>)
+                                     + created_at_log_id
+
+O DynamoDB cria um GSI por vez: rode o script de novo até os dois aparecerem
+como ACTIVE. Eventos anteriores aos índices:
+    python backend/scripts/backfill_audit_indexes.py --execute
+
+Uso:
+    python backend/scripts/create_audit_indexes.py
+"""
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from services.audit_service import EMPLOYEE_INDEX, ENTITY_INDEX  # noqa: E402
+
+REGION     = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_AUDIT', 'AuditLogs')
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+GSI_DEFINITIONS = [
+    {
+        'IndexName': EMPLOYEE_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'company_employee', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at_log_id', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+    {
+        'IndexName': ENTITY_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'company_entity', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at_log_id', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+]
+GSI_ATTRIBUTES = [
+    {'AttributeName': 'company_employee', 'AttributeType': 'S'},
+    {'AttributeName': 'company_entity', 'AttributeType': 'S'},
+    {'AttributeName': 'created_at_log_id', 'AttributeType': 'S'},
+]
+
+
+def ensure_indexes():
+    desc = dynamodb.describe_table(TableName=TABLE_NAME)['Table']
+    existing = {g['IndexName']: g.get('IndexStatus') for g in desc.get('GlobalSecondaryIndexes', [])}
+    for gsi in GSI_DEFINITIONS:
+        name = gsi['IndexName']
+        if name in existing:
+            print(f'  GSI {name}: {existing[name]}')
+            continue
+        if any(status != 'ACTIVE' for status in existing.values()):
+            print(f'  GSI {name}: aguardando os índices em criação terminarem — rode o script de novo depois.')
+            return
+        kwargs = {'TableName': TABLE_NAME, 'AttributeDefinitions': GSI_ATTRIBUTES,
+                  'GlobalSecondaryIndexCreateUpdates': [{'Create': gsi}]}
+        if desc.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+            kwargs['GlobalSecondaryIndexCreateUpdates'][0]['Create']['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5,
+            }
+        dynamodb.update_table(**kwargs)
+        print(f'✓ GSI {name} em criação.')
+        existing[name] = 'CREATING'
+
+
+if __name__ == '__main__':
+    print(f'Índices da tabela {TABLE_NAME} ({REGION}):')
+    ensure_indexes()
@@ -0,0 +1,55 @@
+"""
+Script para criar a tabela CompanyStats no DynamoDB.
+
+Uso:
+    python backend/scripts/create_company_stats_table.py
+
+Depois de criar, popular os contadores das empresas existentes:
+    python backend/scripts/rebuild_company_counters.py --execute
+
+Variáveis de ambiente necessárias:
+    AWS_DEFAULT_REGION  (ex: us-east-1)
+    AWS_ACCESS_KEY_ID
+    AWS_SECRET_ACCESS_KEY
+"""
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+REGION     = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_COMPANY_STATS', 'CompanyStats')
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+
+def create_table():
+    print(f'Criando tabela {TABLE_NAME} na região {REGION}...')
+
+    try:
+        resp = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{'AttributeName': 'company_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'company_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        print(f"✓ Tabela criada: {resp['TableDescription']['TableArn']}")
+        print('  Aguardando tabela ficar ACTIVE...')
+        dynamodb.get_waiter('table_exists').wait(TableName=TABLE_NAME)
+        print('  Tabela ACTIVE.')
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f'  A tabela {TABLE_NAME} já existe — nada a fazer.')
+        else:
+            raise
+
+    print()
+    print('Estrutura da tabela (ver services/company_stats.py):')
+    print('  Partition key : company_id (String) — um item por empresa')
+    print('  Contadores    : records, photos, active_employees (ADD nos caminhos de escrita)')
+    print('  Diretório     : empresa_nome, email, user_id, status, data_criacao, payments...')
+    print()
+    print('Próximo passo: python backend/scripts/rebuild_company_counters.py --execute')
+
+
+if __name__ == '__main__':
+    create_table()
@@ -0,0 +1,81 @@
+"""
+Script para criar a tabela FaceEmbeddings no DynamoDB.
+
+Uso:
+    python backend/scripts/create_face_embeddings_table.py
+
+Variáveis de ambiente necessárias:
+    AWS_DEFAULT_REGION  (ex: us-east-1)
+    AWS_ACCESS_KEY_ID
+    AWS_SECRET_ACCESS_KEY
+
+Ou usando perfil AWS local:
+    AWS_PROFILE=registraponto python backend/scripts/create_face_embeddings_table.py
+"""
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+REGION     = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_FACE_EMBEDDINGS', 'FaceEmbeddings')
+INDEX_NAME = 'company_model-updated_at-index'
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+
+def create_table():
+    print(f'Criando tabela {TABLE_NAME} na região {REGION}...')
+
+    try:
+        resp = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'company_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'model_employee', 'KeyType': 'RANGE'},
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'company_id', 'AttributeType': 'S'},
+                {'AttributeName': 'model_employee', 'AttributeType': 'S'},
+                {'AttributeName': 'company_model', 'AttributeType': 'S'},
+                {'AttributeName': 'updated_at', 'AttributeType': 'S'},
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': INDEX_NAME,
+                'KeySchema': [
+                    {'AttributeName': 'company_model', 'KeyType': 'HASH'},
+                    {'AttributeName': 'updated_at', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        table_arn = resp['TableDescription']['TableArn']
+        print(f'✓ Tabela criada: {table_arn}')
+
+        print('  Aguardando tabela ficar ACTIVE...')
+        waiter = dynamodb.get_waiter('table_exists')
+        waiter.wait(TableName=TABLE_NAME)
+        print('  Tabela ACTIVE.')
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f'  A tabela {TABLE_NAME} já existe — pulando criação.')
+        else:
+            raise
+
+    print()
+    print('Estrutura da tabela:')
+    print('  Partition key : company_id      (String)')
+    print('  Sort key      : model_employee  (String, <model_version>#<employee_id>)')
+    print(f'  GSI           : {INDEX_NAME}')
+    print('                  company_model (<company_id>#<model_version>) + updated_at')
+    print()
+    print('Atributos:')
+    print('  embedding : Binary — float32 little-endian')
+    print('  deleted   : Bool   — tombstone para o pull incremental')
+    print()
+    print('Pronto.')
+
+
+if __name__ == '__main__':
+    create_table()
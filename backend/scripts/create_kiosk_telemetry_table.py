@@ -21,6 +21,54 @@ TABLE_NAME = os.getenv('DYNAMODB_TABLE_KIOSK_TELEMETRY', 'KioskTelemetry')
 
 dynamodb = boto3.client('dynamodb', region_name=REGION)
 
+# Índices de tempo dos logs (ver services/kiosk_telemetry.py). Só itens LOG#
+# têm log_bucket/company_event, então os dois GSIs são esparsos.
+GSI_DEFINITIONS = [
+    {
+        'IndexName': 'bucket-ts-index',
+        'KeySchema': [
+            {'AttributeName': 'log_bucket', 'KeyType': 'HASH'},
+            {'AttributeName': 'ts', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+    {
+        'IndexName': 'company_event-ts-index',
+        'KeySchema': [
+            {'AttributeName': 'company_event', 'KeyType': 'HASH'},
+            {'AttributeName': 'ts', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+]
+GSI_ATTRIBUTES = [
+    {'AttributeName': 'log_bucket', 'AttributeType': 'S'},
+    {'AttributeName': 'company_event', 'AttributeType': 'S'},
+    {'AttributeName': 'ts', 'AttributeType': 'N'},
+]
+
+
+def ensure_indexes():
+    """Cria os GSIs que faltarem numa tabela já existente (um por chamada,
+    limite do DynamoDB). Rode de novo até não restar nenhum pendente."""
+    desc = dynamodb.describe_table(TableName=TABLE_NAME)['Table']
+    existing = {g['IndexName']: g.get('IndexStatus') for g in desc.get('GlobalSecondaryIndexes', [])}
+    for gsi in GSI_DEFINITIONS:
+        name = gsi['IndexName']
+        if name in existing:
+            print(f'  GSI {name}: {existing[name]}')
+            continue
+        if any(status != 'ACTIVE' for status in existing.values()):
+            print(f'  GSI {name}: aguardando os índices em criação terminarem — rode o script de novo depois.')
+            return
+        dynamodb.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=GSI_ATTRIBUTES,
+            GlobalSecondaryIndexCreateUpdates=[{'Create': gsi}],
+        )
+        print(f'✓ GSI {name} em criação.')
+        existing[name] = 'CREATING'
+
 
 def create_table():
     print(f'Criando tabela {TABLE_NAME} na região {REGION}...')
@@ -35,7 +83,9 @@ def create_table():
             AttributeDefinitions=[
                 {'AttributeName': 'pk', 'AttributeType': 'S'},
                 {'AttributeName': 'sk', 'AttributeType': 'S'},
+                *GSI_ATTRIBUTES,
             ],
+            GlobalSecondaryIndexes=GSI_DEFINITIONS,
             BillingMode='PAY_PER_REQUEST',  # on-demand — sem custo quando inativo
         )
         table_arn = resp['TableDescription']['TableArn']
@@ -50,6 +100,7 @@ def create_table():
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceInUseException':
             print(f'  A tabela {TABLE_NAME} já existe — pulando criação.')
+            ensure_indexes()
         else:
             raise
 
@@ -78,6 +129,12 @@ def create_table():
     print('Padrões de chave usados:')
     print('  Logs       — pk: LOG#<company_id>#<device_id>  sk: <ts_ms>#<event>')
     print('  Heartbeats — pk: HEARTBEAT#<company_id>        sk: <device_id>')
+    print('  Frota      — pk: FLEET                         sk: <company_id>  (mapa devices)')
+    print()
+    print('GSIs (só itens LOG#):')
+    print('  bucket-ts-index        — log_bucket (LOGBUCKET#YYYY-MM-DDTHH) + ts')
+    print('  company_event-ts-index — company_event (<company_id>#<EVENT>) + ts')
+    print('  Logs gravados antes dos GSIs: python backend/scripts/backfill_kiosk_log_buckets.py --execute')
     print()
     print('TTL configurado:')
     print('  Logs       : 30 dias')
@@ -0,0 +1,56 @@
+"""
+Cria os GSIs usados pelos logins (routes/api.py — login e login_funcionario),
+que não têm mais fallback para scan:
+
+    UserCompany  user_id-index — user_id (login da empresa)
+    Employees    id-index      — id (login do funcionário, sem a empresa)
+
+Projeção ALL: o login precisa de senha_hash, active/is_active e dos campos do
+token. O DynamoDB cria um GSI por vez por tabela: rode de novo até os dois
+aparecerem como ACTIVE. Só depois disso fazer o deploy dos logins.
+
+Uso:
+    python backend/scripts/create_login_indexes.py
+"""
+import os
+
+import boto3
+
+REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+INDEXES = [
+    (os.getenv('DYNAMODB_TABLE_USERS', 'UserCompany'), 'user_id-index', 'user_id'),
+    (os.getenv('DYNAMODB_TABLE_EMPLOYEES', 'Employees'), 'id-index', 'id'),
+]
+
+
+def ensure_index(table_name: str, index_name: str, attribute: str):
+    desc = dynamodb.describe_table(TableName=table_name)['Table']
+    existing = {g['IndexName']: g.get('IndexStatus') for g in desc.get('GlobalSecondaryIndexes', [])}
+    if index_name in existing:
+        print(f'  {table_name} GSI {index_name}: {existing[index_name]}')
+        return
+    if any(status != 'ACTIVE' for status in existing.values()):
+        print(f'  {table_name} GSI {index_name}: aguardando os índices em criação terminarem — rode o script de novo depois.')
+        return
+    gsi = {
+        'IndexName': index_name,
+        'KeySchema': [{'AttributeName': attribute, 'KeyType': 'HASH'}],
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+    if desc.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        gsi['ProvisionedThroughput'] = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    dynamodb.update_table(
+        TableName=table_name,
+        AttributeDefinitions=[{'AttributeName': attribute, 'AttributeType': 'S'}],
+        GlobalSecondaryIndexCreateUpdates=[{'Create': gsi}],
+    )
+    print(f'✓ {table_name} GSI {index_name} em criação.')
+
+
+if __name__ == '__main__':
+    print(f'Índices de login ({REGION}):')
+    for table_name, index_name, attribute in INDEXES:
+        ensure_index(table_name, index_name, attribute)
@@ -0,0 +1,68 @@
+"""
+Script para criar a tabela RevokedTokens no DynamoDB (logout de JWT
+compartilhado entre workers e instâncias — ver services/token_revocation.py).
+
+Uso:
+    python backend/scripts/create_revoked_tokens_table.py
+
+Variáveis de ambiente necessárias:
+    AWS_DEFAULT_REGION  (ex: us-east-1)
+    AWS_ACCESS_KEY_ID
+    AWS_SECRET_ACCESS_KEY
+"""
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+REGION     = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_REVOKED_TOKENS', 'RevokedTokens')
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+
+def create_table():
+    print(f'Criando tabela {TABLE_NAME} na região {REGION}...')
+
+    try:
+        resp = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'},
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        print(f"✓ Tabela criada: {resp['TableDescription']['TableArn']}")
+        print('  Aguardando tabela ficar ACTIVE...')
+        dynamodb.get_waiter('table_exists').wait(TableName=TABLE_NAME)
+        print('  Tabela ACTIVE.')
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f'  A tabela {TABLE_NAME} já existe — nada a fazer.')
+        else:
+            raise
+
+    try:
+        dynamodb.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'ttl'},
+        )
+        print('✓ TTL habilitado no atributo ttl (= exp do token).')
+    except ClientError as e:
+        if 'already enabled' in str(e).lower():
+            print('  TTL já estava habilitado.')
+        else:
+            raise
+
+    print()
+    print('Estrutura da tabela (ver services/token_revocation.py):')
+    print('  JTI#<jti>             / REVOKED — confirmação pontual no verify_token')
+    print('  FEED#<YYYY-MM-DDTHH>  / <jti>   — feed por hora lido pelo Bloom filter de cada worker')
+
+
+if __name__ == '__main__':
+    create_table()
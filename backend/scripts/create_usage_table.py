@@ -0,0 +1,72 @@
+"""
+Script para criar a tabela Usage no DynamoDB (uso por empresa/rota/dia,
+gravado por services/usage_metering.py).
+
+Uso:
+    python backend/scripts/create_usage_table.py
+
+Variáveis de ambiente necessárias:
+    AWS_DEFAULT_REGION  (ex: us-east-1)
+    AWS_ACCESS_KEY_ID
+    AWS_SECRET_ACCESS_KEY
+"""
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+REGION     = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_USAGE', 'Usage')
+
+dynamodb = boto3.client('dynamodb', region_name=REGION)
+
+
+def create_table():
+    print(f'Criando tabela {TABLE_NAME} na região {REGION}...')
+
+    try:
+        resp = dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'},
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        print(f"✓ Tabela criada: {resp['TableDescription']['TableArn']}")
+        print('  Aguardando tabela ficar ACTIVE...')
+        dynamodb.get_waiter('table_exists').wait(TableName=TABLE_NAME)
+        print('  Tabela ACTIVE.')
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f'  A tabela {TABLE_NAME} já existe — pulando criação.')
+        else:
+            raise
+
+    try:
+        dynamodb.update_time_to_live(
+            TableName=TABLE_NAME,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'ttl'},
+        )
+        print('✓ TTL habilitado no atributo "ttl".')
+    except ClientError as e:
+        if 'already enabled' in str(e).lower() or 'ValidationException' in str(e):
+            print('  TTL já habilitado — nada a fazer.')
+        else:
+            print(f'  Aviso ao configurar TTL: {e}')
+
+    print()
+    print('Padrão de chave:')
+    print('  pk: USAGE#<company_id>   sk: D#<YYYY-MM-DD>#<METHOD> <rota>')
+    print('  Atributos (Number, ADD): requests, ddb_items_read, ddb_items_written,')
+    print('  ddb_read_units, ddb_write_units, rekognition_calls, s3_puts, s3_bytes')
+    print('  TTL: 400 dias')
+    print()
+    print('Pronto.')
+
+
+if __name__ == '__main__':
+    create_table()
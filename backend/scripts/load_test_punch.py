@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Teste de carga das batidas do kiosk contra um servidor rodando (homologação —
+as batidas são gravadas de verdade).
+
+Compara o throughput do mesmo servidor em modos diferentes do Gunicorn:
+    GUNICORN_WORKER_CLASS=sync     gunicorn -c config/gunicorn.py wsgi:app
+    (padrão: gthread, GUNICORN_THREADS=8)
+e rode o script contra cada um, com a mesma concorrência.
+
+Cada linha de --kiosks é "<jwt da empresa> <funcionario_id>" — um kiosk. O
+rate limit de /api/registrar_ponto_facial é por empresa (90/min), então use
+kiosks de várias empresas para medir o servidor e não o limite; respostas 429
+são contadas à parte.
+
+Uso:
+    # Dry-run (mostra o plano, não envia nada)
+    python backend/scripts/load_test_punch.py --url https://hml.exemplo --kiosks kiosks.txt
+
+    # Executar: 32 conexões simultâneas por 60 s
+    python backend/scripts/load_test_punch.py --url https://hml.exemplo --kiosks kiosks.txt \\
+        --concurrency 32 --seconds 60 --execute
+"""
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+
+import requests
+
+DRY_RUN = '--execute' not in sys.argv
+PATH = '/api/registrar_ponto_facial'
+
+
+def _arg(name: str, default=None):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+def main():
+    url = _arg('--url')
+    kiosks_file = _arg('--kiosks')
+    concurrency = int(_arg('--concurrency', 16))
+    seconds = int(_arg('--seconds', 30))
+    if not url or not kiosks_file:
+        print(__doc__)
+        sys.exit(1)
+    with open(kiosks_file) as f:
+        kiosks = [line.split() for line in f if line.strip() and not line.startswith('#')]
+
+    print(f'{url}{PATH}: {len(kiosks)} kiosk(s), {concurrency} conexões, {seconds}s')
+    if DRY_RUN:
+        print('Dry-run — nada enviado. Use --execute.')
+        return
+
+    ciclo = itertools.cycle(kiosks)
+    ciclo_lock = threading.Lock()
+    stop = time.monotonic() + seconds
+    status: Counter = Counter()
+    latencias: list[float] = []
+    lock = threading.Lock()
+
+    def cliente():
+        session = requests.Session()
+        while time.monotonic() < stop:
+            with ciclo_lock:
+                token, funcionario_id = next(ciclo)
+            t0 = time.perf_counter()
+            try:
+                r = session.post(f'{url}{PATH}', json={'funcionario_id': funcionario_id},
+                                 headers={'Authorization': f'Bearer {token}'}, timeout=30)
+                code = r.status_code
+            except requests.RequestException as e:
+                code = type(e).__name__
+            ms = (time.perf_counter() - t0) * 1000
+            with lock:
+                status[code] += 1
+                if isinstance(code, int) and code < 300:
+                    latencias.append(ms)
+
+    threads = [threading.Thread(target=cliente) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ok = len(latencias)
+    print(f'  batidas ok/s = {ok / seconds:.1f}  (total {sum(status.values())}, ok {ok})')
+    print(f'  latência ok  p50={_percentil(latencias, 0.5):.0f} ms  p95={_percentil(latencias, 0.95):.0f} ms  '
+          f'p99={_percentil(latencias, 0.99):.0f} ms')
+    print(f'  status       {dict(status)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Custo de import do app (cold start do Lambda / reload do Gunicorn).
+
+Importa `app` em processos novos (nada em cache além dos .pyc), mede o tempo
+do import e mostra o custo por módulo (`python -X importtime`): o que mais pesa
+no total e quanto cada pacote de terceiros e cada módulo nosso custa.
+
+Falha (exit 1) quando:
+    - a mediana de --runs imports passa de --budget-ms (IMPORT_BUDGET_MS)
+    - algum módulo de FORBIDDEN foi importado na subida — são os que devem
+      ficar para a primeira requisição que precisa deles (routes/lazy.py,
+      imports tardios de Pillow e requests)
+
+Uso:
+    python backend/scripts/profile_imports.py [--runs 5] [--top 25] [--budget-ms 800]
+
+O CI roda com o orçamento padrão; ao subir o orçamento, registre o motivo
+no commit.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+FORBIDDEN = [
+    'routes.chatbot_rh',
+    'routes.admin_aws',
+    'routes.audit',
+    'requests',
+    'PIL',
+]
+
+_CHILD = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import app\n"
+    "ms = (time.perf_counter() - t) * 1000\n"
+    "print('@@IMPORT ' + json.dumps({'ms': ms, 'modules': sorted(sys.modules)}), flush=True)\n"
+)
+
+
+def _arg(name: str, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+RUNS = _arg('--runs', 5)
+TOP = _arg('--top', 25)
+BUDGET_MS = _arg('--budget-ms', float(os.getenv('IMPORT_BUDGET_MS', '800')))
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'import-profile-only')
+    env.setdefault('JWT_SECRET_KEY', 'import-profile-only')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env['AWS_METRICS_COLLECTOR'] = '0'
+    env.pop('LAZY_BLUEPRINTS', None)
+    return env
+
+
+def _child(*flags: str) -> tuple[dict, str]:
+    proc = subprocess.run([sys.executable, *flags, '-c', _CHILD], cwd=BACKEND, env=_env(),
+                          capture_output=True, text=True, timeout=120)
+    for line in proc.stdout.splitlines():
+        if line.startswith('@@IMPORT '):
+            return json.loads(line[len('@@IMPORT '):]), proc.stderr
+    sys.exit(f"import app falhou (exit {proc.returncode}):\n{proc.stderr[-3000:]}")
+
+
+def _importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """[(módulo, self_us, cumulativo_us)] da saída de -X importtime."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def main() -> int:
+    _child()  # aquece .pyc e cache de disco
+    runs = [_child() for _ in range(RUNS)]
+    median_ms = statistics.median(r[0]['ms'] for r in runs)
+    modules = set(runs[0][0]['modules'])
+
+    _, stderr = _child('-X', 'importtime')
+    rows = _importtime(stderr)
+
+    by_package: dict[str, int] = {}
+    for name, self_us, _ in rows:
+        by_package[name.split('.')[0]] = by_package.get(name.split('.')[0], 0) + self_us
+
+    print(f"\nimport app: mediana {median_ms:.0f} ms em {RUNS} execuções "
+          f"(min {min(r[0]['ms'] for r in runs):.0f}, max {max(r[0]['ms'] for r in runs):.0f}); "
+          f"{len(modules)} módulos\n")
+    print(f"Top {TOP} pacotes (soma do tempo próprio):")
+    for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:TOP]:
+        print(f"  {us / 1000:8.1f} ms  {pkg}")
+    print(f"\nNossos módulos (cumulativo — inclui o que eles importam primeiro):")
+    ours = [r for r in rows if r[0].split('.')[0] in ('app', 'routes', 'services', 'utils', 'config')]
+    for name, self_us, cum_us in sorted(ours, key=lambda r: -r[2])[:TOP]:
+        print(f"  {cum_us / 1000:8.1f} ms  (próprio {self_us / 1000:6.1f})  {name}")
+
+    failed = False
+    loaded = [m for m in FORBIDDEN if m in modules]
+    if loaded:
+        print(f"\nFALHOU: importados na subida (deveriam ser tardios): {', '.join(loaded)}")
+        failed = True
+    if median_ms > BUDGET_MS:
+        print(f"\nFALHOU: {median_ms:.0f} ms > orçamento de {BUDGET_MS:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"\nOK: {median_ms:.0f} ms dentro do orçamento de {BUDGET_MS:.0f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Recalcula os contadores por empresa (tabela CompanyStats) a partir das
+tabelas de origem: UserCompany (diretório), TimeRecords (records, photos) e
+Employees (active_employees). Ver services/company_stats.py.
+
+Rodar depois de criar a tabela (popula empresas existentes) e sempre que os
+contadores parecerem fora (falha de escrita, restore de backup, correção
+manual de dados). Usa query COUNT por empresa — sem scan em TimeRecords.
+
+Uso:
+    # Dry-run (mostra os valores recalculados, não grava)
+    python backend/scripts/rebuild_company_counters.py
+
+    # Gravar
+    python backend/scripts/rebuild_company_counters.py --execute
+
+    # Só uma empresa
+    python backend/scripts/rebuild_company_counters.py --execute --company <company_id>
+"""
+import os
+import sys
+
+import boto3
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from services import company_stats  # noqa: E402
+
+load_dotenv()
+
+DRY_RUN = '--execute' not in sys.argv
+ONLY_COMPANY = sys.argv[sys.argv.index('--company') + 1] if '--company' in sys.argv else None
+
+REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+dynamodb = boto3.resource('dynamodb', region_name=REGION)
+table_users = dynamodb.Table(os.getenv('DYNAMODB_TABLE_USERS', 'UserCompany'))
+table_records = dynamodb.Table(os.getenv('DYNAMODB_TABLE_RECORDS', 'TimeRecords'))
+table_employees = dynamodb.Table(os.getenv('DYNAMODB_TABLE_EMPLOYEES', 'Employees'))
+
+
+def iter_companies():
+    """Um item de UserCompany por company_id (a tabela tem uma linha por usuário)."""
+    if ONLY_COMPANY:
+        resp = table_users.query(
+            KeyConditionExpression='company_id = :c',
+            ExpressionAttributeValues={':c': ONLY_COMPANY},
+            Limit=1,
+        )
+        yield from resp.get('Items', [])[:1]
+        return
+    seen = set()
+    scan_kwargs = {}
+    while True:
+        resp = table_users.scan(**scan_kwargs)
+        for item in resp.get('Items', []):
+            cid = item.get('company_id')
+            if cid and cid not in seen:
+                seen.add(cid)
+                yield item
+        last_key = resp.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def main():
+    print(f"{'[DRY-RUN] ' if DRY_RUN else ''}Rebuild dos contadores por empresa")
+
+    done = errors = 0
+    for company in iter_companies():
+        cid = company['company_id']
+        try:
+            if DRY_RUN:
+                counts = company_stats.count_company(cid, table_records, table_employees)
+            else:
+                counts = company_stats.rebuild_company(company, table_records, table_employees)
+            print(f"  {cid} ({company.get('empresa_nome', '')}): records={counts['records']} "
+                  f"photos={counts['photos']} active_employees={counts['active_employees']}")
+            done += 1
+        except Exception as e:
+            errors += 1
+            print(f"  [ERRO] {cid}: {e}")
+
+    verb = 'recalculadas' if DRY_RUN else 'gravadas'
+    print(f"\nEmpresas {verb}: {done} | erros: {errors}")
+    if DRY_RUN and done:
+        print("Execute com --execute para gravar.")
+
+
+if __name__ == '__main__':
+    main()
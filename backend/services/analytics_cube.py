@@ -0,0 +1,261 @@
+"""
+Cubo mensal de ponto por empresa (funcionário × dia) para consultas de leitura.
+
+Um cubo (company_id, ano, mês) é montado com uma única carga:
+    Employees       — funcionários ativos (nome, cargo); quem só aparece nos
+                      resumos do mês entra depois, em posições >= ativos
+    TimeRecords     — só employee_id/data_hora, filtrados para o mês
+    DailySummary    — itens do mês
+    MonthlySummary  — itens do mês (guardados como vieram, um por funcionário)
+
+e guardado em arrays compactos indexados por `pos(funcionário) * dias + (dia-1)`:
+    worked, expected, delay, extra   array('i') — minutos
+    flags                            bytearray  — REGISTRO | RESUMO | AUSENTE | ATRASO
+
+Cache em memória por worker, chave (empresa, ano, mês). O cubo vale enquanto a
+versão dos dados da empresa não muda (company_stats.data_version — novo
+registro ou funcionário ativado/desativado) e no máximo ANALYTICS_CUBE_TTL_S
+segundos (edições que não passam pelos contadores). Assim várias perguntas do
+chatbot RH sobre o mesmo mês custam uma carga, não uma por pergunta.
+"""
+from __future__ import annotations
+
+import os
+import time
+from array import array
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+from threading import Lock
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from services import company_stats
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
+_tables = None
+
+CUBE_TTL_S = float(os.getenv('ANALYTICS_CUBE_TTL_S', '300'))
+CUBE_CACHE_MAX = int(os.getenv('ANALYTICS_CUBE_CACHE_MAX', '200'))
+
+# Flags por (funcionário, dia)
+REGISTRO = 1   # ao menos um TimeRecord no dia
+RESUMO = 2     # existe DailySummary do dia
+AUSENTE = 4    # DailySummary com status 'absent'
+ATRASO = 8     # DailySummary com status 'late' ou delay_minutes > 0
+
+
+def _get_tables() -> dict:
+    global _tables
+    if _tables is None:
+        _tables = {
+            'employees': _dynamodb.Table(os.getenv('DYNAMODB_TABLE_EMPLOYEES', 'Employees')),
+            'records': _dynamodb.Table(os.getenv('DYNAMODB_TABLE_RECORDS', 'TimeRecords')),
+            'daily': _dynamodb.Table(os.getenv('DYNAMODB_TABLE_DAILY_SUMMARY', 'DailySummary')),
+            'monthly': _dynamodb.Table(os.getenv('DYNAMODB_TABLE_MONTHLY_SUMMARY', 'MonthlySummary')),
+        }
+    return _tables
+
+
+def _num(value) -> float:
+    if isinstance(value, Decimal):
+        return float(value)
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _hours_to_minutes(value) -> int:
+    """worked_hours/expected_hours (horas decimais) em minutos — 7.5 → 450."""
+    return round(_num(value) * 60)
+
+
+def _extra_minutes(item: dict) -> int:
+    """Horas extras do DailySummary em minutos (os writers usam campos diferentes)."""
+    for field in ('overtime_minutes', 'extra_minutes'):
+        minutes = int(_num(item.get(field)))
+        if minutes > 0:
+            return minutes
+    return int(_num(item.get('extra_hours')) * 60)
+
+
+def _summary_name(item: dict) -> str:
+    return (item.get('employee_name') or item.get('funcionario_nome')
+            or item.get('nome') or item.get('employee_id', 'Desconhecido'))
+
+
+def _query_all(table, **kwargs) -> list[dict]:
+    resp = table.query(**kwargs)
+    items = resp.get('Items', [])
+    while 'LastEvaluatedKey' in resp:
+        resp = table.query(ExclusiveStartKey=resp['LastEvaluatedKey'], **kwargs)
+        items.extend(resp.get('Items', []))
+    return items
+
+
+class MonthCube:
+    """Dados de um mês da empresa. Somente leitura depois de montado."""
+
+    __slots__ = ('company_id', 'year', 'month', 'days', 'ids', 'nomes', 'cargos', 'ativos', '_pos',
+                 'worked', 'expected', 'delay', 'extra', 'flags', 'monthly', 'built_at')
+
+    def __init__(self, company_id: str, year: int, month: int, employees: list[dict]):
+        self.company_id = company_id
+        self.year = year
+        self.month = month
+        self.days = monthrange(year, month)[1]
+        self.ids: list[str] = []
+        self.nomes: list[str] = []
+        self.cargos: list[str] = []
+        for e in employees:
+            self.ids.append(e.get('id', e.get('employee_id', '')))
+            self.nomes.append(e.get('nome', 'Funcionário'))
+            self.cargos.append(e.get('cargo', ''))
+        self.ativos = len(self.ids)  # posições [0, ativos) são os funcionários ativos
+        self._pos = {emp_id: i for i, emp_id in enumerate(self.ids)}
+        size = len(self.ids) * self.days
+        self.worked = array('i', bytes(4 * size))
+        self.expected = array('i', bytes(4 * size))
+        self.delay = array('i', bytes(4 * size))
+        self.extra = array('i', bytes(4 * size))
+        self.flags = bytearray(size)
+        self.monthly: dict[str, dict] = {}
+        self.built_at = time.monotonic()
+
+    # ── Índices ──────────────────────────────────────────────────────────────
+
+    def pos(self, employee_id: str) -> int | None:
+        return self._pos.get(employee_id)
+
+    def idx(self, pos: int, day: int) -> int:
+        return pos * self.days + day - 1
+
+    def iso(self, day: int) -> str:
+        return f"{self.year:04d}-{self.month:02d}-{day:02d}"
+
+    def nome(self, employee_id: str, default: str = 'Funcionário') -> str:
+        p = self._pos.get(employee_id)
+        return self.nomes[p] if p is not None else default
+
+    def dias_com(self, pos: int, mask: int, first: int = 1, last: int | None = None) -> list[int]:
+        """Dias (1..N) do funcionário em que alguma flag de `mask` está ligada."""
+        base = pos * self.days - 1
+        return [d for d in range(first, (last or self.days) + 1) if self.flags[base + d] & mask]
+
+    def soma(self, arr: array, pos: int, first: int = 1, last: int | None = None) -> int:
+        base = pos * self.days - 1
+        return sum(arr[base + first:base + (last or self.days) + 1])
+
+    # ── Carga ────────────────────────────────────────────────────────────────
+
+    def _add_record(self, employee_id: str, data_hora: str) -> None:
+        p = self._pos.get(employee_id)
+        if p is None or len(data_hora) < 10:
+            return
+        self.flags[self.idx(p, int(data_hora[8:10]))] |= REGISTRO
+
+    def _add_daily(self, item: dict) -> None:
+        p = self._pos.get(item.get('employee_id', ''))
+        d = item.get('date', '')
+        if p is None or len(d) < 10:
+            return
+        i = self.idx(p, int(d[8:10]))
+        self.worked[i] = _hours_to_minutes(item.get('worked_hours'))
+        self.expected[i] = _hours_to_minutes(item.get('expected_hours'))
+        self.delay[i] = int(_num(item.get('delay_minutes')))
+        self.extra[i] = _extra_minutes(item)
+        flags = RESUMO
+        if item.get('status') == 'absent':
+            flags |= AUSENTE
+        if item.get('status') == 'late' or self.delay[i] > 0:
+            flags |= ATRASO
+        self.flags[i] |= flags
+
+
+def build(company_id: str, year: int, month: int, tables: dict | None = None) -> MonthCube:
+    """Carrega as quatro tabelas do mês e monta o cubo."""
+    t = tables or _get_tables()
+    month_str = f"{year:04d}-{month:02d}"
+    start, end = f"{month_str}-01", f"{month_str}-{monthrange(year, month)[1]:02d}"
+    by_company = Key('company_id').eq(company_id)
+
+    employees = [e for e in _query_all(t['employees'], KeyConditionExpression=by_company)
+                 if e.get('ativo', True) is not False]
+    daily = _query_all(t['daily'], KeyConditionExpression=by_company,
+                       FilterExpression=Attr('date').between(start, end))
+    monthly = _query_all(t['monthly'], KeyConditionExpression=by_company,
+                         FilterExpression=Attr('month').eq(month_str))
+
+    # Funcionários que aparecem nos resumos mas não estão ativos (desligados no
+    # mês) entram depois dos ativos, com o nome gravado no próprio resumo.
+    known = {e.get('id', e.get('employee_id', '')) for e in employees}
+    extras = {}
+    for item in daily + monthly:
+        emp_id = item.get('employee_id', '')
+        if emp_id and emp_id not in known and emp_id not in extras:
+            extras[emp_id] = {'id': emp_id, 'nome': _summary_name(item)}
+    cube = MonthCube(company_id, year, month, employees + list(extras.values()))
+    cube.ativos = len(employees)
+
+    for r in _query_all(t['records'], KeyConditionExpression=by_company,
+                        FilterExpression=Attr('data_hora').between(start, f"{end}T23:59:59"),
+                        ProjectionExpression='employee_id, data_hora'):
+        cube._add_record(r.get('employee_id', ''), r.get('data_hora', ''))
+    for item in daily:
+        cube._add_daily(item)
+    for item in monthly:
+        cube.monthly[item.get('employee_id', '')] = item
+
+    return cube
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+_cache: 'OrderedDict[tuple[str, int, int], tuple[str, MonthCube]]' = OrderedDict()
+_cache_lock = Lock()
+_build_locks: dict[tuple[str, int, int], Lock] = {}
+
+
+def get_cube(company_id: str, year: int, month: int, version: str | None = None,
+             tables: dict | None = None) -> MonthCube:
+    """Cubo do mês, do cache se a versão dos dados não mudou.
+
+    `version` pode vir do chamador (que já a leu); senão é lida de CompanyStats.
+    Sem versão (falha ao ler) o cubo é montado e não é cacheado. Montagens
+    concorrentes do mesmo cubo no worker esperam a primeira.
+    """
+    if version is None:
+        version = company_stats.data_version(company_id)
+    if version is None:
+        return build(company_id, year, month, tables)
+
+    key = (company_id, year, month)
+    with _cache_lock:
+        lock = _build_locks.setdefault(key, Lock())
+    with lock:
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] == version and time.monotonic() - entry[1].built_at < CUBE_TTL_S:
+                _cache.move_to_end(key)
+                return entry[1]
+        cube = build(company_id, year, month, tables)
+        with _cache_lock:
+            _cache[key] = (version, cube)
+            _cache.move_to_end(key)
+            while len(_cache) > CUBE_CACHE_MAX:
+                old, _ = _cache.popitem(last=False)
+                _build_locks.pop(old, None)
+        return cube
+
+
+def months_between(start: date, end: date) -> list[tuple[int, int]]:
+    """(ano, mês) de cada mês que toca o intervalo [start, end]."""
+    out = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
@@ -1,14 +1,65 @@
 # backend/services/audit_service.py
+"""
+Log de auditoria (tabela AuditLogs, HASH company_id / RANGE created_at_log_id).
+
+Escrita assíncrona: log_event() só monta o item e o coloca num BatchWriteBuffer
+(services/batch_buffer.py); uma thread do worker grava em lotes de 25 com
+batch_writer. O buffer é esvaziado no atexit e no worker_exit do Gunicorn
+(shutdown e troca de workers no SIGHUP). Buffer cheio → put_item síncrono.
+AUDIT_ASYNC=0 (ou Lambda, onde threads não sobrevivem à resposta) grava direto.
+
+Em vez de duas cópias inteiras do item (before/after), o evento guarda só a
+diferença campo a campo:
+    diff   {campo: [antes, depois]}  — só campos alterados (None = ausente)
+    ctx    {campo: valor}            — CONTEXT_FIELDS que não mudaram, usados
+                                       pela tela de auditoria (tipo, horário,
+                                       justificativa)
+    sides  'before' | 'after' | 'both' — quais snapshots existiam
+Com AUDIT_COMPRESS=1, diffs maiores que COMPRESS_MIN_BYTES vão como JSON
+zlib em `diff_z` (Binary). expand_item() reconstrói before/after no formato
+antigo para a API; itens antigos (com before/after) passam intactos.
+
+GSIs para os filtros seletivos da tela (atributos gravados por log_event;
+itens sem funcionário não entram no índice de funcionário):
+    company_employee-created-index  HASH company_employee '<company_id>#<employee_id>'
+    company_entity-created-index    HASH company_entity   '<company_id>#<ENTITY>'
+    (RANGE created_at_log_id nos dois)
+query_logs() pagina até preencher `limit` resultados ou gastar o orçamento de
+leitura (READ_BUDGET itens avaliados) e devolve um cursor opaco para continuar.
+"""
 from __future__ import annotations
-import boto3
+import base64
+import binascii
+import json
 import os
 import uuid
+import zlib
 from datetime import datetime, timezone
+from decimal import Decimal
 
-_dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from services.batch_buffer import BatchWriteBuffer
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
 _table_name = os.environ.get('DYNAMODB_TABLE_AUDIT', 'AuditLogs')
 _table = None
 
+ASYNC_ENABLED = (os.environ.get('AUDIT_ASYNC', '1') == '1'
+                 and not os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+COMPRESS = os.environ.get('AUDIT_COMPRESS', '0') == '1'
+COMPRESS_MIN_BYTES = 1024
+
+# Campos mantidos mesmo sem mudança: a tela de auditoria os usa para descrever
+# o evento (tipo do registro, horário, justificativa, nome)
+CONTEXT_FIELDS = ('type', 'data_hora', 'justificativa', 'justificativa_ajuste', 'nome')
+
+EMPLOYEE_INDEX = 'company_employee-created-index'
+ENTITY_INDEX = 'company_entity-created-index'
+READ_BUDGET = int(os.environ.get('AUDIT_READ_BUDGET', '2000'))
+
 
 def _get_table():
     global _table
@@ -17,6 +68,80 @@ def _get_table():
     return _table
 
 
+_buffer = BatchWriteBuffer(
+    'audit', _get_table, key_attrs=['company_id', 'created_at_log_id'],
+    max_items=10000, flush_interval=1.0,
+)
+
+
+# ── Diff ─────────────────────────────────────────────────────────────────────
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def _from_json(value):
+    """JSON → tipos aceitos pelo boto3 (float vira Decimal)."""
+    return json.loads(json.dumps(value, default=_json_default), parse_float=Decimal)
+
+
+def build_diff(before: dict | None, after: dict | None) -> dict:
+    """Atributos diff/ctx/sides (ou diff_z) que substituem before/after no item."""
+    b, a = before or {}, after or {}
+    diff = {}
+    ctx = {}
+    for field in sorted(set(b) | set(a)):
+        old, new = b.get(field), a.get(field)
+        if old != new:
+            diff[field] = [old, new]
+        elif field in CONTEXT_FIELDS and old is not None:
+            ctx[field] = old
+
+    out: dict = {'sides': 'both' if before is not None and after is not None
+                 else 'before' if before is not None else 'after'}
+    if ctx:
+        out['ctx'] = ctx
+    if diff:
+        raw = json.dumps(diff, default=_json_default, separators=(',', ':')).encode()
+        if COMPRESS and len(raw) >= COMPRESS_MIN_BYTES:
+            out['diff_z'] = zlib.compress(raw, 6)
+        else:
+            out['diff'] = diff
+    return out
+
+
+def expand_item(item: dict) -> dict:
+    """Item de AuditLogs no formato da API (before/after completos quanto possível)."""
+    if 'sides' not in item:
+        return item
+    out = {k: v for k, v in item.items() if k not in ('diff', 'diff_z', 'ctx', 'sides')}
+    diff = item.get('diff') or {}
+    if 'diff_z' in item:
+        blob = item['diff_z']
+        diff = json.loads(zlib.decompress(getattr(blob, 'value', blob)))
+    ctx = item.get('ctx') or {}
+    sides = item['sides']
+    if sides in ('before', 'both'):
+        out['before'] = {**ctx, **{f: v[0] for f, v in diff.items() if v[0] is not None}}
+    if sides in ('after', 'both'):
+        out['after'] = {**ctx, **{f: v[1] for f, v in diff.items() if v[1] is not None}}
+    return out
+
+
+def index_fields(company_id: str, entity: str, employee_id: str = '') -> dict:
+    """Atributos dos GSIs de filtro — gravar junto com todo evento."""
+    fields = {'company_entity': f"{company_id}#{entity}"}
+    if employee_id:
+        fields['company_employee'] = f"{company_id}#{employee_id}"
+    return fields
+
+
+# ── Escrita ──────────────────────────────────────────────────────────────────
+
 def log_event(
     company_id: str,
     user_id: str,
@@ -45,6 +170,7 @@ def log_event(
             'entity_id': entity_id or '',
             'action': action,
             'created_at': now,
+            **index_fields(company_id, entity, employee_id),
         }
         if employee_id:
             item['employee_id'] = employee_id
@@ -52,13 +178,153 @@ def log_event(
             item['employee_name'] = employee_name
         if reason:
             item['reason'] = reason
-        if before is not None:
-            item['before'] = before
-        if after is not None:
-            item['after'] = after
+        if before is not None or after is not None:
+            changes = build_diff(before, after)
+            if 'diff' in changes:
+                changes['diff'] = _from_json(changes['diff'])
+            if 'ctx' in changes:
+                changes['ctx'] = _from_json(changes['ctx'])
+            item.update(changes)
         if request is not None:
             item['ip'] = request.headers.get('X-Forwarded-For', '') or (request.remote_addr or '')
             item['device'] = (request.headers.get('User-Agent') or '')[:200]
+        if ASYNC_ENABLED and _buffer.offer([item]):
+            return
         _get_table().put_item(Item=item)
     except Exception as exc:
         print(f"[AUDIT] log_event falhou silenciosamente: {exc}")
+
+
+def flush() -> int:
+    """Grava agora os eventos enfileirados (testes, scripts)."""
+    return _buffer.flush()
+
+
+# ── Leitura ──────────────────────────────────────────────────────────────────
+
+def encode_cursor(index: str | None, key: dict) -> str:
+    raw = json.dumps({'i': index or '', 'k': key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, company_id: str) -> tuple[str | None, dict]:
+    """(índice, ExclusiveStartKey). ValueError se inválido ou de outra empresa."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        index, key = data['i'] or None, data['k']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError('cursor inválido')
+    if not isinstance(key, dict) or key.get('company_id') != company_id:
+        raise ValueError('cursor inválido')
+    return index, key
+
+
+def _key_of(item: dict, index: str | None) -> dict:
+    key = {'company_id': item['company_id'], 'created_at_log_id': item['created_at_log_id']}
+    if index == EMPLOYEE_INDEX:
+        key['company_employee'] = item['company_employee']
+    elif index == ENTITY_INDEX:
+        key['company_entity'] = item['company_entity']
+    return key
+
+
+def _and(expr, cond):
+    return cond if expr is None else expr & cond
+
+
+def query_logs(
+    company_id: str,
+    date_from: str = '',
+    date_to: str = '',
+    user_id: str = '',
+    action: str = '',
+    entity: str = '',
+    employee_id: str = '',
+    limit: int = 100,
+    cursor: str | None = None,
+    read_budget: int | None = None,
+    table=None,
+) -> dict:
+    """
+    Eventos da empresa, do mais recente ao mais antigo.
+
+    Filtro por funcionário ou entidade usa o GSI correspondente (só lê itens
+    que casam); os demais filtros viram FilterExpression. Continua paginando
+    até juntar `limit` eventos ou avaliar `read_budget` itens. Retorna
+    {'logs', 'next_cursor', 'scanned'}; next_cursor None = fim.
+    """
+    t = table or _get_table()
+    budget = READ_BUDGET if read_budget is None else read_budget
+
+    index = EMPLOYEE_INDEX if employee_id else ENTITY_INDEX if entity else None
+    start_key = None
+    if cursor:
+        index, start_key = decode_cursor(cursor, company_id)
+
+    def build(idx):
+        if idx == EMPLOYEE_INDEX:
+            key_cond = Key('company_employee').eq(f"{company_id}#{employee_id}")
+        elif idx == ENTITY_INDEX:
+            key_cond = Key('company_entity').eq(f"{company_id}#{entity}")
+        else:
+            key_cond = Key('company_id').eq(company_id)
+        if date_from and date_to:
+            key_cond = key_cond & Key('created_at_log_id').between(date_from, date_to + '\xff')
+        elif date_from:
+            key_cond = key_cond & Key('created_at_log_id').gte(date_from)
+        elif date_to:
+            key_cond = key_cond & Key('created_at_log_id').lte(date_to + '\xff')
+
+        filter_expr = None
+        if user_id:
+            filter_expr = _and(filter_expr, Attr('user_id').eq(user_id))
+        if action:
+            filter_expr = _and(filter_expr, Attr('action').eq(action))
+        if entity and idx != ENTITY_INDEX:
+            filter_expr = _and(filter_expr, Attr('entity').eq(entity))
+        if employee_id and idx != EMPLOYEE_INDEX:
+            filter_expr = _and(filter_expr, Attr('employee_id').eq(employee_id))
+
+        kwargs: dict = {'KeyConditionExpression': key_cond, 'ScanIndexForward': False}
+        if idx:
+            kwargs['IndexName'] = idx
+        if filter_expr is not None:
+            kwargs['FilterExpression'] = filter_expr
+        return kwargs
+
+    kwargs = build(index)
+    logs: list[dict] = []
+    scanned = 0
+    last_key = start_key
+    while True:
+        page = dict(kwargs, Limit=max(1, min(max(limit - len(logs), 50), budget - scanned)))
+        if last_key:
+            page['ExclusiveStartKey'] = last_key
+        try:
+            resp = t.query(**page)
+        except ClientError as e:
+            # GSI ainda não criado: volta para a tabela base com filtro
+            if index and not cursor and not logs and e.response['Error']['Code'] == 'ValidationException':
+                print(f"[AUDIT] índice {index} indisponível, usando a tabela base: {e}")
+                index = None
+                kwargs = build(None)
+                continue
+            raise
+        scanned += resp.get('ScannedCount', len(resp.get('Items', [])))
+        items = resp.get('Items', [])
+        last_key = resp.get('LastEvaluatedKey')
+        room = limit - len(logs)
+        if len(items) >= room:
+            logs.extend(items[:room])
+            if len(items) > room or last_key:
+                last_key = _key_of(logs[-1], index)
+            break
+        logs.extend(items)
+        if not last_key or scanned >= budget:
+            break
+
+    return {
+        'logs': logs,
+        'next_cursor': encode_cursor(index, last_key) if last_key else None,
+        'scanned': scanned,
+    }
@@ -0,0 +1,456 @@
+"""
+Coleta em background das métricas de infraestrutura e custos AWS do portal
+admin (routes/admin_aws.py).
+
+As rotas /api/admin/aws/metrics e /api/admin/aws/costs só leem um snapshot
+local; quem fala com a AWS é o coletor:
+
+    start_collector()   — thread daemon por worker; a cada ciclo chama
+                          refresh() de cada snapshot
+    SnapshotCache       — snapshot em arquivo JSON (AWS_METRICS_CACHE_DIR),
+                          compartilhado pelos workers do host:
+                            refresh()  single-flight — lock da thread + flock
+                                       no arquivo .lock; quem não pega o lock
+                                       não coleta. Também não coleta se outro
+                                       worker acabou de gravar.
+                            get()      snapshot + metadados de idade/staleness
+
+Intervalos (env):
+    AWS_METRICS_REFRESH_S  300    describe_table, CloudWatch, Rekognition
+    AWS_COSTS_REFRESH_S    21600  Cost Explorer (cobrado por requisição e
+                                  atualizado pela AWS poucas vezes ao dia)
+
+Falha de coleta mantém o último snapshot bom e registra o erro em `error`.
+Em Lambda (AWS_LAMBDA_FUNCTION_NAME) ou com AWS_METRICS_COLLECTOR=0 a thread
+não sobe; get() dispara o refresh quando o snapshot passa do intervalo.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from botocore.exceptions import ClientError
+from utils import aws_clients
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): single-flight só dentro do processo
+    fcntl = None
+
+REGION            = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+S3_BUCKET         = os.getenv('S3_BUCKET',                  'registraponto-prod-fotos')
+REKOGNITION_COLL  = os.getenv('REKOGNITION_COLLECTION',      'registraponto-faces')
+TABLE_EMPLOYEES   = os.getenv('DYNAMODB_TABLE_EMPLOYEES',    'Employees')
+TABLE_RECORDS     = os.getenv('DYNAMODB_TABLE_RECORDS',      'TimeRecords')
+TABLE_USERS       = os.getenv('DYNAMODB_TABLE_USERS',        'UserCompany')
+TABLE_CONFIG      = os.getenv('DYNAMODB_TABLE_CONFIG',       'ConfigCompany')
+TABLE_DAILY       = os.getenv('DYNAMODB_TABLE_DAILY_SUMMARY','DailySummary')
+TABLE_MONTHLY     = os.getenv('DYNAMODB_TABLE_MONTHLY_SUMMARY','MonthlySummary')
+
+CACHE_DIR = os.environ.get(
+    'AWS_METRICS_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'registraponto-aws-metrics'),
+)
+METRICS_REFRESH_S = int(os.environ.get('AWS_METRICS_REFRESH_S', '300'))
+COSTS_REFRESH_S = int(os.environ.get('AWS_COSTS_REFRESH_S', str(6 * 3600)))
+COLLECTOR_ENABLED = (
+    os.environ.get('AWS_METRICS_COLLECTOR', '1') == '1'
+    and 'AWS_LAMBDA_FUNCTION_NAME' not in os.environ
+)
+# Snapshot é "stale" quando passou de STALE_FACTOR x o intervalo de refresh
+STALE_FACTOR = 2
+# Depois de uma coleta com erro, esperar isso antes de tentar de novo
+ERROR_RETRY_S = 600
+# Meses de custo coletados; a rota recorta o que o cliente pediu (?months=)
+COSTS_MONTHS = 12
+
+
+def _bytes_to_mb(b: int) -> float:
+    return round(b / (1024 * 1024), 2)
+
+
+def _bytes_to_gb(b: int) -> float:
+    return round(b / (1024 * 1024 * 1024), 4)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+# ── Coletores ────────────────────────────────────────────────────────────────
+
+def collect_metrics() -> dict:
+    """DynamoDB table stats, S3 bucket stats e a collection do Rekognition."""
+    result = {}
+
+    # ── DynamoDB ─────────────────────────────────────────────────────────────
+    ddb_client = aws_clients.client('dynamodb', REGION)
+    tables_cfg = {
+        'Employees':      TABLE_EMPLOYEES,
+        'TimeRecords':    TABLE_RECORDS,
+        'UserCompany':    TABLE_USERS,
+        'ConfigCompany':  TABLE_CONFIG,
+        'DailySummary':   TABLE_DAILY,
+        'MonthlySummary': TABLE_MONTHLY,
+    }
+    dynamo_tables = []
+    total_items = 0
+    total_size  = 0
+    for label, tname in tables_cfg.items():
+        try:
+            resp = ddb_client.describe_table(TableName=tname)
+            t = resp['Table']
+            item_count  = int(t.get('ItemCount', 0))
+            size_bytes  = int(t.get('TableSizeBytes', 0))
+            total_items += item_count
+            total_size  += size_bytes
+            dynamo_tables.append({
+                'label':        label,
+                'table_name':   tname,
+                'item_count':   item_count,
+                'size_bytes':   size_bytes,
+                'size_mb':      _bytes_to_mb(size_bytes),
+                'status':       t.get('TableStatus', 'UNKNOWN'),
+                'billing_mode': t.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED'),
+            })
+        except ClientError as e:
+            dynamo_tables.append({
+                'label': label,
+                'table_name': tname,
+                'error': e.response['Error']['Code'],
+            })
+        except Exception as e:
+            dynamo_tables.append({'label': label, 'table_name': tname, 'error': str(e)})
+
+    result['dynamodb'] = {
+        'tables':           dynamo_tables,
+        'total_items':      total_items,
+        'total_size_bytes': total_size,
+        'total_size_mb':    _bytes_to_mb(total_size),
+    }
+
+    # ── S3 via CloudWatch ────────────────────────────────────────────────────
+    try:
+        cw  = aws_clients.client('cloudwatch', REGION)
+        now = datetime.utcnow()
+        start = now - timedelta(days=3)
+
+        def _cw_metric(metric_name, storage_type):
+            r = cw.get_metric_statistics(
+                Namespace='AWS/S3',
+                MetricName=metric_name,
+                Dimensions=[
+                    {'Name': 'BucketName',   'Value': S3_BUCKET},
+                    {'Name': 'StorageType',  'Value': storage_type},
+                ],
+                StartTime=start,
+                EndTime=now,
+                Period=86400,
+                Statistics=['Average'],
+            )
+            pts = sorted(r.get('Datapoints', []), key=lambda x: x['Timestamp'])
+            return int(pts[-1]['Average']) if pts else 0
+
+        size_bytes   = _cw_metric('BucketSizeBytes',  'StandardStorage')
+        object_count = _cw_metric('NumberOfObjects',   'AllStorageTypes')
+
+        result['s3'] = {
+            'bucket':        S3_BUCKET,
+            'size_bytes':    size_bytes,
+            'size_gb':       _bytes_to_gb(size_bytes),
+            'size_mb':       _bytes_to_mb(size_bytes),
+            'object_count':  object_count,
+        }
+    except Exception as e:
+        result['s3'] = {'bucket': S3_BUCKET, 'error': str(e), 'size_bytes': 0, 'object_count': 0}
+
+    # ── Rekognition ──────────────────────────────────────────────────────────
+    try:
+        rek  = aws_clients.client('rekognition', REGION)
+        resp = rek.describe_collection(CollectionId=REKOGNITION_COLL)
+        result['rekognition'] = {
+            'collection':         REKOGNITION_COLL,
+            'face_count':         resp.get('FaceCount', 0),
+            'face_model_version': resp.get('FaceModelVersion', 'unknown'),
+            'creation_timestamp': str(resp.get('CreationTimestamp', '')),
+        }
+    except Exception as e:
+        result['rekognition'] = {
+            'collection': REKOGNITION_COLL,
+            'face_count': 0,
+            'error': str(e),
+        }
+
+    result['region'] = REGION
+    result['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+    return result
+
+
+def _short_service(name: str) -> str:
+    return (name
+        .replace('Amazon ', '')
+        .replace('AWS ', '')
+        .replace(' (AWS GovCloud)', '')
+        .strip())
+
+
+def collect_costs(months_back: int = COSTS_MONTHS) -> dict:
+    """Custos mensais por serviço (Cost Explorer) + mês corrente até hoje.
+
+    Levanta ClientError se faltar permissão (ce:GetCostAndUsage).
+    """
+    # Cost Explorer is always in us-east-1
+    ce  = aws_clients.client('ce', 'us-east-1')
+    now = datetime.utcnow()
+
+    # End = first of current month → only complete months
+    end_date   = now.replace(day=1).strftime('%Y-%m-%d')
+    start_date = (now.replace(day=1) - timedelta(days=months_back * 31)).replace(day=1).strftime('%Y-%m-%d')
+
+    response = ce.get_cost_and_usage(
+        TimePeriod={'Start': start_date, 'End': end_date},
+        Granularity='MONTHLY',
+        GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
+        Metrics=['BlendedCost', 'UsageQuantity'],
+    )
+
+    monthly = []
+    for period in response.get('ResultsByTime', []):
+        services = []
+        total    = 0.0
+        for group in period.get('Groups', []):
+            cost = float(group['Metrics']['BlendedCost']['Amount'])
+            if cost < 0.00001:
+                continue
+            service = group['Keys'][0]
+            services.append({'service': _short_service(service), 'full_name': service, 'cost': round(cost, 6)})
+            total += cost
+        monthly.append({
+            'month':    period['TimePeriod']['Start'][:7],
+            'services': sorted(services, key=lambda x: x['cost'], reverse=True),
+            'total':    round(total, 6),
+        })
+
+    # Also get current month-to-date (no dia 1 o intervalo seria vazio)
+    mtd_total = 0.0
+    mtd_services = []
+    today = now.strftime('%Y-%m-%d')
+    if today > end_date:
+        mtd_resp = ce.get_cost_and_usage(
+            TimePeriod={'Start': end_date, 'End': today},
+            Granularity='MONTHLY',
+            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
+            Metrics=['BlendedCost'],
+        )
+        for period in mtd_resp.get('ResultsByTime', []):
+            for group in period.get('Groups', []):
+                cost = float(group['Metrics']['BlendedCost']['Amount'])
+                if cost < 0.00001:
+                    continue
+                mtd_services.append({'service': _short_service(group['Keys'][0]), 'cost': round(cost, 6)})
+                mtd_total += cost
+
+    return {
+        'monthly_costs':  monthly,
+        'current_month':  {
+            'month':    now.strftime('%Y-%m'),
+            'total':    round(mtd_total, 6),
+            'services': sorted(mtd_services, key=lambda x: x['cost'], reverse=True),
+        },
+        'currency': 'USD',
+        'error':    None,
+    }
+
+
+# ── Snapshot compartilhado ───────────────────────────────────────────────────
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, ClientError):
+        err = e.response.get('Error', {})
+        return f"{err.get('Code')}: {err.get('Message')}"
+    return str(e)
+
+
+class SnapshotCache:
+    def __init__(self, name: str, collect: Callable[[], dict], refresh_interval: float,
+                 directory: str | None = None):
+        self.name = name
+        self._collect = collect
+        self.refresh_interval = refresh_interval
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._snapshot: dict | None = None
+        self._mtime = 0.0
+
+    @property
+    def directory(self) -> str:
+        return self._directory or CACHE_DIR
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f'{self.name}.json')
+
+    def read(self) -> dict | None:
+        """Snapshot atual ({'data', 'collected_at', 'error', 'error_at'}) ou None."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self._snapshot
+        if self._snapshot is None or mtime != self._mtime:
+            try:
+                with open(self.path, encoding='utf-8') as fh:
+                    self._snapshot = json.load(fh)
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                print(f"[AWS-METRICS] {self.name}: snapshot ilegível ({e}) — ignorando")
+        return self._snapshot
+
+    def _write(self, snapshot: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(snapshot, fh, default=str)
+        os.replace(tmp, self.path)
+        self._snapshot = snapshot
+        self._mtime = os.path.getmtime(self.path)
+
+    @contextmanager
+    def _host_lock(self):
+        """flock não bloqueante: True se este processo pode coletar."""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f'{self.name}.lock'), 'a') as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def age(self, snapshot: dict | None = None, now: float | None = None) -> float | None:
+        snapshot = snapshot if snapshot is not None else self.read()
+        if not snapshot or not snapshot.get('collected_at'):
+            return None
+        return max((now or time.time()) - snapshot['collected_at'], 0.0)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Coleta e grava um snapshot novo. True se coletou.
+
+        Single-flight: se outra thread/worker já está coletando, ou se o
+        snapshot foi renovado dentro do intervalo (e não é `force`), retorna
+        False sem chamar a AWS.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with self._host_lock() as acquired:
+                if not acquired:
+                    return False
+                previous = self.read()
+                age = self.age(previous)
+                if not force and age is not None and age < self.refresh_interval:
+                    return False
+                error_at = (previous or {}).get('error_at')
+                if not force and error_at and time.time() - error_at < min(self.refresh_interval, ERROR_RETRY_S):
+                    return False
+                started = time.time()
+                try:
+                    data = self._collect()
+                except Exception as e:
+                    print(f"[AWS-METRICS] {self.name}: coleta falhou: {_error_text(e)}")
+                    snapshot = dict(previous or {'data': None, 'collected_at': None})
+                    snapshot.update({'error': _error_text(e), 'error_at': started})
+                    # Sem dado bom, o erro vale como "coleta" — não tentar a cada leitura
+                    if not snapshot.get('data'):
+                        snapshot['collected_at'] = started
+                    self._write(snapshot)
+                    return False
+                self._write({
+                    'data': data,
+                    'collected_at': started,
+                    'duration_ms': int((time.time() - started) * 1000),
+                    'error': None,
+                    'error_at': None,
+                })
+                return True
+        finally:
+            self._lock.release()
+
+    def refreshing(self) -> bool:
+        return self._lock.locked()
+
+    def refresh_async(self, force: bool = False) -> None:
+        if self.refreshing():
+            return
+        threading.Thread(target=self.refresh, kwargs={'force': force},
+                         name=f'aws-metrics-{self.name}', daemon=True).start()
+
+    def get(self, wait_s: float = 0) -> tuple[dict | None, dict]:
+        """(data, meta). Não chama a AWS na thread do chamador.
+
+        Sem snapshot algum (primeira subida), dispara a coleta e espera até
+        `wait_s` segundos por ela. Snapshot vencido sem coletor rodando
+        (Lambda) dispara refresh em background e devolve o atual.
+        """
+        snapshot = self.read()
+        if snapshot is None or (self.age(snapshot) or 0) >= self.refresh_interval:
+            self.refresh_async()
+        deadline = time.monotonic() + wait_s
+        while snapshot is None and time.monotonic() < deadline:
+            time.sleep(0.25)
+            snapshot = self.read()
+
+        snapshot = snapshot or {}
+        age = self.age(snapshot)
+        meta = {
+            'collected_at': _iso(snapshot['collected_at']) if snapshot.get('collected_at') else None,
+            'age_seconds': int(age) if age is not None else None,
+            'refresh_interval_seconds': self.refresh_interval,
+            'stale': age is None or age > self.refresh_interval * STALE_FACTOR,
+            'refreshing': self.refreshing(),
+            'error': snapshot.get('error'),
+        }
+        return snapshot.get('data'), meta
+
+
+metrics_cache = SnapshotCache('metrics', collect_metrics, METRICS_REFRESH_S)
+costs_cache = SnapshotCache('costs', collect_costs, COSTS_REFRESH_S)
+
+_collector_lock = threading.Lock()
+_collector_thread: threading.Thread | None = None
+
+
+def _collector_loop() -> None:
+    caches = (metrics_cache, costs_cache)
+    while True:
+        for cache in caches:
+            try:
+                cache.refresh()
+            except Exception as e:
+                print(f"[AWS-METRICS] {cache.name}: erro no coletor: {e}")
+        # Acorda com folga para pegar o menor intervalo (outros workers
+        # podem ter renovado antes — aí refresh() não coleta)
+        time.sleep(max(min(c.refresh_interval for c in caches) / 5, 5))
+
+
+def start_collector() -> None:
+    """Sobe a thread do coletor neste processo (idempotente)."""
+    global _collector_thread
+    if not COLLECTOR_ENABLED:
+        return
+    with _collector_lock:
+        if _collector_thread is not None and _collector_thread.is_alive():
+            return
+        _collector_thread = threading.Thread(target=_collector_loop, name='aws-metrics', daemon=True)
+        _collector_thread.start()
@@ -0,0 +1,131 @@
+"""
+Buffer em memória para escritas em lote no DynamoDB.
+
+Endpoints de ingestão (telemetria do kiosk, etc.) só validam e enfileiram;
+uma thread daemon por worker esvazia o buffer com `batch_writer` — 25 itens
+por BatchWriteItem, juntando itens de todas as requisições/dispositivos que
+chegaram no intervalo. O batch_writer já reenvia UnprocessedItems; se a
+chamada falhar de vez (throttling persistente, rede), o lote volta para o
+início do buffer e é tentado de novo com backoff.
+
+Limites:
+    max_items  — teto do buffer; offer() recusa o lote inteiro quando não
+                 cabe, e o endpoint responde 503 para o cliente reenviar
+    durabilidade — só memória: itens ainda não gravados se perdem se o
+                 processo morrer (flush no atexit e no worker_exit do
+                 Gunicorn — ver flush_all() — cobre o shutdown normal e a
+                 troca de workers no SIGHUP). Aceitável para telemetria e
+                 auditoria; NÃO usar para dado de negócio.
+"""
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from typing import Callable
+
+_BACKOFF_MAX_S = 60
+
+# Todos os buffers criados no processo, para flush_all() no shutdown do worker
+_buffers: list['BatchWriteBuffer'] = []
+
+
+def flush_all(timeout: float = 5.0) -> None:
+    """Esvazia todos os buffers do processo (chamado pelo worker_exit do Gunicorn)."""
+    for buf in list(_buffers):
+        buf.drain(timeout)
+
+
+class BatchWriteBuffer:
+    def __init__(self, name: str, get_table: Callable, key_attrs: list[str],
+                 max_items: int = 20000, flush_interval: float = 2.0):
+        self.name = name
+        self._get_table = get_table
+        self._key_attrs = key_attrs
+        self.max_items = max_items
+        self.flush_interval = flush_interval
+        self._items: list[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._failures = 0
+        self.written = 0
+        self.dropped = 0
+        _buffers.append(self)
+        atexit.register(self.drain)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def offer(self, items: list[dict]) -> bool:
+        """Enfileira o lote inteiro ou nada. False se o buffer está cheio."""
+        if not items:
+            return True
+        with self._lock:
+            if len(self._items) + len(items) > self.max_items:
+                self.dropped += len(items)
+                return False
+            self._items.extend(items)
+        self._ensure_thread()
+        return True
+
+    def flush(self) -> int:
+        """Grava tudo que está no buffer agora. Retorna quantos itens gravou.
+
+        Em erro, devolve os itens ao início do buffer e relança a exceção.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._items = self._items, []
+            if not batch:
+                return 0
+            try:
+                # overwrite_by_pkeys: chaves repetidas no mesmo lote (retry do
+                # cliente) fariam o BatchWriteItem inteiro falhar
+                with self._get_table().batch_writer(overwrite_by_pkeys=self._key_attrs) as writer:
+                    for item in batch:
+                        writer.put_item(Item=item)
+            except Exception:
+                with self._lock:
+                    room = max(self.max_items - len(self._items), 0)
+                    self.dropped += max(len(batch) - room, 0)
+                    self._items[:0] = batch[:room]
+                raise
+            self.written += len(batch)
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            delay = self.flush_interval
+            if self._failures:
+                delay = min(self.flush_interval * (2 ** self._failures), _BACKOFF_MAX_S)
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self._failures = 0
+            except Exception as e:
+                self._failures = min(self._failures + 1, 10)
+                print(f"[BATCH] {self.name}: flush falhou ({type(e).__name__}: {e}) — "
+                      f"{len(self)} item(ns) aguardando retry")
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f'batch-{self.name}', daemon=True)
+            self._thread.start()
+
+    def drain(self, timeout: float = 5.0) -> None:
+        """Tenta gravar tudo até `timeout` segundos (shutdown)."""
+        deadline = time.monotonic() + timeout
+        while len(self) and time.monotonic() < deadline:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[BATCH] {self.name}: flush no shutdown falhou: {e}")
+                time.sleep(0.5)
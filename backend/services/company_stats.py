@@ -0,0 +1,284 @@
+"""
+Contadores por empresa para o portal admin.
+
+Tabela CompanyStats (DynamoDB):
+    HASH  company_id
+    contadores  records, photos, active_employees     (Number, só via ADD)
+    diretório   empresa_nome, email, user_id, status, data_criacao,
+                numero_funcionarios, payments, paymentStatus
+
+O portal admin (routes/admin.py) lista empresas e monta o dashboard lendo só
+esta tabela — um item pequeno por empresa — em vez de varrer UserCompany e
+TimeRecords e contar funcionários empresa a empresa.
+
+Os contadores são mantidos nos caminhos de escrita com `ADD` (atômico, sem
+read-modify-write entre workers):
+    record_written()       — cada put_item em TimeRecords (+1 records; +1 photos
+                             se o registro tem foto_s3_key)
+    employee_activated()   — cadastro de funcionário
+    employee_deactivated() — exclusão lógica (ativo=False)
+e os campos de diretório com `SET` em sync_company() sempre que o admin cria
+ou altera a empresa.
+
+Falha ao atualizar contador nunca derruba a requisição — só loga. Desvios
+(falha de rede, put_item que sobrescreve o mesmo segundo, empresas anteriores
+à tabela) são corrigidos por scripts/rebuild_company_counters.py, que recalcula
+tudo a partir das tabelas de origem com rebuild_company().
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr, Key
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
+_table_name = os.environ.get('DYNAMODB_TABLE_COMPANY_STATS', 'CompanyStats')
+_table = None
+
+COUNTERS = ('records', 'photos', 'active_employees')
+
+# Campos copiados do item da empresa em UserCompany
+DIRECTORY_FIELDS = (
+    'empresa_nome', 'email', 'user_id', 'status', 'data_criacao',
+    'numero_funcionarios', 'payments', 'paymentStatus',
+)
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = _dynamodb.Table(_table_name)
+    return _table
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+# ── Escrita ──────────────────────────────────────────────────────────────────
+
+def increment(company_id: str, table=None, **deltas: int) -> bool:
+    """ADD atômico nos contadores. Deltas zerados são ignorados.
+
+    Retorna False (e loga) se a escrita falhar — nunca levanta exceção.
+    """
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not company_id or not deltas:
+        return True
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f'contador desconhecido: {sorted(unknown)}')
+
+    names = {f'#c{i}': name for i, name in enumerate(deltas)}
+    values = {f':c{i}': delta for i, delta in enumerate(deltas.values())}
+    try:
+        (table or _get_table()).update_item(
+            Key={'company_id': company_id},
+            UpdateExpression='ADD ' + ', '.join(f'#c{i} :c{i}' for i in range(len(deltas))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except Exception as e:
+        print(f"[STATS] Falha ao atualizar contadores de {company_id} {deltas}: {e}")
+        return False
+
+
+def record_written(company_id: str, registro: dict, table=None) -> bool:
+    """Conta um registro recém-gravado em TimeRecords."""
+    return increment(company_id, table=table, records=1,
+                     photos=1 if registro.get('foto_s3_key') else 0)
+
+
+def records_written(company_id: str, count: int, table=None) -> bool:
+    """Conta `count` registros sem foto gravados em lote (férias, atestados)."""
+    return increment(company_id, table=table, records=count)
+
+
+def employee_activated(company_id: str, table=None) -> bool:
+    return increment(company_id, table=table, active_employees=1)
+
+
+def employee_deactivated(company_id: str, table=None) -> bool:
+    return increment(company_id, table=table, active_employees=-1)
+
+
+def sync_company(company_id: str, table=None, **fields) -> bool:
+    """SET dos campos de diretório (nome, status, pagamentos...) da empresa."""
+    fields = {k: v for k, v in fields.items() if k in DIRECTORY_FIELDS}
+    if not company_id or not fields:
+        return True
+    names = {f'#f{i}': name for i, name in enumerate(fields)}
+    values = {f':f{i}': value for i, value in enumerate(fields.values())}
+    names['#u'] = 'updated_at'
+    values[':u'] = _now_iso()
+    try:
+        (table or _get_table()).update_item(
+            Key={'company_id': company_id},
+            UpdateExpression='SET ' + ', '.join(f'#f{i} = :f{i}' for i in range(len(fields))) + ', #u = :u',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except Exception as e:
+        print(f"[STATS] Falha ao sincronizar empresa {company_id}: {e}")
+        return False
+
+
+def sync_payment(company_id: str, month_year: str, is_paid: bool, table=None) -> bool:
+    """Atualiza um mês do mapa payments (cria o mapa se ainda não existe)."""
+    t = table or _get_table()
+    try:
+        try:
+            t.update_item(
+                Key={'company_id': company_id},
+                UpdateExpression='SET payments.#my = :p, updated_at = :u',
+                ConditionExpression=Attr('payments').exists(),
+                ExpressionAttributeNames={'#my': month_year},
+                ExpressionAttributeValues={':p': is_paid, ':u': _now_iso()},
+            )
+        except t.meta.client.exceptions.ConditionalCheckFailedException:
+            t.update_item(
+                Key={'company_id': company_id},
+                UpdateExpression='SET payments = :m, updated_at = :u',
+                ExpressionAttributeValues={':m': {month_year: is_paid}, ':u': _now_iso()},
+            )
+        return True
+    except Exception as e:
+        print(f"[STATS] Falha ao sincronizar pagamento de {company_id}: {e}")
+        return False
+
+
+# ── Leitura ──────────────────────────────────────────────────────────────────
+
+def load_all(table=None) -> list[dict]:
+    """Todos os itens de CompanyStats (um por empresa)."""
+    t = table or _get_table()
+    resp = t.scan()
+    items = resp.get('Items', [])
+    while 'LastEvaluatedKey' in resp:
+        resp = t.scan(ExclusiveStartKey=resp['LastEvaluatedKey'])
+        items.extend(resp.get('Items', []))
+    return items
+
+
+def get_company(company_id: str, table=None) -> dict | None:
+    return (table or _get_table()).get_item(Key={'company_id': company_id}).get('Item')
+
+
+def data_version(company_id: str, table=None) -> str | None:
+    """Versão barata dos dados de ponto da empresa: muda a cada registro gravado
+    ou funcionário ativado/desativado. Usada como chave de caches de leitura
+    (chatbot RH). None se a leitura falhar — o chamador não deve cachear.
+    """
+    try:
+        item = (table or _get_table()).get_item(
+            Key={'company_id': company_id},
+            ProjectionExpression='#r, #a',
+            ExpressionAttributeNames={'#r': 'records', '#a': 'active_employees'},
+        ).get('Item') or {}
+    except Exception as e:
+        print(f"[STATS] Falha ao ler versão de {company_id}: {e}")
+        return None
+    return f"{_int(item.get('records'))}:{_int(item.get('active_employees'))}"
+
+
+def company_summary(item: dict) -> dict:
+    """Item de CompanyStats no formato da listagem do portal admin."""
+    return {
+        'companyId': item.get('company_id', ''),
+        'companyName': item.get('empresa_nome', ''),
+        'email': item.get('email', ''),
+        'status': item.get('status', 'active'),
+        'dateCreated': item.get('data_criacao', ''),
+        'activeEmployees': max(_int(item.get('active_employees')), 0),
+        'expectedEmployees': _int(item.get('numero_funcionarios')),
+        'payments': item.get('payments') or {},
+        'userId': item.get('user_id', ''),
+        'recordsCount': _int(item.get('records')),
+        'photosCount': _int(item.get('photos')),
+    }
+
+
+def dashboard_totals(items: list[dict]) -> dict:
+    """Agregados do dashboard admin a partir dos itens de CompanyStats."""
+    active = paid = 0
+    for item in items:
+        if str(item.get('status', 'active')).lower() == 'active':
+            active += 1
+        if str(item.get('paymentStatus', 'unpaid')).lower() == 'paid':
+            paid += 1
+    total = len(items)
+    last = sorted(items, key=lambda x: x.get('data_criacao', ''), reverse=True)[:5]
+    return {
+        'totalCompanies': total,
+        'totalEmployees': sum(max(_int(i.get('active_employees')), 0) for i in items),
+        'totalTimeEntries': sum(_int(i.get('records')) for i in items),
+        'totalPhotos': sum(_int(i.get('photos')) for i in items),
+        'activeCompanies': active,
+        'inactiveCompanies': total - active,
+        'paidCompanies': paid,
+        'unpaidCompanies': total - paid,
+        'lastCreatedCompanies': [
+            {
+                'companyId': c.get('company_id', ''),
+                'companyName': c.get('empresa_nome', ''),
+                'dateCreated': c.get('data_criacao', ''),
+                'status': c.get('status', 'active'),
+            }
+            for c in last
+        ],
+    }
+
+
+# ── Rebuild ──────────────────────────────────────────────────────────────────
+
+def _count(table, company_id: str, filter_expression=None) -> int:
+    kwargs = {'KeyConditionExpression': Key('company_id').eq(company_id), 'Select': 'COUNT'}
+    if filter_expression is not None:
+        kwargs['FilterExpression'] = filter_expression
+    total = 0
+    while True:
+        resp = table.query(**kwargs)
+        total += resp.get('Count', 0)
+        last_key = resp.get('LastEvaluatedKey')
+        if not last_key:
+            return total
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def count_company(company_id: str, records_table, employees_table) -> dict:
+    """Recalcula os contadores de uma empresa a partir das tabelas de origem."""
+    return {
+        'records': _count(records_table, company_id),
+        'photos': _count(records_table, company_id,
+                         Attr('foto_s3_key').exists() & Attr('foto_s3_key').ne('')),
+        'active_employees': _count(employees_table, company_id, Attr('ativo').eq(True)),
+    }
+
+
+def rebuild_company(company: dict, records_table, employees_table, table=None) -> dict:
+    """Regrava o item da empresa (diretório + contadores absolutos).
+
+    `company` é o item da empresa em UserCompany. Incrementos que chegarem
+    durante a contagem podem ficar de fora — rodar de novo converge.
+    """
+    company_id = company['company_id']
+    counts = count_company(company_id, records_table, employees_table)
+    item = {'company_id': company_id, **counts, 'rebuilt_at': _now_iso(), 'updated_at': _now_iso()}
+    for field in DIRECTORY_FIELDS:
+        value = company.get(field)
+        if value is not None and value != '':
+            item[field] = Decimal(str(value)) if isinstance(value, float) else value
+    (table or _get_table()).put_item(Item=item)
+    return item
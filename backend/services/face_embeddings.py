@@ -0,0 +1,262 @@
+"""
+Store de embeddings faciais para reconhecimento on-device (kiosk Android).
+
+Tabela FaceEmbeddings (DynamoDB):
+    HASH  company_id
+    RANGE model_employee      — '<model_version>#<employee_id>'
+    GSI   company_model-updated_at-index
+          HASH  company_model — '<company_id>#<model_version>'
+          RANGE updated_at    — ISO-8601 UTC (ordenável lexicograficamente)
+
+Cada item guarda o vetor já normalizado como float32 little-endian empacotado
+(atributo Binary `embedding`) — ~768 bytes para 192d, contra ~3 KB de uma
+lista de Decimals. Remoções viram tombstone (`deleted=True`) em vez de
+delete_item, para que o pull incremental (`updated_since`) consiga avisar os
+tablets que o funcionário saiu.
+
+Formato binário de resposta (`pack_embeddings`):
+    header  : magic 'RPFE' | version u8 | dtype u8 (1=f16, 2=f32) | dim u16 | count u32
+    por item: len u16 + employee_id utf-8 | len u8 + updated_at ascii | flags u8 (bit0=deleted)
+              | dim * (2|4) bytes (omitido em tombstones)
+Tudo little-endian.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Iterable
+
+from boto3.dynamodb.conditions import Attr, Key
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
+_table_name = os.environ.get('DYNAMODB_TABLE_FACE_EMBEDDINGS', 'FaceEmbeddings')
+_table = None
+
+UPDATED_INDEX = 'company_model-updated_at-index'
+
+# Mesmo identificador usado pelo app (mobile/src/features/facial/providers/tfliteProvider.ts)
+DEFAULT_MODEL_VERSION = os.environ.get('FACE_EMBEDDING_MODEL_VERSION', 'mobilefacenet@112x112-192d')
+
+MAX_DIM = 1024
+
+_MAGIC = b'RPFE'
+_FORMAT_VERSION = 1
+DTYPE_F16 = 1
+DTYPE_F32 = 2
+_DTYPE_CODES = {'f16': DTYPE_F16, 'f32': DTYPE_F32}
+_DTYPE_STRUCT = {DTYPE_F16: ('e', 2), DTYPE_F32: ('f', 4)}
+_HEADER = struct.Struct('<4sBBHI')
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = _dynamodb.Table(_table_name)
+    return _table
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+# ── Codificação ──────────────────────────────────────────────────────────────
+
+def encode_vector(values: Iterable[float]) -> bytes:
+    """Empacota o vetor como float32 little-endian (formato de armazenamento)."""
+    vals = [float(v) for v in values]
+    return struct.pack(f'<{len(vals)}f', *vals)
+
+
+def decode_vector(raw: bytes) -> list[float]:
+    """Inverso de encode_vector. Aceita bytes ou boto3 Binary."""
+    data = bytes(raw.value) if hasattr(raw, 'value') else bytes(raw)
+    return list(struct.unpack(f'<{len(data) // 4}f', data))
+
+
+def parse_dtype(value: str | None) -> int:
+    """'f16'/'f32' → código do header. ValueError para qualquer outro valor."""
+    code = _DTYPE_CODES.get((value or 'f16').lower())
+    if code is None:
+        raise ValueError(f"dtype inválido: {value!r} (use f16 ou f32)")
+    return code
+
+
+def pack_embeddings(items: list[dict], dtype: int = DTYPE_F16) -> bytes:
+    """Serializa itens {employee_id, embedding, updated_at, deleted} no formato RPFE.
+
+    Todos os vetores não-deletados precisam ter a mesma dimensão — o header
+    carrega um único `dim`.
+    """
+    fmt_char, _ = _DTYPE_STRUCT[dtype]
+    dims = {len(it['embedding']) for it in items if not it.get('deleted')}
+    if len(dims) > 1:
+        raise ValueError(f"dimensões divergentes no lote: {sorted(dims)}")
+    dim = dims.pop() if dims else 0
+
+    parts = [_HEADER.pack(_MAGIC, _FORMAT_VERSION, dtype, dim, len(items))]
+    for it in items:
+        emp = str(it['employee_id']).encode('utf-8')
+        upd = str(it.get('updated_at') or '').encode('ascii')
+        deleted = bool(it.get('deleted'))
+        parts.append(struct.pack('<H', len(emp)) + emp)
+        parts.append(struct.pack('<B', len(upd)) + upd)
+        parts.append(struct.pack('<B', 1 if deleted else 0))
+        if not deleted:
+            parts.append(struct.pack(f'<{dim}{fmt_char}', *it['embedding']))
+    return b''.join(parts)
+
+
+def unpack_embeddings(data: bytes) -> tuple[int, int, list[dict]]:
+    """Lê um payload RPFE. Retorna (dtype, dim, items). Usado em testes/ferramentas."""
+    magic, version, dtype, dim, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _FORMAT_VERSION:
+        raise ValueError('payload RPFE inválido')
+    fmt_char, size = _DTYPE_STRUCT[dtype]
+    off = _HEADER.size
+    items = []
+    for _ in range(count):
+        (n,) = struct.unpack_from('<H', data, off)
+        off += 2
+        emp = data[off:off + n].decode('utf-8')
+        off += n
+        (n,) = struct.unpack_from('<B', data, off)
+        off += 1
+        upd = data[off:off + n].decode('ascii')
+        off += n
+        (flags,) = struct.unpack_from('<B', data, off)
+        off += 1
+        item = {'employee_id': emp, 'updated_at': upd, 'deleted': bool(flags & 1)}
+        if not item['deleted']:
+            item['embedding'] = list(struct.unpack_from(f'<{dim}{fmt_char}', data, off))
+            off += dim * size
+        items.append(item)
+    return dtype, dim, items
+
+
+def compute_etag(company_id: str, model_version: str, since: str, variant: str, items: list[dict]) -> str:
+    """ETag derivado do conteúdo lógico da resposta (employee_id + updated_at).
+
+    `variant` identifica a representação (json/f16/f32) — representações
+    diferentes do mesmo conjunto não podem compartilhar ETag.
+    """
+    h = hashlib.sha256()
+    h.update(f"{company_id}|{model_version}|{since}|{variant}".encode('utf-8'))
+    for it in items:
+        h.update(f"|{it['employee_id']}@{it.get('updated_at', '')}{'-' if it.get('deleted') else ''}".encode('utf-8'))
+    return f'"{h.hexdigest()[:32]}"'
+
+
+# ── Persistência ─────────────────────────────────────────────────────────────
+
+def _item_to_dict(item: dict) -> dict:
+    out = {
+        'employee_id': item.get('employee_id', ''),
+        'model_version': item.get('model_version', ''),
+        'updated_at': item.get('updated_at', ''),
+        'deleted': bool(item.get('deleted', False)),
+    }
+    if not out['deleted'] and item.get('embedding') is not None:
+        out['embedding'] = decode_vector(item['embedding'])
+    return out
+
+
+def put_embedding(company_id: str, employee_id: str, embedding: list[float],
+                  model_version: str = DEFAULT_MODEL_VERSION) -> str:
+    """Grava/atualiza o embedding do funcionário. Retorna o updated_at gravado."""
+    if not embedding or len(embedding) > MAX_DIM:
+        raise ValueError('embedding vazio ou com dimensão excessiva')
+    updated_at = _now_iso()
+    _get_table().put_item(Item={
+        'company_id': company_id,
+        'model_employee': f"{model_version}#{employee_id}",
+        'company_model': f"{company_id}#{model_version}",
+        'employee_id': employee_id,
+        'model_version': model_version,
+        'dim': len(embedding),
+        'embedding': encode_vector(embedding),
+        'updated_at': updated_at,
+        'deleted': False,
+    })
+    return updated_at
+
+
+def mark_deleted(company_id: str, employee_id: str, model_version: str | None = None) -> int:
+    """Converte os embeddings do funcionário em tombstones.
+
+    Sem `model_version`, invalida todas as versões — usado quando a foto de
+    cadastro muda ou o funcionário é excluído. Retorna quantos itens mudaram.
+    """
+    table = _get_table()
+    prefix = f"{model_version}#{employee_id}" if model_version else None
+    if prefix:
+        resp = table.get_item(Key={'company_id': company_id, 'model_employee': prefix})
+        targets = [resp['Item']] if resp.get('Item') else []
+    else:
+        targets = _query_all(
+            table,
+            KeyConditionExpression=Key('company_id').eq(company_id),
+            FilterExpression=Attr('employee_id').eq(employee_id),
+        )
+
+    updated_at = _now_iso()
+    changed = 0
+    for it in targets:
+        if it.get('deleted'):
+            continue
+        table.update_item(
+            Key={'company_id': company_id, 'model_employee': it['model_employee']},
+            UpdateExpression='SET deleted = :t, updated_at = :u REMOVE embedding',
+            ExpressionAttributeValues={':t': True, ':u': updated_at},
+        )
+        changed += 1
+    return changed
+
+
+def list_embeddings(company_id: str, model_version: str = DEFAULT_MODEL_VERSION,
+                    updated_since: str | None = None) -> list[dict]:
+    """Embeddings da empresa para a versão do modelo.
+
+    Sem `updated_since` devolve o snapshot completo (sem tombstones). Com ele,
+    usa o GSI por updated_at e devolve só o delta — incluindo tombstones.
+    Ordenado por updated_at para o cliente poder avançar o cursor com o último.
+    """
+    table = _get_table()
+    if updated_since:
+        rows = _query_all(
+            table,
+            IndexName=UPDATED_INDEX,
+            KeyConditionExpression=(
+                Key('company_model').eq(f"{company_id}#{model_version}")
+                & Key('updated_at').gt(updated_since)
+            ),
+        )
+        items = [_item_to_dict(r) for r in rows]
+    else:
+        rows = _query_all(
+            table,
+            KeyConditionExpression=(
+                Key('company_id').eq(company_id)
+                & Key('model_employee').begins_with(f"{model_version}#")
+            ),
+        )
+        items = [_item_to_dict(r) for r in rows if not r.get('deleted')]
+    items.sort(key=lambda it: it['updated_at'])
+    return items
+
+
+def _query_all(table, **kwargs) -> list[dict]:
+    items: list[dict] = []
+    last = None
+    while True:
+        kw = dict(kwargs)
+        if last:
+            kw['ExclusiveStartKey'] = last
+        resp = table.query(**kw)
+        items.extend(resp.get('Items', []))
+        last = resp.get('LastEvaluatedKey')
+        if not last:
+            break
+    return items
@@ -0,0 +1,241 @@
+"""
+Verificação facial assíncrona para pontos aceitos em modo degradado.
+
+Quando o Rekognition está lento, com throttling ou com o circuito aberto
+(`reconhecer_funcionario` → status UNAVAILABLE), o endpoint de ponto NÃO
+bloqueia o funcionário: grava o registro com
+`verification_status='PENDING_VERIFICATION'` e enfileira aqui uma verificação.
+
+Fila durável em disco (VERIFICATION_SPOOL_DIR):
+    <job_id>.json  — metadados do job (company_id, record_key, employee_id, tentativas)
+    <job_id>.jpg   — cópia local da foto enviada (evita GET no S3 para verificar)
+
+Se o upload da foto falhou no ponto (job sem foto_s3_key), o job envia a
+cópia do spool ao S3 e grava a key no registro antes de apagá-la. A cópia
+só é apagada depois do upload: esgotadas as tentativas, a verificação é
+gravada com `upload_falhou` no detalhe e o job continua só reenviando a foto.
+
+Cada worker Gunicorn roda uma thread daemon que varre o diretório (ver
+utils/spool.py: posse por rename atômico, recuperação de jobs de workers
+mortos) — nenhum ponto fica sem verificação.
+
+Resultado gravado no próprio TimeRecord:
+    VERIFIED      — rosto confere com o funcionário do token (inclusive com
+                    baixa confiança, como no ponto síncrono)
+    MISMATCH      — rosto de outra pessoa / não reconhecido → evento de auditoria
+                    para o RH revisar
+    UNVERIFIED    — esgotou as tentativas sem resposta útil do Rekognition
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from services.audit_service import log_event
+from services.usage_metering import usage_context
+from utils.aws import MATCH_STATUSES, reconhecer_funcionario, rekognition_breaker, tabela_registros
+from utils.photo_derivatives import item_fields as foto_derivados
+from utils.s3 import upload_photo_to_s3
+from utils.spool import Spool
+
+SPOOL_DIR = os.environ.get(
+    'VERIFICATION_SPOOL_DIR',
+    os.path.join(tempfile.gettempdir(), 'registraponto-verificacao'),
+)
+MAX_ATTEMPTS = int(os.environ.get('VERIFICATION_MAX_ATTEMPTS', '12'))
+_BACKOFF_BASE_S = 15
+_BACKOFF_MAX_S = 30 * 60
+_POLL_INTERVAL_S = 5
+
+_worker_lock = threading.Lock()
+_worker_thread: threading.Thread | None = None
+_wakeup = threading.Event()
+
+
+def _backoff(attempts: int) -> float:
+    return min(_BACKOFF_BASE_S * (2 ** max(attempts - 1, 0)), _BACKOFF_MAX_S)
+
+
+def _spool() -> Spool:
+    return Spool(SPOOL_DIR, blob_ext='jpg')
+
+
+def enqueue_verification(company_id: str, record_key: str, employee_id: str,
+                         image_path: str, foto_s3_key: str | None = None) -> str:
+    """Copia a foto para o spool e registra o job. Retorna o job_id.
+
+    Chamado DEPOIS do put_item do registro — se o processo morrer entre as
+    duas coisas o ponto existe, só fica PENDING até um RH revisar.
+    """
+    job_id = _spool().put({
+        'company_id': company_id,
+        'record_key': record_key,
+        'employee_id': employee_id,
+        'foto_s3_key': foto_s3_key,
+        'next_attempt_at': time.time() + _BACKOFF_BASE_S,
+        'created_at': time.time(),
+        'enqueued_at': datetime.now(timezone.utc).isoformat(),
+    }, blob_src_path=image_path)
+    start_worker()
+    return job_id
+
+
+def _recover_orphans() -> None:
+    for job_id in _spool().recover_orphans():
+        print(f"[VERIFICACAO] Job {job_id} recuperado de worker morto")
+
+
+def _finish(job: dict, work_path: str) -> None:
+    _spool().finish(job, work_path)
+
+
+def _requeue(job: dict, work_path: str) -> None:
+    _spool().release(job, work_path, _backoff(job['attempts']))
+
+
+def _set_record_status(job: dict, status: str, detail: dict) -> None:
+    expr_values = {
+        ':st': status,
+        ':at': datetime.now(timezone.utc).isoformat(),
+        ':dt': detail,
+    }
+    tabela_registros.update_item(
+        Key={'company_id': job['company_id'], 'employee_id#date_time': job['record_key']},
+        UpdateExpression='SET verification_status = :st, verified_at = :at, verification_detail = :dt',
+        ExpressionAttributeValues=expr_values,
+    )
+
+
+def _upload_missing_photo(job: dict, image_path: str) -> None:
+    """Envia a cópia do spool ao S3 e grava foto_s3_key (e derivados) no registro."""
+    taken_at = datetime.strptime(job['record_key'].rsplit('#', 1)[1], '%Y-%m-%d %H:%M:%S')
+    with open(image_path, 'rb') as f:
+        photo = f.read()
+    key, _ = upload_photo_to_s3(photo, job['company_id'], job['employee_id'], taken_at, background=False)
+    fields = {'foto_s3_key': key, **foto_derivados(key, photo)}
+    expr = 'SET ' + ', '.join(f'{name} = :f{i}' for i, name in enumerate(fields))
+    if job.get('verification_status'):
+        expr += ' REMOVE verification_detail.upload_falhou'
+    tabela_registros.update_item(
+        Key={'company_id': job['company_id'], 'employee_id#date_time': job['record_key']},
+        UpdateExpression=expr,
+        ExpressionAttributeValues={f':f{i}': value for i, value in enumerate(fields.values())},
+    )
+    job['foto_s3_key'] = key
+
+
+def _flag_to_hr(job: dict, status: str, detail: dict) -> None:
+    log_event(
+        company_id=job['company_id'],
+        user_id='sistema',
+        user_name='Verificação facial',
+        entity='registro',
+        entity_id=job['record_key'],
+        action='VERIFICACAO_FACIAL_DIVERGENTE' if status == 'MISMATCH' else 'VERIFICACAO_FACIAL_PENDENTE',
+        before=None,
+        after={'verification_status': status, **detail},
+        employee_id=job['employee_id'],
+        reason='Ponto aceito com Rekognition indisponível; verificação posterior não confirmou a identidade.',
+    )
+
+
+def process_job(job: dict, work_path: str) -> str:
+    """Executa uma tentativa. Retorna o status final ou 'RETRY'."""
+    image_path = _spool().blob_path(job['job_id'])
+    if not os.path.exists(image_path):
+        print(f"[VERIFICACAO] Foto do job {job['job_id']} ausente — marcando UNVERIFIED")
+        status, detail = 'UNVERIFIED', {'motivo': 'foto_ausente'}
+    else:
+        job['attempts'] = int(job.get('attempts', 0)) + 1
+        if not job.get('foto_s3_key'):
+            try:
+                _upload_missing_photo(job, image_path)
+            except Exception as e:
+                print(f"[VERIFICACAO] Falha ao enviar foto do job {job['job_id']}: {e}")
+                if job.get('verification_status') or job['attempts'] < MAX_ATTEMPTS:
+                    _requeue(job, work_path)
+                    return 'RETRY'
+        if job.get('verification_status'):
+            # Verificação gravada numa passagem anterior; faltava só a foto.
+            print(f"[VERIFICACAO] Foto do job {job['job_id']} enviada após a verificação")
+            _finish(job, work_path)
+            return job['verification_status']
+        match = reconhecer_funcionario(image_path, expected_company_id=job['company_id'])
+        rek_status = match.get('status') if isinstance(match, dict) else 'ERROR'
+
+        if rek_status in ('UNAVAILABLE', 'ERROR'):
+            if job['attempts'] < MAX_ATTEMPTS:
+                _requeue(job, work_path)
+                return 'RETRY'
+            status, detail = 'UNVERIFIED', {'motivo': match.get('reason', rek_status), 'tentativas': job['attempts']}
+        elif rek_status in MATCH_STATUSES and match.get('employee_id') == job['employee_id']:
+            # Mesma regra do ponto síncrono: baixa confiança do próprio
+            # funcionário é aceita (só fica registrada no detalhe).
+            status, detail = 'VERIFIED', {'similarity': str(round(float(match.get('similarity', 0)), 2))}
+            if rek_status == 'LOW_CONFIDENCE':
+                detail['baixa_confianca'] = True
+        else:
+            status = 'MISMATCH'
+            detail = {'rekognition_status': rek_status}
+            if match.get('employee_id'):
+                detail['matched_employee_id'] = match['employee_id']
+            if match.get('similarity') is not None:
+                detail['similarity'] = str(round(float(match['similarity']), 2))
+        if not job.get('foto_s3_key'):
+            detail['upload_falhou'] = True
+
+    try:
+        _set_record_status(job, status, detail)
+    except Exception as e:
+        # DynamoDB indisponível — não perder o resultado, tentar de novo depois
+        print(f"[VERIFICACAO] Falha ao gravar status do job {job['job_id']}: {e}")
+        _requeue(job, work_path)
+        return 'RETRY'
+
+    if status != 'VERIFIED':
+        _flag_to_hr(job, status, detail)
+    print(f"[VERIFICACAO] Job {job['job_id']} record={job['record_key']} → {status}")
+    if detail.get('upload_falhou'):
+        # A cópia do spool é a única da foto: fica na fila só para o upload.
+        job['verification_status'] = status
+        _requeue(job, work_path)
+        return status
+    _finish(job, work_path)
+    return status
+
+
+def _worker_loop() -> None:
+    _recover_orphans()
+    while True:
+        try:
+            if rekognition_breaker.state == 'open':
+                _wakeup.wait(_POLL_INTERVAL_S)
+                _wakeup.clear()
+                continue
+            claimed = _spool().claim_due()
+            if claimed is None:
+                _recover_orphans()
+                _wakeup.wait(_POLL_INTERVAL_S)
+                _wakeup.clear()
+                continue
+            work_path, job = claimed
+            with usage_context(job.get('company_id'), 'job:facial-verification'):
+                process_job(job, work_path)
+        except Exception as e:
+            print(f"[VERIFICACAO] Erro no worker: {e}")
+            time.sleep(_POLL_INTERVAL_S)
+
+
+def start_worker() -> None:
+    """Sobe a thread de verificação deste processo (idempotente, fork-safe)."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            _wakeup.set()
+            return
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        _worker_thread = threading.Thread(target=_worker_loop, name='facial-verification', daemon=True)
+        _worker_thread.start()
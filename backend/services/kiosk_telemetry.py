@@ -0,0 +1,532 @@
+"""
+Layout de chaves da tabela KioskTelemetry e consultas do admin.
+
+Itens base (pk/sk):
+    LOG#<company_id>#<device_id>   sk <ts_ms>#<event>    — evento do kioskLogger
+    HEARTBEAT#<company_id>         sk <device_id>        — último estado do tablet
+    FLEET                          sk <company_id>       — mapa devices da empresa
+                                                           (visão da frota, ver abaixo)
+    ROLLUP#<company_id> | ROLLUP#ALL                     — contadores agregados (ver abaixo)
+    CONTROL#update                 sk flag               — force_update
+
+Índices de tempo dos logs (atributos gravados na ingestão; itens que não são
+LOG# não têm esses atributos, então não entram nos GSIs):
+    GSI bucket-ts-index
+        HASH  log_bucket     — 'LOGBUCKET#YYYY-MM-DDTHH' (hora UTC do ts)
+        RANGE ts             — Unix ms
+    GSI company_event-ts-index
+        HASH  company_event  — '<company_id>#<EVENT>'
+        RANGE ts
+
+Uma janela [start, end] vira uma query por hora (da mais recente para a mais
+antiga, parando ao atingir o limite) — ou uma única query no índice
+company_event quando empresa e evento são informados. Nada de scan.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr, Key
+
+BUCKET_INDEX = 'bucket-ts-index'
+COMPANY_EVENT_INDEX = 'company_event-ts-index'
+BUCKET_PREFIX = 'LOGBUCKET#'
+MAX_WINDOW_HOURS = 31 * 24  # TTL dos logs é 30 dias
+
+
+def log_bucket(ts_ms: int) -> str:
+    hour = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return f"{BUCKET_PREFIX}{hour.strftime('%Y-%m-%dT%H')}"
+
+
+def log_index_fields(company_id: str, event: str, ts_ms: int) -> dict:
+    """Atributos dos GSIs de tempo — gravar junto com todo item LOG#."""
+    return {
+        'log_bucket': log_bucket(ts_ms),
+        'company_event': f"{company_id}#{event}",
+    }
+
+
+def buckets_between(start_ms: int, end_ms: int) -> list[str]:
+    """Buckets horários que cobrem [start_ms, end_ms], do mais recente ao mais antigo."""
+    start = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    end = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if end < start:
+        return []
+    if (end - start) > timedelta(hours=MAX_WINDOW_HOURS):
+        start = end - timedelta(hours=MAX_WINDOW_HOURS)
+    buckets = []
+    hour = end
+    while hour >= start:
+        buckets.append(f"{BUCKET_PREFIX}{hour.strftime('%Y-%m-%dT%H')}")
+        hour -= timedelta(hours=1)
+    return buckets
+
+
+def _query_desc(table, limit: int, **kwargs) -> list[dict]:
+    items: list[dict] = []
+    kwargs['ScanIndexForward'] = False
+    while len(items) < limit:
+        resp = table.query(**kwargs)
+        items.extend(resp.get('Items', []))
+        last = resp.get('LastEvaluatedKey')
+        if not last:
+            break
+        kwargs['ExclusiveStartKey'] = last
+    return items[:limit]
+
+
+def query_logs(table, start_ms: int, end_ms: int, company_id: str = '',
+               event: str = '', limit: int = 500) -> list[dict]:
+    """Logs em [start_ms, end_ms], mais recentes primeiro, no máximo `limit`."""
+    ts_range = Key('ts').between(start_ms, end_ms)
+
+    if company_id and event:
+        return _query_desc(
+            table, limit,
+            IndexName=COMPANY_EVENT_INDEX,
+            KeyConditionExpression=Key('company_event').eq(f"{company_id}#{event}") & ts_range,
+        )
+
+    filter_expr = None
+    if company_id:
+        filter_expr = Attr('company_id').eq(company_id)
+    if event:
+        filter_expr = Attr('event').eq(event)
+
+    items: list[dict] = []
+    for bucket in buckets_between(start_ms, end_ms):
+        kwargs = {
+            'IndexName': BUCKET_INDEX,
+            'KeyConditionExpression': Key('log_bucket').eq(bucket) & ts_range,
+        }
+        if filter_expr is not None:
+            kwargs['FilterExpression'] = filter_expr
+        items.extend(_query_desc(table, limit - len(items), **kwargs))
+        if len(items) >= limit:
+            break
+    return items
+
+
+# ── Heartbeats ───────────────────────────────────────────────────────────────
+# Cada tablet manda heartbeat a cada ~5 min, quase sempre igual ao anterior.
+# O estado fica em memória por worker e só vai para o DynamoDB quando muda
+# algo relevante (versão, faixa de bateria, faixa da fila offline, wifi) ou
+# quando o último write passa de HEARTBEAT_MAX_STALENESS_S. Por isso
+# `last_seen` no banco pode atrasar até esse limite — ONLINE_WINDOW_S leva
+# isso em conta.
+#
+# Visão da frota (materializada a cada write):
+#     pk FLEET   sk <company_id>   devices: {device_id: {version, battery,
+#                                             wifi, queue_size, last_seen, ...}}
+# Uma query em pk=FLEET devolve todos os tablets de todas as empresas.
+
+FLEET_PK = 'FLEET'
+HEARTBEAT_MAX_STALENESS_S = int(os.getenv('KIOSK_HEARTBEAT_MAX_STALENESS_S', str(15 * 60)))
+ONLINE_WINDOW_S = HEARTBEAT_MAX_STALENESS_S + 10 * 60
+FLEET_RETENTION_S = 7 * 24 * 3600  # mesmo TTL dos itens HEARTBEAT#
+
+
+def _battery_band(battery) -> str | None:
+    if battery is None:
+        return None
+    b = int(battery)
+    if b < 15:
+        return 'critical'
+    if b < 30:
+        return 'low'
+    if b < 60:
+        return 'mid'
+    return 'high'
+
+
+def _queue_band(queue_size: int) -> str:
+    if queue_size <= 0:
+        return '0'
+    if queue_size < 10:
+        return '1-9'
+    if queue_size < 50:
+        return '10-49'
+    return '50+'
+
+
+def heartbeat_signature(state: dict) -> tuple:
+    """Campos cuja mudança justifica gravar o heartbeat na hora."""
+    return (
+        state.get('version'),
+        _battery_band(state.get('battery')),
+        _queue_band(int(state.get('queue_size') or 0)),
+        bool(state.get('wifi')),
+    )
+
+
+class HeartbeatCoalescer:
+    def __init__(self, max_staleness_s: float = HEARTBEAT_MAX_STALENESS_S, max_devices: int = 50000):
+        self.max_staleness_s = max_staleness_s
+        self.max_devices = max_devices
+        self._last: dict[tuple[str, str], tuple[tuple, float]] = {}
+        self._lock = threading.Lock()
+
+    def should_write(self, company_id: str, device_id: str, state: dict) -> bool:
+        """True se este heartbeat deve ir para o banco (e registra o write)."""
+        key = (company_id, device_id)
+        sig = heartbeat_signature(state)
+        now = time.monotonic()
+        with self._lock:
+            prev = self._last.get(key)
+            if prev and prev[0] == sig and now - prev[1] < self.max_staleness_s:
+                return False
+            if len(self._last) >= self.max_devices and key not in self._last:
+                self._last.clear()
+            self._last[key] = (sig, now)
+            return True
+
+    def forget(self, company_id: str, device_id: str) -> None:
+        """Desfaz o registro quando o write falhou — o próximo heartbeat grava."""
+        with self._lock:
+            self._last.pop((company_id, device_id), None)
+
+
+def update_fleet(table, company_id: str, device_id: str, state: dict) -> None:
+    """Atualiza a entrada do tablet no item FLEET/<company_id>."""
+    key = {'pk': FLEET_PK, 'sk': company_id}
+    names = {'#d': device_id}
+    values = {':s': state, ':u': state.get('last_seen')}
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET devices.#d = :s, updated_at = :u',
+            ConditionExpression='attribute_exists(devices)',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Primeiro tablet da empresa: cria o mapa e tenta de novo
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET devices = if_not_exists(devices, :empty), company_id = :c',
+            ExpressionAttributeValues={':empty': {}, ':c': company_id},
+        )
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET devices.#d = :s, updated_at = :u',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+
+def _parse_iso(value: str) -> float | None:
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def fleet_devices(fleet_items: list[dict], now: float | None = None) -> list[dict]:
+    """Achata itens FLEET em uma lista de tablets com `online` calculado.
+
+    Tablets sem heartbeat há mais de FLEET_RETENTION_S são omitidos.
+    """
+    now = time.time() if now is None else now
+    devices = []
+    for fleet in fleet_items:
+        for device_id, state in (fleet.get('devices') or {}).items():
+            seen = _parse_iso(state.get('last_seen'))
+            if seen is None or now - seen > FLEET_RETENTION_S:
+                continue
+            devices.append({
+                # Decimal → int: o jsonify serializaria como string
+                **{k: int(v) if isinstance(v, Decimal) else v for k, v in state.items()},
+                'company_id': fleet.get('company_id') or fleet.get('sk'),
+                'device_id': device_id,
+                'online': now - seen <= ONLINE_WINDOW_S,
+            })
+    devices.sort(key=lambda d: d.get('last_seen', ''), reverse=True)
+    return devices
+
+
+def fleet_summary(devices: list[dict]) -> dict:
+    """Contagem online/offline global e por empresa."""
+    per_company: dict[str, dict] = {}
+    for d in devices:
+        c = per_company.setdefault(d['company_id'], {'company_id': d['company_id'], 'total': 0, 'online': 0, 'offline': 0})
+        c['total'] += 1
+        c['online' if d['online'] else 'offline'] += 1
+    companies = sorted(per_company.values(), key=lambda c: (-c['offline'], c['company_id']))
+    return {
+        'total': sum(c['total'] for c in companies),
+        'online': sum(c['online'] for c in companies),
+        'offline': sum(c['offline'] for c in companies),
+        'online_window_s': ONLINE_WINDOW_S,
+        'companies': companies,
+    }
+
+
+def load_fleet(table, company_id: str = '') -> list[dict]:
+    """Itens FLEET de uma empresa (get_item) ou de todas (query em uma partição)."""
+    if company_id:
+        item = table.get_item(Key={'pk': FLEET_PK, 'sk': company_id}).get('Item')
+        return [item] if item else []
+    items: list[dict] = []
+    kwargs = {'KeyConditionExpression': Key('pk').eq(FLEET_PK)}
+    while True:
+        resp = table.query(**kwargs)
+        items.extend(resp.get('Items', []))
+        last = resp.get('LastEvaluatedKey')
+        if not last:
+            break
+        kwargs['ExclusiveStartKey'] = last
+    return items
+
+
+# ── Rollups ──────────────────────────────────────────────────────────────────
+# Contadores agregados na ingestão (logs + TODOS os heartbeats, inclusive os
+# coalescidos), acumulados em memória por worker e somados no DynamoDB com
+# ADD a cada ROLLUP_FLUSH_INTERVAL_S — uma update_item por (bucket, escopo),
+# independente de quantos eventos chegaram.
+#
+#     pk ROLLUP#<company_id>  sk <gran>#<bucket>#company
+#     pk ROLLUP#<company_id>  sk <gran>#<bucket>#device#<device_id>
+#     pk ROLLUP#ALL           sk <gran>#<bucket>#company#<company_id>
+#
+# gran: '5m' (bucket 'YYYY-MM-DDTHH:MM', TTL 14 dias) e '1d' ('YYYY-MM-DD',
+# TTL 400 dias). Atributos numéricos planos (ADD só funciona no topo):
+#     events, errors, ev_<EVENT>, heartbeats,
+#     queue_sum, qh_<faixa>, battery_sum, battery_n, bh_<faixa>
+
+GRANULARITIES = {
+    '5m': {'seconds': 300, 'fmt': '%Y-%m-%dT%H:%M', 'ttl_s': 14 * 24 * 3600},
+    '1d': {'seconds': 86400, 'fmt': '%Y-%m-%d', 'ttl_s': 400 * 24 * 3600},
+}
+ROLLUP_FLUSH_INTERVAL_S = int(os.getenv('KIOSK_ROLLUP_FLUSH_INTERVAL_S', '60'))
+ROLLUP_ALL_PK = 'ROLLUP#ALL'
+MAX_ROLLUP_BUCKETS = 2000
+
+_EVENT_RE = re.compile(r'^[A-Z0-9_]{1,64}$')
+_ERROR_MARKERS = ('FAIL', 'ERROR', 'MISMATCH', 'UNHEALTHY')
+
+# Limites superiores (inclusivos) das faixas de histograma
+QUEUE_BANDS = [(0, '0'), (1, '1'), (4, '2_4'), (9, '5_9'), (19, '10_19'),
+               (49, '20_49'), (99, '50_99'), (None, '100p')]
+BATTERY_BANDS = [(9, '0_9'), (19, '10_19'), (29, '20_29'), (49, '30_49'),
+                 (79, '50_79'), (None, '80_100')]
+
+
+def is_error_event(event: str) -> bool:
+    return any(marker in event for marker in _ERROR_MARKERS)
+
+
+def _band(value: int, bands) -> str:
+    for upper, label in bands:
+        if upper is None or value <= upper:
+            return label
+    return bands[-1][1]
+
+
+def rollup_bucket(gran: str, ts_s: float) -> str:
+    g = GRANULARITIES[gran]
+    start = int(ts_s) - int(ts_s) % g['seconds']
+    return datetime.fromtimestamp(start, tz=timezone.utc).strftime(g['fmt'])
+
+
+def _rollup_keys(company_id: str, device_id: str, gran: str, bucket: str) -> list[tuple[str, str]]:
+    prefix = f"{gran}#{bucket}#"
+    return [
+        (f"ROLLUP#{company_id}", f"{prefix}company"),
+        (f"ROLLUP#{company_id}", f"{prefix}device#{device_id}"),
+        (ROLLUP_ALL_PK, f"{prefix}company#{company_id}"),
+    ]
+
+
+class RollupAggregator:
+    def __init__(self, flush_interval: float = ROLLUP_FLUSH_INTERVAL_S):
+        self.flush_interval = flush_interval
+        self._pending: dict[tuple[str, str], Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._get_table = None
+
+    def _add(self, company_id: str, device_id: str, ts_s: float, deltas: Counter) -> None:
+        with self._lock:
+            for gran in GRANULARITIES:
+                for key in _rollup_keys(company_id, device_id, gran, rollup_bucket(gran, ts_s)):
+                    if key not in self._pending and len(self._pending) >= MAX_ROLLUP_BUCKETS * 3:
+                        return  # proteção de memória: DynamoDB fora há muito tempo
+                    self._pending.setdefault(key, Counter()).update(deltas)
+
+    def add_log(self, company_id: str, device_id: str, event: str, ts_ms: int) -> None:
+        event = event if _EVENT_RE.match(event) else 'OTHER'
+        deltas = Counter({'events': 1, f'ev_{event}': 1})
+        if is_error_event(event):
+            deltas['errors'] = 1
+        # Bucket pelo horário do evento, limitado a "agora" (relógio do tablet)
+        self._add(company_id, device_id, min(ts_ms / 1000, time.time()), deltas)
+
+    def add_heartbeat(self, company_id: str, device_id: str, state: dict) -> None:
+        queue_size = max(int(state.get('queue_size') or 0), 0)
+        deltas = Counter({
+            'heartbeats': 1,
+            'queue_sum': queue_size,
+            f"qh_{_band(queue_size, QUEUE_BANDS)}": 1,
+        })
+        if state.get('battery') is not None:
+            battery = min(max(int(state['battery']), 0), 100)
+            deltas['battery_sum'] = battery
+            deltas['battery_n'] = 1
+            deltas[f"bh_{_band(battery, BATTERY_BANDS)}"] = 1
+        self._add(company_id, device_id, time.time(), deltas)
+
+    def flush(self, table) -> int:
+        """Soma os contadores pendentes no DynamoDB. Retorna quantos itens atualizou.
+
+        Itens que falharem voltam para o pendente (podem contar em dobro se a
+        falha foi depois do write — aceitável para métricas de saúde).
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        done = 0
+        failed: dict[tuple[str, str], Counter] = {}
+        last_error = None
+        for (pk, sk), deltas in pending.items():
+            gran = sk.split('#', 1)[0]
+            names, values, adds = {}, {}, []
+            for i, (attr, n) in enumerate(sorted(deltas.items())):
+                if not n:
+                    continue
+                names[f'#a{i}'] = attr
+                values[f':v{i}'] = n
+                adds.append(f'#a{i} :v{i}')
+            if not adds:
+                continue
+            values[':ttl'] = int(time.time()) + GRANULARITIES[gran]['ttl_s']
+            try:
+                table.update_item(
+                    Key={'pk': pk, 'sk': sk},
+                    UpdateExpression=f"SET #ttl = :ttl ADD {', '.join(adds)}",
+                    ExpressionAttributeNames={**names, '#ttl': 'ttl'},
+                    ExpressionAttributeValues=values,
+                )
+                done += 1
+            except Exception as e:
+                failed[(pk, sk)] = deltas
+                last_error = e
+        if failed:
+            with self._lock:
+                for key, deltas in failed.items():
+                    self._pending.setdefault(key, Counter()).update(deltas)
+            print(f"[ROLLUP] {len(failed)} bucket(s) não gravados, nova tentativa no próximo flush: {last_error}")
+        return done
+
+    def start(self, get_table) -> None:
+        """Sobe a thread de flush deste processo (idempotente)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._get_table = get_table
+            self._thread = threading.Thread(target=self._run, name='kiosk-rollups', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self) -> None:
+        try:
+            self.flush(self._get_table())
+        except Exception as e:
+            print(f"[ROLLUP] Flush no shutdown falhou: {e}")
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush(self._get_table())
+            except Exception as e:
+                print(f"[ROLLUP] Erro no flush: {e}")
+
+
+def _hist(item: dict, prefix: str, bands) -> dict:
+    return {label: int(item.get(f'{prefix}{label}', 0)) for _, label in bands}
+
+
+def _hist_percentile(hist: dict, bands, pct: float):
+    """Limite superior da faixa que contém o percentil (None se vazio)."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    target = total * pct
+    running = 0
+    for upper, label in bands:
+        running += hist[label]
+        if running >= target:
+            return upper if upper is not None else f"{bands[-2][0] + 1}+"
+    return None
+
+
+def format_rollup(item: dict) -> dict:
+    """Item de rollup do DynamoDB → dict pronto para JSON."""
+    gran, bucket, scope = item['sk'].split('#', 2)
+    out = {'granularity': gran, 'bucket': bucket}
+    if scope.startswith('device#'):
+        out['device_id'] = scope[len('device#'):]
+    elif scope.startswith('company#'):
+        out['company_id'] = scope[len('company#'):]
+    if item['pk'] != ROLLUP_ALL_PK:
+        out['company_id'] = item['pk'][len('ROLLUP#'):]
+
+    events = int(item.get('events', 0))
+    errors = int(item.get('errors', 0))
+    queue_hist = _hist(item, 'qh_', QUEUE_BANDS)
+    battery_hist = _hist(item, 'bh_', BATTERY_BANDS)
+    heartbeats = int(item.get('heartbeats', 0))
+    battery_n = int(item.get('battery_n', 0))
+    out.update({
+        'events': events,
+        'errors': errors,
+        'error_rate': round(errors / events, 4) if events else 0.0,
+        'events_by_type': {k[3:]: int(v) for k, v in item.items() if k.startswith('ev_')},
+        'heartbeats': heartbeats,
+        'queue_avg': round(int(item.get('queue_sum', 0)) / heartbeats, 2) if heartbeats else None,
+        'queue_p95': _hist_percentile(queue_hist, QUEUE_BANDS, 0.95),
+        'queue_hist': queue_hist,
+        'battery_avg': round(int(item.get('battery_sum', 0)) / battery_n, 1) if battery_n else None,
+        'battery_hist': battery_hist,
+    })
+    return out
+
+
+def query_rollups(table, gran: str, start_s: float, end_s: float,
+                  company_id: str = '', device_id: str = '') -> list[dict]:
+    """Rollups da janela: por empresa (todas, via ROLLUP#ALL), da empresa, ou
+    de cada tablet da empresa (device_id='*') / de um tablet específico."""
+    if gran not in GRANULARITIES:
+        raise ValueError(f"granularidade inválida: {gran!r} (use 5m ou 1d)")
+    step = GRANULARITIES[gran]['seconds']
+    if (end_s - start_s) / step > MAX_ROLLUP_BUCKETS:
+        start_s = end_s - MAX_ROLLUP_BUCKETS * step
+    lo = f"{gran}#{rollup_bucket(gran, start_s)}"
+    hi = f"{gran}#{rollup_bucket(gran, end_s)}#~"
+    pk = f"ROLLUP#{company_id}" if company_id else ROLLUP_ALL_PK
+
+    items: list[dict] = []
+    kwargs = {'KeyConditionExpression': Key('pk').eq(pk) & Key('sk').between(lo, hi)}
+    while True:
+        resp = table.query(**kwargs)
+        items.extend(resp.get('Items', []))
+        last = resp.get('LastEvaluatedKey')
+        if not last:
+            break
+        kwargs['ExclusiveStartKey'] = last
+
+    if company_id:
+        if device_id == '*':
+            items = [i for i in items if '#device#' in i['sk']]
+        elif device_id:
+            items = [i for i in items if i['sk'].endswith(f"#device#{device_id}")]
+        else:
+            items = [i for i in items if i['sk'].endswith('#company')]
+    return [format_rollup(i) for i in items]
@@ -7,7 +7,6 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import Any, Dict, List, Set
 from boto3.dynamodb.conditions import Key, Attr
-import boto3
 import calendar
 
 from services.calculation_engine import (
@@ -15,8 +14,9 @@ from services.calculation_engine import (
     calculate_delay_minutes,
 )
 from utils.schedule_settings import resolve_interval_automatico
+from utils import aws_clients
 
-dynamodb       = boto3.resource('dynamodb', region_name='us-east-1')
+dynamodb       = aws_clients.lazy_resource('dynamodb')
 table_records  = dynamodb.Table('TimeRecords')
 table_feriados = dynamodb.Table('Feriados')
 table_config   = dynamodb.Table('ConfigCompany')
@@ -0,0 +1,259 @@
+"""
+Métricas de desempenho por requisição: header Server-Timing e /metrics
+(formato texto do Prometheus).
+
+No fim de cada requisição (after_request em app.py) lê o escopo de
+services/usage_metering — tempo e número de chamadas por serviço AWS (e
+externas, via time_external), itens lidos e capacidade consumida do DynamoDB
+(ReturnConsumedCapacity=TOTAL, injetado pelos hooks) — e soma tudo por
+(método, rota). A rota é a url_rule ('/api/funcionarios/<id>'), nunca o path,
+para a cardinalidade ficar limitada ao número de rotas.
+
+Séries expostas:
+    registraponto_request_duration_seconds           histograma {method, route}
+    registraponto_requests_total                     {method, route, status}
+    registraponto_dependency_seconds_total           {method, route, service}
+    registraponto_dependency_calls_total             {method, route, service}
+    registraponto_dynamodb_items_read_total          {method, route}
+    registraponto_dynamodb_capacity_units_total      {method, route, kind=read|write}
+
+Vários workers Gunicorn: cada um soma em memória e uma thread do worker
+grava o snapshot <METRICS_DIR>/<pid>.json a cada METRICS_DUMP_S quando houve
+requisição nova (e ao sair); o /metrics soma os snapshots de todos os workers
+com o estado vivo do worker que atendeu. O diretório é limpo quando o master
+sobe (config/gunicorn.py). Em Lambda (AWS_LAMBDA_FUNCTION_NAME) a thread não
+sobe: não há outros workers para ler o snapshot e a função fica congelada
+entre invocações — o /metrics mostra só o estado vivo da instância.
+
+Env:
+    METRICS_DIR        padrão <tmp>/registraponto_metrics
+    METRICS_DUMP_S     padrão 5
+    METRICS_TOKEN      Bearer aceito no /metrics; sem token, só conexão direta
+                       pelo loopback (sem X-Forwarded-For — o Nginx sempre põe)
+    SERVER_TIMING=0    não envia o header Server-Timing
+"""
+from __future__ import annotations
+
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'registraponto_'
+
+METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'registraponto_metrics')
+DUMP_S = float(os.environ.get('METRICS_DUMP_S', '5'))
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+DUMP_THREAD = 'AWS_LAMBDA_FUNCTION_NAME' not in os.environ
+
+_HELP = {
+    'request_duration_seconds': ('histogram', 'Tempo total da requisição.'),
+    'requests_total': ('counter', 'Requisições atendidas.'),
+    'dependency_seconds_total': ('counter', 'Segundos em chamadas AWS/externas.'),
+    'dependency_calls_total': ('counter', 'Chamadas AWS/externas.'),
+    'dynamodb_items_read_total': ('counter', 'Itens lidos/avaliados no DynamoDB.'),
+    'dynamodb_capacity_units_total': ('counter', 'Capacidade consumida no DynamoDB (RCU/WCU).'),
+}
+
+
+class Registry:
+    """Séries de um processo. Chave: (métrica, ((label, valor), ...))."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list] = {}   # labels -> [n por bucket..., +Inf, soma]
+
+    def inc(self, name: str, labels: tuple, n: float = 1) -> None:
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        key = (name, labels)
+        h = self.histograms.get(key)
+        if h is None:
+            h = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        h[i] += 1
+        h[-1] += value
+
+    def record(self, method: str, route: str, status: int, duration: float, scope=None) -> None:
+        base = (('method', method), ('route', route))
+        with self._lock:
+            self.observe('request_duration_seconds', base, duration)
+            self.inc('requests_total', base + (('status', str(status)),))
+            if scope is None:
+                return
+            for service, (calls, seconds) in scope.timings.items():
+                labels = base + (('service', service),)
+                self.inc('dependency_calls_total', labels, calls)
+                self.inc('dependency_seconds_total', labels, seconds)
+            counts = scope.counts
+            if counts.get('ddb_items_read'):
+                self.inc('dynamodb_items_read_total', base, counts['ddb_items_read'])
+            for kind, metric in (('read', 'ddb_read_units'), ('write', 'ddb_write_units')):
+                if counts.get(metric):
+                    self.inc('dynamodb_capacity_units_total', base + (('kind', kind),), counts[metric])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'counters': [[n, list(map(list, l)), v] for (n, l), v in self.counters.items()],
+                'histograms': [[n, list(map(list, l)), list(h)] for (n, l), h in self.histograms.items()],
+            }
+
+    def merge(self, snap: dict) -> None:
+        with self._lock:
+            for name, labels, value in snap.get('counters', []):
+                self.inc(name, tuple(map(tuple, labels)), value)
+            for name, labels, h in snap.get('histograms', []):
+                key = (name, tuple(map(tuple, labels)))
+                acc = self.histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+                for i, v in enumerate(h):
+                    acc[i] += v
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra: tuple = ()) -> str:
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in (*labels, *extra)) + '}'
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(round(v, 6))
+
+
+def render_registry(reg: Registry) -> str:
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        full = PREFIX + name
+        if kind == 'histogram':
+            series = sorted((l, h) for (n, l), h in reg.histograms.items() if n == name)
+        else:
+            series = sorted((l, v) for (n, l), v in reg.counters.items() if n == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {full} {help_text}')
+        lines.append(f'# TYPE {full} {kind}')
+        for labels, data in series:
+            if kind != 'histogram':
+                lines.append(f'{full}{_labels(labels)} {_num(data)}')
+                continue
+            cumulative = 0
+            for le, n in zip((*map(str, BUCKETS), '+Inf'), data[:-1]):
+                cumulative += n
+                lines.append(f'{full}_bucket{_labels(labels, (("le", le),))} {cumulative}')
+            lines.append(f'{full}_sum{_labels(labels)} {_num(data[-1])}')
+            lines.append(f'{full}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# ── Estado do processo ───────────────────────────────────────────────────────
+
+registry = Registry()
+_dirty = False
+_thread: threading.Thread | None = None
+_start_lock = threading.Lock()
+
+
+def server_timing(duration: float, scope=None) -> str:
+    """Valor do header: total e um item por serviço (dur em ms)."""
+    parts = [f'total;dur={duration * 1000:.1f}']
+    if scope is not None:
+        for service, (calls, seconds) in scope.timings.items():
+            desc = f'{calls} calls'
+            if service == 'dynamodb':
+                counts = scope.counts
+                desc += f', {_num(counts.get("ddb_items_read", 0))} items'
+                units = counts.get('ddb_read_units', 0) + counts.get('ddb_write_units', 0)
+                if units:
+                    desc += f', {_num(round(units, 2))} CU'
+            parts.append(f'{service};dur={seconds * 1000:.1f};desc="{desc}"')
+    return ', '.join(parts)
+
+
+def record(method: str, route: str, status: int, duration: float, scope=None) -> str:
+    """Soma a requisição nas séries do processo e devolve o Server-Timing."""
+    global _dirty
+    registry.record(method, route, status, duration, scope)
+    _dirty = True
+    return server_timing(duration, scope)
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f'{pid}.json')
+
+
+def dump() -> None:
+    """Grava o snapshot deste worker (escrita atômica)."""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"[METRICS] Falha ao gravar snapshot: {e}")
+
+
+def _run() -> None:
+    global _dirty
+    while True:
+        time.sleep(DUMP_S)
+        if _dirty:
+            _dirty = False
+            dump()
+
+
+def start() -> None:
+    """Sobe a thread de snapshot deste worker (idempotente)."""
+    global _thread
+    if not DUMP_THREAD:
+        return
+    with _start_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_run, name='request-metrics', daemon=True)
+        _thread.start()
+
+
+def render() -> str:
+    """Texto do /metrics: snapshots dos outros workers + estado vivo deste."""
+    total = Registry()
+    own = _snapshot_path(os.getpid())
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as f:
+                total.merge(json.load(f))
+        except Exception as e:
+            print(f"[METRICS] Snapshot ignorado {os.path.basename(path)}: {e}")
+    total.merge(registry.snapshot())
+    return render_registry(total)
+
+
+def clear_snapshots() -> None:
+    """Remove snapshots de workers anteriores (master do Gunicorn subindo)."""
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def scrape_allowed(remote_addr: str | None, headers) -> bool:
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        auth = headers.get('Authorization') or ''
+        return hmac.compare_digest(auth.encode(), f'Bearer {token}'.encode())
+    return remote_addr in ('127.0.0.1', '::1') and not headers.get('X-Forwarded-For')
@@ -12,19 +12,19 @@ records from TimeRecords. It implements:
 - Work mode enforcement (onsite/remote/external)
 """
 
-import boto3
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 
 from utils.schedule_settings import resolve_early_entry_overtime, resolve_interval_automatico
+from utils import aws_clients
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 # DynamoDB client
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+dynamodb = aws_clients.lazy_resource('dynamodb')
 time_records_table = dynamodb.Table('TimeRecords')
 daily_summary_table = dynamodb.Table('DailySummary')
 monthly_summary_table = dynamodb.Table('MonthlySummary')
@@ -2,7 +2,6 @@
 Módulo de cálculo de resumos diários e mensais
 Gera DailySummary e MonthlySummary a partir de TimeRecords
 """
-import boto3
 from datetime import datetime, date, time, timedelta
 from decimal import Decimal
 from typing import List, Dict, Optional, Tuple
@@ -17,8 +16,9 @@ from services.calculation_engine import (
     calculate_daily_balance as eng_daily_balance,
 )
 from utils.schedule_settings import resolve_interval_automatico
+from utils import aws_clients
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+dynamodb = aws_clients.lazy_resource('dynamodb')
 table_records = dynamodb.Table('TimeRecords')
 table_daily = dynamodb.Table('DailySummary')
 table_monthly = dynamodb.Table('MonthlySummary')
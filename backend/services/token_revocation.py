@@ -0,0 +1,194 @@
+"""
+Revogação de JWT (logout) compartilhada entre workers e instâncias.
+
+Tabela RevokedTokens (DynamoDB, pk/sk, TTL no atributo `ttl` = exp do token):
+    JTI#<jti>                sk REVOKED   — consulta pontual (confirmação)
+    FEED#<YYYY-MM-DDTHH>     sk <jti>     — feed por hora de revogação (UTC),
+                                            lido pelos workers para o Bloom filter
+
+Caminho quente (verify_token): cada worker mantém um Bloom filter com os jti
+revogados. `jti not in bloom` — o caso comum — responde sem I/O. Só um
+possível acerto (revogado de fato ou falso positivo, ~0,1%) é confirmado com
+GetItem. Uma thread por worker relê o feed a cada REVOCATION_REFRESH_S: as
+horas desde a última leitura, e a janela inteira de MAX_TOKEN_HOURS a cada
+hora (reconstrói o filtro sem os tokens já expirados).
+
+Até a primeira leitura do feed dar certo, toda verificação vai ao GetItem —
+uma falha na leitura não libera o filtro vazio. Se a tabela não responder, o
+worker continua com o que revogou localmente (comportamento antigo) e tenta
+de novo no próximo ciclo; um GetItem com erro suspende as confirmações por
+CONFIRM_BACKOFF_S para não pagar timeout em toda requisição.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
+_table_name = os.environ.get('DYNAMODB_TABLE_REVOKED_TOKENS', 'RevokedTokens')
+_table = None
+
+REFRESH_S = float(os.environ.get('REVOCATION_REFRESH_S', '15'))
+REBUILD_S = 3600.0
+MAX_TOKEN_HOURS = int(os.environ.get('TOKEN_MAX_HOURS', '24'))  # maior exp emitido (api.py)
+FEED_PREFIX = 'FEED#'
+CONFIRM_BACKOFF_S = 2.0
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = _dynamodb.Table(_table_name)
+    return _table
+
+
+def feed_bucket(ts: float) -> str:
+    return FEED_PREFIX + datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%dT%H')
+
+
+def _buckets_since(start_ts: float, end_ts: float) -> list[str]:
+    hour = datetime.fromtimestamp(start_ts, tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    end = datetime.fromtimestamp(end_ts, tz=timezone.utc)
+    out = []
+    while hour <= end:
+        out.append(FEED_PREFIX + hour.strftime('%Y-%m-%dT%H'))
+        hour += timedelta(hours=1)
+    return out
+
+
+class BloomFilter:
+    """Bloom filter em bytearray; k posições derivadas de um blake2b (double hashing)."""
+
+    def __init__(self, capacity: int = 200_000, bits_per_item: int = 15, hashes: int = 10):
+        self.size = max(capacity * bits_per_item, 8)
+        self.hashes = hashes
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for p in self._positions(value):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+
+class RevocationStore:
+    def __init__(self, get_table=_get_table, refresh_interval: float = REFRESH_S):
+        self._get_table = get_table
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter()
+        self._local: dict[str, float] = {}   # jti -> exp: revogados aqui ou já confirmados
+        self._ready = False                   # feed já lido ao menos uma vez
+        self._built_at = 0.0
+        self._fed_until = 0.0
+        self._confirm_paused_until = 0.0
+        self._thread: threading.Thread | None = None
+
+    # ── Escrita ──────────────────────────────────────────────────────────────
+
+    def revoke(self, jti: str, exp: float, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._local[jti] = exp
+            self._bloom.add(jti)
+        ttl = int(exp) + 1
+        try:
+            with self._get_table().batch_writer() as writer:
+                writer.put_item(Item={'pk': f'JTI#{jti}', 'sk': 'REVOKED', 'exp': ttl, 'ttl': ttl})
+                writer.put_item(Item={'pk': feed_bucket(now), 'sk': jti, 'exp': ttl, 'ttl': ttl})
+        except Exception as e:
+            print(f"[REVOKE] Falha ao gravar revogação (vale só neste worker): {e}")
+
+    # ── Leitura ──────────────────────────────────────────────────────────────
+
+    def is_revoked(self, jti: str, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        self._ensure_thread()
+        exp = self._local.get(jti)
+        if exp is not None:
+            return exp >= now
+        if self._ready and jti not in self._bloom:
+            return False
+        return self._confirm(jti, now)
+
+    def _confirm(self, jti: str, now: float) -> bool:
+        if now < self._confirm_paused_until:
+            return False
+        try:
+            item = self._get_table().get_item(Key={'pk': f'JTI#{jti}', 'sk': 'REVOKED'}).get('Item')
+        except Exception as e:
+            print(f"[REVOKE] Falha ao confirmar revogação de token: {e}")
+            self._confirm_paused_until = now + CONFIRM_BACKOFF_S
+            return False
+        if not item or float(item.get('exp', 0)) < now:
+            return False
+        with self._lock:
+            self._local[jti] = float(item['exp'])
+        return True
+
+    # ── Feed ─────────────────────────────────────────────────────────────────
+
+    def _read_bucket(self, bucket: str, now: float) -> list[str]:
+        table = self._get_table()
+        kwargs = {'KeyConditionExpression': Key('pk').eq(bucket), 'ProjectionExpression': 'sk, #e',
+                  'ExpressionAttributeNames': {'#e': 'exp'}}
+        resp = table.query(**kwargs)
+        items = resp.get('Items', [])
+        while 'LastEvaluatedKey' in resp:
+            resp = table.query(ExclusiveStartKey=resp['LastEvaluatedKey'], **kwargs)
+            items.extend(resp.get('Items', []))
+        return [it['sk'] for it in items if float(it.get('exp', 0)) >= now]
+
+    def refresh(self, now: float | None = None) -> None:
+        """Lê o feed: só as horas novas, ou tudo (reconstrução) a cada REBUILD_S."""
+        now = time.time() if now is None else now
+        rebuild = not self._ready or now - self._built_at >= REBUILD_S
+        start = now - MAX_TOKEN_HOURS * 3600 if rebuild else self._fed_until
+        try:
+            jtis = [j for b in _buckets_since(start, now) for j in self._read_bucket(b, now)]
+        except Exception as e:
+            # _ready fica como está: sem feed lido, is_revoked segue confirmando
+            print(f"[REVOKE] Falha ao ler feed de revogações: {e}")
+            return
+        with self._lock:
+            self._local = {j: exp for j, exp in self._local.items() if exp >= now}
+            if rebuild:
+                bloom = BloomFilter()
+                for j in self._local:
+                    bloom.add(j)
+                self._bloom = bloom
+                self._built_at = now
+            for j in jtis:
+                self._bloom.add(j)
+            self._fed_until = now
+            self._ready = True
+
+    def _run(self) -> None:
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='token-revocation', daemon=True)
+            self._thread.start()
+
+
+revocations = RevocationStore()
@@ -0,0 +1,483 @@
+"""
+Medição de uso por empresa (tenant) e rota.
+
+O que é contado, por (company_id, rota, dia):
+    requests            requisições atendidas
+    ddb_items_read      itens lidos/avaliados (Count/ScannedCount, GetItem, BatchGet)
+    ddb_items_written   itens gravados (Put/Update/Delete, BatchWrite)
+    ddb_read_units      RCU consumidas  ┐ via ReturnConsumedCapacity=TOTAL,
+    ddb_write_units     WCU consumidas  ┘ injetado em toda chamada DynamoDB
+    rekognition_calls   chamadas ao Rekognition
+    s3_puts / s3_bytes  objetos e bytes enviados ao S3
+
+Como é coletado — hooks de evento do botocore registrados na sessão padrão do
+boto3 por install(), antes de qualquer client ser criado (app.py chama no
+topo, antes de importar os blueprints). Nenhuma rota precisa mudar.
+
+Atribuição:
+    rota      — url_rule da requisição (begin_request/end_request em app.py);
+                fora de requisição, o nome passado a usage_context() ou
+                'background'
+    empresa   — company_id do JWT (utils/auth.verify_token chama
+                set_company); para S3, o prefixo da key ('<company_id>/...')
+                quando não há empresa no contexto; senão '-'
+
+Caminho quente sem lock: cada requisição acumula num dict próprio
+(ContextVar) e, ao terminar, faz um único deque.append (atômico no CPython).
+Chamadas AWS fora de requisição (threads de upload, verificação facial) também
+só fazem append. Uma thread por worker drena o deque e grava a cada
+USAGE_FLUSH_INTERVAL_S um update_item com ADD por linha agregada.
+
+Tempo por serviço: o escopo da requisição também acumula, para toda chamada
+boto3 (qualquer serviço), número de chamadas e segundos gastos, e
+time_external() faz o mesmo para HTTP fora do boto3 (Groq). Isso não vai para
+a Usage — é lido no fim da requisição por services/request_metrics.py
+(Server-Timing e /metrics). Os hooks de tempo são instalados mesmo com
+USAGE_METERING=0.
+
+Tabela Usage (DynamoDB):
+    pk  USAGE#<company_id>
+    sk  D#<YYYY-MM-DD>#<METHOD> <rota>
+    ttl 400 dias
+Perda aceitável: o que não foi gravado se perde se o processo morrer sem
+passar pelo atexit.
+
+Em Lambda (AWS_LAMBDA_FUNCTION_NAME) ou com USAGE_FLUSH_THREAD=0 a thread de
+flush não sobe (a função fica congelada entre invocações): app.py chama
+flush_inline() no teardown e cada requisição grava o próprio uso.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from utils import aws_clients
+
+_dynamodb = aws_clients.lazy_resource('dynamodb')
+_table_name = os.environ.get('DYNAMODB_TABLE_USAGE', 'Usage')
+_table = None
+
+ENABLED = os.environ.get('USAGE_METERING', '1') == '1'
+FLUSH_INTERVAL_S = int(os.environ.get('USAGE_FLUSH_INTERVAL_S', '60'))
+FLUSH_THREAD = (
+    os.environ.get('USAGE_FLUSH_THREAD', '1') == '1'
+    and 'AWS_LAMBDA_FUNCTION_NAME' not in os.environ
+)
+RETENTION_S = 400 * 86400
+# Teto de eventos pendentes no deque (backpressure: o mais antigo é descartado)
+MAX_PENDING_EVENTS = 100_000
+
+METRICS = (
+    'requests', 'ddb_items_read', 'ddb_items_written', 'ddb_read_units',
+    'ddb_write_units', 'rekognition_calls', 's3_puts', 's3_bytes',
+)
+UNATTRIBUTED = '-'
+BACKGROUND_ROUTE = 'background'
+
+_WRITE_OPS = {'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'}
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = _dynamodb.Table(_table_name)
+    return _table
+
+
+class _Scope:
+    __slots__ = ('company_id', 'route', 'counts', 'timings')
+
+    def __init__(self, company_id: str | None, route: str):
+        self.company_id = company_id
+        self.route = route
+        self.counts: dict[str, float] = {}
+        self.timings: dict[str, list] = {}   # serviço -> [chamadas, segundos]
+
+    def add_time(self, service: str, seconds: float) -> None:
+        t = self.timings.get(service)
+        if t is None:
+            self.timings[service] = [1, seconds]
+        else:
+            t[0] += 1
+            t[1] += seconds
+
+
+_current: ContextVar[_Scope | None] = ContextVar('usage_scope', default=None)
+# (company_id, route, day, {metric: n}) — consumido por UsageAggregator
+_events: deque = deque(maxlen=MAX_PENDING_EVENTS)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _emit(company_id: str | None, route: str, counts: dict) -> None:
+    if counts:
+        _events.append((company_id or UNATTRIBUTED, route, _today(), counts))
+
+
+# ── API para app/rotas ───────────────────────────────────────────────────────
+
+def begin_request(route: str) -> None:
+    _current.set(_Scope(None, route))
+
+
+def set_company(company_id: str | None) -> None:
+    """Atribui a requisição/escopo atual a uma empresa (chamado ao validar o JWT)."""
+    scope = _current.get()
+    if scope is not None and company_id:
+        scope.company_id = company_id
+
+
+def current() -> _Scope | None:
+    """Escopo da requisição/contexto atual (contadores e tempos até aqui)."""
+    return _current.get()
+
+
+def end_request(route: str | None = None) -> None:
+    scope = _current.get()
+    if scope is None:
+        return
+    _current.set(None)
+    scope.counts['requests'] = scope.counts.get('requests', 0) + 1
+    _emit(scope.company_id, route or scope.route, scope.counts)
+
+
+@contextmanager
+def usage_context(company_id: str | None, route: str):
+    """Atribui chamadas AWS feitas fora de requisição (jobs em background)."""
+    token = _current.set(_Scope(company_id, route))
+    try:
+        yield
+    finally:
+        scope = _current.get()
+        _current.reset(token)
+        if scope is not None:
+            _emit(scope.company_id, scope.route, scope.counts)
+
+
+@contextmanager
+def time_external(service: str):
+    """Conta o tempo de uma chamada externa (fora do boto3) no escopo atual."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        scope = _current.get()
+        if scope is not None:
+            scope.add_time(service, time.perf_counter() - start)
+
+
+def add(metric: str, n: float = 1, company_id: str | None = None) -> None:
+    """Soma `n` na métrica do escopo atual (ou emite direto, sem escopo)."""
+    scope = _current.get()
+    if scope is not None:
+        if company_id and not scope.company_id:
+            scope.company_id = company_id
+        scope.counts[metric] = scope.counts.get(metric, 0) + n
+    else:
+        _emit(company_id, BACKGROUND_ROUTE, {metric: n})
+
+
+# ── Hooks do botocore ────────────────────────────────────────────────────────
+
+def _inject_consumed_capacity(params, model, **kwargs):
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _capacity(parsed: dict, op: str) -> tuple[float, float]:
+    """(RCU, WCU) de ConsumedCapacity. Com TOTAL o DynamoDB só devolve
+    CapacityUnits — o tipo da operação diz se é leitura ou escrita."""
+    consumed = parsed.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    units = sum(float(c.get('CapacityUnits') or 0) for c in consumed)
+    return (0.0, units) if op in _WRITE_OPS else (units, 0.0)
+
+
+def _after_dynamodb_call(http_response, parsed, model, **kwargs):
+    if not isinstance(parsed, dict) or (http_response is not None and http_response.status_code >= 300):
+        return
+    op = model.name
+    counts: dict[str, float] = {}
+    if op in ('Query', 'Scan'):
+        counts['ddb_items_read'] = parsed.get('ScannedCount', parsed.get('Count', 0))
+    elif op == 'GetItem':
+        counts['ddb_items_read'] = 1 if 'Item' in parsed else 0
+    elif op == 'BatchGetItem':
+        counts['ddb_items_read'] = sum(len(v) for v in (parsed.get('Responses') or {}).values())
+    elif op == 'TransactGetItems':
+        counts['ddb_items_read'] = len(parsed.get('Responses') or [])
+    elif op in ('PutItem', 'UpdateItem', 'DeleteItem'):
+        counts['ddb_items_written'] = 1
+    elif op == 'BatchWriteItem':
+        request_items = (kwargs.get('context') or {}).get('usage_batch_size', 0)
+        unprocessed = sum(len(v) for v in (parsed.get('UnprocessedItems') or {}).values())
+        counts['ddb_items_written'] = max(request_items - unprocessed, 0)
+    elif op == 'TransactWriteItems':
+        counts['ddb_items_written'] = (kwargs.get('context') or {}).get('usage_batch_size', 0)
+    else:
+        return
+    read, write = _capacity(parsed, op)
+    if read:
+        counts['ddb_read_units'] = read
+    if write:
+        counts['ddb_write_units'] = write
+    for metric, n in counts.items():
+        if n:
+            add(metric, n)
+
+
+def _remember_batch_size(params, model, context, **kwargs):
+    if model.name == 'BatchWriteItem':
+        context['usage_batch_size'] = sum(len(v) for v in (params.get('RequestItems') or {}).values())
+    elif model.name == 'TransactWriteItems':
+        context['usage_batch_size'] = len(params.get('TransactItems') or [])
+
+
+def _after_rekognition_call(http_response, parsed, model, **kwargs):
+    add('rekognition_calls', 1)
+
+
+def _body_size(params: dict) -> int:
+    if params.get('ContentLength') is not None:
+        return int(params['ContentLength'])
+    body = params.get('Body')
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        pass
+    try:
+        return os.fstat(body.fileno()).st_size
+    except Exception:
+        return 0
+
+
+def _before_s3_put(params, model, **kwargs):
+    key = params.get('Key') or ''
+    prefix = key.split('/', 1)[0] if '/' in key else None
+    scope = _current.get()
+    company_id = (scope.company_id if scope is not None else None) or prefix
+    add('s3_puts', 1, company_id=company_id)
+    add('s3_bytes', _body_size(params), company_id=company_id)
+
+
+def _before_call(model, context, **kwargs):
+    context['usage_call'] = (model.service_model.service_name, time.perf_counter())
+
+
+def _after_call(context, **kwargs):
+    """after-call e after-call-error (este sem `model`: o serviço vem do context)."""
+    call = context.pop('usage_call', None)
+    scope = _current.get()
+    if call is not None and scope is not None:
+        scope.add_time(call[0], time.perf_counter() - call[1])
+
+
+_install_lock = threading.Lock()
+_installed_on: 'weakref.WeakSet' = weakref.WeakSet()   # id() se repete após GC
+
+
+def install(session=None) -> None:
+    """Registra os hooks na sessão (padrão: a sessão default do boto3).
+
+    Clients criados ANTES desta chamada não são medidos.
+    """
+    session = session or boto3._get_default_session()
+    with _install_lock:
+        if session in _installed_on:
+            return
+        events = session.events
+        # before-parameter-build (e não before-call): dispara sempre, inclusive
+        # quando um handler de before-call responde no lugar da rede (Stubber)
+        events.register('before-parameter-build', _before_call, unique_id='usage-call-start')
+        events.register('after-call', _after_call, unique_id='usage-call-time')
+        events.register('after-call-error', _after_call, unique_id='usage-call-time-error')
+        _installed_on.add(session)
+        if not ENABLED:
+            return
+        events.register('before-parameter-build.dynamodb', _inject_consumed_capacity,
+                        unique_id='usage-ddb-capacity')
+        events.register('before-parameter-build.dynamodb', _remember_batch_size,
+                        unique_id='usage-ddb-batch-size')
+        events.register('after-call.dynamodb', _after_dynamodb_call, unique_id='usage-ddb')
+        events.register('after-call.rekognition', _after_rekognition_call, unique_id='usage-rekognition')
+        events.register('before-parameter-build.s3.PutObject', _before_s3_put, unique_id='usage-s3-put')
+
+
+# ── Agregação e flush ────────────────────────────────────────────────────────
+
+def usage_sk(day: str, route: str) -> str:
+    return f'D#{day}#{route}'
+
+
+class UsageAggregator:
+    """Drena o deque de eventos e grava as linhas agregadas com ADD."""
+
+    def __init__(self, events: deque | None = None, flush_interval: float = FLUSH_INTERVAL_S):
+        self._events = events if events is not None else _events
+        self.flush_interval = flush_interval
+        self._pending: dict[tuple[str, str, str], dict[str, float]] = {}
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def drain(self) -> int:
+        n = 0
+        while True:
+            try:
+                company_id, route, day, counts = self._events.popleft()
+            except IndexError:
+                return n
+            row = self._pending.setdefault((company_id, route, day), {})
+            for metric, value in counts.items():
+                row[metric] = row.get(metric, 0) + value
+            n += 1
+
+    def flush(self, table=None) -> int:
+        """Grava as linhas pendentes. Linhas que falharem ficam para o próximo flush."""
+        with self._flush_lock:
+            self.drain()
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            table = table or _get_table()
+            ttl = int(time.time()) + RETENTION_S
+            # As próprias escritas na Usage não entram na medição
+            token = _current.set(_Scope(None, 'usage-flush'))
+            try:
+                written = 0
+                for (company_id, route, day), counts in pending.items():
+                    counts = {m: v for m, v in counts.items() if v}
+                    if not counts:
+                        continue
+                    names = {f'#a{i}': m for i, m in enumerate(counts)}
+                    values = {f':v{i}': _number(v) for i, v in enumerate(counts.values())}
+                    values[':ttl'] = ttl
+                    values[':cid'] = company_id
+                    try:
+                        table.update_item(
+                            Key={'pk': f'USAGE#{company_id}', 'sk': usage_sk(day, route)},
+                            UpdateExpression='ADD ' + ', '.join(f'#a{i} :v{i}' for i in range(len(counts)))
+                                             + ' SET #ttl = :ttl, company_id = :cid',
+                            ExpressionAttributeNames={**names, '#ttl': 'ttl'},
+                            ExpressionAttributeValues=values,
+                        )
+                        written += 1
+                    except Exception as e:
+                        print(f"[USAGE] Falha ao gravar uso {company_id} {day} {route}: {e}")
+                        row = self._pending.setdefault((company_id, route, day), {})
+                        for metric, value in counts.items():
+                            row[metric] = row.get(metric, 0) + value
+            finally:
+                _current.reset(token)
+            return written
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[USAGE] Erro no flush: {e}")
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='usage-metering', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[USAGE] Flush no shutdown falhou: {e}")
+
+
+def _number(value: float):
+    if float(value).is_integer():
+        return int(value)
+    return Decimal(str(round(value, 4)))
+
+
+aggregator = UsageAggregator()
+
+
+def start() -> None:
+    """Sobe a thread de flush deste worker (idempotente)."""
+    if ENABLED and FLUSH_THREAD:
+        aggregator.start()
+
+
+def flush_inline() -> None:
+    """Sem thread de flush (Lambda): grava na hora o que está pendente."""
+    if not ENABLED or FLUSH_THREAD:
+        return
+    try:
+        aggregator.flush()
+    except Exception as e:
+        print(f"[USAGE] Erro no flush: {e}")
+
+
+# ── Leitura (endpoint admin) ─────────────────────────────────────────────────
+
+def query_usage(company_id: str, days: int = 30, table=None, today: str | None = None) -> list[dict]:
+    """Linhas diárias da empresa nos últimos `days` dias (inclui hoje)."""
+    table = table or _get_table()
+    end = today or _today()
+    start = (datetime.strptime(end, '%Y-%m-%d') - timedelta(days=max(days - 1, 0))).strftime('%Y-%m-%d')
+    kwargs = {
+        'KeyConditionExpression': Key('pk').eq(f'USAGE#{company_id}')
+        & Key('sk').between(f'D#{start}', f'D#{end}#\uffff'),
+    }
+    items = []
+    while True:
+        resp = table.query(**kwargs)
+        items.extend(resp.get('Items', []))
+        last_key = resp.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def summarize_usage(items: list[dict]) -> dict:
+    """Totais, por rota e por dia a partir das linhas de query_usage()."""
+    totals = {m: 0 for m in METRICS}
+    by_route: dict[str, dict] = {}
+    by_day: dict[str, dict] = {}
+    for item in items:
+        _, day, route = item['sk'].split('#', 2)
+        r = by_route.setdefault(route, {m: 0 for m in METRICS})
+        d = by_day.setdefault(day, {m: 0 for m in METRICS})
+        for m in METRICS:
+            v = float(item.get(m, 0) or 0)
+            totals[m] += v
+            r[m] += v
+            d[m] += v
+
+    def _clean(row):
+        return {m: (int(v) if float(v).is_integer() else round(v, 2)) for m, v in row.items()}
+
+    return {
+        'totals': _clean(totals),
+        'by_route': sorted(
+            ({'route': route, **_clean(row)} for route, row in by_route.items()),
+            key=lambda r: r['requests'], reverse=True,
+        ),
+        'by_day': [{'day': day, **_clean(by_day[day])} for day in sorted(by_day)],
+    }
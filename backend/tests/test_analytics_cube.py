@@ -0,0 +1,131 @@
+"""
+Testes unitários de services/analytics_cube.py (cubo mensal funcionário × dia)
+e das intenções do chatbot RH que respondem a partir dele. Tabelas falsas —
+sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+from decimal import Decimal
+
+import pytest
+
+from services import analytics_cube as ac
+
+
+class _Table:
+    """query() devolve os itens em duas páginas, ignorando filtros (já vêm do mês)."""
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    def query(self, **kwargs):
+        self.calls += 1
+        if 'ExclusiveStartKey' in kwargs:
+            return {'Items': self.items[1:]}
+        resp = {'Items': self.items[:1]}
+        if len(self.items) > 1:
+            resp['LastEvaluatedKey'] = {'k': 1}
+        return resp
+
+
+def _tables():
+    return {
+        'employees': _Table([
+            {'id': 'ana', 'nome': 'Ana Souza', 'cargo': 'Caixa'},
+            {'id': 'bia', 'nome': 'Beatriz Lima'},
+            {'id': 'caio', 'nome': 'Caio', 'ativo': False},
+        ]),
+        'records': _Table([
+            {'employee_id': 'ana', 'data_hora': '2025-03-03 08:00:00'},
+            {'employee_id': 'ana', 'data_hora': '2025-03-04 08:10:00'},
+            {'employee_id': 'bia', 'data_hora': '2025-03-03 09:00:00'},
+        ]),
+        'daily': _Table([
+            {'employee_id': 'ana', 'date': '2025-03-03', 'worked_hours': 8, 'expected_hours': 8,
+             'status': 'normal', 'overtime_minutes': 30},
+            {'employee_id': 'ana', 'date': '2025-03-04', 'worked_hours': Decimal('7.5'), 'delay_minutes': 10,
+             'status': 'late', 'extra_hours': 0},
+            {'employee_id': 'bia', 'date': '2025-03-05', 'status': 'absent'},
+            {'employee_id': 'caio', 'date': '2025-03-03', 'employee_name': 'Caio Desligado',
+             'extra_minutes': 45},
+        ]),
+        'monthly': _Table([
+            {'employee_id': 'bia', 'month': '2025-03', 'final_balance': -2, 'status': 'negative'},
+        ]),
+    }
+
+
+class TestBuild:
+    def test_arrays_e_flags(self):
+        cube = ac.build('c1', 2025, 3, _tables())
+        assert cube.days == 31 and cube.ativos == 2
+        ana, bia, caio = cube.pos('ana'), cube.pos('bia'), cube.pos('caio')
+        assert caio == 2 and cube.nomes[caio] == 'Caio Desligado'
+        assert cube.dias_com(ana, ac.REGISTRO) == [3, 4]
+        assert cube.dias_com(ana, ac.ATRASO) == [4]
+        assert cube.dias_com(bia, ac.AUSENTE) == [5]
+        # horas decimais do DailySummary viram minutos (7.5 h → 450)
+        assert cube.soma(cube.worked, ana) == 930 and cube.soma(cube.extra, ana) == 30
+        assert cube.expected[cube.idx(ana, 3)] == 480
+        assert cube.extra[cube.idx(caio, 3)] == 45
+        assert cube.monthly['bia']['status'] == 'negative'
+
+
+class TestCache:
+    @pytest.fixture(autouse=True)
+    def limpar(self):
+        ac._cache.clear()
+        yield
+        ac._cache.clear()
+
+    def test_mesma_versao_nao_recarrega(self):
+        tables = _tables()
+        a = ac.get_cube('c1', 2025, 3, version='5:2', tables=tables)
+        b = ac.get_cube('c1', 2025, 3, version='5:2', tables=tables)
+        assert a is b and tables['records'].calls == 2
+
+    def test_versao_nova_recarrega(self):
+        tables = _tables()
+        a = ac.get_cube('c1', 2025, 3, version='5:2', tables=tables)
+        assert ac.get_cube('c1', 2025, 3, version='6:2', tables=tables) is not a
+
+
+def test_months_between():
+    from datetime import date
+    assert ac.months_between(date(2024, 11, 20), date(2025, 1, 5)) == [(2024, 11), (2024, 12), (2025, 1)]
+
+
+class TestIntencoes:
+    @pytest.fixture(autouse=True)
+    def cubo(self, monkeypatch):
+        from routes import chatbot_rh as bot
+        cube = ac.build('c1', 2025, 3, _tables())
+        monkeypatch.setattr(bot, '_cubo', lambda company_id, year, month: cube)
+        self.bot = bot
+
+    def test_faltas_do_mes_em_dias_uteis_sem_registro(self):
+        out = self.bot.faltas_do_mes('c1', 'ana', 3, 2025)
+        (r,) = out['resultados']
+        assert r['employee_id'] == 'ana' and '2025-03-03' not in r['dias_falta']
+        assert '2025-03-05' in r['dias_falta'] and '2025-03-08' not in r['dias_falta']  # sábado
+
+    def test_horas_extras_inclui_desligado_com_resumo(self):
+        out = self.bot.horas_extras_periodo('c1', None, '2025-03-01', '2025-03-31')
+        totais = {r['employee_id']: r['total_horas_extras'] for r in out['resultados']}
+        assert totais == {'ana': '0h30min', 'caio': '0h45min'}
+
+    def test_dias_trabalhados_ignora_falta(self):
+        out = self.bot.dias_trabalhados_funcionario('c1', None, 3, 2025)
+        dias = {r['employee_id']: r['dias_trabalhados'] for r in out['resultados']}
+        assert dias == {'ana': 2, 'caio': 1}
+
+    def test_saldo_negativo(self):
+        (r,) = self.bot.saldo_negativo('c1', 3, 2025)['resultados']
+        assert r['funcionario'] == 'Beatriz Lima' and r['saldo'] == '2h00min negativos'
@@ -0,0 +1,173 @@
+"""
+Testes unitários de services/audit_service.py: diff campo a campo, compressão,
+reconstrução para a API e escrita em lote. Sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+from decimal import Decimal
+
+import pytest
+
+from services import audit_service as audit
+from services.batch_buffer import BatchWriteBuffer
+
+
+BEFORE = {'id': 'r1', 'type': 'entrada', 'data_hora': '2025-03-03 08:00:00',
+          'status': 'ATIVO', 'foto_s3_key': 'c1/x.jpg', 'lat': Decimal('-23.5')}
+AFTER = {**BEFORE, 'data_hora': '2025-03-03 08:05:00', 'justificativa': 'esqueceu'}
+
+
+class TestDiff:
+    def test_guarda_so_campos_alterados_e_contexto(self):
+        out = audit.build_diff(BEFORE, AFTER)
+        assert out['sides'] == 'both'
+        assert out['diff'] == {'data_hora': ['2025-03-03 08:00:00', '2025-03-03 08:05:00'],
+                               'justificativa': [None, 'esqueceu']}
+        assert out['ctx'] == {'type': 'entrada'}
+
+    def test_expand_reconstroi_o_que_a_tela_usa(self):
+        log = audit.expand_item({'action': 'ADJUST', **audit.build_diff(BEFORE, AFTER)})
+        assert log['before'] == {'type': 'entrada', 'data_hora': '2025-03-03 08:00:00'}
+        assert log['after']['justificativa'] == 'esqueceu' and log['after']['type'] == 'entrada'
+        assert 'diff' not in log and 'sides' not in log
+
+    def test_so_before(self):
+        log = audit.expand_item(audit.build_diff(BEFORE, None))
+        assert log['before']['foto_s3_key'] == 'c1/x.jpg' and 'after' not in log
+
+    def test_compressao(self, monkeypatch):
+        monkeypatch.setattr(audit, 'COMPRESS', True)
+        big = {'obs': 'x' * 5000}
+        out = audit.build_diff(None, big)
+        assert 'diff' not in out and len(out['diff_z']) < 200
+        assert audit.expand_item(out)['after'] == big
+
+    def test_item_antigo_passa_intacto(self):
+        item = {'action': 'EDIT', 'before': {'a': 1}, 'after': {'a': 2}}
+        assert audit.expand_item(item) is item
+
+
+class _Writer:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.batched.append(Item)
+
+
+class _Table:
+    def __init__(self):
+        self.batched = []
+        self.puts = []
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _Writer(self)
+
+    def put_item(self, Item):
+        self.puts.append(Item)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    t = _Table()
+    monkeypatch.setattr(audit, '_get_table', lambda: t)
+    monkeypatch.setattr(audit, 'ASYNC_ENABLED', True)
+    buf = BatchWriteBuffer('audit-test', lambda: t, key_attrs=['company_id', 'created_at_log_id'],
+                           max_items=2, flush_interval=60)
+    monkeypatch.setattr(audit, '_buffer', buf)
+    return t
+
+
+class TestEscrita:
+    def test_enfileira_e_grava_em_lote(self, table):
+        audit.log_event('c1', 'u1', 'Admin', 'RECORD', 'r1', 'ADJUST', BEFORE, AFTER)
+        assert table.batched == [] and table.puts == []
+        assert audit.flush() == 1
+        item = table.batched[0]
+        assert item['company_id'] == 'c1' and 'before' not in item
+        assert item['ctx'] == {'type': 'entrada'} and item['sides'] == 'both'
+
+    def test_buffer_cheio_grava_direto(self, table):
+        for _ in range(3):
+            audit.log_event('c1', 'u1', 'Admin', 'EMPLOYEE', 'e1', 'EDIT', {'nome': 'A'}, {'nome': 'B'})
+        assert len(table.puts) == 1 and audit.flush() == 2
+
+
+class _PagedTable:
+    """Simula query com Limit aplicado ANTES do filtro (como o DynamoDB)."""
+
+    def __init__(self, items, match=lambda item: True, missing_index=False):
+        self.items = items  # já em ordem decrescente de created_at_log_id
+        self.match = match
+        self.missing_index = missing_index
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.missing_index and 'IndexName' in kwargs:
+            from botocore.exceptions import ClientError
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'no index'}}, 'Query')
+        start = 0
+        if 'ExclusiveStartKey' in kwargs:
+            sk = kwargs['ExclusiveStartKey']['created_at_log_id']
+            start = next(i for i, it in enumerate(self.items) if it['created_at_log_id'] == sk) + 1
+        window = self.items[start:start + kwargs['Limit']]
+        resp = {'Items': [it for it in window if self.match(it)], 'ScannedCount': len(window)}
+        if start + kwargs['Limit'] < len(self.items):
+            resp['LastEvaluatedKey'] = {'company_id': 'c1', 'created_at_log_id': window[-1]['created_at_log_id']}
+        return resp
+
+
+def _items(n):
+    return [{'company_id': 'c1', 'created_at_log_id': f'2025-01-01T00:{n - i:04d}#x',
+             'action': 'EDIT' if i % 10 == 0 else 'LOGIN'} for i in range(n)]
+
+
+class TestQueryLogs:
+    def test_pagina_ate_encher_o_limite(self):
+        t = _PagedTable(_items(500), match=lambda it: it['action'] == 'EDIT')
+        page = audit.query_logs('c1', action='EDIT', limit=20, table=t)
+        assert len(page['logs']) == 20 and len(t.calls) > 1
+        assert all(c['FilterExpression'] is not None for c in t.calls)
+        nxt = audit.query_logs('c1', action='EDIT', limit=20, cursor=page['next_cursor'], table=t)
+        assert nxt['logs'][0]['created_at_log_id'] < page['logs'][-1]['created_at_log_id']
+
+    def test_orcamento_de_leitura_devolve_cursor(self):
+        t = _PagedTable(_items(500), match=lambda it: False)
+        page = audit.query_logs('c1', action='X', limit=10, read_budget=120, table=t)
+        assert page['logs'] == [] and page['scanned'] <= 120 and page['next_cursor']
+
+    def test_filtro_de_funcionario_usa_gsi(self):
+        t = _PagedTable(_items(5))
+        audit.query_logs('c1', employee_id='e1', limit=5, table=t)
+        assert t.calls[0]['IndexName'] == audit.EMPLOYEE_INDEX
+        assert 'FilterExpression' not in t.calls[0]
+
+    def test_sem_gsi_volta_para_a_tabela_base(self):
+        t = _PagedTable(_items(5), missing_index=True)
+        page = audit.query_logs('c1', entity='RECORD', limit=5, table=t)
+        assert len(page['logs']) == 5 and 'IndexName' not in t.calls[-1]
+
+    def test_cursor_de_outra_empresa_e_recusado(self):
+        cursor = audit.encode_cursor(None, {'company_id': 'outra', 'created_at_log_id': 'x'})
+        with pytest.raises(ValueError):
+            audit.query_logs('c1', cursor=cursor, table=_PagedTable([]))
+        with pytest.raises(ValueError):
+            audit.decode_cursor('@@lixo', 'c1')
+
+
+def test_log_event_grava_atributos_de_indice(table):
+    audit.log_event('c1', 'u1', 'Admin', 'RECORD', 'r1', 'INVALIDATE', BEFORE, None, employee_id='e1')
+    audit.flush()
+    item = table.batched[0]
+    assert item['company_entity'] == 'c1#RECORD' and item['company_employee'] == 'c1#e1'
@@ -0,0 +1,136 @@
+"""
+Testes do caminho de autenticação comum (utils/auth.py): claims memorizadas
+por requisição em `g`, LRU de tokens já verificados e o decorator único usado
+pelos blueprints. Sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import time
+
+import jwt
+import pytest
+from flask import Flask, jsonify
+
+from utils import auth
+
+SECRET = 'test-secret-key-only'
+
+
+def _token(exp_in=600, **claims):
+    claims.setdefault('company_id', 'c1')
+    return jwt.encode({'exp': int(time.time()) + exp_in, **claims}, SECRET, algorithm='HS256')
+
+
+@pytest.fixture(autouse=True)
+def isolar(monkeypatch):
+    monkeypatch.setattr(auth, '_secret_key', SECRET)
+    monkeypatch.setattr(auth.revocations, 'is_revoked', lambda jti: False)
+    auth._verified.clear()
+    yield
+    auth._verified.clear()
+
+
+@pytest.fixture
+def contar_decode(monkeypatch):
+    calls = []
+    real = jwt.decode
+
+    def decode(*a, **kw):
+        calls.append(1)
+        return real(*a, **kw)
+    monkeypatch.setattr(auth.jwt, 'decode', decode)
+    return calls
+
+
+class TestVerifiedCache:
+    def test_mesmo_token_nao_refaz_hmac(self, contar_decode):
+        token = _token()
+        assert auth.verify_token(token)['company_id'] == 'c1'
+        assert auth.verify_token(token)['company_id'] == 'c1'
+        assert len(contar_decode) == 1
+
+    def test_payload_devolvido_e_copia(self):
+        token = _token()
+        auth.verify_token(token)['company_id'] = 'outra'
+        assert auth.verify_token(token)['company_id'] == 'c1'
+
+    def test_expirado_sai_do_cache(self, contar_decode):
+        token = _token(exp_in=600)
+        auth.verify_token(token)
+        sig = token.rpartition('.')[2]
+        t, payload, _ = auth._verified[sig]
+        auth._verified[sig] = (t, payload, time.time() - 1)
+        assert auth.verify_token(token) is not None  # jwt ainda aceita; recarregado
+        assert len(contar_decode) == 2
+
+    def test_assinatura_adulterada_nao_usa_cache(self):
+        token = _token()
+        auth.verify_token(token)
+        head, body, sig = token.split('.')
+        forged = '.'.join([head, jwt.utils.base64url_encode(b'{"company_id":"c2"}').decode(), sig])
+        assert auth.verify_token(forged) is None
+
+    def test_revogado_mesmo_em_cache(self, monkeypatch):
+        token = _token(jti='j1')
+        auth.verify_token(token)
+        monkeypatch.setattr(auth.revocations, 'is_revoked', lambda jti: jti == 'j1')
+        assert auth.verify_token(token) is None
+
+
+class TestDecorator:
+    @pytest.fixture
+    def client(self):
+        app = Flask('test_auth_fastpath')
+
+        @app.route('/bearer')
+        @auth.bearer_token_required
+        def bearer(payload):
+            return jsonify({'again': auth.current_payload(allow_cookie=False) is payload,
+                            'company_id': payload['company_id']})
+
+        @app.route('/cookie')
+        @auth.token_required
+        def cookie(payload):
+            return jsonify({'company_id': payload['company_id']})
+
+        return app.test_client()
+
+    def test_claims_uma_vez_por_requisicao(self, client):
+        r = client.get('/bearer', headers={'Authorization': f'Bearer {_token()}'})
+        assert r.status_code == 200 and r.get_json() == {'again': True, 'company_id': 'c1'}
+
+    def test_bearer_ignora_cookie(self, client):
+        client.set_cookie('session_token', _token())
+        assert client.get('/bearer').status_code == 401
+        assert client.get('/cookie').status_code == 200
+
+    def test_token_invalido(self, client):
+        r = client.get('/bearer', headers={'Authorization': 'Bearer a.b.c'})
+        assert r.status_code == 401 and r.get_json()['error'] == 'Token inválido'
+
+
+def test_verify_token_concorrente(monkeypatch):
+    import threading
+    monkeypatch.setattr(auth, '_VERIFIED_MAX', 8)
+    tokens = [_token(company_id=f'c{i}') for i in range(32)]
+    erros = []
+
+    def rodar(offset):
+        for i in range(200):
+            idx = (offset + i) % len(tokens)
+            payload = auth.verify_token(tokens[idx])
+            if payload is None or payload['company_id'] != f'c{idx}':
+                erros.append(idx)
+
+    threads = [threading.Thread(target=rodar, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros and len(auth._verified) <= 8
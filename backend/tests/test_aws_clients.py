@@ -0,0 +1,81 @@
+"""
+Testes unitários de utils/aws_clients.py (fábrica lazy de clients boto3).
+Só cria clients localmente — nenhuma chamada de rede.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+from unittest.mock import patch
+
+import pytest
+
+from utils import aws_clients
+
+
+@pytest.fixture(autouse=True)
+def _fresh():
+    aws_clients.reset()
+    yield
+    aws_clients.reset()
+
+
+def test_proxies_lazy_nao_criam_nada_antes_do_uso():
+    with patch.object(aws_clients, 'client', wraps=aws_clients.client) as spy:
+        proxy = aws_clients.lazy_client('s3')
+        table = aws_clients.lazy_resource('dynamodb').Table('Foo')
+        assert spy.call_count == 0
+        assert table.name == 'Foo'
+        proxy.meta
+        assert spy.call_count == 1
+
+
+def test_client_compartilhado_por_servico_regiao_e_opcoes():
+    a = aws_clients.client('s3')
+    assert aws_clients.client('s3') is a
+    assert aws_clients.client('s3', 'sa-east-1') is not a
+    assert aws_clients.client('s3', read_timeout=3) is not a
+
+
+def test_config_base_e_sobrescritas():
+    c = aws_clients.client('s3')
+    assert c.meta.config.max_pool_connections == aws_clients.MAX_POOL_CONNECTIONS
+    assert c.meta.config.retries['mode'] == 'adaptive'
+    assert c.meta.config.tcp_keepalive is True
+    t = aws_clients.client('s3', read_timeout=3)
+    assert t.meta.config.read_timeout == 3
+    assert t.meta.config.max_pool_connections == aws_clients.MAX_POOL_CONNECTIONS
+
+
+def test_proxy_de_tabela_usa_resource_compartilhado():
+    t1 = aws_clients.table('Foo')
+    t2 = aws_clients.lazy_resource().Table('Bar')
+    assert t1.meta.client is t2.meta.client
+    assert t1.table_name == 'Foo'
+
+
+def test_processo_novo_recria_clients():
+    proxy = aws_clients.lazy_client('s3')
+    first = proxy._get()
+    with patch('utils.aws_clients.os.getpid', return_value=os.getpid() + 1):
+        second = proxy._get()
+        assert second is not first
+        assert aws_clients.client('s3') is second
+
+
+def test_reset_descarta_clients():
+    a = aws_clients.client('dynamodb')
+    aws_clients.reset()
+    assert aws_clients.client('dynamodb') is not a
+
+
+def test_modelos_de_servico_sobrevivem_a_reset_e_fork():
+    aws_clients.warm(('s3',))
+    assert aws_clients._pid is None
+    aws_clients.client('s3')
+    core = aws_clients._session._session
+    assert core.get_component('data_loader') is aws_clients._loader
@@ -0,0 +1,86 @@
+"""
+Testes unitários de services/aws_metrics.py::SnapshotCache (snapshot local das
+métricas/custos AWS do portal admin). Os coletores são substituídos por
+funções locais — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+import threading
+import time
+
+from services.aws_metrics import SnapshotCache
+
+
+class _Collector:
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('AccessDenied')
+        return {'value': self.calls}
+
+
+def test_coleta_uma_vez_por_intervalo(tmp_path):
+    collect = _Collector()
+    cache = SnapshotCache('m', collect, refresh_interval=300, directory=str(tmp_path))
+    assert cache.refresh() is True
+    assert cache.refresh() is False
+    data, meta = cache.get()
+    assert data == {'value': 1} and collect.calls == 1
+    assert meta['stale'] is False and meta['age_seconds'] == 0 and meta['error'] is None
+    assert cache.refresh(force=True) is True and collect.calls == 2
+
+
+def test_single_flight_entre_threads(tmp_path):
+    collect = _Collector(delay=0.2)
+    cache = SnapshotCache('m', collect, refresh_interval=300, directory=str(tmp_path))
+    threads = [threading.Thread(target=cache.refresh) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert collect.calls == 1
+
+
+def test_outro_worker_le_o_snapshot_sem_coletar(tmp_path):
+    SnapshotCache('m', _Collector(), refresh_interval=300, directory=str(tmp_path)).refresh()
+    other = _Collector()
+    cache = SnapshotCache('m', other, refresh_interval=300, directory=str(tmp_path))
+    assert cache.refresh() is False
+    assert cache.get()[0] == {'value': 1} and other.calls == 0
+
+
+def test_falha_mantem_ultimo_snapshot_bom(tmp_path):
+    collect = _Collector()
+    cache = SnapshotCache('m', collect, refresh_interval=300, directory=str(tmp_path))
+    cache.refresh()
+    collect.fail = True
+    assert cache.refresh(force=True) is False
+    data, meta = cache.get()
+    assert data == {'value': 1} and meta['error'] == 'AccessDenied'
+    # erro recente: o coletor não insiste a cada ciclo
+    cache._write({**cache.read(), 'collected_at': time.time() - 1000})
+    assert cache.refresh() is False and collect.calls == 2
+
+
+def test_snapshot_antigo_fica_stale(tmp_path):
+    cache = SnapshotCache('m', _Collector(), refresh_interval=10, directory=str(tmp_path))
+    cache._write({'data': {'value': 0}, 'collected_at': time.time() - 60, 'error': None})
+    cache.refresh_async = lambda force=False: None
+    data, meta = cache.get()
+    assert data == {'value': 0} and meta['stale'] is True and meta['age_seconds'] >= 60
+
+
+def test_primeira_leitura_espera_a_coleta(tmp_path):
+    cache = SnapshotCache('m', _Collector(delay=0.1), refresh_interval=300, directory=str(tmp_path))
+    data, meta = cache.get(wait_s=5)
+    assert data == {'value': 1} and meta['collected_at']
@@ -0,0 +1,100 @@
+"""
+Testes unitários dos caches do chatbot RH (routes/chatbot_rh.py): intenção
+resolvida localmente antes do Groq e resposta reaproveitada enquanto a versão
+dos dados da empresa não muda. Groq e DynamoDB são substituídos — sem rede.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import pytest
+import requests
+
+from routes import chatbot_rh as bot
+
+
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    bot._intent_cache.clear()
+    bot._answer_cache.clear()
+    yield
+    bot._intent_cache.clear()
+    bot._answer_cache.clear()
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    calls = []
+
+    def fake(question):
+        calls.append(question)
+        return {'intent': 'saldo_negativo', 'employee_name': None, 'month': 1, 'year': 2025,
+                'needs_clarification': False}
+    monkeypatch.setattr(bot, '_parse_intent_groq', fake)
+    return calls
+
+
+class TestIntencao:
+    def test_local_confiante_nao_chama_groq(self, groq):
+        intent, source = bot._resolver_intencao('Quem faltou hoje?')
+        assert intent['intent'] == 'faltas_hoje' and source == 'local'
+        assert groq == []
+
+    @pytest.mark.parametrize('pergunta', [
+        'Quem faltou ontem?',
+        'Quem faltou anteontem?',
+        'Quem faltou no mês passado?',
+        'Quem faltou na semana passada?',
+        'Quem faltou no dia 12?',
+        'Quem chegou atrasado ontem?',
+        'Quem chegou atrasado em março?',
+        'Quem faltou hoje em 2025?',
+    ])
+    def test_tempo_nao_entendido_vai_ao_groq(self, groq, pergunta):
+        assert bot._parse_intent_local(pergunta)['confident'] is False
+        assert bot._resolver_intencao(pergunta)[1] == 'groq'
+        assert groq == [pergunta]
+
+    def test_mes_citado_em_intent_mensal_continua_local(self, groq):
+        intent, source = bot._resolver_intencao('Quem faltou em março?')
+        assert source == 'local' and intent['intent'] == 'faltas_mes' and intent['month'] == 3
+        assert groq == []
+
+    def test_ambigua_vai_ao_groq_e_fica_em_cache(self, groq):
+        # "colaboradores" (listar) + "faltaram" (faltas): duas famílias
+        pergunta = 'Quais colaboradores faltaram?'
+        assert bot._resolver_intencao(pergunta)[1] == 'groq'
+        intent, source = bot._resolver_intencao('quais colaboradores FALTARAM')
+        assert source == 'cache' and intent['intent'] == 'saldo_negativo'
+        assert len(groq) == 1
+
+    def test_fallback_nao_entra_no_cache(self, monkeypatch):
+        def fora(question):
+            raise requests.exceptions.ConnectionError('timeout')
+        monkeypatch.setattr(bot, '_parse_intent_groq', fora)
+        assert bot._resolver_intencao('Quais colaboradores faltaram?')[1] == 'fallback'
+        assert not bot._intent_cache
+
+
+class TestResposta:
+    def test_mesma_versao_reaproveita_e_versao_nova_invalida(self):
+        key = bot._chave_resposta('c1', {'intent': 'faltas_mes', 'month': 3, 'year': 2025})
+        bot._guardar_resposta(key, '10:3', {'resultados': []}, 'ok')
+        assert bot._resposta_cacheada(key, '10:3') == ({'resultados': []}, 'ok')
+        assert bot._resposta_cacheada(key, '11:3') is None
+        # versão desconhecida (falha ao ler CompanyStats): nunca usa cache
+        assert bot._resposta_cacheada(key, None) is None
+
+    def test_ttl_expira(self, monkeypatch):
+        key = bot._chave_resposta('c1', {'intent': 'atrasos_hoje'})
+        monkeypatch.setattr(bot, '_ANSWER_TTL_S', -1)
+        bot._guardar_resposta(key, '1:1', {'resultados': []}, 'ok')
+        assert bot._resposta_cacheada(key, '1:1') is None
+
+    def test_empresas_nao_compartilham_resposta(self):
+        intent = {'intent': 'listar_funcionarios'}
+        assert bot._chave_resposta('c1', intent) != bot._chave_resposta('c2', intent)
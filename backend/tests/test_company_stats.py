@@ -0,0 +1,110 @@
+"""
+Testes unitários de services/company_stats.py (contadores por empresa do
+portal admin). Sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+from services import company_stats as cs
+
+
+class _Table:
+    def __init__(self, fail=False):
+        self.updates = []
+        self.puts = []
+        self.fail = fail
+
+    def update_item(self, **kwargs):
+        if self.fail:
+            raise RuntimeError('throttled')
+        self.updates.append(kwargs)
+
+    def put_item(self, Item):
+        self.puts.append(Item)
+
+
+def _added(update):
+    names, values = update['ExpressionAttributeNames'], update['ExpressionAttributeValues']
+    return {names[n]: values[':' + n[1:]] for n in names}
+
+
+class TestIncrement:
+    def test_registro_com_foto_soma_records_e_photos(self):
+        t = _Table()
+        assert cs.record_written('c1', {'foto_s3_key': 'c1/e/x.jpg'}, table=t)
+        assert t.updates[0]['Key'] == {'company_id': 'c1'}
+        assert t.updates[0]['UpdateExpression'].startswith('ADD ')
+        assert _added(t.updates[0]) == {'records': 1, 'photos': 1}
+
+    def test_registro_sem_foto_so_records(self):
+        t = _Table()
+        cs.record_written('c1', {'foto_s3_key': None}, table=t)
+        assert _added(t.updates[0]) == {'records': 1}
+
+    def test_desativar_funcionario_decrementa(self):
+        t = _Table()
+        cs.employee_deactivated('c1', table=t)
+        assert _added(t.updates[0]) == {'active_employees': -1}
+
+    def test_falha_nao_propaga(self):
+        assert cs.records_written('c1', 3, table=_Table(fail=True)) is False
+
+    def test_sync_company_ignora_campos_fora_do_diretorio(self):
+        t = _Table()
+        cs.sync_company('c1', table=t, status='suspended', senha_hash='x')
+        fields = _added(t.updates[0])
+        assert fields['status'] == 'suspended' and 'senha_hash' not in fields
+        assert 'updated_at' in fields
+
+
+class TestLeitura:
+    ITEMS = [
+        {'company_id': 'a', 'empresa_nome': 'A', 'status': 'active', 'data_criacao': '2025-01-01',
+         'records': 10, 'photos': 4, 'active_employees': 3, 'numero_funcionarios': 5},
+        {'company_id': 'b', 'empresa_nome': 'B', 'status': 'suspended', 'data_criacao': '2025-03-01',
+         'records': 2, 'active_employees': -1, 'paymentStatus': 'paid'},
+    ]
+
+    def test_company_summary(self):
+        out = cs.company_summary(self.ITEMS[0])
+        assert out['companyId'] == 'a' and out['recordsCount'] == 10 and out['photosCount'] == 4
+        assert out['activeEmployees'] == 3 and out['expectedEmployees'] == 5 and out['payments'] == {}
+        # contador que ficou negativo (decremento sem o incremento) não aparece negativo
+        assert cs.company_summary(self.ITEMS[1])['activeEmployees'] == 0
+
+    def test_dashboard_totals(self):
+        out = cs.dashboard_totals(self.ITEMS)
+        assert (out['totalCompanies'], out['totalEmployees'], out['totalTimeEntries']) == (2, 3, 12)
+        assert (out['activeCompanies'], out['inactiveCompanies']) == (1, 1)
+        assert (out['paidCompanies'], out['unpaidCompanies']) == (1, 1)
+        assert [c['companyId'] for c in out['lastCreatedCompanies']] == ['b', 'a']
+
+
+class _CountTable:
+    """query(Select=COUNT) paginada: devolve `pages` contagens em sequência."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        i = len(self.calls) - 1
+        resp = {'Count': self.pages[i % len(self.pages)]}
+        if (i % len(self.pages)) < len(self.pages) - 1:
+            resp['LastEvaluatedKey'] = {'k': i}
+        return resp
+
+
+class TestRebuild:
+    def test_rebuild_grava_contagens_absolutas_e_diretorio(self):
+        records, employees, stats = _CountTable([100, 20]), _CountTable([7]), _Table()
+        company = {'company_id': 'c1', 'user_id': 'admin', 'empresa_nome': 'C1',
+                   'senha_hash': 'x', 'payments': {'2025-01': True}}
+        item = cs.rebuild_company(company, records, employees, table=stats)
+        assert item['records'] == 120 and item['photos'] == 120 and item['active_employees'] == 7
+        assert stats.puts[0]['empresa_nome'] == 'C1' and 'senha_hash' not in stats.puts[0]
+        assert all(c['Select'] == 'COUNT' for c in records.calls + employees.calls)
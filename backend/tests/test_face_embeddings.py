@@ -0,0 +1,81 @@
+"""
+Testes unitários para backend/services/face_embeddings.py
+
+Cobre o formato de transporte usado pelo pull de embeddings do kiosk:
+  - encode_vector / decode_vector (armazenamento float32)
+  - pack_embeddings / unpack_embeddings (payload binário RPFE)
+  - compute_etag
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import pytest
+from services.face_embeddings import (
+    DTYPE_F16,
+    DTYPE_F32,
+    compute_etag,
+    decode_vector,
+    encode_vector,
+    pack_embeddings,
+    parse_dtype,
+    unpack_embeddings,
+)
+
+
+VEC = [0.5, -0.25, 0.125, 1.0]
+
+
+class TestVectorEncoding:
+    def test_roundtrip_float32(self):
+        assert decode_vector(encode_vector(VEC)) == VEC
+
+    def test_tamanho_quatro_bytes_por_dimensao(self):
+        assert len(encode_vector([0.0] * 192)) == 192 * 4
+
+
+class TestPackEmbeddings:
+    def _items(self):
+        return [
+            {'employee_id': 'joao_1', 'embedding': VEC, 'updated_at': '2026-01-01T00:00:00.000000Z'},
+            {'employee_id': 'maria_2', 'updated_at': '2026-01-02T00:00:00.000000Z', 'deleted': True},
+        ]
+
+    def test_roundtrip_f32(self):
+        dtype, dim, items = unpack_embeddings(pack_embeddings(self._items(), DTYPE_F32))
+        assert (dtype, dim) == (DTYPE_F32, 4)
+        assert items[0]['embedding'] == VEC
+        assert items[1]['deleted'] is True
+        assert 'embedding' not in items[1]
+
+    def test_f16_usa_metade_dos_bytes(self):
+        f16 = pack_embeddings(self._items(), DTYPE_F16)
+        f32 = pack_embeddings(self._items(), DTYPE_F32)
+        assert len(f32) - len(f16) == len(VEC) * 2
+        _, _, items = unpack_embeddings(f16)
+        assert items[0]['embedding'] == pytest.approx(VEC, abs=1e-3)
+
+    def test_dimensoes_divergentes_rejeitadas(self):
+        items = self._items() + [{'employee_id': 'x', 'embedding': [1.0], 'updated_at': ''}]
+        with pytest.raises(ValueError):
+            pack_embeddings(items)
+
+    def test_lote_vazio(self):
+        assert unpack_embeddings(pack_embeddings([])) == (DTYPE_F16, 0, [])
+
+    def test_dtype_invalido(self):
+        with pytest.raises(ValueError):
+            parse_dtype('f64')
+
+
+class TestEtag:
+    def test_muda_quando_updated_at_muda(self):
+        a = [{'employee_id': 'e1', 'updated_at': '1'}]
+        b = [{'employee_id': 'e1', 'updated_at': '2'}]
+        assert compute_etag('c', 'm', '', 'json', a) != compute_etag('c', 'm', '', 'json', b)
+
+    def test_muda_com_a_representacao(self):
+        a = [{'employee_id': 'e1', 'updated_at': '1'}]
+        assert compute_etag('c', 'm', '', 'json', a) != compute_etag('c', 'm', '', 'f16', a)
@@ -0,0 +1,233 @@
+"""
+Testes unitários do modo degradado de reconhecimento facial:
+  - utils/circuit_breaker.py::CircuitBreaker
+  - utils/aws.py::reconhecer_funcionario (sonda do half-open)
+  - services/facial_verification.py::process_job
+
+Todos os testes são unitários — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from utils.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+    def test_abre_apos_threshold(self):
+        cb = CircuitBreaker('t', failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            cb.record_failure()
+        assert cb.allow() is True
+        cb.record_failure()
+        assert cb.state == 'open'
+        assert cb.allow() is False
+
+    def test_sucesso_zera_contador(self):
+        cb = CircuitBreaker('t', failure_threshold=2, reset_timeout=60)
+        cb.record_failure()
+        cb.record_success()
+        cb.record_failure()
+        assert cb.state == 'closed'
+
+    def test_half_open_libera_uma_sonda(self):
+        cb = CircuitBreaker('t', failure_threshold=1, reset_timeout=0)
+        cb.record_failure()
+        assert cb.state == 'half-open'
+        assert cb.allow() is True
+        assert cb.allow() is False
+        cb.record_success()
+        assert cb.state == 'closed'
+
+    def test_falha_da_sonda_reabre(self):
+        cb = CircuitBreaker('t', failure_threshold=1, reset_timeout=0)
+        cb.record_failure()
+        assert cb.allow() is True
+        cb.reset_timeout = 60
+        cb.record_failure()
+        assert cb.state == 'open'
+
+    def test_release_devolve_sonda_sem_resultado(self):
+        cb = CircuitBreaker('t', failure_threshold=1, reset_timeout=0)
+        cb.record_failure()
+        assert cb.allow() is True
+        cb.release()
+        assert cb.state == 'half-open'
+        assert cb.allow() is True
+
+    def test_release_nao_solta_sonda_de_outra_thread(self):
+        import threading
+        cb = CircuitBreaker('t', failure_threshold=1, reset_timeout=0)
+        cb.record_failure()
+        assert cb.allow() is True
+        t = threading.Thread(target=cb.release)
+        t.start()
+        t.join()
+        assert cb.allow() is False
+
+
+class TestReconhecerFuncionarioSonda:
+    def _half_open(self):
+        cb = CircuitBreaker('rekognition', failure_threshold=1, reset_timeout=0)
+        cb.record_failure()
+        return cb
+
+    def _rekognition(self):
+        rek = MagicMock()
+        rek.exceptions.InvalidParameterException = type('InvalidParameterException', (Exception,), {})
+        rek.exceptions.ResourceNotFoundException = type('ResourceNotFoundException', (Exception,), {})
+        return rek
+
+    def test_excecao_inesperada_nao_prende_sonda(self, tmp_path):
+        with patch('utils.aws.dynamodb'), patch('boto3.resource'), patch('boto3.client'):
+            import utils.aws as aws
+        foto = tmp_path / 'f.jpg'
+        foto.write_bytes(b'jpeg-sonda-1')
+        cb = self._half_open()
+        with patch.object(aws, 'rekognition_breaker', cb), \
+             patch.object(aws, 'rekognition', self._rekognition()), \
+             patch.object(aws, '_resize_for_rekognition', side_effect=RuntimeError('boom')):
+            assert aws.reconhecer_funcionario(str(foto))['status'] == 'ERROR'
+        assert cb.allow() is True
+
+    def test_base_exception_na_chamada_nao_prende_sonda(self, tmp_path):
+        with patch('utils.aws.dynamodb'), patch('boto3.resource'), patch('boto3.client'):
+            import utils.aws as aws
+        foto = tmp_path / 'f.jpg'
+        foto.write_bytes(b'jpeg-sonda-2')
+        cb = self._half_open()
+        rek = self._rekognition()
+        rek.search_faces_by_image.side_effect = KeyboardInterrupt
+        with patch.object(aws, 'rekognition_breaker', cb), patch.object(aws, 'rekognition', rek), \
+             patch.object(aws, '_resize_for_rekognition', side_effect=lambda b: b):
+            with pytest.raises(KeyboardInterrupt):
+                aws.reconhecer_funcionario(str(foto))
+        assert cb.allow() is True
+
+
+@pytest.fixture
+def spool(tmp_path):
+    with patch('utils.aws.dynamodb'), patch('utils.aws.s3'), \
+         patch('boto3.resource'), patch('boto3.client'):
+        import services.facial_verification as fv
+    with patch.object(fv, 'SPOOL_DIR', str(tmp_path)):
+        yield fv, tmp_path
+
+
+def _job(fv, tmp_path, attempts=0, foto_s3_key='c1/e1/2026/01/01/08-00-00.jpg'):
+    job = {
+        'job_id': 'j1', 'company_id': 'c1', 'record_key': 'e1#2026-01-01 08:00:00',
+        'employee_id': 'e1', 'attempts': attempts, 'next_attempt_at': 0,
+        'foto_s3_key': foto_s3_key,
+    }
+    (tmp_path / 'j1.jpg').write_bytes(b'jpeg')
+    work = tmp_path / f'j1.{os.getpid()}.work'
+    work.write_text(json.dumps(job))
+    return job, str(work)
+
+
+class TestProcessJob:
+    def test_rosto_confere_marca_verified_sem_alertar_rh(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path)
+        with patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'OK', 'employee_id': 'e1', 'similarity': 97.1}), \
+             patch.object(fv, 'tabela_registros') as tbl, patch.object(fv, 'log_event') as audit:
+            assert fv.process_job(job, work) == 'VERIFIED'
+        assert tbl.update_item.call_args.kwargs['ExpressionAttributeValues'][':st'] == 'VERIFIED'
+        audit.assert_not_called()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_baixa_confianca_do_mesmo_funcionario_marca_verified(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path)
+        match = {'status': 'LOW_CONFIDENCE', 'employee_id': 'e1', 'similarity': 71.4}
+        with patch.object(fv, 'reconhecer_funcionario', return_value=match), \
+             patch.object(fv, 'tabela_registros') as tbl, patch.object(fv, 'log_event') as audit:
+            assert fv.process_job(job, work) == 'VERIFIED'
+        values = tbl.update_item.call_args.kwargs['ExpressionAttributeValues']
+        assert values[':st'] == 'VERIFIED'
+        assert values[':dt']['baixa_confianca'] is True
+        audit.assert_not_called()
+
+    def test_outro_funcionario_marca_mismatch_e_alerta_rh(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path)
+        with patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'OK', 'employee_id': 'e2', 'similarity': 92}), \
+             patch.object(fv, 'tabela_registros'), patch.object(fv, 'log_event') as audit:
+            assert fv.process_job(job, work) == 'MISMATCH'
+        assert audit.call_args.kwargs['action'] == 'VERIFICACAO_FACIAL_DIVERGENTE'
+
+    def test_indisponivel_reagenda_com_backoff(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path)
+        with patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'UNAVAILABLE'}), \
+             patch.object(fv, 'tabela_registros') as tbl:
+            assert fv.process_job(job, work) == 'RETRY'
+        tbl.update_item.assert_not_called()
+        requeued = json.loads((tmp_path / 'j1.json').read_text())
+        assert requeued['attempts'] == 1
+        assert (tmp_path / 'j1.jpg').exists()
+
+    def test_esgota_tentativas_marca_unverified(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path, attempts=fv.MAX_ATTEMPTS - 1)
+        with patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'UNAVAILABLE'}), \
+             patch.object(fv, 'tabela_registros'), patch.object(fv, 'log_event') as audit:
+            assert fv.process_job(job, work) == 'UNVERIFIED'
+        assert audit.call_args.kwargs['action'] == 'VERIFICACAO_FACIAL_PENDENTE'
+
+    def test_foto_nao_enviada_no_ponto_e_enviada_pelo_job(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path, foto_s3_key=None)
+        key = 'c1/e1/2026/01/01/08-00-00.jpg'
+        with patch.object(fv, 'upload_photo_to_s3', return_value=(key, 'url')) as upload, \
+             patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'OK', 'employee_id': 'e1', 'similarity': 97}), \
+             patch.object(fv, 'tabela_registros') as tbl, patch.object(fv, 'log_event'):
+            assert fv.process_job(job, work) == 'VERIFIED'
+        assert upload.call_args.args[0] == b'jpeg'
+        assert upload.call_args.kwargs['background'] is False
+        photo_update = tbl.update_item.call_args_list[0].kwargs
+        assert key in photo_update['ExpressionAttributeValues'].values()
+        assert 'foto_s3_key = ' in photo_update['UpdateExpression']
+        assert list(tmp_path.iterdir()) == []
+
+    def test_falha_no_envio_da_foto_reagenda_sem_apagar_copia(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path, foto_s3_key=None)
+        with patch.object(fv, 'upload_photo_to_s3', side_effect=RuntimeError('s3 fora')), \
+             patch.object(fv, 'reconhecer_funcionario') as rek, patch.object(fv, 'tabela_registros'):
+            assert fv.process_job(job, work) == 'RETRY'
+        rek.assert_not_called()
+        assert (tmp_path / 'j1.jpg').exists()
+        assert json.loads((tmp_path / 'j1.json').read_text())['foto_s3_key'] is None
+
+    def test_ultima_tentativa_sem_foto_grava_status_e_mantem_copia(self, spool):
+        fv, tmp_path = spool
+        job, work = _job(fv, tmp_path, attempts=fv.MAX_ATTEMPTS - 1, foto_s3_key=None)
+        with patch.object(fv, 'upload_photo_to_s3', side_effect=RuntimeError('s3 fora')), \
+             patch.object(fv, 'reconhecer_funcionario', return_value={'status': 'OK', 'employee_id': 'e1', 'similarity': 97}), \
+             patch.object(fv, 'tabela_registros') as tbl, patch.object(fv, 'log_event'):
+            assert fv.process_job(job, work) == 'VERIFIED'
+        values = tbl.update_item.call_args.kwargs['ExpressionAttributeValues']
+        assert values[':st'] == 'VERIFIED' and values[':dt']['upload_falhou'] is True
+        assert (tmp_path / 'j1.jpg').exists()
+        requeued = json.loads((tmp_path / 'j1.json').read_text())
+        assert requeued['verification_status'] == 'VERIFIED'
+
+        # Próxima passagem: só reenvia a foto, sem nova verificação
+        work2 = tmp_path / f'j1.{os.getpid()}.work'
+        (tmp_path / 'j1.json').rename(work2)
+        key = 'c1/e1/2026/01/01/08-00-00.jpg'
+        with patch.object(fv, 'upload_photo_to_s3', return_value=(key, 'url')), \
+             patch.object(fv, 'reconhecer_funcionario') as rek, \
+             patch.object(fv, 'tabela_registros') as tbl:
+            assert fv.process_job(requeued, str(work2)) == 'VERIFIED'
+        rek.assert_not_called()
+        assert 'REMOVE verification_detail.upload_falhou' in tbl.update_item.call_args.kwargs['UpdateExpression']
+        assert list(tmp_path.iterdir()) == []
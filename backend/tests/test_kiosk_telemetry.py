@@ -0,0 +1,282 @@
+"""
+Testes unitários da ingestão de telemetria do kiosk:
+  - services/batch_buffer.py::BatchWriteBuffer
+  - services/kiosk_telemetry.py (buckets horários e query dos logs,
+    coalescência de heartbeats, visão da frota e rollups)
+
+Todos os testes são unitários — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+import pytest
+from unittest.mock import patch
+
+from services.batch_buffer import BatchWriteBuffer
+from services import kiosk_telemetry as kt
+
+
+class _FakeWriter:
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.table.fail:
+            raise RuntimeError('throttled')
+        self.table.written.extend(self.pending)
+        return False
+
+    def put_item(self, Item):
+        self.pending.append(Item)
+
+
+class _FakeTable:
+    def __init__(self):
+        self.written = []
+        self.fail = False
+        self.batch_kwargs = None
+
+    def batch_writer(self, **kwargs):
+        self.batch_kwargs = kwargs
+        return _FakeWriter(self)
+
+
+def _items(n, prefix='d'):
+    return [{'pk': f'LOG#c#{prefix}', 'sk': f'{i}#E'} for i in range(n)]
+
+
+@pytest.fixture
+def table():
+    return _FakeTable()
+
+
+class TestBatchWriteBuffer:
+    def test_flush_grava_tudo_com_dedupe_de_chave(self, table):
+        buf = BatchWriteBuffer('t', lambda: table, key_attrs=['pk', 'sk'])
+        buf._ensure_thread = lambda: None
+        assert buf.offer(_items(30, 'a')) and buf.offer(_items(5, 'b'))
+        assert buf.flush() == 35
+        assert len(table.written) == 35
+        assert table.batch_kwargs == {'overwrite_by_pkeys': ['pk', 'sk']}
+        assert len(buf) == 0
+
+    def test_recusa_lote_que_nao_cabe(self, table):
+        buf = BatchWriteBuffer('t', lambda: table, key_attrs=['pk', 'sk'], max_items=10)
+        buf._ensure_thread = lambda: None
+        assert buf.offer(_items(8))
+        assert buf.offer(_items(3)) is False
+        assert len(buf) == 8
+
+    def test_falha_devolve_itens_ao_buffer(self, table):
+        buf = BatchWriteBuffer('t', lambda: table, key_attrs=['pk', 'sk'])
+        buf._ensure_thread = lambda: None
+        buf.offer(_items(4))
+        table.fail = True
+        with pytest.raises(RuntimeError):
+            buf.flush()
+        assert len(buf) == 4
+        table.fail = False
+        assert buf.flush() == 4
+
+
+H = 3600 * 1000
+T0 = 1_700_000_000_000  # 2023-11-14T22:13:20Z
+
+
+class _QueryTable:
+    """Responde query() por bucket a partir de um dict {bucket: [items]}."""
+
+    def __init__(self, by_bucket):
+        self.by_bucket = by_bucket
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        bucket = kwargs['KeyConditionExpression'].get_expression()['values'][0].get_expression()['values'][1]
+        items = sorted(self.by_bucket.get(bucket, []), key=lambda i: i['ts'], reverse=True)
+        return {'Items': items}
+
+
+class TestLogBuckets:
+    def test_bucket_por_hora_utc(self):
+        assert kt.log_bucket(T0) == 'LOGBUCKET#2023-11-14T22'
+        fields = kt.log_index_fields('c1', 'REGISTER_FAILED', T0)
+        assert fields == {'log_bucket': 'LOGBUCKET#2023-11-14T22', 'company_event': 'c1#REGISTER_FAILED'}
+
+    def test_buckets_da_janela_mais_recente_primeiro(self):
+        buckets = kt.buckets_between(T0 - 2 * H, T0)
+        assert buckets == ['LOGBUCKET#2023-11-14T22', 'LOGBUCKET#2023-11-14T21', 'LOGBUCKET#2023-11-14T20']
+        assert kt.buckets_between(T0, T0 - H) == []
+
+    def test_janela_limitada_ao_ttl(self):
+        assert len(kt.buckets_between(T0 - 365 * 24 * H, T0)) == kt.MAX_WINDOW_HOURS + 1
+
+    def test_query_para_ao_atingir_limite(self):
+        table = _QueryTable({
+            'LOGBUCKET#2023-11-14T22': [{'ts': T0}, {'ts': T0 - 1}],
+            'LOGBUCKET#2023-11-14T21': [{'ts': T0 - H}],
+            'LOGBUCKET#2023-11-14T20': [{'ts': T0 - 2 * H}],
+        })
+        items = kt.query_logs(table, T0 - 3 * H, T0, limit=3)
+        assert [i['ts'] for i in items] == [T0, T0 - 1, T0 - H]
+        assert len(table.calls) == 2
+        assert all(c['IndexName'] == kt.BUCKET_INDEX and c['ScanIndexForward'] is False for c in table.calls)
+
+    def test_empresa_e_evento_usa_indice_esparso(self):
+        table = _QueryTable({})
+        table.query = lambda **kw: table.calls.append(kw) or {'Items': []}
+        kt.query_logs(table, T0 - 48 * H, T0, company_id='c1', event='E', limit=10)
+        assert len(table.calls) == 1
+        assert table.calls[0]['IndexName'] == kt.COMPANY_EVENT_INDEX
+
+
+class TestHeartbeats:
+    def _state(self, **kw):
+        base = {'version': '1.2.0', 'battery': 80, 'queue_size': 0, 'wifi': True}
+        base.update(kw)
+        return base
+
+    def test_grava_so_quando_muda_algo_relevante(self):
+        hb = kt.HeartbeatCoalescer(max_staleness_s=600)
+        assert hb.should_write('c', 'd', self._state())
+        assert not hb.should_write('c', 'd', self._state(battery=75))   # mesma faixa
+        assert not hb.should_write('c', 'd', self._state(queue_size=0))
+        assert hb.should_write('c', 'd', self._state(battery=20))       # faixa low
+        assert hb.should_write('c', 'd', self._state(battery=20, wifi=False))
+        assert hb.should_write('c', 'd', self._state(battery=20, wifi=False, version='1.3.0'))
+        assert hb.should_write('c', 'd2', self._state())
+
+    def test_grava_apos_staleness(self):
+        hb = kt.HeartbeatCoalescer(max_staleness_s=0)
+        assert hb.should_write('c', 'd', self._state())
+        assert hb.should_write('c', 'd', self._state())
+
+    def test_forget_forca_proximo_write(self):
+        hb = kt.HeartbeatCoalescer(max_staleness_s=600)
+        hb.should_write('c', 'd', self._state())
+        hb.forget('c', 'd')
+        assert hb.should_write('c', 'd', self._state())
+
+    def test_fleet_online_offline(self):
+        from datetime import datetime, timezone
+        from decimal import Decimal
+        now = 1_700_000_000.0
+        iso = lambda t: datetime.fromtimestamp(t, tz=timezone.utc).isoformat()
+        fleet = [
+            {'sk': 'c1', 'company_id': 'c1', 'devices': {
+                'a': {'last_seen': iso(now - 60), 'battery': Decimal('50')},
+                'b': {'last_seen': iso(now - kt.ONLINE_WINDOW_S - 1)},
+                'velho': {'last_seen': iso(now - kt.FLEET_RETENTION_S - 1)},
+            }},
+            {'sk': 'c2', 'company_id': 'c2', 'devices': {'x': {'last_seen': iso(now)}}},
+        ]
+        devices = kt.fleet_devices(fleet, now=now)
+        assert [d['device_id'] for d in devices] == ['x', 'a', 'b']
+        assert devices[1]['battery'] == 50 and isinstance(devices[1]['battery'], int)
+        summary = kt.fleet_summary(devices)
+        assert (summary['total'], summary['online'], summary['offline']) == (3, 2, 1)
+        assert summary['companies'][0] == {'company_id': 'c1', 'total': 2, 'online': 1, 'offline': 1}
+
+
+class _UpdateTable:
+    def __init__(self):
+        self.updates = []
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+class TestRollups:
+    def test_buckets(self):
+        ts = T0 / 1000  # 22:13:20
+        assert kt.rollup_bucket('5m', ts) == '2023-11-14T22:10'
+        assert kt.rollup_bucket('1d', ts) == '2023-11-14'
+
+    def test_agrega_e_grava_uma_update_por_bucket(self):
+        agg = kt.RollupAggregator()
+        with patch.object(kt.time, 'time', return_value=T0 / 1000):
+            for _ in range(3):
+                agg.add_log('c1', 'd1', 'REGISTER_FAILED', T0)
+            agg.add_log('c1', 'd1', 'face match; drop', T0)
+            agg.add_heartbeat('c1', 'd1', {'queue_size': 12, 'battery': 25})
+        table = _UpdateTable()
+        # 2 granularidades x 3 escopos (empresa, tablet, ROLLUP#ALL)
+        assert agg.flush(table) == 6
+        upd = next(u for u in table.updates if u['Key'] == {'pk': 'ROLLUP#c1', 'sk': '5m#2023-11-14T22:10#device#d1'})
+        names, values = upd['ExpressionAttributeNames'], upd['ExpressionAttributeValues']
+        added = {names[n]: values[':v' + n[2:]] for n in names if n.startswith('#a')}
+        assert added['events'] == 4 and added['errors'] == 3
+        assert added['ev_REGISTER_FAILED'] == 3 and added['ev_OTHER'] == 1
+        assert added['qh_10_19'] == 1 and added['bh_20_29'] == 1 and added['battery_sum'] == 25
+        assert agg.flush(table) == 0
+
+    def test_falha_mantem_pendente(self):
+        agg = kt.RollupAggregator()
+        agg.add_log('c1', 'd1', 'KIOSK_BOOT', T0)
+        table = _UpdateTable()
+        table.update_item = lambda **kw: (_ for _ in ()).throw(RuntimeError('x'))
+        assert agg.flush(table) == 0
+        assert agg.flush(_UpdateTable()) == 6
+
+    def test_format_rollup(self):
+        item = {
+            'pk': 'ROLLUP#c1', 'sk': '1d#2023-11-14#device#d1',
+            'events': 10, 'errors': 2, 'ev_FACE_NO_MATCH': 2, 'ev_FACE_MATCH': 8,
+            'heartbeats': 20, 'queue_sum': 40, 'qh_0': 18, 'qh_100p': 2,
+            'battery_sum': 1000, 'battery_n': 20, 'bh_30_49': 20,
+        }
+        out = kt.format_rollup(item)
+        assert out['company_id'] == 'c1' and out['device_id'] == 'd1' and out['bucket'] == '2023-11-14'
+        assert out['error_rate'] == 0.2
+        assert out['events_by_type'] == {'FACE_NO_MATCH': 2, 'FACE_MATCH': 8}
+        assert out['queue_avg'] == 2.0 and out['queue_p95'] == '100+'
+        assert out['battery_avg'] == 50.0
+
+    def test_query_rollups_escopos(self):
+        rows = [
+            {'pk': 'ROLLUP#c1', 'sk': '5m#2023-11-14T22:10#company'},
+            {'pk': 'ROLLUP#c1', 'sk': '5m#2023-11-14T22:10#device#d1'},
+            {'pk': 'ROLLUP#c1', 'sk': '5m#2023-11-14T22:10#device#d2'},
+        ]
+
+        class _T:
+            def query(self, **kw):
+                return {'Items': [dict(r) for r in rows]}
+
+        ts = T0 / 1000
+        assert len(kt.query_rollups(_T(), '5m', ts - 600, ts, company_id='c1')) == 1
+        assert len(kt.query_rollups(_T(), '5m', ts - 600, ts, company_id='c1', device_id='*')) == 2
+        assert [r['device_id'] for r in kt.query_rollups(_T(), '5m', ts - 600, ts, company_id='c1', device_id='d2')] == ['d2']
+        with pytest.raises(ValueError):
+            kt.query_rollups(_T(), '1h', ts - 600, ts)
+
+
+class TestForceUpdateCache:
+    def test_um_get_item_por_minuto_entre_threads(self, monkeypatch):
+        import threading
+        from routes import kiosk_telemetry as rkt
+
+        class _Table:
+            calls = 0
+
+            def get_item(self, Key):
+                _Table.calls += 1
+                return {'Item': {'active': True}}
+
+        monkeypatch.setattr(rkt, '_get_table', lambda: _Table())
+        monkeypatch.setattr(rkt, '_force_update_cache', (False, 0.0))
+        assert rkt._check_force_update() is True
+        out = []
+        threads = [threading.Thread(target=lambda: out.append(rkt._check_force_update())) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert out == [True] * 16 and _Table.calls == 1
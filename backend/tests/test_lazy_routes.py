@@ -0,0 +1,50 @@
+"""
+Testes de routes/lazy.py: a casca de cada blueprint sob demanda tem
+exatamente as regras do blueprint real e delega para a view real.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import importlib
+
+import pytest
+from flask import Flask
+
+from routes import lazy
+
+
+def _rules(app):
+    return {(r.rule, r.endpoint, frozenset(r.methods)) for r in app.url_map.iter_rules()
+            if r.endpoint != 'static'}
+
+
+@pytest.mark.parametrize('module', sorted(lazy.LAZY_ROUTES))
+def test_casca_tem_as_mesmas_regras_do_blueprint_real(module):
+    real = Flask('real')
+    real.register_blueprint(getattr(importlib.import_module(module), lazy.LAZY_ROUTES[module][0]))
+    shell = Flask('shell')
+    shell.register_blueprint(lazy.placeholder(module))
+    assert _rules(shell) == _rules(real)
+
+
+def test_lazy_view_delega_para_a_view_real_decorada():
+    app = Flask('t')
+    app.register_blueprint(lazy.placeholder('routes.audit'))
+    resp = app.test_client().get('/api/audit')
+    # @token_required do módulo real respondeu
+    assert resp.status_code == 401
+    assert resp.get_json() == {'error': 'Token ausente'}
+
+
+def test_modo_eager_registra_blueprints_reais(monkeypatch):
+    monkeypatch.setenv('LAZY_BLUEPRINTS', '0')
+    app = Flask('t')
+    lazy.register(app)
+    view = app.view_functions['audit_routes.get_audit_logs']
+    assert not isinstance(view, lazy.LazyView)
+    assert view is lazy.real_views('routes.audit')['audit_routes.get_audit_logs']
@@ -0,0 +1,114 @@
+"""
+Testes dos logins sem scan (routes/api.py) e do pool de bcrypt
+(utils/password_pool.py). Tabelas MagicMock — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import bcrypt
+import pytest
+from flask import Flask
+
+from utils import password_pool
+
+SENHA = 'senha-correta'
+HASH = bcrypt.hashpw(SENHA.encode(), bcrypt.gensalt(rounds=4)).decode()
+OUTRO_HASH = bcrypt.hashpw(b'outra', bcrypt.gensalt(rounds=4)).decode()
+
+
+class TestPasswordPool:
+    def test_verifica_no_pool(self, monkeypatch):
+        monkeypatch.setattr(password_pool, 'ENABLED', True)
+        assert password_pool.verify_many(SENHA, [OUTRO_HASH, '', HASH]) == [False, False, True]
+
+    def test_sem_pool_verifica_na_thread(self, monkeypatch):
+        monkeypatch.setattr(password_pool, 'ENABLED', False)
+        assert password_pool.verify(SENHA, HASH) and not password_pool.verify('x', HASH)
+
+    def test_fila_cheia(self, monkeypatch):
+        monkeypatch.setattr(password_pool, '_slots', threading.BoundedSemaphore(1))
+        monkeypatch.setattr(password_pool, 'WAIT_S', 0.01)
+        password_pool._slots.acquire()
+        with pytest.raises(password_pool.PasswordPoolBusy):
+            password_pool.verify(SENHA, HASH)
+        password_pool._slots.release()
+
+    def test_uma_vaga_por_chamada(self, monkeypatch):
+        # Vários candidatos não disputam vagas entre si: basta uma livre.
+        monkeypatch.setattr(password_pool, 'ENABLED', False)
+        monkeypatch.setattr(password_pool, '_slots', threading.BoundedSemaphore(1))
+        monkeypatch.setattr(password_pool, 'WAIT_S', 0.01)
+        assert password_pool.verify_many(SENHA, [OUTRO_HASH, HASH, OUTRO_HASH]) == [False, True, False]
+        assert password_pool._slots.acquire(blocking=False)
+        password_pool._slots.release()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(password_pool, 'ENABLED', False)
+    app = Flask('test_login')
+    app.config['TESTING'] = True
+    with patch('utils.aws.dynamodb'), patch('utils.aws.s3'), \
+         patch('utils.aws.rekognition', None), \
+         patch('boto3.resource'), patch('boto3.client'):
+        from routes.api import routes
+        app.register_blueprint(routes, url_prefix='/api')
+    return app.test_client()
+
+
+def _funcionario(company_id, senha_hash):
+    return {'id': 'joao', 'company_id': company_id, 'nome': 'João', 'senha_hash': senha_hash}
+
+
+class TestLoginFuncionario:
+    def test_desambigua_pela_senha_sem_scan(self, client):
+        table = MagicMock()
+        table.query.return_value = {'Items': [_funcionario('c1', OUTRO_HASH), _funcionario('c2', HASH)]}
+        with patch('routes.api.tabela_funcionarios', table):
+            r = client.post('/api/funcionario/login', json={'funcionario_id': 'joao', 'senha': SENHA})
+        assert r.status_code == 200
+        table.scan.assert_not_called()
+
+    def test_com_empresa_usa_get_item(self, client):
+        table = MagicMock()
+        table.get_item.return_value = {'Item': _funcionario('c2', HASH)}
+        with patch('routes.api.tabela_funcionarios', table):
+            r = client.post('/api/funcionario/login',
+                            json={'funcionario_id': 'joao', 'senha': SENHA, 'company_id': 'c2'})
+        assert r.status_code == 200
+        table.get_item.assert_called_once_with(Key={'company_id': 'c2', 'id': 'joao'})
+        table.query.assert_not_called()
+
+    def test_indice_fora_do_ar_responde_503(self, client):
+        table = MagicMock()
+        table.query.side_effect = RuntimeError('ValidationException')
+        with patch('routes.api.tabela_funcionarios', table):
+            r = client.post('/api/funcionario/login', json={'funcionario_id': 'joao', 'senha': SENHA})
+        assert r.status_code == 503 and r.headers['Retry-After'] == '1'
+        table.scan.assert_not_called()
+
+
+class TestLoginEmpresa:
+    def test_senha_errada_sem_scan(self, client):
+        table = MagicMock()
+        table.query.return_value = {'Items': [{'user_id': 'u1', 'company_id': 'c1', 'senha_hash': HASH}]}
+        with patch('routes.api.tabela_usuarioempresa', table):
+            r = client.post('/api/login', json={'usuario_id': 'u1', 'senha': 'errada'})
+        assert r.status_code == 401
+        table.scan.assert_not_called()
+
+    def test_conta_desativada_so_com_senha_certa(self, client):
+        table = MagicMock()
+        table.query.return_value = {'Items': [{'user_id': 'u1', 'company_id': 'c1', 'senha_hash': HASH,
+                                               'active': False}]}
+        with patch('routes.api.tabela_usuarioempresa', table):
+            assert client.post('/api/login', json={'usuario_id': 'u1', 'senha': 'errada'}).status_code == 401
+            assert client.post('/api/login', json={'usuario_id': 'u1', 'senha': SENHA}).status_code == 403
@@ -0,0 +1,75 @@
+"""
+Testes unitários de utils/rate_limiter.py (GCRA com backend em memória e
+SQLite compartilhado entre processos).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import multiprocessing
+
+import pytest
+
+from utils.rate_limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def limiter(request, tmp_path):
+    if request.param == 'memory':
+        return RateLimiter(MemoryBackend())
+    return RateLimiter(SQLiteBackend(str(tmp_path / 'rate.sqlite3')))
+
+
+def test_rajada_exata_e_reabastecimento(limiter):
+    now = 1000.0
+    assert [limiter.hit('ip:/api/login', 5, 60, now) for _ in range(5)] == [0.0] * 5
+    retry = limiter.hit('ip:/api/login', 5, 60, now)
+    assert retry == pytest.approx(12.0)
+    # um token volta a cada 60/5 = 12 s
+    assert limiter.hit('ip:/api/login', 5, 60, now + 12) == 0.0
+    assert limiter.hit('ip:/api/login', 5, 60, now + 12) > 0
+
+
+def test_limite_fracionario_nao_perde_a_ultima_requisicao(limiter):
+    hits = [limiter.hit('company:c1', 90, 60, 50.0) for _ in range(91)]
+    assert hits.count(0.0) == 90
+
+
+def test_chaves_ociosas_expiram(limiter):
+    for i in range(10):
+        limiter.hit(f'ip{i}', 5, 60, 0.0)
+    assert len(limiter.backend) == 10
+    assert limiter.backend.purge(12.0) == 10
+    assert len(limiter.backend) == 0
+
+
+def test_memoria_limitada_sob_chaves_aleatorias():
+    backend = MemoryBackend(max_keys=100)
+    limiter = RateLimiter(backend)
+    for i in range(1000):
+        limiter.hit(f'atacante{i}', 5, 60, 0.0)
+    assert len(backend) <= 100
+
+
+def test_backend_com_erro_libera():
+    class Quebrado:
+        def acquire(self, *args):
+            raise OSError('database is locked')
+    assert RateLimiter(Quebrado()).hit('k', 1, 60) == 0.0
+
+
+def _worker(path, n, out):
+    limiter = RateLimiter(SQLiteBackend(path))
+    out.put(sum(1 for _ in range(n) if limiter.hit('ip:/api/login', 5, 60, 500.0) == 0.0))
+
+
+def test_limite_vale_para_o_host_com_varios_workers(tmp_path):
+    path = str(tmp_path / 'rate.sqlite3')
+    ctx = multiprocessing.get_context('fork')
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, 5, out)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    assert sum(out.get(timeout=5) for _ in procs) == 5
@@ -0,0 +1,99 @@
+"""
+Testes unitários de services/request_metrics.py (Server-Timing e /metrics no
+formato do Prometheus, somando os snapshots dos workers).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import pytest
+
+from services import request_metrics as rm
+from services import usage_metering as um
+
+
+def _scope():
+    scope = um._Scope('c1', 'GET /api/x')
+    scope.add_time('dynamodb', 0.004)
+    scope.add_time('dynamodb', 0.006)
+    scope.add_time('s3', 0.02)
+    scope.counts.update({'ddb_items_read': 12, 'ddb_read_units': 1.5, 'requests': 1})
+    return scope
+
+
+def _lines(text, prefix):
+    return [l for l in text.splitlines() if l.startswith(prefix)]
+
+
+class TestRegistry:
+    def test_histograma_cumulativo_e_contadores_por_rota(self):
+        reg = rm.Registry()
+        reg.record('GET', '/api/x', 200, 0.03, _scope())
+        reg.record('GET', '/api/x', 500, 3.0)
+        text = rm.render_registry(reg)
+        assert 'registraponto_request_duration_seconds_bucket{method="GET",route="/api/x",le="0.025"} 0' in text
+        assert 'registraponto_request_duration_seconds_bucket{method="GET",route="/api/x",le="0.05"} 1' in text
+        assert 'registraponto_request_duration_seconds_bucket{method="GET",route="/api/x",le="+Inf"} 2' in text
+        assert 'registraponto_request_duration_seconds_count{method="GET",route="/api/x"} 2' in text
+        assert 'registraponto_requests_total{method="GET",route="/api/x",status="500"} 1' in text
+        assert 'registraponto_dependency_calls_total{method="GET",route="/api/x",service="dynamodb"} 2' in text
+        assert 'registraponto_dynamodb_items_read_total{method="GET",route="/api/x"} 12' in text
+        assert 'registraponto_dynamodb_capacity_units_total{method="GET",route="/api/x",kind="read"} 1.5' in text
+        assert '# TYPE registraponto_request_duration_seconds histogram' in text
+
+    def test_labels_escapados(self):
+        reg = rm.Registry()
+        reg.record('GET', 'a"b\\c', 200, 0.001)
+        assert 'route="a\\"b\\\\c"' in rm.render_registry(reg)
+
+
+def test_server_timing():
+    value = rm.server_timing(0.0512, _scope())
+    assert value.startswith('total;dur=51.2')
+    assert 'dynamodb;dur=10.0;desc="2 calls, 12 items, 1.5 CU"' in value
+    assert 's3;dur=20.0;desc="1 calls"' in value
+    assert rm.server_timing(0.001) == 'total;dur=1.0'
+
+
+def test_lambda_nao_sobe_thread_de_snapshot(monkeypatch):
+    monkeypatch.setattr(rm, 'DUMP_THREAD', False)
+    monkeypatch.setattr(rm, '_thread', None)
+    rm.start()
+    assert rm._thread is None
+
+
+def test_render_soma_snapshots_dos_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(rm, 'METRICS_DIR', str(tmp_path))
+    other = rm.Registry()
+    other.record('POST', '/api/y', 200, 0.2)
+    other.record('POST', '/api/y', 200, 0.2)
+    (tmp_path / '999999.json').write_text(__import__('json').dumps(other.snapshot()))
+    monkeypatch.setattr(rm, 'registry', rm.Registry())
+    rm.record('POST', '/api/y', 201, 0.2)
+    text = rm.render()
+    assert 'registraponto_request_duration_seconds_count{method="POST",route="/api/y"} 3' in text
+    rm.dump()
+    assert os.path.exists(tmp_path / f'{os.getpid()}.json')
+    # o próprio snapshot não é somado duas vezes
+    assert 'registraponto_request_duration_seconds_count{method="POST",route="/api/y"} 3' in rm.render()
+    rm.clear_snapshots()
+    assert list(tmp_path.glob('*.json')) == []
+
+
+@pytest.mark.parametrize('token,addr,headers,ok', [
+    (None, '127.0.0.1', {}, True),
+    (None, '127.0.0.1', {'X-Forwarded-For': '1.2.3.4'}, False),
+    (None, '10.0.0.5', {}, False),
+    ('s3cr3t', '127.0.0.1', {}, False),
+    ('s3cr3t', '10.0.0.5', {'Authorization': 'Bearer s3cr3t'}, True),
+])
+def test_scrape_allowed(monkeypatch, token, addr, headers, ok):
+    if token:
+        monkeypatch.setenv('METRICS_TOKEN', token)
+    else:
+        monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    assert rm.scrape_allowed(addr, headers) is ok
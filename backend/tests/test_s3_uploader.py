@@ -0,0 +1,214 @@
+"""
+Testes unitários do upload em background para o S3:
+  - utils/spool.py::Spool
+  - utils/s3_uploader.py::upload_async / _process
+  - utils/aws.py::generate_presigned_urls (cache de URLs assinadas)
+  - utils/photo_derivatives.py (miniaturas WebP)
+
+Todos os testes são unitários — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+import queue
+import pytest
+from unittest.mock import patch
+
+from utils.spool import Spool
+from utils import photo_derivatives as pd
+import utils.s3_uploader as up
+
+
+class TestSpool:
+    def test_claim_exclusivo(self, tmp_path):
+        sp = Spool(str(tmp_path))
+        job_id = sp.put({'key': 'a'}, blob_bytes=b'x')
+        assert sp.claim(job_id) is not None
+        assert sp.claim(job_id) is None
+
+    def test_release_respeita_backoff(self, tmp_path):
+        sp = Spool(str(tmp_path))
+        job_id = sp.put({'key': 'a'}, blob_bytes=b'x')
+        work, job = sp.claim(job_id)
+        sp.release(job, work, delay=60)
+        assert sp.due_ids() == []
+        assert sp.due_ids(now=job['next_attempt_at']) == [job_id]
+
+    def test_recupera_job_de_pid_morto(self, tmp_path):
+        sp = Spool(str(tmp_path))
+        (tmp_path / 'j1.999999999.work').write_text('{"job_id": "j1"}')
+        assert sp.recover_orphans() == ['j1']
+        assert (tmp_path / 'j1.json').exists()
+
+    def test_finish_remove_payload(self, tmp_path):
+        sp = Spool(str(tmp_path))
+        job_id = sp.put({'key': 'a'}, blob_bytes=b'x')
+        work, job = sp.claim(job_id)
+        sp.finish(job, work)
+        assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def uploader(tmp_path):
+    with patch.object(up, 'SPOOL_DIR', str(tmp_path)), \
+         patch.object(up, 'ASYNC_ENABLED', True), \
+         patch.object(up, 'start_uploader'), \
+         patch.object(up, '_queue', queue.Queue(maxsize=1)), \
+         patch.object(up, '_queued', set()):
+        yield tmp_path
+
+
+class TestUploadAsync:
+    def test_retorna_key_sem_enviar(self, uploader):
+        with patch.object(up, '_put_file') as put:
+            assert up.upload_async('c/f.jpg', data=b'img') == 'c/f.jpg'
+        put.assert_not_called()
+        assert up._queue.qsize() == 1
+
+    def test_fila_cheia_envia_na_requisicao(self, uploader):
+        with patch.object(up, '_put_file') as put:
+            up.upload_async('c/1.jpg', data=b'1')
+            up.upload_async('c/2.jpg', data=b'2')
+        put.assert_called_once()
+        assert put.call_args[0][1] == 'c/2.jpg'
+
+    def test_job_ja_na_fila_nao_e_repetido(self, uploader):
+        # A varredura acha o mesmo job pendente a cada ciclo: com a fila
+        # (maxsize=1) ocupada por ele, reenfileirar não pode dar Full.
+        up.upload_async('c/f.jpg', data=b'img')
+        job_id = up._queue.queue[0]
+        assert up._spool().due_ids(skip={job_id}) == []
+        assert up._enqueue(job_id) is True
+        assert up._queue.qsize() == 1
+
+    def test_falha_devolve_ao_spool(self, uploader):
+        up.upload_async('c/f.jpg', data=b'img')
+        sp = up._spool()
+        work, job = sp.claim(up._queue.get_nowait())
+        with patch.object(up, '_put_file', side_effect=RuntimeError('s3 fora')):
+            assert up._process(job, work) is False
+        assert not os.path.exists(work)
+        assert os.path.exists(sp.blob_path(job['job_id']))
+        assert sp.due_ids(now=job['next_attempt_at']) == [job['job_id']]
+
+    def test_reinicia_so_threads_mortas(self, tmp_path):
+        import threading
+        parar = threading.Event()
+        morta = threading.Thread(target=lambda: None)
+        morta.start()
+        morta.join()
+        viva = threading.Thread(target=parar.wait, daemon=True)
+        viva.start()
+        threads = {'s3-upload-0': viva, 's3-upload-sweep': morta}
+        with patch.object(up, 'SPOOL_DIR', str(tmp_path)), patch.object(up, 'ASYNC_ENABLED', True), \
+             patch.object(up, 'THREADS', 1), patch.object(up, '_threads', threads), \
+             patch.object(up, '_sweep_loop', parar.wait):
+            up.start_uploader()
+            assert threads['s3-upload-0'] is viva
+            assert threads['s3-upload-sweep'] is not morta and threads['s3-upload-sweep'].is_alive()
+        parar.set()
+
+    def test_sincrono_quando_desabilitado(self, uploader):
+        with patch.object(up, 'ASYNC_ENABLED', False), \
+             patch.object(up, '_put_bytes') as put:
+            up.upload_async('c/f.jpg', data=b'img')
+        put.assert_called_once_with(b'img', 'c/f.jpg', 'image/jpeg')
+
+
+@pytest.fixture
+def presign():
+    import utils.aws as aws
+    counter = iter(range(10_000))
+    with patch.object(aws, 's3') as s3, patch.dict(aws._presign_cache, clear=True):
+        s3.generate_presigned_url.side_effect = lambda *a, **kw: f"https://u/{kw['Params']['Key']}?v={next(counter)}"
+        yield aws, s3
+
+
+class TestPresignCache:
+    def test_reaproveita_url(self, presign):
+        aws, s3 = presign
+        u1 = aws.generate_presigned_url('c/a.jpg', expiration_seconds=300)
+        u2 = aws.generate_presigned_url('c/a.jpg', expiration_seconds=300)
+        assert u1 == u2
+        assert s3.generate_presigned_url.call_count == 1
+        # assinada com folga: validade >= pedida mesmo reaproveitada
+        assert s3.generate_presigned_url.call_args.kwargs['ExpiresIn'] == 600
+
+    def test_lote_deduplica_e_ignora_vazias(self, presign):
+        aws, s3 = presign
+        urls = aws.generate_presigned_urls(['c/a.jpg', None, 'c/b.jpg', 'c/a.jpg', ''], 300)
+        assert set(urls) == {'c/a.jpg', 'c/b.jpg'}
+        assert s3.generate_presigned_url.call_count == 2
+
+    def test_renova_perto_de_expirar(self, presign):
+        aws, s3 = presign
+        u1 = aws.generate_presigned_url('c/a.jpg', expiration_seconds=300)
+        with patch.object(aws.time, 'time', return_value=aws.time.time() + 301):
+            u2 = aws.generate_presigned_url('c/a.jpg', expiration_seconds=300)
+        assert u1 != u2
+
+    def test_invalidate(self, presign):
+        aws, s3 = presign
+        u1 = aws.generate_presigned_url('c/a.jpg', expiration_seconds=300)
+        aws.invalidate_presigned_url('c/a.jpg')
+        assert aws.generate_presigned_url('c/a.jpg', expiration_seconds=300) != u1
+
+    def test_foto_de_cadastro_enviada_antes_de_devolver_key(self, presign):
+        # Key fixa reescrita a cada cadastro: nada de fila (ordem/404 na URL).
+        aws, s3 = presign
+        u1 = aws.generate_presigned_url('c/funcionarios/e1.jpg', expiration_seconds=300)
+        with patch.object(up, 'upload_now') as now, patch.object(up, 'upload_async') as later:
+            key = aws.enviar_s3('/tmp/f.jpg', 'funcionarios/e1.jpg', 'c', derivatives=True)
+        assert key == 'c/funcionarios/e1.jpg'
+        now.assert_called_once_with(key, path='/tmp/f.jpg', derivatives=True)
+        later.assert_not_called()
+        assert aws.generate_presigned_url(key, expiration_seconds=300) != u1
+
+
+def _jpeg(w=1200, h=900):
+    import io
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (w, h), (120, 80, 40)).save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+class TestPhotoDerivatives:
+    def test_keys_deterministicas(self):
+        key = 'c/e/2024/01/02/08-00-00.jpg'
+        assert pd.derivative_key(key, 'sm') == 'c/e/2024/01/02/08-00-00.sm.webp'
+        assert pd.item_fields(key) == {
+            'foto_s3_key_sm': 'c/e/2024/01/02/08-00-00.sm.webp',
+            'foto_s3_key_md': 'c/e/2024/01/02/08-00-00.md.webp',
+        }
+
+    def test_photo_key_for_cai_no_original(self):
+        assert pd.photo_key_for({'foto_s3_key': 'a.jpg'}, 'sm') == 'a.jpg'
+        assert pd.photo_key_for({'foto_s3_key': 'a.jpg', 'foto_s3_key_sm': 'a.sm.webp'}, 'sm') == 'a.sm.webp'
+
+    def test_gera_webp_no_tamanho(self):
+        import io
+        from PIL import Image
+        out = pd.build_derivatives(_jpeg())
+        for size, max_px in pd.SIZES.items():
+            body, ctype = out[size]
+            assert ctype == 'image/webp'
+            img = Image.open(io.BytesIO(body))
+            assert img.format == 'WEBP' and max(img.size) == max_px
+
+    def test_imagem_invalida_sem_miniaturas(self):
+        assert pd.build_derivatives(b'not an image') == {}
+        assert pd.item_fields('c/f.jpg', b'not an image') == {'foto_s3_key_sm': None, 'foto_s3_key_md': None}
+        assert pd.item_fields('c/f.jpg', _jpeg())['foto_s3_key_sm'] == 'c/f.sm.webp'
+        with patch.object(up, '_put_bytes') as put:
+            up.upload_now('c/f.jpg', data=b'not an image', derivatives=True)
+        assert [c.args[1] for c in put.call_args_list] == ['c/f.jpg']
+
+    def test_upload_grava_derivados(self):
+        with patch.object(up, '_put_bytes') as put:
+            up.upload_now('c/f.jpg', data=_jpeg(), derivatives=True)
+        keys = [c.args[1] for c in put.call_args_list]
+        assert keys == ['c/f.jpg', 'c/f.sm.webp', 'c/f.md.webp']
@@ -0,0 +1,155 @@
+"""
+Testes unitários de services/token_revocation.py (revogação de JWT
+compartilhada + Bloom filter por worker). Tabela falsa — sem chamadas AWS reais.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-only')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-only')
+
+import pytest
+
+from services import token_revocation as tr
+
+NOW = 1_760_000_000.0
+
+
+class _Writer:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.items[(Item['pk'], Item['sk'])] = Item
+
+
+class _Table:
+    """Tabela compartilhada entre os 'workers' (instâncias de RevocationStore)."""
+
+    def __init__(self):
+        self.items = {}
+        self.gets = 0
+        self.fail = False
+
+    def batch_writer(self):
+        return _Writer(self)
+
+    def get_item(self, Key):
+        self.gets += 1
+        if self.fail:
+            raise RuntimeError('indisponível')
+        item = self.items.get((Key['pk'], Key['sk']))
+        return {'Item': item} if item else {}
+
+    def query(self, KeyConditionExpression, **kwargs):
+        if self.fail:
+            raise RuntimeError('indisponível')
+        bucket = KeyConditionExpression.get_expression()['values'][1]
+        return {'Items': [it for (pk, _), it in self.items.items() if pk == bucket]}
+
+
+@pytest.fixture(autouse=True)
+def sem_thread(monkeypatch):
+    monkeypatch.setattr(tr.RevocationStore, '_ensure_thread', lambda self: None)
+
+
+@pytest.fixture
+def table():
+    return _Table()
+
+
+def _worker(table):
+    return tr.RevocationStore(get_table=lambda: table)
+
+
+class TestBloomFilter:
+    def test_sem_falso_negativo(self):
+        bloom = tr.BloomFilter(capacity=1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        assert all(f'jti-{i}' in bloom for i in range(1000))
+
+    def test_falsos_positivos_raros(self):
+        bloom = tr.BloomFilter(capacity=1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        fp = sum(f'outro-{i}' in bloom for i in range(10000))
+        assert fp < 50
+
+
+class TestRevocationStore:
+    def test_revogado_em_outro_worker_apos_refresh(self, table):
+        a, b = _worker(table), _worker(table)
+        b.refresh(now=NOW)
+        a.revoke('j1', NOW + 3600, now=NOW)
+        assert a.is_revoked('j1', now=NOW)
+        # b só descobre via GetItem se o Bloom filter acusar; antes do feed, não acusa
+        assert not b.is_revoked('j1', now=NOW) and table.gets == 0
+        b.refresh(now=NOW + 15)
+        assert b.is_revoked('j1', now=NOW + 15) and table.gets == 1
+        assert b.is_revoked('j1', now=NOW + 16) and table.gets == 1  # confirmado fica local
+
+    def test_token_nao_revogado_sem_io(self, table):
+        w = _worker(table)
+        w.refresh(now=NOW)
+        assert not any(w.is_revoked(f'x{i}', now=NOW) for i in range(100))
+        assert table.gets == 0
+
+    def test_antes_do_primeiro_refresh_confirma_na_tabela(self, table):
+        _worker(table).revoke('j1', NOW + 3600, now=NOW)
+        fresh = _worker(table)
+        assert fresh.is_revoked('j1', now=NOW) and table.gets == 1
+
+    def test_expirado_nao_conta(self, table):
+        w = _worker(table)
+        w.revoke('j1', NOW + 10, now=NOW)
+        assert not w.is_revoked('j1', now=NOW + 11)
+
+    def test_rebuild_le_janela_inteira(self, table):
+        _worker(table).revoke('antigo', NOW + 20 * 3600, now=NOW - 5 * 3600)
+        w = _worker(table)
+        w.refresh(now=NOW)
+        assert 'antigo' in w._bloom
+
+    def test_tabela_fora_vale_o_local(self, table):
+        table.fail = True
+        w = _worker(table)
+        w.revoke('j1', NOW + 3600, now=NOW)
+        w.refresh(now=NOW)
+        assert w.is_revoked('j1', now=NOW)
+        assert not w.is_revoked('j2', now=NOW) and table.gets == 1
+        # GetItem com erro: pausa curta antes de tentar de novo
+        assert not w.is_revoked('j3', now=NOW + 1) and table.gets == 1
+        w.is_revoked('j3', now=NOW + tr.CONFIRM_BACKOFF_S)
+        assert table.gets == 2
+
+    def test_falha_no_primeiro_feed_nao_libera_sem_confirmar(self, table):
+        _worker(table).revoke('j1', NOW + 3600, now=NOW)
+        fresh = _worker(table)
+        table.fail = True
+        fresh.refresh(now=NOW)
+        table.fail = False
+        assert not fresh._ready
+        assert fresh.is_revoked('j1', now=NOW) and table.gets == 1
+
+
+def test_verify_token_recusa_revogado(monkeypatch, table):
+    import jwt
+    import time
+    from utils import auth
+    store = _worker(table)
+    store.refresh()
+    monkeypatch.setattr(auth, 'revocations', store)
+    token = jwt.encode({'company_id': 'c1', 'jti': 'abc', 'exp': int(time.time()) + 600},
+                       'test-secret-key-only', algorithm='HS256')
+    assert auth.verify_token(token)['jti'] == 'abc'
+    auth.blacklist_token('abc', time.time() + 600)
+    assert auth.verify_token(token) is None
@@ -0,0 +1,167 @@
+"""
+Testes unitários de services/usage_metering.py (uso por empresa/rota).
+As chamadas AWS são respondidas por botocore.stub.Stubber — sem rede.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from services import usage_metering as um
+
+
+@pytest.fixture
+def session():
+    s = boto3.Session(aws_access_key_id='x', aws_secret_access_key='x', region_name='us-east-1')
+    um.install(s)
+    um._events.clear()
+    yield s
+    um._events.clear()
+
+
+def _drain():
+    agg = um.UsageAggregator(events=um._events)
+    agg.drain()
+    return agg._pending
+
+
+class TestHooks:
+    def test_dynamodb_atribuido_a_requisicao(self, session):
+        client = session.client('dynamodb')
+        seen = []
+        client.meta.events.register_last('before-parameter-build.dynamodb',
+                                         lambda params, **kw: seen.append(dict(params)))
+        with Stubber(client) as stub:
+            stub.add_response('query', {'Items': [], 'Count': 2, 'ScannedCount': 7,
+                                        'ConsumedCapacity': {'TableName': 'T', 'CapacityUnits': 1.5}})
+            stub.add_response('batch_write_item', {
+                'UnprocessedItems': {'T': [{'PutRequest': {'Item': {'k': {'S': '3'}}}}]},
+                'ConsumedCapacity': [{'TableName': 'T', 'CapacityUnits': 2.0}],
+            })
+            um.begin_request('GET /api/x')
+            um.set_company('c1')
+            client.query(TableName='T', KeyConditionExpression='k = :k',
+                         ExpressionAttributeValues={':k': {'S': 'a'}})
+            client.batch_write_item(RequestItems={'T': [
+                {'PutRequest': {'Item': {'k': {'S': str(i)}}}} for i in range(3)
+            ]})
+            um.end_request()
+
+        assert all(p['ReturnConsumedCapacity'] == 'TOTAL' for p in seen)
+        row = _drain()[('c1', 'GET /api/x', um._today())]
+        assert row == {'ddb_items_read': 7, 'ddb_read_units': 1.5, 'ddb_items_written': 2,
+                       'ddb_write_units': 2.0, 'requests': 1}
+
+    def test_tempo_por_servico_no_escopo(self, session):
+        client = session.client('dynamodb')
+        with Stubber(client) as stub:
+            stub.add_response('get_item', {'Item': {'k': {'S': 'a'}}})
+            stub.add_client_error('get_item', 'ResourceNotFoundException')
+            um.begin_request('GET /api/x')
+            client.get_item(TableName='T', Key={'k': {'S': 'a'}})
+            with pytest.raises(client.exceptions.ResourceNotFoundException):
+                client.get_item(TableName='T', Key={'k': {'S': 'b'}})
+            with um.time_external('groq'):
+                pass
+            scope = um.current()
+            um.end_request()
+        assert scope.timings['dynamodb'][0] == 2
+        assert scope.timings['dynamodb'][1] >= 0
+        assert scope.timings['groq'][0] == 1
+        assert 'timings' not in str(_drain())
+
+    def test_s3_fora_de_requisicao_usa_prefixo_da_key(self, session):
+        client = session.client('s3')
+        with Stubber(client) as stub:
+            stub.add_response('put_object', {})
+            client.put_object(Bucket='b', Key='c9/func/1.jpg', Body=b'x' * 100)
+        row = _drain()[('c9', um.BACKGROUND_ROUTE, um._today())]
+        assert row == {'s3_puts': 1, 's3_bytes': 100}
+
+    def test_job_em_background_com_contexto(self, session):
+        client = session.client('rekognition')
+        with Stubber(client) as stub:
+            stub.add_response('describe_collection', {})
+            with um.usage_context('c2', 'job:facial-verification'):
+                client.describe_collection(CollectionId='x')
+        assert _drain()[('c2', 'job:facial-verification', um._today())] == {'rekognition_calls': 1}
+
+
+def test_install_em_sessao_nova_com_id_reaproveitado():
+    # id() de uma sessão coletada pode voltar numa sessão nova
+    for _ in range(20):
+        s = boto3.Session(region_name='us-east-1')
+        um.install(s)
+        assert 'usage-call-start' in str(s.events._emitter._unique_id_handlers)
+        del s
+
+
+class _Table:
+    def __init__(self, fail=False):
+        self.updates = []
+        self.fail = fail
+
+    def update_item(self, **kwargs):
+        if self.fail:
+            raise RuntimeError('throttled')
+        self.updates.append(kwargs)
+
+
+class TestAggregator:
+    def test_agrega_eventos_numa_linha_por_empresa_rota_dia(self):
+        events = um.deque()
+        for _ in range(3):
+            events.append(('c1', 'GET /a', '2025-01-02', {'requests': 1, 'ddb_read_units': 0.5}))
+        events.append(('c1', 'GET /b', '2025-01-02', {'requests': 1}))
+        agg = um.UsageAggregator(events=events)
+        table = _Table()
+        assert agg.flush(table) == 2
+        upd = next(u for u in table.updates if u['Key']['sk'] == 'D#2025-01-02#GET /a')
+        assert upd['Key']['pk'] == 'USAGE#c1'
+        names, values = upd['ExpressionAttributeNames'], upd['ExpressionAttributeValues']
+        added = {names[n]: values[':v' + n[2:]] for n in names if n.startswith('#a')}
+        assert added['requests'] == 3 and float(added['ddb_read_units']) == 1.5
+        assert agg.flush(table) == 0
+
+    def test_falha_mantem_pendente(self):
+        events = um.deque([('c1', 'GET /a', '2025-01-02', {'requests': 1})])
+        agg = um.UsageAggregator(events=events)
+        assert agg.flush(_Table(fail=True)) == 0
+        table = _Table()
+        assert agg.flush(table) == 1
+
+    def test_lambda_sem_thread_grava_no_fim_da_requisicao(self, monkeypatch):
+        agg = um.UsageAggregator(events=um.deque([('c1', 'GET /a', '2025-01-02', {'requests': 1})]))
+        table = _Table()
+        monkeypatch.setattr(um, 'aggregator', agg)
+        monkeypatch.setattr(um, 'FLUSH_THREAD', False)
+        monkeypatch.setattr(um, 'ENABLED', True)
+        monkeypatch.setattr(um, '_get_table', lambda: table)
+        um.start()
+        assert agg._thread is None
+        um.flush_inline()
+        assert len(table.updates) == 1
+
+    def test_flush_inline_nao_grava_com_thread(self, monkeypatch):
+        agg = um.UsageAggregator(events=um.deque([('c1', 'GET /a', '2025-01-02', {'requests': 1})]))
+        monkeypatch.setattr(um, 'aggregator', agg)
+        monkeypatch.setattr(um, 'FLUSH_THREAD', True)
+        monkeypatch.setattr(um, '_get_table', lambda: pytest.fail('flush fora da thread'))
+        um.flush_inline()
+
+
+def test_summarize_usage():
+    items = [
+        {'sk': 'D#2025-01-01#GET /a', 'requests': 10, 'rekognition_calls': 2},
+        {'sk': 'D#2025-01-02#GET /a', 'requests': 5},
+        {'sk': 'D#2025-01-02#POST /b', 'requests': 1, 's3_bytes': 2048},
+    ]
+    out = um.summarize_usage(items)
+    assert out['totals']['requests'] == 16 and out['totals']['s3_bytes'] == 2048
+    assert [r['route'] for r in out['by_route']] == ['GET /a', 'POST /b']
+    assert [d['day'] for d in out['by_day']] == ['2025-01-01', '2025-01-02']
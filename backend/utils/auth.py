@@ -1,39 +1,29 @@
 import jwt
 import os
 import time
-import threading
 import bcrypt
+from collections import OrderedDict
 from functools import wraps
-from flask import current_app, request as flask_request, jsonify
+from threading import Lock
+from flask import current_app, g, request as flask_request, jsonify
 from utils.safe_logger import get_safe_logger
+from services import usage_metering
+from services.token_revocation import revocations
 
 logger = get_safe_logger(__name__)
 
-# ─── Token Blacklist (in-memory, TTL automático) ──────────────────────────────
-# Chave: jti (str); Valor: exp (Unix timestamp float)
-# Gunicorn multi-worker: cada worker tem memória própria — logout invalida apenas
-# no worker que o atendeu. Para invalidação cross-worker usar Redis/DynamoDB TTL.
-_bl_lock: threading.Lock = threading.Lock()
-_token_blacklist: dict[str, float] = {}
-
-
-def _cleanup_blacklist() -> None:
-    now = time.time()
-    with _bl_lock:
-        expired = [k for k, v in _token_blacklist.items() if v < now]
-        for k in expired:
-            del _token_blacklist[k]
+# ─── Revogação de tokens (logout) ─────────────────────────────────────────────
+# Compartilhada entre workers/instâncias (tabela RevokedTokens, TTL = exp do
+# token). O caso comum — token não revogado — é respondido pelo Bloom filter
+# local do worker, sem I/O. Ver services/token_revocation.py.
 
 
 def blacklist_token(jti: str, exp: float) -> None:
-    _cleanup_blacklist()
-    with _bl_lock:
-        _token_blacklist[jti] = exp
+    revocations.revoke(jti, exp)
 
 
 def is_token_blacklisted(jti: str) -> bool:
-    with _bl_lock:
-        return jti in _token_blacklist
+    return revocations.is_revoked(jti)
 
 
 # ─── Cookie helpers ───────────────────────────────────────────────────────────
@@ -52,8 +42,18 @@ def cookie_kwargs(max_age: int | None = None) -> dict:
     return kwargs
 
 
+_secret_key: str | None = None
+
+
 def get_secret_key() -> str:
-    """Obtém SECRET_KEY de forma segura. Falha explicitamente se ausente."""
+    """Obtém SECRET_KEY de forma segura. Falha explicitamente se ausente.
+
+    Resolvida uma vez por processo (env → config do Flask → stage do Lambda) e
+    reaproveitada; trocar a chave exige reiniciar os workers.
+    """
+    global _secret_key
+    if _secret_key is not None:
+        return _secret_key
     secret_key = (
         os.environ.get('SECRET_KEY')
         or _get_from_flask_config()
@@ -64,7 +64,8 @@ def get_secret_key() -> str:
             "SECRET_KEY não encontrada! "
             "Configure a variável de ambiente SECRET_KEY."
         )
-    return str(secret_key)
+    _secret_key = str(secret_key)
+    return _secret_key
 
 
 def _get_from_flask_config() -> str | None:
@@ -85,12 +86,46 @@ def _get_from_lambda_stage() -> str | None:
     return None
 
 
+# ─── Tokens já verificados ────────────────────────────────────────────────────
+# LRU por worker: assinatura -> (token, claims, exp). Um tablet do kiosk manda
+# o mesmo token em toda batida; depois da primeira, verify_token não refaz o
+# HMAC nem o parse das claims até o exp do token. Revogação continua sendo
+# checada a cada chamada (Bloom filter local, sem I/O).
+_VERIFIED_MAX = int(os.getenv('AUTH_VERIFIED_CACHE_MAX', '1024'))
+_verified: 'OrderedDict[str, tuple[str, dict, float]]' = OrderedDict()
+_verified_lock = Lock()
+
+
+def _decode(token: str) -> dict:
+    signature = token.rpartition('.')[2]
+    now = time.time()
+    with _verified_lock:
+        entry = _verified.get(signature)
+        if entry is not None:
+            if entry[0] == token and entry[2] > now:
+                _verified.move_to_end(signature)
+                return entry[1]
+            del _verified[signature]
+    payload = jwt.decode(token, get_secret_key(), algorithms=["HS256"])
+    exp = payload.get('exp')
+    if isinstance(exp, (int, float)) and exp > now:
+        with _verified_lock:
+            _verified[signature] = (token, payload, float(exp))
+            while len(_verified) > _VERIFIED_MAX:
+                _verified.popitem(last=False)
+    return payload
+
+
 def verify_token(token: str) -> dict | None:
     """Verifica e decodifica o token JWT. Retorna payload ou None."""
     try:
-        secret_key = get_secret_key()
-        payload = jwt.decode(token, secret_key, algorithms=["HS256"])
-        return payload
+        payload = _decode(token)
+        jti = payload.get('jti')
+        if jti and revocations.is_revoked(jti):
+            logger.warning("Token revogado recebido")
+            return None
+        usage_metering.set_company(payload.get('company_id'))
+        return dict(payload)
     except jwt.ExpiredSignatureError:
         logger.warning("Token expirado recebido")
         return None
@@ -102,6 +137,35 @@ def verify_token(token: str) -> dict | None:
         return None
 
 
+def request_token(allow_cookie: bool = True) -> str | None:
+    """Token da requisição: cookie httpOnly 'session_token' (se `allow_cookie`)
+    ou header Authorization — 'Bearer <token>' ou só o token."""
+    if allow_cookie:
+        token = flask_request.cookies.get('session_token')
+        if token:
+            return token
+    parts = flask_request.headers.get('Authorization', '').split()
+    if len(parts) == 2 and parts[0].lower() == 'bearer':
+        return parts[1]
+    if len(parts) == 1 and parts[0].count('.') == 2:
+        return parts[0]
+    return None
+
+
+def current_payload(allow_cookie: bool = True) -> dict | None:
+    """Claims do token da requisição, verificado uma única vez por requisição
+    (memo em `g`) — o rate limit do app.py e o decorator da rota compartilham."""
+    token = request_token(allow_cookie)
+    if not token:
+        return None
+    cached = g.get('_auth')
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    payload = verify_token(token)
+    g._auth = (token, payload)
+    return payload
+
+
 def hash_password(password: str) -> str:
     """Cria hash bcrypt da senha."""
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -115,6 +179,21 @@ def verify_password(password: str, password_hash: str) -> bool:
         return False
 
 
+def _auth_required(f, allow_cookie: bool):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if flask_request.method == 'OPTIONS':
+            return ('', 200)
+        if not request_token(allow_cookie):
+            return jsonify({'error': 'Token ausente'}), 401
+        # verify_token já recusa tokens revogados (logout)
+        payload = current_payload(allow_cookie)
+        if not payload:
+            return jsonify({'error': 'Token inválido'}), 401
+        return f(payload, *args, **kwargs)
+    return decorated
+
+
 def token_required(f):
     """Decorator que verifica se o request contém um token JWT válido.
 
@@ -127,30 +206,13 @@ def token_required(f):
         def create_user(payload):
             ...
     """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if flask_request.method == 'OPTIONS':
-            return ('', 200)
+    return _auth_required(f, allow_cookie=True)
 
-        # Cookie httpOnly tem prioridade; Bearer header como fallback (PWA offline)
-        token = flask_request.cookies.get('session_token')
-        if not token:
-            auth_header = flask_request.headers.get('Authorization', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ', 1)[1]
-        if not token:
-            return jsonify({'error': 'Token ausente'}), 401
 
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido'}), 401
-
-        jti = payload.get('jti')
-        if jti and is_token_blacklisted(jti):
-            return jsonify({'error': 'Token revogado'}), 401
-
-        return f(payload, *args, **kwargs)
-    return decorated
+def bearer_token_required(f):
+    """Como token_required, mas só aceita o header Authorization — rotas
+    chamadas pelo kiosk/app e que nunca aceitaram o cookie de sessão."""
+    return _auth_required(f, allow_cookie=False)
 
 
 def require_company_scope(f):
@@ -1,11 +1,14 @@
-import boto3
 import os
+from botocore.exceptions import BotoCoreError, ClientError
 import uuid
 import hashlib
 import time
+from collections import OrderedDict
 from threading import Lock
 from datetime import datetime
 from dotenv import load_dotenv
+from utils.circuit_breaker import CircuitBreaker
+from utils import aws_clients
 
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -24,19 +27,24 @@ DYNAMODB_TABLE_AUDIT = os.environ.get('DYNAMODB_TABLE_AUDIT', 'AuditLogs')
 # NOTA: Tabela HorariosPreset não existe. Horários pré-definidos são salvos em ConfigCompany
 # com chave config_key='horarios_preset'
 
-# AWS clients/resources
-s3 = boto3.client('s3', region_name=REGIAO)
+# AWS clients/resources — criados no primeiro uso (utils/aws_clients.py)
+s3 = aws_clients.lazy_client('s3', REGIAO)
 # Enable Rekognition by default unless explicitly disabled
 enable_rekognition = os.environ.get('ENABLE_REKOGNITION', '1') == '1'
 if enable_rekognition:
-    try:
-        rekognition = boto3.client('rekognition', region_name=REGIAO)
-    except Exception as e:
-        print(f"Aviso: não foi possível criar client Rekognition: {e}")
-        rekognition = None
+    # Timeouts curtos: o kiosk espera ~10s no total e uma thread presa no
+    # Rekognition não atende mais ninguém. Sem os retries longos do modo
+    # adaptive da config base — o circuit breaker abaixo cuida de incidentes.
+    rekognition = aws_clients.lazy_client(
+        'rekognition',
+        REGIAO,
+        connect_timeout=2,
+        read_timeout=float(os.environ.get('REKOGNITION_TIMEOUT_S', '5')),
+        retries={'mode': 'standard', 'max_attempts': 2},
+    )
 else:
     rekognition = None
-dynamodb = boto3.resource('dynamodb', region_name=REGIAO)
+dynamodb = aws_clients.lazy_resource('dynamodb', REGIAO)
 
 # Keep the same variable names used by the rest of the code, but point them
 # to the new table names. The application code will be updated to include
@@ -47,42 +55,137 @@ tabela_usuarioempresa = dynamodb.Table(DYNAMODB_TABLE_USERS)
 tabela_configuracoes = dynamodb.Table(DYNAMODB_TABLE_CONFIG)
 # Nota: Horários pré-definidos serão salvos na tabela ConfigCompany com id='horarios_preset'
 
-def enviar_s3(caminho, nome_arquivo, company_id):
+def enviar_s3(caminho, nome_arquivo, company_id, background=False, derivatives=False):
     """Faz upload sob o prefixo da empresa e retorna a S3 key.
 
     Retorna a key (ex: '{company_id}/funcionarios/{id}.jpg').
     Para obter uma URL temporária, use generate_presigned_url(key).
+
+    Síncrono por padrão: fotos de cadastro sobrescrevem sempre a mesma key e
+    a resposta já devolve uma URL assinada para ela — em background um envio
+    antigo ainda na fila poderia sobrescrever o novo, e a URL daria 404 até o
+    upload terminar. `background=True` (utils/s3_uploader.py) só para keys
+    que nunca são reescritas nem lidas logo em seguida.
+    `derivatives=True` grava também as miniaturas WebP (ver
+    utils/photo_derivatives.py — item_fields() dá as keys para o item).
     """
+    from utils.s3_uploader import upload_async, upload_now
+    from utils.photo_derivatives import SIZES, derivative_key
+
     key = f"{company_id}/{nome_arquivo}"
-    s3.upload_file(
-        caminho,
-        BUCKET,
-        key,
-        ExtraArgs={'ContentType': 'image/jpeg'},
-    )
+    upload = upload_async if background else upload_now
+    upload(key, path=caminho, derivatives=derivatives)
+    # Fotos de cadastro sobrescrevem a mesma key — não servir URL antiga em cache
+    invalidate_presigned_url(key)
+    if derivatives:
+        for size in SIZES:
+            invalidate_presigned_url(derivative_key(key, size))
     return key
 
 
+# ── Cache de URLs assinadas ──────────────────────────────────────────────────
+# Assinar é só CPU (HMAC local), mas listagens assinam dezenas de fotos por
+# requisição e, principalmente, cada URL nova invalida o cache de imagem do
+# navegador/app. A URL é assinada com folga extra (até PRESIGN_REUSE_MAX_S) e
+# reaproveitada enquanto ainda restar pelo menos a validade pedida — o
+# chamador continua recebendo uma URL válida por >= expiration_seconds.
+# Cache por worker Gunicorn; LRU limitado a _PRESIGN_CACHE_MAX entradas.
+_PRESIGN_REUSE_MAX_S = int(os.environ.get('PRESIGN_REUSE_MAX_S', '900'))
+_PRESIGN_CACHE_MAX = 5000
+_presign_cache: 'OrderedDict[tuple[str, int], tuple[float, str]]' = OrderedDict()
+_presign_lock = Lock()
+
+
+def _sign(key: str, expires_in: int) -> str:
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': BUCKET, 'Key': key},
+        ExpiresIn=expires_in,
+    )
+
+
+def _presign_cached(key: str, expiration_seconds: int, now: float) -> str | None:
+    """Busca no cache (chamar com _presign_lock). None se ausente/perto de expirar."""
+    entry = _presign_cache.get((key, expiration_seconds))
+    if entry is None:
+        return None
+    expires_at, url = entry
+    if expires_at - now < expiration_seconds:
+        del _presign_cache[(key, expiration_seconds)]
+        return None
+    _presign_cache.move_to_end((key, expiration_seconds))
+    return url
+
+
+def _presign_store(key: str, expiration_seconds: int, expires_at: float, url: str) -> None:
+    _presign_cache[(key, expiration_seconds)] = (expires_at, url)
+    _presign_cache.move_to_end((key, expiration_seconds))
+    while len(_presign_cache) > _PRESIGN_CACHE_MAX:
+        _presign_cache.popitem(last=False)
+
+
+def invalidate_presigned_url(key: str) -> None:
+    """Descarta URLs em cache da key — usar quando o objeto é sobrescrito."""
+    with _presign_lock:
+        for cache_key in [k for k in _presign_cache if k[0] == key]:
+            del _presign_cache[cache_key]
+
+
+def generate_presigned_urls(keys, expiration_seconds: int = 3600) -> dict[str, str]:
+    """Versão em lote de generate_presigned_url.
+
+    Retorna {key: url} só para as keys assinadas com sucesso; keys vazias e
+    repetidas são ignoradas.
+    """
+    slack = min(expiration_seconds, _PRESIGN_REUSE_MAX_S)
+    urls: dict[str, str] = {}
+    missing: list[str] = []
+    seen: set[str] = set()
+    now = time.time()
+    with _presign_lock:
+        for key in keys:
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            url = _presign_cached(key, expiration_seconds, now)
+            if url:
+                urls[key] = url
+            else:
+                missing.append(key)
+
+    signed = []
+    for key in missing:
+        try:
+            signed.append((key, _sign(key, expiration_seconds + slack)))
+        except Exception as e:
+            print(f"[S3] Erro ao gerar presigned URL: {type(e).__name__}")
+
+    if signed:
+        expires_at = now + expiration_seconds + slack
+        with _presign_lock:
+            for key, url in signed:
+                _presign_store(key, expiration_seconds, expires_at, url)
+                urls[key] = url
+    return urls
+
+
 def generate_presigned_url(key: str, expiration_seconds: int = 3600) -> str | None:
     """Gera uma URL assinada temporária para um objeto S3.
 
+    URLs são reaproveitadas do cache enquanto ainda válidas pelo prazo pedido
+    (ver _PRESIGN_REUSE_MAX_S), então chamadas repetidas para a mesma foto
+    devolvem a mesma URL.
+
     Args:
         key: S3 object key (ex: '{company_id}/funcionarios/{id}.jpg')
-        expiration_seconds: Tempo de validade em segundos (padrão: 1 hora)
+        expiration_seconds: Tempo mínimo de validade em segundos (padrão: 1 hora)
 
     Returns:
         URL assinada ou None em caso de erro.
     """
-    try:
-        url = s3.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': BUCKET, 'Key': key},
-            ExpiresIn=expiration_seconds,
-        )
-        return url
-    except Exception as e:
-        print(f"[S3] Erro ao gerar presigned URL: {type(e).__name__}")
+    if not key:
         return None
+    return generate_presigned_urls([key], expiration_seconds).get(key)
 
 
 def extract_s3_key_from_url(url: str) -> str | None:
@@ -132,6 +235,33 @@ def _rek_cache_set(key: str, result: dict):
         _rek_cache[key] = (time.monotonic() + _REK_CACHE_TTL, result)
 
 
+# ── Circuit breaker Rekognition ──────────────────────────────────────────────
+# Após N falhas transitórias seguidas (throttling, timeout, 5xx), as chamadas
+# são recusadas na hora com status UNAVAILABLE em vez de segurar o worker.
+# Os endpoints de ponto usam esse status para entrar em modo degradado
+# (ver services/facial_verification.py).
+rekognition_breaker = CircuitBreaker(
+    'rekognition',
+    failure_threshold=int(os.environ.get('REKOGNITION_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.environ.get('REKOGNITION_BREAKER_RESET_S', '30')),
+)
+
+_REK_TRANSIENT_CODES = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'InternalServerError',
+    'ServiceUnavailableException',
+    'LimitExceededException',
+}
+
+
+def _is_transient_rekognition_error(exc: Exception) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get('Error', {}).get('Code') in _REK_TRANSIENT_CODES
+    # Timeouts de conexão/leitura e falhas de rede chegam como BotoCoreError
+    return isinstance(exc, BotoCoreError)
+
+
 def _resize_for_rekognition(image_bytes: bytes, max_px: int = 800) -> bytes:
     """Redimensiona para max_px no lado maior antes de enviar ao Rekognition.
 
@@ -184,6 +314,11 @@ def parse_external_image_id(external_id):
     return company_part, employee_part
 
 
+# Status de `reconhecer_funcionario` que identificam o funcionário (o ponto
+# síncrono e a verificação posterior usam a mesma regra).
+MATCH_STATUSES = ('OK', 'LOW_CONFIDENCE')
+
+
 def reconhecer_funcionario(caminho_foto, expected_company_id=None):
     """Procura o rosto na collection do Rekognition.
 
@@ -198,8 +333,12 @@ def reconhecer_funcionario(caminho_foto, expected_company_id=None):
       - {'status': 'INVALID_EXTERNAL_ID', 'external_image_id': ...}
       - {'status': 'TENANT_MISMATCH', 'matched_company_id': ..., 'expected_company_id': ...}
       - {'status': 'OK', 'company_id', 'employee_id', 'similarity', 'external_image_id'}
+      - {'status': 'LOW_CONFIDENCE', ...}  (mesmas chaves do OK, similaridade abaixo do threshold)
+      - {'status': 'UNAVAILABLE', 'reason': ...}  (transitório ou circuito aberto)
       - {'status': 'ERROR', 'reason': ...}
     """
+    if rekognition is None:
+        return {'status': 'ERROR', 'reason': 'rekognition-disabled'}
     try:
         print(f"[REKOGNITION] Iniciando busca facial na collection: {COLLECTION}")
         print(f"[REKOGNITION] Foto: {caminho_foto}, expected_company_id={expected_company_id}")
@@ -229,17 +368,36 @@ def reconhecer_funcionario(caminho_foto, expected_company_id=None):
         LOW_CONFIDENCE_FLOOR = 60
         api_threshold = min(threshold, LOW_CONFIDENCE_FLOOR)
 
-        # Redimensionar antes da chamada — reduz tamanho do payload e custo
-        api_bytes = _resize_for_rekognition(image_bytes)
-
-        # MaxFaces=10 permite encontrar o match correto mesmo quando o funcionário
-        # está cadastrado em múltiplas empresas (cada uma com seu próprio ExternalImageId).
-        response = rekognition.search_faces_by_image(
-            CollectionId=COLLECTION,
-            Image={'Bytes': api_bytes},
-            MaxFaces=10,
-            FaceMatchThreshold=api_threshold,
-        )
+        if not rekognition_breaker.allow():
+            print("[REKOGNITION] Circuito aberto — chamada recusada sem contatar a API")
+            return {'status': 'UNAVAILABLE', 'reason': 'circuit-open'}
+
+        try:
+            # Redimensionar antes da chamada — reduz tamanho do payload e custo
+            api_bytes = _resize_for_rekognition(image_bytes)
+
+            # MaxFaces=10 permite encontrar o match correto mesmo quando o funcionário
+            # está cadastrado em múltiplas empresas (cada uma com seu próprio ExternalImageId).
+            try:
+                response = rekognition.search_faces_by_image(
+                    CollectionId=COLLECTION,
+                    Image={'Bytes': api_bytes},
+                    MaxFaces=10,
+                    FaceMatchThreshold=api_threshold,
+                )
+            except Exception as api_exc:
+                if _is_transient_rekognition_error(api_exc):
+                    rekognition_breaker.record_failure()
+                    print(f"[REKOGNITION] Falha transitória: {type(api_exc).__name__}: {api_exc}")
+                    return {'status': 'UNAVAILABLE', 'reason': type(api_exc).__name__}
+                # InvalidParameter (sem rosto) etc. provam que a API respondeu
+                rekognition_breaker.record_success()
+                raise
+            rekognition_breaker.record_success()
+        finally:
+            # Exceção fora do previsto (resize, BaseException...) não pode deixar a
+            # sonda do half-open presa; sem efeito quando o resultado já foi registrado.
+            rekognition_breaker.release()
 
         matches = response.get('FaceMatches') or []
         if not matches:
@@ -0,0 +1,183 @@
+"""
+Fábrica única de clients/resources boto3 do processo.
+
+Antes cada módulo criava o seu `boto3.resource('dynamodb')` / `boto3.client`
+no import (alguns com us-east-1 fixo) e algumas rotas criavam um client novo a
+cada requisição. Agora:
+
+    client(service, **config)   client real, criado no primeiro uso e
+                                compartilhado pelo processo (um por serviço,
+                                região e config)
+    resource(service)           idem para resources
+    lazy_client / lazy_resource proxies para variáveis de módulo — nada é
+    table(name)                 criado no import; o objeto real é resolvido
+                                no primeiro atributo acessado
+
+Config base (env):
+    AWS_REGION / AWS_DEFAULT_REGION  região padrão (us-east-1)
+    AWS_MAX_POOL_CONNECTIONS  64     conexões HTTP por client — cobre o fan-out
+                                     de 40 threads do dashboard + threads gthread
+    AWS_RETRY_MODE            adaptive
+    AWS_MAX_ATTEMPTS          5
+    tcp_keepalive                    ligado (conexões ociosas não morrem no NAT)
+
+Tudo é criado numa boto3.Session própria do processo, com os hooks de
+services/usage_metering instalados. Depois de um fork (Gunicorn) o processo
+filho descarta o que herdou e recria na primeira chamada — pools de conexão
+não são compartilhados entre processos.
+
+Os modelos de serviço do botocore (JSON de dezenas/centenas de KB por serviço)
+ficam num loader único do módulo, que sobrevive ao reset/fork. Com preload
+(config/gunicorn.py) o master chama warm() e os workers herdam os modelos já
+lidos (copy-on-write): o primeiro client de cada worker sai em ~30 ms em vez
+de ~130 ms.
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+import boto3
+import botocore.loaders
+import botocore.session
+from botocore.config import Config
+
+REGION = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '64'))
+
+BASE_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    retries={
+        'mode': os.environ.get('AWS_RETRY_MODE', 'adaptive'),
+        'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', '5')),
+    },
+    tcp_keepalive=True,
+)
+
+_lock = threading.RLock()
+_pid: int | None = None
+_session: boto3.session.Session | None = None
+_clients: dict[tuple, object] = {}
+_resources: dict[tuple, object] = {}
+_loader = botocore.loaders.create_loader(os.environ.get('AWS_DATA_PATH'))
+
+
+def _key(service: str, region: str | None, options: dict) -> tuple:
+    return (service, region or REGION, tuple(sorted((k, repr(v)) for k, v in options.items())))
+
+
+def _ensure_process() -> boto3.session.Session:
+    """Sessão deste processo (chamar com _lock)."""
+    global _pid, _session
+    if _pid != os.getpid() or _session is None:
+        _clients.clear()
+        _resources.clear()
+        core = botocore.session.get_session()
+        core.register_component('data_loader', _loader)
+        _session = boto3.session.Session(botocore_session=core)
+        from services import usage_metering
+        usage_metering.install(_session)
+        _pid = os.getpid()
+    return _session
+
+
+def client(service: str, region: str | None = None, **options):
+    """Client compartilhado. `options` sobrepõem a BASE_CONFIG (ex: timeouts)."""
+    key = _key(service, region, options)
+    c = _clients.get(key)
+    if c is not None and _pid == os.getpid():
+        return c
+    with _lock:
+        session = _ensure_process()
+        c = _clients.get(key)
+        if c is None:
+            config = BASE_CONFIG.merge(Config(**options)) if options else BASE_CONFIG
+            c = session.client(service, region_name=region or REGION, config=config)
+            _clients[key] = c
+        return c
+
+
+def resource(service: str = 'dynamodb', region: str | None = None):
+    key = _key(service, region, {})
+    r = _resources.get(key)
+    if r is not None and _pid == os.getpid():
+        return r
+    with _lock:
+        session = _ensure_process()
+        r = _resources.get(key)
+        if r is None:
+            r = session.resource(service, region_name=region or REGION, config=BASE_CONFIG)
+            _resources[key] = r
+        return r
+
+
+def reset() -> None:
+    """Descarta sessão e clients (o próximo uso recria). Pós-fork e testes."""
+    global _pid
+    with _lock:
+        _pid = None
+
+
+def warm(services=('dynamodb', 's3', 'rekognition', 'ses')) -> None:
+    """Carrega no loader os modelos dos serviços (criar client não faz I/O de
+    rede) e descarta os clients — para o master do Gunicorn antes do fork."""
+    for service in services:
+        client(service)
+    resource('dynamodb').Table('warm')
+    reset()
+
+
+class _Lazy:
+    """Proxy que resolve o objeto real no primeiro acesso (e de novo após fork)."""
+
+    __slots__ = ('_factory', '_obj', '_obj_pid', '__weakref__')
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_obj', None)
+        object.__setattr__(self, '_obj_pid', None)
+
+    def _get(self):
+        obj = self._obj
+        if obj is None or self._obj_pid != os.getpid() or self._obj_pid != _pid:
+            obj = self._factory()
+            object.__setattr__(self, '_obj', obj)
+            object.__setattr__(self, '_obj_pid', os.getpid())
+        return obj
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+class LazyResource(_Lazy):
+    __slots__ = ('_region',)
+
+    def __init__(self, service: str, region: str | None):
+        super().__init__(lambda: resource(service, region))
+        object.__setattr__(self, '_region', region)
+
+    def Table(self, name: str) -> 'LazyTable':
+        return LazyTable(name, self._region)
+
+
+class LazyTable(_Lazy):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str, region: str | None = None):
+        super().__init__(lambda: resource('dynamodb', region).Table(name))
+        object.__setattr__(self, 'name', name)
+
+    def __repr__(self) -> str:
+        return f"LazyTable({self.name!r})"
+
+
+def lazy_client(service: str, region: str | None = None, **options) -> _Lazy:
+    return _Lazy(lambda: client(service, region, **options))
+
+
+def lazy_resource(service: str = 'dynamodb', region: str | None = None) -> LazyResource:
+    return LazyResource(service, region)
+
+
+def table(name: str, region: str | None = None) -> LazyTable:
+    return LazyTable(name, region)
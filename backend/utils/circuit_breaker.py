@@ -0,0 +1,83 @@
+"""
+Circuit breaker simples para dependências externas (Rekognition, etc.).
+
+Estados:
+    closed    — chamadas passam; falhas consecutivas são contadas
+    open      — chamadas são recusadas imediatamente até `reset_timeout` expirar
+    half-open — após o timeout, UMA chamada de teste passa; sucesso fecha o
+                circuito, falha reabre
+
+Estado por processo (cada worker Gunicorn tem o seu). É suficiente para o
+objetivo — não segurar um worker síncrono esperando uma API que já está
+falhando — sem exigir coordenação entre processos.
+"""
+import threading
+import time
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+        self._probe_owner: int | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """True se a chamada pode seguir. Em half-open libera só uma sonda por vez."""
+        with self._lock:
+            state = self._state_locked()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_owner = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"[CIRCUIT] {self.name}: fechado após sonda bem-sucedida")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+            self._probe_owner = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            reopen = self._probe_in_flight
+            self._probe_in_flight = False
+            self._probe_owner = None
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                print(f"[CIRCUIT] {self.name}: ABERTO após {self._failures} falha(s) — recusando por {self.reset_timeout:.0f}s")
+
+    def release(self) -> None:
+        """Devolve a sonda desta thread sem registrar resultado.
+
+        Para o `finally` do chamador: se algo entre allow() e record_* levantar
+        exceção, a sonda do half-open não fica presa (o que recusaria todas as
+        chamadas do processo para sempre). Sem efeito se o resultado já foi
+        registrado ou se a sonda é de outra thread.
+        """
+        with self._lock:
+            if self._probe_in_flight and self._probe_owner == threading.get_ident():
+                self._probe_in_flight = False
+                self._probe_owner = None
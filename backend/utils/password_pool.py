@@ -0,0 +1,114 @@
+"""
+Verificação bcrypt fora das threads de requisição.
+
+bcrypt custa ~100–250 ms de CPU por tentativa. No pico de login (início de
+turno) isso ocupava os workers/threads que atendem as batidas. As verificações
+de login vão para um ProcessPoolExecutor por worker Gunicorn, com tamanho e
+fila limitados:
+
+    BCRYPT_POOL_WORKERS      processos por worker Gunicorn (padrão 1)
+    BCRYPT_POOL_MAX_PENDING  logins na fila ou em execução (padrão 16); acima
+                             disso a requisição espera até BCRYPT_POOL_WAIT_S
+                             e recebe PasswordPoolBusy (503)
+    BCRYPT_POOL=0            desliga (verifica na própria thread)
+
+O pool é criado sob demanda no processo que o usa (depois do fork do
+Gunicorn) com contexto 'spawn' — fork de um processo com threads não é seguro.
+No Lambda não há pool (sem /dev/shm para os semáforos do multiprocessing).
+Se o pool quebrar, a verificação roda na própria thread e o pool é recriado.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+WORKERS = int(os.getenv('BCRYPT_POOL_WORKERS', '1'))
+MAX_PENDING = int(os.getenv('BCRYPT_POOL_MAX_PENDING', '16'))
+WAIT_S = float(os.getenv('BCRYPT_POOL_WAIT_S', '2'))
+ENABLED = os.getenv('BCRYPT_POOL', '1') == '1' and not os.getenv('AWS_LAMBDA_FUNCTION_NAME')
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+class PasswordPoolBusy(Exception):
+    """Fila de verificação cheia — responder 503 e deixar o cliente tentar de novo."""
+
+
+def _checkpw(password: str, password_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def _checkpw_many(password: str, password_hashes: list[str]) -> list[bool]:
+    return [_checkpw(password, h) for h in password_hashes]
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool, _pool_pid
+    if not ENABLED:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def verify_many(password: str, password_hashes: list[str]) -> list[bool]:
+    """Verifica a senha contra cada hash (uma tarefa no pool para todos).
+    Hashes vazios dão False sem custo. Levanta PasswordPoolBusy se a fila
+    estiver cheia.
+
+    Uma vaga por chamada, não por hash: com uma por hash, logins com vários
+    candidatos segurando vagas parciais podiam se bloquear mutuamente.
+    """
+    results = [False] * len(password_hashes)
+    todo = [(i, h) for i, h in enumerate(password_hashes) if h]
+    if not todo:
+        return results
+    hashes = [h for _, h in todo]
+    if not _slots.acquire(timeout=WAIT_S):
+        raise PasswordPoolBusy()
+    try:
+        try:
+            pool = _get_pool()
+        except Exception as e:
+            print(f"[BCRYPT] Pool indisponível, verificando na thread: {e}")
+            pool = None
+        matches = None
+        if pool is not None:
+            try:
+                matches = pool.submit(_checkpw_many, password, hashes).result()
+            except BrokenProcessPool as e:
+                print(f"[BCRYPT] Pool quebrado, recriando: {e}")
+                _reset_pool()
+        if matches is None:
+            matches = _checkpw_many(password, hashes)
+        for (i, _), ok in zip(todo, matches):
+            results[i] = ok
+        return results
+    finally:
+        _slots.release()
+
+
+def verify(password: str, password_hash: str) -> bool:
+    return verify_many(password, [password_hash])[0]
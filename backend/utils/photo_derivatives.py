@@ -0,0 +1,83 @@
+"""
+Miniaturas WebP geradas no upload das fotos (cadastro e ponto).
+
+Para cada original `<base>.jpg` são gravadas, no mesmo prefixo:
+    <base>.sm.webp  — 96px no lado maior  (avatar de listagem, dashboard)
+    <base>.md.webp  — 320px no lado maior (confirmação no kiosk, detalhe)
+
+As keys são determinísticas (derivative_key), então o item no DynamoDB já
+recebe `foto_s3_key_sm` / `foto_s3_key_md` no mesmo write que grava
+`foto_s3_key`, antes mesmo do upload em background terminar. Itens antigos
+não têm esses campos — photo_key_for() cai no original. O mesmo vale para
+fotos que o Pillow não lê: item_fields(key, image) deixa os campos vazios e
+nada é gravado nas keys de miniatura.
+"""
+from __future__ import annotations
+
+import io
+import os
+
+SIZES = {'sm': 96, 'md': 320}
+WEBP_QUALITY = int(os.environ.get('PHOTO_WEBP_QUALITY', '75'))
+WEBP_CONTENT_TYPE = 'image/webp'
+
+
+def derivative_key(key: str, size: str) -> str:
+    """'c/e/2024/01/02/08-00-00.jpg', 'sm' → 'c/e/2024/01/02/08-00-00.sm.webp'."""
+    base, _ = os.path.splitext(key)
+    return f"{base}.{size}.webp"
+
+
+def can_build(image: bytes | str) -> bool:
+    """True se o Pillow reconhece a imagem (bytes ou caminho) — só o cabeçalho."""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+def item_fields(key: str | None, image: bytes | str | None = None) -> dict:
+    """Atributos a gravar no item junto com foto_s3_key.
+
+    Com `image` (bytes ou caminho do original), imagem que o Pillow não lê
+    fica sem miniaturas: campos None, a leitura cai no original.
+    """
+    if not key or (image is not None and not can_build(image)):
+        return {f'foto_s3_key_{size}': None for size in SIZES}
+    return {f'foto_s3_key_{size}': derivative_key(key, size) for size in SIZES}
+
+
+def photo_key_for(item: dict, size: str | None) -> str | None:
+    """Key da foto no tamanho pedido; original quando não há derivado."""
+    if size in SIZES and item.get(f'foto_s3_key_{size}'):
+        return item[f'foto_s3_key_{size}']
+    return item.get('foto_s3_key')
+
+
+def build_derivatives(image_bytes: bytes) -> dict[str, tuple[bytes, str]]:
+    """Gera {size: (bytes, content_type)} para todos os tamanhos.
+
+    Se o Pillow não conseguir ler a imagem, devolve {} — nada é gravado nas
+    keys de miniatura (o original nunca vai para uma key `.webp`).
+    """
+    try:
+        from PIL import Image, ImageOps
+        img = Image.open(io.BytesIO(image_bytes))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+    except Exception as e:
+        print(f"[FOTO] Aviso: não foi possível gerar miniaturas ({e})")
+        return {}
+
+    out = {}
+    for size, max_px in SIZES.items():
+        thumb = img.copy()
+        thumb.thumbnail((max_px, max_px), Image.LANCZOS)
+        buf = io.BytesIO()
+        thumb.save(buf, format='WEBP', quality=WEBP_QUALITY, method=4)
+        out[size] = (buf.getvalue(), WEBP_CONTENT_TYPE)
+    return out
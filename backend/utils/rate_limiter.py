@@ -0,0 +1,148 @@
+"""
+Rate limiting GCRA (generic cell rate algorithm) com estado compartilhado.
+
+Cada chave guarda um único número — o TAT (theoretical arrival time). Para um
+limite de `max_req` por `window` segundos, o intervalo de emissão é
+T = window / max_req e uma requisição em `now` é aceita se
+
+    max(tat, now) + T - now <= window
+
+(equivale a um token bucket de capacidade max_req reabastecido a 1 token/T).
+Custo O(1) por requisição, independente de quantas vieram antes. Uma chave
+com tat <= now está com o bucket cheio e pode ser descartada — é assim que
+chaves ociosas expiram.
+
+Backends (RATE_LIMIT_BACKEND):
+    sqlite   (padrão) — arquivo local RATE_LIMIT_DB, compartilhado por todos os
+             workers Gunicorn do host; cada decisão é uma transação
+             BEGIN IMMEDIATE, então o limite vale para o host, não por worker
+    memory   — dict por processo (testes, dev com um worker só)
+    pacote.modulo:Classe — backend remoto (Redis, DynamoDB...) fornecido pelo
+             deploy; precisa implementar acquire() e purge() como os daqui
+
+Falha do backend nunca bloqueia a requisição: loga e deixa passar.
+"""
+from __future__ import annotations
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_PURGE_EVERY_S = 60.0
+
+
+class MemoryBackend:
+    """Estado em memória do processo. `max_keys` limita a memória sob chaves
+    aleatórias (credential stuffing): expira as ociosas e, se ainda faltar
+    espaço, descarta as menos recentes."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tat: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, interval: float, window: float, now: float) -> float:
+        """0 se aceitou; senão, segundos até a próxima requisição ser aceita."""
+        with self._lock:
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + interval
+            if new_tat - now > window + 1e-9:
+                return new_tat - window - now
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            if len(self._tat) > self.max_keys:
+                self._purge_locked(now)
+                while len(self._tat) > self.max_keys:
+                    self._tat.popitem(last=False)
+            return 0.0
+
+    def purge(self, now: float) -> int:
+        with self._lock:
+            return self._purge_locked(now)
+
+    def _purge_locked(self, now: float) -> int:
+        idle = [k for k, tat in self._tat.items() if tat <= now]
+        for k in idle:
+            del self._tat[k]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class SQLiteBackend:
+    """Estado num arquivo SQLite local, compartilhado entre processos do host.
+
+    Uma conexão por thread e por processo (recriada depois do fork).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def acquire(self, key: str, interval: float, window: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tat FROM rate WHERE key = ?', (key,)).fetchone()
+            tat = max(row[0] if row else now, now)
+            new_tat = tat + interval
+            if new_tat - now > window + 1e-9:
+                conn.execute('COMMIT')
+                return new_tat - window - now
+            conn.execute('INSERT OR REPLACE INTO rate (key, tat) VALUES (?, ?)', (key, new_tat))
+            conn.execute('COMMIT')
+            return 0.0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def purge(self, now: float) -> int:
+        return self._conn().execute('DELETE FROM rate WHERE tat <= ?', (now,)).rowcount
+
+    def __len__(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM rate').fetchone()[0]
+
+
+def _load_backend(spec: str):
+    if spec == 'memory':
+        return MemoryBackend()
+    if spec == 'sqlite':
+        path = os.getenv('RATE_LIMIT_DB') or os.path.join(tempfile.gettempdir(), 'registraponto_ratelimit.sqlite3')
+        return SQLiteBackend(path)
+    module, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module), attr)()
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else _load_backend(os.getenv('RATE_LIMIT_BACKEND', 'sqlite'))
+        self._next_purge = 0.0
+
+    def hit(self, key: str, max_req: int, window: float, now: float | None = None) -> float:
+        """Conta uma requisição. 0 = aceita; > 0 = recusada, com o Retry-After em segundos."""
+        now = time.time() if now is None else now
+        try:
+            retry_after = self.backend.acquire(key, window / max_req, window, now)
+            if now >= self._next_purge:
+                self._next_purge = now + _PURGE_EVERY_S
+                self.backend.purge(now)
+            return retry_after
+        except Exception as e:
+            print(f"[RATE] backend {type(self.backend).__name__} falhou, liberando {key}: {e}")
+            return 0.0
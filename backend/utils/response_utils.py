@@ -7,6 +7,8 @@ _BLOCKED_EMPLOYEE_FIELDS = frozenset({
     'face_id',        # Identificador biométrico do Rekognition — dado sensível
     'deleted_at',     # Campo interno de soft-delete
     'foto_s3_key',    # Chave interna S3
+    'foto_s3_key_sm', # Chaves internas das miniaturas (utils/photo_derivatives.py)
+    'foto_s3_key_md',
     'is_active',      # Campo interno (usar 'ativo')
 })
 
@@ -43,4 +45,14 @@ def sanitize_employee(employee: dict, generate_foto_url: bool = False) -> dict:
 
 def sanitize_employees(employees: list, generate_foto_url: bool = False) -> list:
     """Sanitiza uma lista de funcionários."""
+    if generate_foto_url:
+        try:
+            # Assina todas as fotos de uma vez; sanitize_employee reaproveita do cache
+            from utils.aws import generate_presigned_urls
+            generate_presigned_urls(
+                [e.get('foto_s3_key') for e in employees if isinstance(e, dict)],
+                expiration_seconds=300,
+            )
+        except Exception:
+            pass
     return [sanitize_employee(e, generate_foto_url=generate_foto_url) for e in employees]
@@ -2,14 +2,17 @@
 Gerenciamento de fotos no S3 com nova estrutura de pastas
 Formato: /company_id/employee_id/YYYY/MM/DD/HH-mm-ss.jpg
 """
-import boto3
 from datetime import datetime
 from typing import Optional
 import os
 
+from utils.photo_derivatives import SIZES, derivative_key
+from utils.s3_uploader import upload_async, upload_now
+from utils import aws_clients
+
 # Região AWS configurável via variável de ambiente
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
-s3 = boto3.client('s3', region_name=AWS_REGION)
+s3 = aws_clients.lazy_client('s3', AWS_REGION)
 BUCKET = os.environ.get('S3_BUCKET', 'registraponto-prod-fotos')
 
 def generate_s3_key(company_id: str, employee_id: str, timestamp: datetime = None) -> str:
@@ -33,31 +36,34 @@ def upload_photo_to_s3(
     company_id: str,
     employee_id: str,
     timestamp: datetime = None,
-    content_type: str = 'image/jpeg'
+    content_type: str = 'image/jpeg',
+    background: bool = True,
+    derivatives: bool = True,
 ) -> tuple[str, str]:
     """
     Faz upload de foto para S3 usando nova estrutura
-    
+
+    Com background=True (padrão) a foto vai para o spool de upload
+    (utils/s3_uploader.py) e a função retorna sem esperar a rede — a key já é
+    a definitiva. Use background=False quando o objeto precisa existir no
+    retorno (ex: migração que apaga o original em seguida).
+    Com derivatives=True (padrão) grava também as miniaturas WebP
+    (utils/photo_derivatives.py).
+
     Returns:
         tuple: (s3_key, public_url)
     """
     s3_key = generate_s3_key(company_id, employee_id, timestamp)
     
     try:
-        # Upload sem ACL (bucket deve ter política de acesso público configurada)
-        s3.put_object(
-            Bucket=BUCKET,
-            Key=s3_key,
-            Body=photo_bytes,
-            ContentType=content_type
-            # ACL removido - bucket usa Object Ownership: BucketOwnerEnforced
-        )
+        # Upload sem ACL (bucket usa Object Ownership: BucketOwnerEnforced)
+        upload = upload_async if background else upload_now
+        upload(s3_key, data=photo_bytes, content_type=content_type, derivatives=derivatives)
         
         # Gerar URL pública
         url = f"https://{BUCKET}.s3.amazonaws.com/{s3_key}"
         
-        print(f"[S3] Upload concluído: {s3_key}")
-        print(f"[S3] URL: {url}")
+        print(f"[S3] Upload {'agendado' if background else 'concluído'}: {s3_key}")
         
         return s3_key, url
         
@@ -66,9 +72,11 @@ def upload_photo_to_s3(
         raise
 
 def delete_photo_from_s3(s3_key: str) -> bool:
-    """Remove foto do S3"""
+    """Remove foto do S3 (e as miniaturas derivadas, se existirem)"""
     try:
         s3.delete_object(Bucket=BUCKET, Key=s3_key)
+        for size in SIZES:
+            s3.delete_object(Bucket=BUCKET, Key=derivative_key(s3_key, size))
         print(f"[S3] Foto deletada: {s3_key}")
         return True
     except Exception as e:
@@ -99,7 +107,7 @@ def migrate_old_photo_key(old_key: str, company_id: str, employee_id: str) -> Op
         photo_bytes = response['Body'].read()
         
         # Fazer upload com nova estrutura
-        new_key, _ = upload_photo_to_s3(photo_bytes, company_id, employee_id)
+        new_key, _ = upload_photo_to_s3(photo_bytes, company_id, employee_id, background=False)
         
         # Deletar foto antiga
         delete_photo_from_s3(old_key)
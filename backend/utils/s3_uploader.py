@@ -0,0 +1,215 @@
+"""
+Upload de fotos para o S3 fora do caminho da requisição.
+
+O endpoint de ponto/cadastro já conhece a key final do objeto, então grava o
+registro com ela na hora e só deixa o envio para depois:
+
+    upload_async(key, path=...)  →  copia para o spool local e retorna a key
+                                    (sem rede; ~ms em disco local)
+    threads deste worker         →  upload_file com retry/backoff
+    start_uploader() na subida   →  reenvia o que ficou no spool de um worker
+                                    anterior (crash, reload, deploy)
+
+Fila em memória limitada (S3_UPLOAD_QUEUE_MAX): se encher, a requisição faz o
+upload ela mesma — nunca descarta foto e nunca acumula memória sem limite.
+O arquivo no spool só é apagado depois do upload confirmado.
+
+Em Lambda (AWS_LAMBDA_FUNCTION_NAME) ou com S3_UPLOAD_ASYNC=0 o upload é
+síncrono: threads em background não rodam com a função congelada.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from utils.photo_derivatives import build_derivatives, derivative_key
+from utils.spool import Spool
+
+SPOOL_DIR = os.environ.get(
+    'S3_UPLOAD_SPOOL_DIR',
+    os.path.join(tempfile.gettempdir(), 'registraponto-uploads'),
+)
+ASYNC_ENABLED = (
+    os.environ.get('S3_UPLOAD_ASYNC', '1') == '1'
+    and 'AWS_LAMBDA_FUNCTION_NAME' not in os.environ
+)
+QUEUE_MAX = int(os.environ.get('S3_UPLOAD_QUEUE_MAX', '200'))
+THREADS = int(os.environ.get('S3_UPLOAD_THREADS', '2'))
+_BACKOFF_BASE_S = 2
+_BACKOFF_MAX_S = 5 * 60
+_SWEEP_INTERVAL_S = 10
+_WARN_AFTER_ATTEMPTS = 10
+
+_queue: queue.Queue[str] = queue.Queue(maxsize=QUEUE_MAX)
+_queued: set[str] = set()   # ids em _queue — a varredura não os repete
+_queued_lock = threading.Lock()
+_start_lock = threading.Lock()
+_threads: dict[str, threading.Thread] = {}   # nome → thread
+
+
+def _spool() -> Spool:
+    return Spool(SPOOL_DIR, blob_ext='bin')
+
+
+def _backoff(attempts: int) -> float:
+    return min(_BACKOFF_BASE_S * (2 ** max(attempts - 1, 0)), _BACKOFF_MAX_S)
+
+
+def _enqueue(job_id: str) -> bool:
+    """Põe o job na fila uma vez só. False se a fila estiver cheia."""
+    with _queued_lock:
+        if job_id in _queued:
+            return True
+        try:
+            _queue.put_nowait(job_id)
+        except queue.Full:
+            return False
+        _queued.add(job_id)
+        return True
+
+
+def _put_file(path: str, key: str, content_type: str) -> None:
+    from utils.aws import s3, BUCKET
+    s3.upload_file(path, BUCKET, key, ExtraArgs={'ContentType': content_type})
+
+
+def _put_bytes(data: bytes, key: str, content_type: str) -> None:
+    from utils.aws import s3, BUCKET
+    s3.put_object(Bucket=BUCKET, Key=key, Body=data, ContentType=content_type)
+
+
+def _put_derivatives(key: str, image_bytes: bytes) -> None:
+    for size, (body, ctype) in build_derivatives(image_bytes).items():
+        _put_bytes(body, derivative_key(key, size), ctype)
+
+
+def upload_now(key: str, *, path: str | None = None, data: bytes | None = None,
+               content_type: str = 'image/jpeg', derivatives: bool = False) -> str:
+    """Upload síncrono com a mesma interface de upload_async."""
+    if path is not None:
+        _put_file(path, key, content_type)
+        if derivatives:
+            with open(path, 'rb') as fh:
+                _put_derivatives(key, fh.read())
+    else:
+        _put_bytes(data, key, content_type)
+        if derivatives:
+            _put_derivatives(key, data)
+    return key
+
+
+def upload_async(key: str, *, path: str | None = None, data: bytes | None = None,
+                 content_type: str = 'image/jpeg', derivatives: bool = False) -> str:
+    """Agenda o upload de `path` (ou `data`) para `key` e retorna a key.
+
+    O chamador pode apagar `path` logo em seguida — o conteúdo já foi copiado
+    para o spool. Exceções só escapam se o fallback síncrono falhar.
+    Com `derivatives=True` também grava as miniaturas WebP
+    (utils/photo_derivatives.py) nas keys derivadas de `key`.
+    """
+    if (path is None) == (data is None):
+        raise ValueError('informe path OU data')
+
+    if not ASYNC_ENABLED:
+        return upload_now(key, path=path, data=data, content_type=content_type,
+                          derivatives=derivatives)
+
+    start_uploader()
+    try:
+        job_id = _spool().put(
+            {'key': key, 'content_type': content_type, 'derivatives': derivatives,
+             'created_at': time.time()},
+            blob_src_path=path, blob_bytes=data,
+        )
+    except OSError as e:
+        # Disco local cheio/indisponível: melhor pagar a latência do que perder a foto
+        print(f"[S3-UPLOAD] Spool indisponível ({e}) — upload síncrono de {key}")
+        return upload_now(key, path=path, data=data, content_type=content_type,
+                          derivatives=derivatives)
+
+    if not _enqueue(job_id):
+        # Backpressure: a fila está cheia, esta requisição envia a própria foto
+        claimed = _spool().claim(job_id)
+        if claimed is not None:
+            work_path, job = claimed
+            if not _process(job, work_path):
+                print(f"[S3-UPLOAD] Fila cheia e upload de {key} falhou — fica no spool para retry")
+    return key
+
+
+def _process(job: dict, work_path: str) -> bool:
+    """Uma tentativa de envio. True se concluído; senão devolve ao spool."""
+    spool = _spool()
+    blob = spool.blob_path(job['job_id'])
+    if not os.path.exists(blob):
+        print(f"[S3-UPLOAD] Arquivo do job {job['job_id']} ({job.get('key')}) ausente — descartando")
+        spool.finish(job, work_path)
+        return True
+    try:
+        upload_now(job['key'], path=blob, content_type=job.get('content_type') or 'image/jpeg',
+                   derivatives=bool(job.get('derivatives')))
+    except Exception as e:
+        job['attempts'] = int(job.get('attempts', 0)) + 1
+        if job['attempts'] >= _WARN_AFTER_ATTEMPTS:
+            print(f"[S3-UPLOAD] {job['key']} falhando há {job['attempts']} tentativas: {e}")
+        spool.release(job, work_path, _backoff(job['attempts']))
+        return False
+    spool.finish(job, work_path)
+    return True
+
+
+def _upload_loop() -> None:
+    spool = _spool()
+    while True:
+        job_id = _queue.get()
+        try:
+            claimed = spool.claim(job_id)
+            if claimed is not None:  # None: outro worker/thread já pegou
+                work_path, job = claimed
+                _process(job, work_path)
+        except Exception as e:
+            print(f"[S3-UPLOAD] Erro no worker: {e}")
+        finally:
+            with _queued_lock:
+                _queued.discard(job_id)
+            _queue.task_done()
+
+
+def _sweep_loop() -> None:
+    """Recupera jobs órfãos e reenfileira os que estão prontos para retry."""
+    while True:
+        try:
+            spool = _spool()
+            recovered = spool.recover_orphans()
+            if recovered:
+                print(f"[S3-UPLOAD] {len(recovered)} upload(s) recuperado(s) de worker morto")
+            with _queued_lock:
+                queued = set(_queued)
+            for job_id in spool.due_ids(skip=queued):
+                if not _enqueue(job_id):
+                    break
+        except Exception as e:
+            print(f"[S3-UPLOAD] Erro na varredura do spool: {e}")
+        time.sleep(_SWEEP_INTERVAL_S)
+
+
+def start_uploader() -> None:
+    """Sobe as threads de upload deste processo (idempotente).
+
+    Só recria as threads que morreram — as vivas seguem como estão.
+    """
+    if not ASYNC_ENABLED:
+        return
+    with _start_lock:
+        targets = {f's3-upload-{i}': _upload_loop for i in range(max(THREADS, 1))}
+        targets['s3-upload-sweep'] = _sweep_loop
+        for name, target in targets.items():
+            t = _threads.get(name)
+            if t is not None and t.is_alive():
+                continue
+            os.makedirs(SPOOL_DIR, exist_ok=True)
+            t = _threads[name] = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
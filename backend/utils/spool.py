@@ -0,0 +1,151 @@
+"""
+Fila durável em diretório local, compartilhada entre workers Gunicorn.
+
+Layout de um job:
+    <job_id>.json        — metadados (inclui `next_attempt_at`), aguardando
+    <job_id>.<pid>.work  — metadados de um job em execução pelo worker <pid>
+    <job_id>.<ext>       — payload binário opcional (foto, etc.)
+
+A posse é tomada com os.rename atômico de `.json` para `.work`: dois workers
+nunca processam o mesmo job ao mesmo tempo. `recover_orphans()` devolve à
+fila os `.work` de PIDs mortos (crash, reload), então nada se perde quando o
+processo cai no meio do trabalho.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+import uuid
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Spool:
+    def __init__(self, directory: str, blob_ext: str = 'bin'):
+        self.directory = directory
+        self.blob_ext = blob_ext
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def blob_path(self, job_id: str) -> str:
+        return self._path(f"{job_id}.{self.blob_ext}")
+
+    def _write_json_atomic(self, path: str, data: dict) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    def put(self, job: dict, blob_src_path: str | None = None,
+            blob_bytes: bytes | None = None) -> str:
+        """Persiste o job (e o payload, se houver). Retorna o job_id.
+
+        O payload é gravado antes do `.json` — um job visível sempre tem o
+        arquivo de dados completo ao lado.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        job_id = job.get('job_id') or uuid.uuid4().hex
+        job['job_id'] = job_id
+        job.setdefault('attempts', 0)
+        job.setdefault('next_attempt_at', 0)
+        if blob_src_path is not None:
+            shutil.copyfile(blob_src_path, self.blob_path(job_id))
+        elif blob_bytes is not None:
+            with open(self.blob_path(job_id), 'wb') as fh:
+                fh.write(blob_bytes)
+        self._write_json_atomic(self._path(f"{job_id}.json"), job)
+        return job_id
+
+    def claim(self, job_id: str) -> tuple[str, dict] | None:
+        """Toma posse de um job específico. None se outro worker já pegou."""
+        src = self._path(f"{job_id}.json")
+        work = self._path(f"{job_id}.{os.getpid()}.work")
+        try:
+            os.rename(src, work)
+        except OSError:
+            return None
+        try:
+            with open(work, encoding='utf-8') as fh:
+                return work, json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def due_ids(self, now: float | None = None, skip=()) -> list[str]:
+        """IDs aguardando cuja próxima tentativa já venceu (ordem de chegada).
+
+        IDs em `skip` são ignorados sem ler o `.json`.
+        """
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        due = []
+        for name in names:
+            if not name.endswith('.json') or name[:-5] in skip:
+                continue
+            try:
+                with open(self._path(name), encoding='utf-8') as fh:
+                    job = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if job.get('next_attempt_at', 0) <= now:
+                due.append((job.get('created_at', 0), name[:-5]))
+        return [job_id for _, job_id in sorted(due)]
+
+    def claim_due(self) -> tuple[str, dict] | None:
+        for job_id in self.due_ids():
+            claimed = self.claim(job_id)
+            if claimed is not None:
+                return claimed
+        return None
+
+    def release(self, job: dict, work_path: str, delay: float) -> None:
+        """Devolve o job à fila para nova tentativa daqui a `delay` segundos."""
+        job['next_attempt_at'] = time.time() + delay
+        self._write_json_atomic(self._path(f"{job['job_id']}.json"), job)
+        try:
+            os.remove(work_path)
+        except OSError:
+            pass
+
+    def finish(self, job: dict, work_path: str) -> None:
+        for path in (work_path, self.blob_path(job['job_id'])):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def recover_orphans(self) -> list[str]:
+        """Devolve à fila jobs em `.work` cujo worker dono morreu."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        recovered = []
+        for name in names:
+            if not name.endswith('.work'):
+                continue
+            try:
+                job_id, pid_str, _ = name.rsplit('.', 2)
+                pid = int(pid_str)
+            except ValueError:
+                continue
+            if pid != os.getpid() and not _pid_alive(pid):
+                try:
+                    os.rename(self._path(name), self._path(f"{job_id}.json"))
+                    recovered.append(job_id)
+                except OSError:
+                    pass
+        return recovered
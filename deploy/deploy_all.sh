@@ -148,9 +148,8 @@ ssh $SSH_OPTS "$EC2_USER@$EC2_HOST" bash <<'REMOTE'
   cd ~/RP_Full/backend
   source venv/bin/activate
   gunicorn \
-    --workers 3 \
+    -c config/gunicorn.py \
     --bind 127.0.0.1:8000 \
-    --timeout 120 \
     --access-logfile /var/log/gunicorn/access.log \
     --error-logfile /var/log/gunicorn/error.log \
     app:app \